@@ -12,7 +12,14 @@ from api.middleware.token_budget import TokenBudgetMiddleware
 from api.routers.health import router as health_router
 from api.routers.ingest import router as ingest_router
 from api.routers.search import router as search_router
+from api.services.bm25_index import BM25Index
 from api.services.cache import close_redis, create_semantic_cache_index, get_redis
+from api.services.document_changes import DocumentChangeListener
+from api.services.ingest_jobs import IngestJobQueue
+from api.services.reclaimer import VersionReclaimer
+from api.services.vector_index import VectorIndex
+from config import BM25_CONFIG, BM25_INDEX_CONFIG, NAMESPACE_REGISTRY, VECTOR_INDEX_CONFIG
+from core.database import ensure_namespace_partitions, set_bm25_stats_maintenance
 from core.database.pool import create_pool
 
 
@@ -20,15 +27,46 @@ from core.database.pool import create_pool
 async def lifespan(app: FastAPI):
     # STARTUP
     app.state.db_pool = await create_pool()
+    await ensure_namespace_partitions(app.state.db_pool, NAMESPACE_REGISTRY)
+    await set_bm25_stats_maintenance(app.state.db_pool, BM25_CONFIG["maintain_stats"])
     app.state.agent_graph = build_agent_graph(app.state.db_pool)
     app.state.redis = await get_redis()
     await create_semantic_cache_index()
     init_mcp_context(app.state.db_pool)
-    print("[startup] DB pool, agent graph, Redis, semantic cache, MCP context ready")
+    app.state.reclaimer = VersionReclaimer(app.state.db_pool)
+    app.state.reclaimer.start()
+    app.state.ingest_jobs = IngestJobQueue(app.state.db_pool, app.state.redis, app.state.reclaimer)
+    app.state.ingest_jobs.start()
+    app.state.vector_index = None
+    if VECTOR_INDEX_CONFIG["backend"] == "memory":
+        app.state.vector_index = VectorIndex(app.state.db_pool)
+    app.state.bm25_index = None
+    if BM25_INDEX_CONFIG["backend"] == "memory":
+        app.state.bm25_index = BM25Index(app.state.db_pool)
+    memory_indexes = [i for i in (app.state.vector_index, app.state.bm25_index) if i is not None]
+    # The listener holds a pool connection for good; only run it when an index consumes its events
+    app.state.document_changes = None
+    if memory_indexes:
+        app.state.document_changes = DocumentChangeListener(app.state.db_pool)
+        for index in memory_indexes:
+            app.state.document_changes.subscribe(index.on_change)
+        # LISTEN before the indexes load, so no change between a snapshot and the LISTEN is missed
+        await app.state.document_changes.start()
+        for index in memory_indexes:
+            index.start(NAMESPACE_REGISTRY)
+    print("[startup] DB pool, agent graph, Redis, semantic cache, MCP context, ingest workers, reclaimer ready")
 
     yield
 
     # SHUTDOWN
+    if app.state.document_changes is not None:
+        await app.state.document_changes.stop()
+    if app.state.vector_index is not None:
+        await app.state.vector_index.stop()
+    if app.state.bm25_index is not None:
+        await app.state.bm25_index.stop()
+    await app.state.ingest_jobs.stop()
+    await app.state.reclaimer.stop()
     await close_redis()
     await app.state.db_pool.close()
     print("[shutdown] DB pool and Redis pool closed")
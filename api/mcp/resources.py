@@ -42,9 +42,9 @@ async def resource_document(namespace: str, document_id: str) -> str:
             rows = await conn.fetch(
                 """
                 SELECT id, content, metadata
-                FROM documents
+                FROM current_documents
                 WHERE namespace = $1 AND document_id = $2
-                ORDER BY id
+                ORDER BY (metadata->>'chunk_index')::int, id
                 """,
                 namespace, document_id,
             )
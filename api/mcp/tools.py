@@ -163,7 +163,7 @@ async def get_ingestion_status(
                 SELECT
                     COUNT(DISTINCT document_id) AS doc_count,
                     COUNT(*) AS chunk_count
-                FROM documents
+                FROM current_documents
                 WHERE namespace = $1
                 """,
                 namespace,
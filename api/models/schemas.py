@@ -17,6 +17,41 @@ class IngestResponse(BaseModel):
     status: str = "new"  # "new" | "unchanged" | "updated"
     content_hash: str | None = None
     chunks_deleted: int = 0
+    chunks_reused: int = 0   # "updated" only: unchanged chunks kept without re-embedding
+    embedding_cache_hit_ratio: float = 0.0
+
+class IngestJobAccepted(BaseModel):
+    job_id: str
+    status: str = "queued"
+    status_url: str              # GET this to poll progress
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    status: str                  # "queued" | "running" | "done" | "failed"
+    stage: str                   # queued → running → chunking → embedding → registering → done
+    document_id: str
+    namespace: str
+    chunks_done: int = 0
+    chunks_total: int | None = None   # known once chunking has finished
+    elapsed_seconds: float = 0.0
+    throughput_chunks_per_second: float = 0.0
+    error: str | None = None
+    result: IngestResponse | None = None
+
+class DeleteResponse(BaseModel):
+    document_id: str
+    namespace: str
+    status: str = "deleted"
+    chunks_deleted: int          # hidden from search now; rows reclaimed in the background
+
+class ReclaimStatus(BaseModel):
+    running: bool
+    current: str | None = None   # "namespace/document_id" or "startup sweep" while a reclaim runs
+    queued: int
+    documents_done: int
+    chunks_reclaimed: int        # since this process started
+    last_error: str | None = None
+    dead_chunks: dict[str, int]  # namespace → rows still waiting to be reclaimed
 
 # --- Search ---
 
@@ -26,8 +61,9 @@ class SearchRequest(BaseModel):
     top_k: int = Field(default=5, ge=1, le=50, description="Number of chunks to retrieve")
     retrieval_mode: str = Field(
         default="hybrid",
-        pattern="^(vector_only|bm25_only|hybrid)$",
-        description="Retrieval strategy: vector_only, bm25_only, or hybrid (default)"
+        pattern="^(vector_only|bm25_only|hybrid|hybrid_sql)$",
+        description="Retrieval strategy: vector_only, bm25_only, hybrid (default), or hybrid_sql "
+                    "(same results, fused in one Postgres statement)"
     )
     rerank: bool = Field(
         default=True,
@@ -1,17 +1,12 @@
-import os
-import tempfile
-
+import redis.asyncio as redis
 from asyncpg import Pool
 from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse
 
-from api.models.schemas import IngestResponse
-from core.ingestion.lifecycle import (
-    check_document_status,
-    compute_content_hash,
-    delete_document_chunks,
-    register_document,
-)
-from core.pipeline.db_ingest import ingestion_pipeline
+from api.models.schemas import DeleteResponse, IngestJobAccepted, IngestJobStatus, IngestResponse, ReclaimStatus
+from api.services.ingest_jobs import IngestQueueFull, get_job, ingest_upload
+from api.services.uploads import spool_upload
+from core.ingestion.lifecycle import delete_document_chunks
 
 router = APIRouter()
 
@@ -30,71 +25,85 @@ async def ingest(
     file: UploadFile = File(...),
     namespace: str = "default",
     document_id: str = None,
+    background: bool = False,
     pool: Pool = Depends(get_db_pool),
 ):
     doc_id = document_id or file.filename
-    content = await file.read()
-    content_hash = compute_content_hash(content)
-
-    # Check document lifecycle status
-    status = await check_document_status(pool, doc_id, namespace, content_hash)
-
-    # Case 1: Unchanged file — short-circuit and skip processing
-    if status == "unchanged":
-        return IngestResponse(
-            document_id=doc_id,
-            namespace=namespace,
-            total_chunks=0,
-            total_time_seconds=0.0,
-            throughput_chunks_per_second=0.0,
-            status="unchanged",
-            content_hash=content_hash,
-            chunks_deleted=0,
-        )
 
-    # Case 2: Updated file — delete old chunks before re-ingesting
-    chunks_deleted = 0
-    if status == "updated":
-        chunks_deleted = await delete_document_chunks(pool, doc_id, namespace)
-
-    # Case 3 & 2 (New or Updated): Run chunking & embedding pipeline
-    tmp_path = None
+    # Read the upload in fixed-size pieces, hashing and UTF-8-validating as it
+    # arrives. Small files stay in memory; large ones spill to a spool file.
     try:
-        suffix = "." + file.filename.rsplit(".", 1)[-1] if "." in file.filename else ".txt"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-
-        metrics = await ingestion_pipeline(
-            input_file_path=tmp_path,
-            document_id=doc_id,
-            namespace=namespace,
-            pool=pool,
-        )
+        upload = await spool_upload(file)
+    except ValueError as e:                 # includes UnicodeDecodeError
+        raise HTTPException(status_code=415, detail=str(e))
 
-        # Register document in document_registry
-        await register_document(
-            pool=pool,
-            document_id=doc_id,
-            namespace=namespace,
-            content_hash=content_hash,
-            chunk_count=metrics.get("total_chunks", 0),
-            source_filename=file.filename,
-        )
+    # Job mode: answer 202 with a job id now, ingest in a background worker.
+    # Poll GET /ingest/jobs/{job_id} for stage and progress. Once submitted,
+    # the job owns the upload and removes its spool file.
+    if background:
+        try:
+            job_id = await request.app.state.ingest_jobs.submit(upload, doc_id, namespace)
+        except IngestQueueFull as e:
+            upload.cleanup()
+            return JSONResponse(
+                status_code=429,
+                content={"error": "ingest_queue_full", "retry_after_seconds": e.retry_after},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        except redis.RedisError as e:
+            upload.cleanup()
+            raise HTTPException(status_code=503, detail=f"job store unavailable: {e}")
+        accepted = IngestJobAccepted(job_id=job_id, status_url=f"/ingest/jobs/{job_id}")
+        return JSONResponse(status_code=202, content=accepted.model_dump())
 
+    # Synchronous mode: lifecycle check on the spooled digest → chunk → embed
+    # → COPY → register. Unchanged files short-circuit; updated files go
+    # through the incremental path — only new/changed chunks are embedded,
+    # unchanged ones are carried over into the new version, and searches
+    # switch to it when it is registered. The old version is deleted in the
+    # background by the reclaimer. In-memory uploads are chunked whole;
+    # spilled ones are streamed from the spool file.
+    try:
+        result = await ingest_upload(pool, upload, doc_id, namespace, reclaimer=request.app.state.reclaimer)
     except ValueError as e:
         raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        upload.cleanup()
+
+    return IngestResponse(**result)
+
+
+@router.get("/ingest/jobs/{job_id}", response_model=IngestJobStatus)
+async def ingest_job_status(job_id: str, request: Request):
+    # Job state is in Redis, so any API replica can answer — not just the
+    # one whose worker runs the job.
+    try:
+        job = await get_job(request.app.state.redis, job_id)
+    except redis.RedisError as e:
+        raise HTTPException(status_code=503, detail=f"job store unavailable: {e}")
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"unknown or expired job: {job_id}")
+    return IngestJobStatus(**job)
+
+
+@router.delete("/ingest/{document_id}", response_model=DeleteResponse)
+async def delete_document(
+    document_id: str,
+    request: Request,
+    namespace: str = "default",
+    pool: Pool = Depends(get_db_pool),
+):
+    # Tombstone only: search stops returning the document as soon as this
+    # answers, whatever its size. The reclaimer deletes the rows in batches.
+    count = await delete_document_chunks(pool, document_id, namespace)
+    if count is None:
+        raise HTTPException(status_code=404, detail=f"unknown document: {namespace}/{document_id}")
+    request.app.state.reclaimer.schedule(document_id, namespace)
+    return DeleteResponse(document_id=document_id, namespace=namespace, chunks_deleted=count)
+
 
-    return IngestResponse(
-        document_id=doc_id,
-        namespace=namespace,
-        status=status,
-        content_hash=content_hash,
-        chunks_deleted=chunks_deleted,
-        **metrics,
-    )
+@router.get("/ingest/reclaim", response_model=ReclaimStatus)
+async def reclaim_status(request: Request):
+    return ReclaimStatus(**await request.app.state.reclaimer.status())
@@ -0,0 +1,267 @@
+"""
+api/services/bm25_index.py
+
+In-process Okapi BM25, per namespace — retrieve_bm25's "memory" backend
+(RetrieverConfig.bm25_backend, config.BM25_INDEX_CONFIG).
+
+Postings are built from the chunks' own fts_vector (lexeme, number of
+positions), so a chunk matches exactly what it matches in Postgres FTS.
+They are held compressed-sparse-row style: per term a slice of chunk
+positions (int32) and term frequencies (float32), with chunk lengths
+(bm25_length) alongside. A query term's contribution is one vectorised
+update of a score array over its postings; AND / OR matching (as in
+BM25_OR_THRESHOLD) is a count of matched terms per chunk. Unlike BM25_SQL
+there is no candidate budget: every matching chunk is scored, and the
+statistics are over current chunks only.
+
+Query analysis stays Postgres's: the lexemes of to_tsvector('english',
+query) are fetched once per distinct query and kept in an LRU cache, so a
+repeated query ("GDPR Article 5") is answered with no round trip at all.
+
+Freshness and fallback work as for the vector index
+(api.services.memory_indexes): a changed document's rows are masked out of
+the namespace's postings and its current rows indexed in a small delta
+segment; search() returns None when Postgres has to answer.
+"""
+import asyncio
+import json
+import logging
+import math
+from collections import OrderedDict
+from typing import Iterable
+
+import numpy as np
+from asyncpg import Pool
+
+from api.services.memory_indexes import MemoryIndexes
+from config import BM25_INDEX_CONFIG
+
+logger = logging.getLogger("api.bm25_index")
+
+ROWS_SQL = """
+SELECT d.id, d.document_id, d.content, d.metadata,
+       coalesce(v.terms, '{}') AS terms, coalesce(v.tfs, '{}') AS tfs
+FROM current_documents d
+CROSS JOIN LATERAL (
+    SELECT array_agg(u.lexeme) AS terms,
+           array_agg(coalesce(array_length(u.positions, 1), 1)) AS tfs
+    FROM unnest(d.fts_vector) u
+) v
+WHERE d.namespace = $1
+"""
+
+ANALYSE_SQL = "SELECT tsvector_to_array(to_tsvector('english', $1))"
+
+_NO_POSTINGS = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+
+
+def _metadata(raw) -> dict:
+    if isinstance(raw, str):
+        return json.loads(raw)
+    return raw or {}
+
+
+class Postings:
+    """Term -> (chunk positions, term frequencies) over a fixed set of chunks."""
+
+    def __init__(self, rows: list):
+        self.rows = [
+            {"id": r["id"], "document_id": r["document_id"], "content": r["content"],
+             "metadata": _metadata(r["metadata"])}
+            for r in rows
+        ]
+        self.ids = np.array([r["id"] for r in rows], dtype=np.int64)
+        self.vocabulary: dict[str, int] = {}
+        self.documents: dict[str, int] = {}
+        self.doc_codes = np.array([self.documents.setdefault(r["document_id"], len(self.documents)) for r in rows],
+                                  dtype=np.int32)
+        term_codes, chunks, tfs = [], [], []
+        for i, r in enumerate(rows):
+            term_codes += [self.vocabulary.setdefault(t, len(self.vocabulary)) for t in r["terms"]]
+            chunks += [i] * len(r["terms"])
+            tfs += r["tfs"]
+        term_codes = np.array(term_codes, dtype=np.int64)
+        order = np.argsort(term_codes, kind="stable")
+        self.chunks = np.array(chunks, dtype=np.int32)[order]
+        self.tfs = np.array(tfs, dtype=np.float32)[order]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(np.bincount(term_codes, minlength=len(self.vocabulary)))
+        self.lengths = np.array([sum(r["tfs"]) for r in rows], dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        code = self.vocabulary.get(term)
+        if code is None:
+            return _NO_POSTINGS
+        start, end = self.offsets[code], self.offsets[code + 1]
+        return self.chunks[start:end], self.tfs[start:end]
+
+
+class NamespaceBM25:
+    """
+    One worker's postings for a namespace: the chunks it was loaded with,
+    a mask of those no longer visible, and a delta segment of newer ones.
+    """
+
+    def __init__(self, rows: list):
+        self.base = Postings(rows)
+        self.alive = np.ones(len(self.base), dtype=bool)
+        self._delta_rows: list = []
+        self.delta = Postings([])
+        self.changed_rows = 0
+        self._total_length = float(self.base.lengths.sum())
+
+    @property
+    def size(self) -> int:
+        return int(self.alive.sum()) + len(self.delta)
+
+    @property
+    def base_size(self) -> int:
+        return len(self.base)
+
+    def replace_documents(self, document_ids: Iterable[str], rows: list) -> None:
+        """The documents' visible rows are now exactly rows (none for a deleted document)."""
+        document_ids = set(document_ids)
+        codes = [self.base.documents[d] for d in document_ids if d in self.base.documents]
+        if codes:
+            dropped = self.alive & np.isin(self.base.doc_codes, codes)
+            self.changed_rows += int(dropped.sum())
+            self.alive &= ~dropped
+        self._delta_rows = [r for r in self._delta_rows if r["document_id"] not in document_ids] + list(rows)
+        self.delta = Postings(self._delta_rows)
+        self.changed_rows += len(rows)
+        self._total_length = float(self.base.lengths[self.alive].sum() + self.delta.lengths.sum())
+
+    def search(self, terms: list[str], or_mode: bool, limit: int, k1: float, b: float) -> list[dict]:
+        """Okapi BM25 top-limit of the chunks matching all (or, in OR mode, any) of terms."""
+        terms = list(dict.fromkeys(terms))
+        n = self.size
+        if not terms or n == 0 or limit <= 0:
+            return []
+        avg_length = max(self._total_length / n, 1.0)
+        segments = ((self.base, self.alive), (self.delta, None))
+        scores = [np.zeros(len(seg), dtype=np.float64) for seg, _ in segments]
+        matched = [np.zeros(len(seg), dtype=np.int32) for seg, _ in segments]
+
+        for term in terms:
+            found = []
+            for seg, alive in segments:
+                chunks, tf = seg.postings(term)
+                if alive is not None and len(chunks):
+                    visible = alive[chunks]
+                    chunks, tf = chunks[visible], tf[visible]
+                found.append((chunks, tf))
+            doc_freq = sum(len(chunks) for chunks, _ in found)
+            if doc_freq == 0:
+                if not or_mode:
+                    return []
+                continue
+            idf = math.log(1 + (n - doc_freq + 0.5) / (doc_freq + 0.5))
+            for (seg, _), score, hits, (chunks, tf) in zip(segments, scores, matched, found):
+                norm = k1 * (1 - b + b * seg.lengths[chunks] / avg_length)
+                score[chunks] += idf * tf * (k1 + 1) / (tf + norm)
+                hits[chunks] += 1
+
+        scores, matched = np.concatenate(scores), np.concatenate(matched)
+        candidates = np.flatnonzero(matched >= (1 if or_mode else len(terms)))
+        if len(candidates) == 0:
+            return []
+        k = min(limit, len(candidates))
+        # Every candidate tied with the k-th score stays in, and ties go to
+        # the lower id, as in BM25_SQL's ORDER BY bm25_score DESC, id
+        kth = -np.partition(-scores[candidates], k - 1)[k - 1]
+        candidates = candidates[scores[candidates] >= kth]
+        ids = np.concatenate([self.base.ids, self.delta.ids])[candidates]
+        top = candidates[np.lexsort((ids, -scores[candidates]))[:k]]
+
+        results = []
+        n_base = len(self.base)
+        for i in top:
+            row = self.base.rows[i] if i < n_base else self.delta.rows[i - n_base]
+            results.append({
+                **row,
+                "bm25_score": float(scores[i]),
+                "source_filename": row["metadata"].get("source_filename"),
+            })
+        return results
+
+
+class BM25Index(MemoryIndexes):
+    """
+    Per-worker set of NamespaceBM25, loaded on demand and kept fresh by a
+    single background task (api.services.memory_indexes).
+
+    Usage (FastAPI lifespan):
+        app.state.bm25_index = BM25Index(db_pool)
+        app.state.document_changes.subscribe(app.state.bm25_index.on_change)
+        app.state.bm25_index.start(NAMESPACE_REGISTRY)   # preload
+        ...
+        await app.state.bm25_index.stop()
+    """
+
+    name = "bm25_index"
+    ROWS_SQL = ROWS_SQL
+
+    def __init__(
+        self,
+        pool: Pool,
+        max_rows: int = BM25_INDEX_CONFIG["max_rows"],
+        rebuild_fraction: float = BM25_INDEX_CONFIG["rebuild_fraction"],
+        query_cache_size: int = BM25_INDEX_CONFIG["query_cache_size"],
+    ):
+        super().__init__(pool, max_rows, rebuild_fraction)
+        self.query_cache_size = query_cache_size
+        self._query_terms: OrderedDict[str, list[str]] = OrderedDict()
+
+    def start(self, namespaces: Iterable[str] = ()) -> None:
+        super().start(namespaces)
+        _set_active(self)
+
+    async def stop(self) -> None:
+        _set_active(None)
+        await super().stop()
+
+    async def search(
+        self, namespace: str, query: str, limit: int, or_mode: bool, k1: float, b: float,
+    ) -> list[dict] | None:
+        """Top-limit rows from memory, or None when Postgres has to answer this one."""
+        index = self._lookup(namespace)
+        if index is None:
+            return None
+        terms = await self._analyse(query)
+        return index.search(terms, or_mode, limit, k1, b)
+
+    async def _analyse(self, query: str) -> list[str]:
+        terms = self._query_terms.get(query)
+        if terms is not None:
+            self._query_terms.move_to_end(query)
+            return terms
+        async with self.pool.acquire() as conn:
+            terms = list(await conn.fetchval(ANALYSE_SQL, query))
+        self._query_terms[query] = terms
+        if len(self._query_terms) > self.query_cache_size:
+            self._query_terms.popitem(last=False)
+        return terms
+
+    async def _open(self, namespace: str, force: bool) -> NamespaceBM25:
+        # Postings are per worker; there is nothing shared to reuse
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(self.ROWS_SQL, namespace)
+        index = await asyncio.to_thread(NamespaceBM25, rows)
+        logger.info(f"[bm25_index] {namespace}: {index.size} chunks, {len(index.base.vocabulary)} terms in memory")
+        return index
+
+
+_active: BM25Index | None = None
+
+
+def _set_active(index: BM25Index | None) -> None:
+    global _active
+    _active = index
+
+
+def get_bm25_index() -> BM25Index | None:
+    """The running index of this worker, or None (retrieve_bm25 then uses Postgres)."""
+    return _active
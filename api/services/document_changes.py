@@ -0,0 +1,113 @@
+"""
+api/services/document_changes.py
+
+One LISTEN connection per worker on lifecycle.DOCUMENT_CHANGES_CHANNEL,
+fanned out to in-process indexes that mirror the documents table.
+
+register_document and delete_document_chunks publish {"namespace",
+"document_id"} in the statement that changes what current_documents shows,
+so a subscriber hears of a change when it becomes visible. Subscribers are
+plain callbacks run on the event loop; they should only record the change
+and let their own task do the work.
+
+A subscriber called with (namespace, None) must assume anything in the
+namespace changed, and with (None, None) anything at all: that is what it
+gets after the LISTEN connection was lost and re-established, since
+notifications sent in between are gone.
+"""
+import asyncio
+import json
+import logging
+from typing import Callable
+
+from asyncpg import Pool
+
+from core.ingestion.lifecycle import DOCUMENT_CHANGES_CHANNEL
+
+logger = logging.getLogger("api.document_changes")
+
+RECONNECT_DELAY_SECONDS = 1.0
+
+ChangeCallback = Callable[[str | None, str | None], None]
+
+
+class DocumentChangeListener:
+    """
+    Usage (FastAPI lifespan):
+        app.state.document_changes = DocumentChangeListener(db_pool)
+        app.state.document_changes.subscribe(index.on_change)
+        await app.state.document_changes.start()
+        ...
+        await app.state.document_changes.stop()
+    """
+
+    def __init__(self, pool: Pool):
+        self.pool = pool
+        self._subscribers: list[ChangeCallback] = []
+        self._conn = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._stopping = False
+
+    def subscribe(self, callback: ChangeCallback) -> None:
+        self._subscribers.append(callback)
+
+    async def start(self) -> None:
+        self._stopping = False
+        await self._listen()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            await asyncio.gather(self._reconnect_task, return_exceptions=True)
+            self._reconnect_task = None
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            if not conn.is_closed():
+                await conn.remove_listener(DOCUMENT_CHANGES_CHANNEL, self._on_notify)
+            await self.pool.release(conn)
+
+    async def _listen(self) -> None:
+        self._conn = await self.pool.acquire()
+        self._conn.add_termination_listener(self._on_terminated)
+        await self._conn.add_listener(DOCUMENT_CHANGES_CHANNEL, self._on_notify)
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str) -> None:
+        try:
+            change = json.loads(payload)
+            namespace, document_id = change["namespace"], change["document_id"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"[document_changes] ignoring malformed payload {payload!r}")
+            return
+        self._dispatch(namespace, document_id)
+
+    def _dispatch(self, namespace: str | None, document_id: str | None) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(namespace, document_id)
+            except Exception as e:
+                logger.warning(f"[document_changes] subscriber failed: {e}")
+
+    def _on_terminated(self, conn) -> None:
+        if self._stopping or self._reconnect_task is not None:
+            return
+        logger.warning("[document_changes] LISTEN connection lost; reconnecting")
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect(conn))
+
+    async def _reconnect(self, lost) -> None:
+        try:
+            await self.pool.release(lost)
+        except Exception:
+            pass
+        self._conn = None
+        while not self._stopping:
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.warning(f"[document_changes] reconnect failed: {e}")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                continue
+            self._reconnect_task = None
+            # Whatever was published while we were gone is lost
+            self._dispatch(None, None)
+            return
@@ -0,0 +1,334 @@
+"""
+api/services/ingest_jobs.py
+
+Background ingestion jobs for POST /ingest?background=true.
+
+The synchronous route does hash → lifecycle check → chunk → embed → COPY →
+register inside the request, so a large upload holds the HTTP connection
+for minutes and dies behind any proxy with a 60s timeout. In job mode:
+
+  1. POST stores a "queued" job record in Redis, puts the upload on an
+     in-process asyncio.Queue and answers 202 with the job id at once.
+  2. A fixed number of worker tasks (INGEST_JOB_CONFIG["workers"]) drain the
+     queue and run the same ingest_upload() as the synchronous route,
+     writing stage / chunks_done to the job record as they go.
+  3. GET /ingest/jobs/{id} reads the record. It lives in Redis, not in this
+     process, so whichever API replica receives the poll can answer it.
+
+Backpressure: the queue is bounded (INGEST_JOB_CONFIG["max_queued"]). When it
+is full, submit() raises IngestQueueFull and the route answers 429 with a
+Retry-After estimated from recent job durations. Queued uploads are
+SpooledUploads (api/services/uploads.py): small ones in memory, large ones as
+spool files, so memory held by the queue is at most max_queued ×
+SPOOL_MAX_MEMORY.
+
+Jobs are in-process: a job queued or running when the process stops is
+marked failed (on a clean shutdown) and must be resubmitted.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from uuid import uuid4
+
+import redis.asyncio as redis
+from asyncpg import Pool
+
+from api.services.reclaimer import VersionReclaimer
+from api.services.uploads import SpooledUpload
+from config import INGEST_JOB_CONFIG
+from core.ingestion.lifecycle import allocate_version, check_document_status, register_document
+from core.pipeline.db_ingest import ProgressFn, ingest_document, ingestion_pipeline
+
+logger = logging.getLogger("api.ingest_jobs")
+
+JOB_KEY_PREFIX = "ingest_job:"
+
+# Retry-After inputs: assumed job duration until one has finished, and a cap
+DEFAULT_JOB_SECONDS = 10.0
+MAX_RETRY_AFTER_SECONDS = 300
+
+
+async def ingest_upload(
+    pool: Pool,
+    upload: SpooledUpload,
+    document_id: str,
+    namespace: str,
+    on_progress: ProgressFn | None = None,
+    reclaimer: VersionReclaimer | None = None,
+) -> dict:
+    """
+    Lifecycle-aware ingest of one received upload; returns IngestResponse fields.
+
+    Shared by the synchronous /ingest route and the job workers. The digest
+    was computed while the upload was spooled, so the lifecycle check is one
+    query. Unchanged content short-circuits; updated documents take the
+    incremental path. In-memory uploads are chunked whole (chunk_document);
+    spilled ones are streamed from the spool file. Raises ValueError for
+    content that cannot be chunked — the route maps it to 415.
+
+    New and updated documents are written under a freshly allocated version
+    that stays invisible to search until register_document flips the
+    registry to it, so searches see the old chunk set or the new one, never
+    a mix. The superseded rows are then handed to reclaimer (deleted in the
+    background); without one they stay hidden until its next sweep.
+    """
+    content_hash = upload.sha256
+    status = await check_document_status(pool, document_id, namespace, content_hash)
+
+    if status == "unchanged":
+        return {
+            "document_id": document_id,
+            "namespace": namespace,
+            "total_chunks": 0,
+            "total_time_seconds": 0.0,
+            "throughput_chunks_per_second": 0.0,
+            "status": "unchanged",
+            "content_hash": content_hash,
+            "chunks_deleted": 0,
+        }
+
+    source = upload.filename or document_id
+    version = await allocate_version(pool)
+    if upload.content is not None:
+        metrics = await ingest_document(
+            text=upload.content.decode("utf-8"),
+            source=source,
+            document_id=document_id,
+            namespace=namespace,
+            pool=pool,
+            incremental=(status == "updated"),
+            version=version,
+            on_progress=on_progress,
+        )
+    else:
+        metrics = await ingestion_pipeline(
+            input_file_path=upload.path,
+            source=source,
+            document_id=document_id,
+            namespace=namespace,
+            pool=pool,
+            incremental=(status == "updated"),
+            version=version,
+            on_progress=on_progress,
+        )
+
+    if on_progress is not None:
+        await on_progress("registering", metrics["total_chunks"], metrics["total_chunks"])
+    await register_document(
+        pool=pool,
+        document_id=document_id,
+        namespace=namespace,
+        content_hash=content_hash,
+        chunk_count=metrics.get("total_chunks", 0),
+        source_filename=upload.filename,
+        version=version,
+    )
+    if status == "updated" and reclaimer is not None:
+        reclaimer.schedule(document_id, namespace)
+
+    return {
+        "document_id": document_id,
+        "namespace": namespace,
+        "status": status,
+        "content_hash": content_hash,
+        **metrics,
+    }
+
+
+class IngestQueueFull(Exception):
+    """The job queue is at max_queued; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"ingest job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Job:
+    job_id:      str
+    upload:      SpooledUpload
+    document_id: str
+    namespace:   str
+
+
+class IngestJobQueue:
+    """
+    Bounded in-process job queue drained by a fixed pool of worker tasks.
+
+    Usage (FastAPI lifespan):
+        app.state.ingest_jobs = IngestJobQueue(db_pool, redis_client, app.state.reclaimer)
+        app.state.ingest_jobs.start()
+        ...
+        await app.state.ingest_jobs.stop()
+    """
+
+    def __init__(
+        self,
+        pool: Pool,
+        redis_client: redis.Redis,
+        reclaimer: VersionReclaimer | None = None,
+        workers: int | None = None,
+        max_queued: int | None = None,
+        ttl_seconds: int | None = None,
+    ):
+        self.pool = pool
+        self.redis = redis_client
+        self.reclaimer = reclaimer
+        self.workers = workers or INGEST_JOB_CONFIG["workers"]
+        self.ttl_seconds = ttl_seconds or INGEST_JOB_CONFIG["job_ttl_seconds"]
+        self._queue: asyncio.Queue[_Job] = asyncio.Queue(maxsize=max_queued or INGEST_JOB_CONFIG["max_queued"])
+        self._tasks: list[asyncio.Task] = []
+        self._running: set[str] = set()
+        self._avg_job_seconds: float | None = None
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers and fail every job that did not finish."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        unfinished = list(self._running)
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.upload.cleanup()
+            unfinished.append(job.job_id)
+        for job_id in unfinished:
+            await self._update(job_id, {
+                "status": "failed",
+                "error": "server shut down before the job finished; resubmit the upload",
+                "finished_at": time.time(),
+            })
+        self._running.clear()
+
+    async def submit(self, upload: SpooledUpload, document_id: str, namespace: str) -> str:
+        """
+        Record a queued job and enqueue it; returns the job id. On success the
+        queue owns upload and cleans it up after the job runs.
+
+        Raises IngestQueueFull when the queue is at capacity, and
+        redis.RedisError if the job record cannot be written — a job nobody
+        can poll is not accepted.
+        """
+        if self._queue.full():
+            raise IngestQueueFull(self.retry_after())
+
+        job = _Job(uuid4().hex, upload, document_id, namespace)
+        await self._save(job.job_id, {
+            "status": "queued",
+            "stage": "queued",
+            "document_id": document_id,
+            "namespace": namespace,
+            "filename": upload.filename,
+            "size_bytes": upload.size,
+            "chunks_done": 0,
+            "created_at": time.time(),
+        })
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Another request took the last slot while the record was written
+            await self._update(job.job_id, {"status": "failed", "error": "queue full", "finished_at": time.time()})
+            raise IngestQueueFull(self.retry_after()) from None
+        return job.job_id
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a queue slot is likely free. The queue is full, so every
+        worker is busy; one of them finishes about every avg_job / workers.
+        """
+        per_job = self._avg_job_seconds or DEFAULT_JOB_SECONDS
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(per_job / self.workers)))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._running.add(job.job_id)
+            try:
+                await self._run(job)
+            finally:
+                job.upload.cleanup()
+                self._running.discard(job.job_id)
+                self._queue.task_done()
+
+    async def _run(self, job: _Job) -> None:
+        started_at = time.time()
+        await self._update(job.job_id, {"status": "running", "stage": "running", "started_at": started_at})
+
+        async def progress(stage: str, chunks_done: int, chunks_total: int | None) -> None:
+            fields = {"stage": stage, "chunks_done": chunks_done}
+            if chunks_total is not None:
+                fields["chunks_total"] = chunks_total
+            await self._update(job.job_id, fields)
+
+        try:
+            result = await ingest_upload(self.pool, job.upload, job.document_id, job.namespace,
+                                        on_progress=progress, reclaimer=self.reclaimer)
+        except Exception as e:
+            logger.warning(f"[ingest_jobs] {job.job_id} ({job.namespace}/{job.document_id}) failed: {e}")
+            await self._update(job.job_id, {
+                "status": "failed", "error": str(e) or type(e).__name__, "finished_at": time.time(),
+            })
+        else:
+            await self._update(job.job_id, {
+                "status": "done",
+                "stage": "done",
+                "chunks_done": result["total_chunks"],
+                "chunks_total": result["total_chunks"],
+                "result": json.dumps(result),
+                "finished_at": time.time(),
+            })
+        finally:
+            elapsed = time.time() - started_at
+            # Exponential moving average — recent jobs dominate the Retry-After estimate
+            self._avg_job_seconds = elapsed if self._avg_job_seconds is None else 0.8 * self._avg_job_seconds + 0.2 * elapsed
+
+    async def _save(self, job_id: str, fields: dict) -> None:
+        # HSET and EXPIRE in one MULTI — a crash between them would leave a
+        # job record that never expires
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(JOB_KEY_PREFIX + job_id, mapping={k: str(v) for k, v in fields.items()})
+            pipe.expire(JOB_KEY_PREFIX + job_id, self.ttl_seconds)
+            await pipe.execute()
+
+    async def _update(self, job_id: str, fields: dict) -> None:
+        """Best effort: a Redis blip must not fail an ingest that is otherwise succeeding."""
+        try:
+            await self._save(job_id, fields)
+        except redis.RedisError as e:
+            logger.warning(f"[ingest_jobs] Could not update job {job_id}: {e}")
+
+
+async def get_job(redis_client: redis.Redis, job_id: str) -> dict | None:
+    """
+    The job record as IngestJobStatus fields, or None if unknown / expired.
+    Raises redis.RedisError if the store is unreachable.
+    """
+    raw = await redis_client.hgetall(JOB_KEY_PREFIX + job_id)
+    if not raw:
+        return None
+
+    chunks_done = int(raw.get("chunks_done", 0))
+    started_at = float(raw["started_at"]) if raw.get("started_at") else None
+    finished_at = float(raw["finished_at"]) if raw.get("finished_at") else None
+    elapsed = ((finished_at or time.time()) - started_at) if started_at else 0.0
+
+    return {
+        "job_id": job_id,
+        "status": raw["status"],
+        "stage": raw.get("stage", raw["status"]),
+        "document_id": raw.get("document_id", ""),
+        "namespace": raw.get("namespace", ""),
+        "chunks_done": chunks_done,
+        "chunks_total": int(raw["chunks_total"]) if raw.get("chunks_total") else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_chunks_per_second": round(chunks_done / elapsed, 2) if elapsed > 0 else 0.0,
+        "error": raw.get("error"),
+        "result": json.loads(raw["result"]) if raw.get("result") else None,
+    }
@@ -0,0 +1,152 @@
+"""
+api/services/memory_indexes.py
+
+Bookkeeping shared by the in-process retrieval indexes (vector_index,
+bm25_index): one index object per namespace, loaded on demand by a single
+background task and kept fresh from lifecycle's document change events
+(api.services.document_changes).
+
+A changed document is re-fetched from current_documents and swapped into
+the namespace's index (replace_documents). Once the rows changed since the
+index was loaded exceed rebuild_fraction of it, or the change is not
+attributable to one document, the namespace is loaded again from scratch.
+A namespace past max_rows is left to Postgres.
+
+An index object provides size, base_size (rows it was loaded with),
+changed_rows and replace_documents(document_ids, rows); a subclass provides
+ROWS_SQL (filtered on namespace = $1) and _open(namespace, force), both
+abstract here.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+from asyncpg import Pool
+
+logger = logging.getLogger("api.memory_indexes")
+
+
+class MemoryIndexes(ABC):
+    name = "memory_index"
+
+    @property
+    @abstractmethod
+    def ROWS_SQL(self) -> str:
+        """The namespace's visible rows, filtered on d.namespace = $1; a class attribute in subclasses."""
+
+    def __init__(self, pool: Pool, max_rows: int, rebuild_fraction: float):
+        self.pool = pool
+        self.max_rows = max_rows
+        self.rebuild_fraction = rebuild_fraction
+        self._indexes: dict = {}
+        self._oversized: set[str] = set()
+        self._to_load: dict[str, bool] = {}                 # namespace -> force a fresh load
+        self._loading: str | None = None
+        self._pending: dict[str, set[str] | None] = {}      # namespace -> changed documents (None: all)
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self, namespaces: Iterable[str] = ()) -> None:
+        for namespace in namespaces:
+            self._to_load.setdefault(namespace, False)
+        self._task = asyncio.create_task(self._worker())
+        self._wake.set()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _lookup(self, namespace: str):
+        """The namespace's index, or None (a load is scheduled unless it is oversized)."""
+        index = self._indexes.get(namespace)
+        if index is None and namespace not in self._oversized and self._task is not None:
+            self._to_load.setdefault(namespace, False)
+            self._wake.set()
+        return index
+
+    def on_change(self, namespace: str | None, document_id: str | None) -> None:
+        """DocumentChangeListener callback: record the change for the worker."""
+        if namespace is None:
+            for loaded in self._indexes:
+                self._pending[loaded] = None
+            self._oversized.clear()
+        elif namespace in self._indexes or namespace in self._to_load or namespace == self._loading:
+            docs = self._pending.get(namespace, set())
+            if docs is not None and document_id is not None:
+                docs.add(document_id)
+            self._pending[namespace] = docs if document_id is not None else None
+        self._wake.set()
+
+    def status(self) -> dict:
+        return {
+            "namespaces": {ns: index.size for ns, index in self._indexes.items()},
+            "oversized": sorted(self._oversized),
+            "loading": sorted(self._to_load),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._to_load:
+                namespace = next(iter(self._to_load))
+                force = self._to_load.pop(namespace)
+                self._loading = namespace
+                try:
+                    await self._load(namespace, force)
+                except Exception as e:
+                    # Stays on Postgres; the next search for it retries
+                    logger.warning(f"[{self.name}] loading {namespace} failed: {e}")
+                finally:
+                    self._loading = None
+            pending, self._pending = self._pending, {}
+            for namespace, documents in pending.items():
+                if namespace not in self._indexes:
+                    continue
+                try:
+                    await self._refresh(namespace, documents)
+                except Exception as e:
+                    # Serving stale results silently is worse than falling back
+                    self._indexes.pop(namespace, None)
+                    logger.warning(f"[{self.name}] refreshing {namespace} failed, back on Postgres: {e}")
+
+    def _over_budget(self, index, changed: int) -> bool:
+        return changed > self.rebuild_fraction * max(index.base_size, 1)
+
+    async def _refresh(self, namespace: str, documents: set[str] | None) -> None:
+        index = self._indexes[namespace]
+        if documents is None or self._over_budget(index, len(documents)):
+            self._to_load[namespace] = True
+            self._wake.set()
+            return
+        async with self.pool.acquire() as conn:
+            rows = await self._fetch_documents(conn, namespace, documents)
+        index.replace_documents(documents, rows)
+        if index.size > self.max_rows:
+            self._indexes.pop(namespace)
+            self._oversized.add(namespace)
+            logger.info(f"[{self.name}] {namespace} grew past {self.max_rows} rows, back on Postgres")
+        elif self._over_budget(index, index.changed_rows):
+            self._to_load[namespace] = True
+            self._wake.set()
+
+    async def _fetch_documents(self, conn, namespace: str, documents: Iterable[str]) -> list:
+        return await conn.fetch(self.ROWS_SQL + " AND d.document_id = ANY($2::text[])", namespace, list(documents))
+
+    async def _load(self, namespace: str, force: bool) -> None:
+        async with self.pool.acquire() as conn:
+            count = await conn.fetchval("SELECT count(*) FROM current_documents WHERE namespace = $1", namespace)
+        if count > self.max_rows:
+            self._indexes.pop(namespace, None)
+            self._oversized.add(namespace)
+            logger.info(f"[{self.name}] {namespace}: {count} rows > {self.max_rows}, staying on Postgres")
+            return
+        self._indexes[namespace] = await self._open(namespace, force)
+        self._oversized.discard(namespace)
+
+    @abstractmethod
+    async def _open(self, namespace: str, force: bool):
+        """A loaded, current index for namespace; force: nothing loaded before this call may be reused."""
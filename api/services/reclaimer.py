@@ -0,0 +1,124 @@
+"""
+api/services/reclaimer.py
+
+Background reclaim of superseded chunk sets and deleted documents.
+
+An updated document is written under a new version and the registry flips
+to it; a deleted one is tombstoned in the registry (see
+core.ingestion.lifecycle). Either way the rows retrieval no longer sees are
+dead weight in documents and its HNSW / GIN indexes. Deleting them inline
+would put one large DELETE on the request path, so update and delete
+latency would grow with the old document's size. Instead the routes hand
+the document to this queue and a single worker deletes the rows in small
+batches (reclaim_stale_versions), one document at a time.
+
+On start the worker first sweeps every document once, so rows left behind
+by a restart or a failed reclaim are collected too. Every uvicorn worker
+runs a reclaimer, but only the one holding SWEEP_LOCK (a session advisory
+lock, pg_try_advisory_lock) sweeps; the others skip straight to their
+queue. status() reports the worker's progress and the dead rows still left
+per namespace.
+"""
+import asyncio
+import logging
+
+from asyncpg import Pool
+
+from core.ingestion.lifecycle import count_dead_chunks, reclaim_stale_versions
+
+logger = logging.getLogger("api.reclaimer")
+
+SWEEP_LOCK = "reclaim_startup_sweep"     # hashtext()'d into the advisory lock key
+
+
+class VersionReclaimer:
+    """
+    Single-worker queue of (document_id, namespace) to reclaim.
+
+    Usage (FastAPI lifespan):
+        app.state.reclaimer = VersionReclaimer(db_pool)
+        app.state.reclaimer.start()
+        ...
+        await app.state.reclaimer.stop()
+    """
+
+    def __init__(self, pool: Pool):
+        self.pool = pool
+        self._queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue()
+        self._pending: set[tuple[str, str]] = set()
+        self._task: asyncio.Task | None = None
+        self._current: str | None = None
+        self.reclaimed = 0
+        self.documents_done = 0
+        self.last_error: str | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self) -> None:
+        """Cancel the worker. Anything still queued is picked up by the next start's sweep."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def schedule(self, document_id: str, namespace: str) -> None:
+        """Queue a document that was just updated or deleted; repeats collapse into one entry."""
+        key = (document_id, namespace)
+        if key not in self._pending:
+            self._pending.add(key)
+            self._queue.put_nowait(key)
+
+    async def _worker(self) -> None:
+        await self._sweep()
+        while True:
+            document_id, namespace = await self._queue.get()
+            self._pending.discard((document_id, namespace))
+            await self._reclaim(document_id, namespace)
+
+    async def status(self) -> dict:
+        """
+        Progress so far plus dead_chunks, {namespace: rows still to reclaim}.
+        dead_chunks is one aggregate query; the rest is in-process state.
+        """
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "current": self._current,
+            "queued": self._queue.qsize(),
+            "documents_done": self.documents_done,
+            "chunks_reclaimed": self.reclaimed,
+            "last_error": self.last_error,
+            "dead_chunks": await count_dead_chunks(self.pool),
+        }
+
+    async def _sweep(self) -> None:
+        """The startup sweep, by whichever worker of the deployment gets SWEEP_LOCK first."""
+        try:
+            async with self.pool.acquire() as conn:
+                if not await conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", SWEEP_LOCK):
+                    logger.info("[reclaimer] another worker is sweeping; skipping the startup sweep")
+                    return
+                try:
+                    await self._reclaim(None, None)
+                finally:
+                    await conn.execute("SELECT pg_advisory_unlock(hashtext($1))", SWEEP_LOCK)
+        except Exception as e:
+            self.last_error = f"startup sweep: {e}"
+            logger.warning(f"[reclaimer] startup sweep failed: {e}")
+
+    def _count(self, deleted: int) -> None:
+        self.reclaimed += deleted
+
+    async def _reclaim(self, document_id: str | None, namespace: str | None) -> None:
+        self._current = f"{namespace}/{document_id}" if document_id is not None else "startup sweep"
+        try:
+            await reclaim_stale_versions(self.pool, document_id, namespace, on_batch=self._count)
+        except Exception as e:
+            # Never let one failure stop the worker; the next start's sweep retries
+            self.last_error = f"{self._current}: {e}"
+            logger.warning(f"[reclaimer] {self._current} failed: {e}")
+        else:
+            if document_id is not None:
+                self.documents_done += 1
+        finally:
+            self._current = None
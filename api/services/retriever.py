@@ -6,12 +6,16 @@ Called by the /search route and by LangGraph agents.
 """
 import asyncio
 import json
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
+from typing import AsyncIterator
 
-from asyncpg import Pool
+from asyncpg import Connection, Pool
 from sentence_transformers import CrossEncoder
 
 import config
+from api.services.bm25_index import get_bm25_index
+from api.services.vector_index import get_vector_index
 from core.processing.cpu_offload import run_cpu_bound
 
 
@@ -27,46 +31,203 @@ class RetrieverConfig:
     rrf_k: int = 60
     bm25_weight: float = 0.4
     vector_weight: float = 0.6
-    mode: str = "hybrid"
+    mode: str = "hybrid"          # "hybrid" | "hybrid_sql" | "vector_only" | "bm25_only"
     rerank: bool = False          # turn reranking on/off
     rerank_candidates: int = 20   # how many candidates to feed the reranker
+    ef_search: int | None = config.HNSW_SEARCH_CONFIG["ef_search"]             # hnsw.ef_search; None = pool default
+    iterative_scan: str | None = config.HNSW_SEARCH_CONFIG["iterative_scan"]   # hnsw.iterative_scan; None = pool default
+    bm25_scoring: str = config.BM25_CONFIG["scoring"]   # "ts_rank" | "bm25"
+    vector_backend: str = config.VECTOR_INDEX_CONFIG["backend"]   # "postgres" | "memory"
+    bm25_backend: str = config.BM25_INDEX_CONFIG["backend"]       # "postgres" | "memory"
 
 BM25_OR_THRESHOLD = 5  # queries with 5 or more words switch AND to OR
 
+BM25_SCORINGS = ("ts_rank", "bm25")
+
+VECTOR_BACKENDS = ("postgres", "memory")
+
+BM25_BACKENDS = ("postgres", "memory")
+
+ITERATIVE_SCAN_MODES = ("off", "relaxed_order", "strict_order")
+
+
+@asynccontextmanager
+async def _vector_search_conn(
+    pool: Pool,
+    ef_search: int | None,
+    iterative_scan: str | None,
+) -> AsyncIterator[Connection]:
+    """
+    A pooled connection with the HNSW search settings applied.
+
+    Every pooled connection already starts with config.HNSW_SEARCH_CONFIG
+    (create_pool's server_settings), so a request at those values — or None —
+    gets a plain connection: one round trip for the query. Only values that
+    differ are set, with set_config(..., true), which is transaction-local and
+    never leaks to the next user of the pooled connection.
+    """
+    if iterative_scan is not None and iterative_scan not in ITERATIVE_SCAN_MODES:
+        raise ValueError(f"iterative_scan must be one of {ITERATIVE_SCAN_MODES}, got {iterative_scan!r}")
+    defaults = config.HNSW_SEARCH_CONFIG
+    settings = {
+        f"hnsw.{name}": str(value)
+        for name, value in (("ef_search", ef_search), ("iterative_scan", iterative_scan))
+        if value is not None and value != defaults[name]
+    }
+    async with pool.acquire() as conn:
+        if not settings:
+            yield conn
+            return
+        async with conn.transaction():
+            await conn.execute(
+                "SELECT " + ", ".join(f"set_config('{name}', ${i}, true)" for i, name in enumerate(settings, 1)),
+                *settings.values(),
+            )
+            yield conn
+
+# Okapi BM25 over the corpus statistics tables (schema.sql), as CTEs shared
+# by BM25_SQL and HYBRID_BM25_SQL; the {placeholders} are each statement's
+# parameter numbers. Matching is ts_rank's (AND below BM25_OR_THRESHOLD
+# words, OR from it). Candidates are bounded first: query terms are taken
+# rarest first until their document frequencies reach the candidate budget,
+# and only chunks holding one of those terms (GIN on fts_vector) are scored,
+# so a common word in an OR query no longer pulls in most of the namespace.
+# Term frequencies come from the candidates' fts_vector, lengths from
+# bm25_chunk_stats. Yields bm25 (id, bm25_score, rank), ties ranked by id.
+_OKAPI_BM25_CTES = """
+q AS (
+    SELECT CASE WHEN {or_mode}
+                THEN replace(plainto_tsquery('english', {query})::text, '&', '|')::tsquery
+                ELSE plainto_tsquery('english', {query})
+           END AS tsq
+),
+terms AS (
+    SELECT t.term, coalesce(s.doc_freq, 0) AS doc_freq,
+           sum(coalesce(s.doc_freq, 0)) OVER (ORDER BY coalesce(s.doc_freq, 0), t.term) AS running_df
+    FROM unnest(tsvector_to_array(to_tsvector('english', {query}))) AS t(term)
+    LEFT JOIN bm25_term_stats s ON s.namespace = {namespace} AND s.term = t.term
+),
+rarest AS (
+    -- 'a' 'b' (tsvector output, lexemes quoted by Postgres) -> 'a' | 'b'
+    SELECT replace(strip(array_to_tsvector(array_agg(term)))::text, ''' ''', ''' | ''')::tsquery AS tsq
+    FROM terms
+    WHERE running_df - doc_freq < {budget}
+),
+corpus AS (
+    SELECT chunk_count, total_length::float8 / greatest(chunk_count, 1) AS avg_length
+    FROM bm25_corpus_stats
+    WHERE namespace = {namespace}
+),
+bm25 AS (
+    SELECT id, bm25_score, row_number() OVER (ORDER BY bm25_score DESC, id) AS rank
+    FROM (
+        SELECT d.id,
+               sum(ln(1 + (corpus.chunk_count - t.doc_freq + 0.5)::float8 / (t.doc_freq + 0.5))
+                   * u.tf * ({k1}::float8 + 1)
+                   / (u.tf + {k1}::float8 * (1 - {b}::float8 + {b}::float8
+                                            * coalesce(l.length, corpus.avg_length)
+                                            / greatest(corpus.avg_length, 1)))) AS bm25_score
+        FROM current_documents d
+        CROSS JOIN q CROSS JOIN rarest CROSS JOIN corpus
+        LEFT JOIN bm25_chunk_stats l ON l.namespace = d.namespace AND l.chunk_id = d.id
+        CROSS JOIN LATERAL (
+            SELECT lexeme, coalesce(array_length(positions, 1), 1) AS tf FROM unnest(d.fts_vector)
+        ) u
+        JOIN terms t ON t.term = u.lexeme
+        WHERE d.namespace = {namespace} AND d.fts_vector @@ rarest.tsq AND d.fts_vector @@ q.tsq
+        GROUP BY d.id
+        ORDER BY bm25_score DESC, d.id
+        LIMIT {limit}
+    ) top_bm25
+)"""
+
+# $1 query text, $2 OR mode, $3 namespace, $4 limit, $5 k1, $6 b,
+# $7 candidate budget. Content and metadata are read for the top rows only.
+BM25_SQL = "WITH" + _OKAPI_BM25_CTES.format(
+    query="$1", or_mode="$2", namespace="$3", limit="$4", k1="$5", b="$6", budget="$7",
+) + """
+SELECT b.id, d.document_id, d.content, d.metadata, b.bm25_score
+FROM bm25 b JOIN documents d ON d.id = b.id AND d.namespace = $3
+ORDER BY b.rank
+"""
+
+
+def _okapi_params() -> tuple[float, float, int]:
+    return config.BM25_CONFIG["k1"], config.BM25_CONFIG["b"], config.BM25_CONFIG["candidate_budget"]
+
+
+def _require_bm25_stats() -> None:
+    """BM25_SQL over empty statistics tables matches nothing; refuse instead of returning no rows."""
+    if not config.BM25_CONFIG["maintain_stats"]:
+        raise ValueError(
+            'scoring "bm25" needs the BM25 statistics tables, which are not maintained '
+            '(BM25_CONFIG["maintain_stats"] is off; set BM25_MAINTAIN_STATS=1)'
+        )
+
+
 async def retrieve_bm25(
     pool: Pool,
     query: str,
     namespace: str,
     limit: int,
+    scoring: str = "ts_rank",
+    backend: str = "postgres",
 ) -> list[dict]:
+    """
+    Keyword search. scoring "ts_rank" ranks every chunk matching the
+    tsquery with ts_rank; "bm25" runs BM25_SQL, Okapi BM25 over the corpus
+    statistics with candidates bounded by the rarest query terms
+    (config.BM25_CONFIG). Those statistics are only kept while
+    BM25_CONFIG["maintain_stats"] is on; without them "bm25" on Postgres
+    raises ValueError.
+
+    backend "memory" answers from this worker's in-process postings
+    (api.services.bm25_index: Okapi BM25 whatever scoring says, same
+    matching) and falls back to Postgres for namespaces it does not hold.
+    """
+    if scoring not in BM25_SCORINGS:
+        raise ValueError(f"scoring must be one of {BM25_SCORINGS}, got {scoring!r}")
+    if backend not in BM25_BACKENDS:
+        raise ValueError(f"backend must be one of {BM25_BACKENDS}, got {backend!r}")
     word_count = len(query.split())
     use_or_mode = word_count >= BM25_OR_THRESHOLD
 
+    if backend == "memory" and (index := get_bm25_index()) is not None:
+        k1, b, _ = _okapi_params()
+        results = await index.search(namespace, query, limit, use_or_mode, k1, b)
+        if results is not None:
+            return results
+
+    if scoring == "bm25":
+        _require_bm25_stats()
     async with pool.acquire() as conn:
-        if use_or_mode:
-            tsq = await conn.fetchval(
-                "SELECT replace(plainto_tsquery('english', $1)::text, '&', '|')::tsquery", query
-            )
+        if scoring == "bm25":
+            rows = await conn.fetch(BM25_SQL, query, use_or_mode, namespace, limit, *_okapi_params())
         else:
-            tsq = await conn.fetchval(
-                "SELECT plainto_tsquery('english', $1)", query
+            if use_or_mode:
+                tsq = await conn.fetchval(
+                    "SELECT replace(plainto_tsquery('english', $1)::text, '&', '|')::tsquery", query
+                )
+            else:
+                tsq = await conn.fetchval(
+                    "SELECT plainto_tsquery('english', $1)", query
+                )
+
+            if not str(tsq):
+                return []
+
+            rows = await conn.fetch(
+                """
+                SELECT id, document_id, content, metadata,
+                       ts_rank(fts_vector, $1) AS bm25_score
+                FROM current_documents
+                WHERE namespace = $2 AND fts_vector @@ $1
+                ORDER BY bm25_score DESC, id
+                LIMIT $3
+                """,
+                tsq, namespace, limit,
             )
 
-        if not str(tsq):
-            return []
-
-        rows = await conn.fetch(
-            """
-            SELECT id, document_id, content, metadata,
-                   ts_rank(fts_vector, $1) AS bm25_score
-            FROM documents
-            WHERE namespace = $2 AND fts_vector @@ $1
-            ORDER BY bm25_score DESC
-            LIMIT $3
-            """,
-            tsq, namespace, limit,
-        )
-
     results = []
     for r in rows:
         meta = _parse_metadata(r["metadata"])
@@ -81,42 +242,66 @@ async def retrieve_bm25(
     return results
 
 
+# Nearest neighbours first, score floor after. ORDER BY the distance
+# expression itself with a LIMIT is the only shape idx_documents_embedding_hnsw
+# can serve; ordering by a computed alias behind a WHERE on it makes Postgres
+# score every row of the namespace and sort. The outer ORDER BY re-sorts the
+# (at most LIMIT) rows, which iterative_scan = relaxed_order may return
+# slightly out of order, with id breaking score ties (the inner ORDER BY
+# cannot take a tiebreaker without losing the index). $1 embedding,
+# $2 namespace, $3 limit, $4 floor.
+VECTOR_SQL = """
+SELECT * FROM (
+    SELECT id, document_id, content, metadata,
+           1.0 - (embedding <=> $1::vector) AS vector_score
+    FROM current_documents
+    WHERE namespace = $2
+    ORDER BY embedding <=> $1::vector
+    LIMIT $3
+) nearest
+WHERE vector_score > $4
+ORDER BY vector_score DESC, id
+"""
+
+
 async def retrieve_vector(
     pool: Pool,
     query_embedding: list[float],
     namespace: str,
     limit: int,
     min_score: float = config.MIN_VECTOR_SCORE,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+    backend: str = "postgres",
 ) -> list[dict]:
     """
-    Vector similarity search with a score floor.
-
-    Why the nested SQL query (SELECT * FROM (SELECT ...))?
-    Postgres processes the WHERE clause before it processes the SELECT clause.
-    If we calculate the vector_score inside the SELECT, Postgres doesn't know what 
-    "vector_score" is when it hits the WHERE clause, unless we type the whole math formula again!
-    
-    To avoid making the database do the math twice, we use a subquery:
-    1. The inner query does the math once and labels it 'vector_score'.
-    2. The outer query can now safely filter using WHERE vector_score > min_score.
-    
+    Vector similarity search with a score floor (VECTOR_SQL).
+
+    The limit nearest chunks come from the HNSW index; those at or below
+    min_score are then dropped, so fewer than limit rows can come back.
     min_score defaults to config.MIN_VECTOR_SCORE (0.0) so we don't break existing code.
+
+    ef_search / iterative_scan set hnsw.ef_search / hnsw.iterative_scan for
+    this query only (None, or the config.HNSW_SEARCH_CONFIG value every
+    pooled connection starts with, costs nothing extra). The namespace
+    filter prunes documents to that namespace's partition, so the HNSW index
+    searched is the one built over that namespace alone; ef_search still
+    caps how many rows one index scan returns, so keep it at or above
+    limit (iterative_scan keeps scanning past it).
+
+    backend "memory" answers from this worker's in-process index
+    (api.services.vector_index: exact, no round trip) and falls back to
+    Postgres for namespaces it does not hold.
     """
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT * FROM (
-                SELECT id, document_id, content, metadata,
-                       1.0 - (embedding <=> $1::vector) AS vector_score
-                FROM documents
-                WHERE namespace = $2
-            ) scored
-            WHERE vector_score > $4
-            ORDER BY vector_score DESC
-            LIMIT $3
-            """,
-            query_embedding, namespace, limit, min_score,
-        )
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"backend must be one of {VECTOR_BACKENDS}, got {backend!r}")
+    if backend == "memory" and (index := get_vector_index()) is not None:
+        results = await index.search(namespace, query_embedding, limit, min_score)
+        if results is not None:
+            return results
+
+    async with _vector_search_conn(pool, ef_search, iterative_scan) as conn:
+        rows = await conn.fetch(VECTOR_SQL, query_embedding, namespace, limit, min_score)
 
     results = []
     for r in rows:
@@ -159,6 +344,122 @@ def rrf_merge(
 
     return merged
 
+# hybrid_sql: tsquery, both top-N lists and the RRF fusion in one statement.
+# $1 embedding, $2 query text, $3 OR mode, $4 namespace, $5 per-list limit,
+# $6 rrf k, $7 final limit, $8 vector score floor. The vector list has
+# VECTOR_SQL's index-eligible shape. Same semantics as retrieve_bm25 +
+# retrieve_vector + rrf_merge, ties included: within each list equal scores
+# are ordered by id, as in retrieve_bm25 and VECTOR_SQL; at equal rrf_score
+# BM25 hits come first in BM25 rank order, then vector-only hits in vector
+# rank order (rrf_merge's dict insertion order). Content and metadata are read for the
+# final rows only. HYBRID_BM25_SQL is the same with the BM25 list scored by
+# _OKAPI_BM25_CTES, $9 k1, $10 b, $11 candidate budget.
+_HYBRID_SQL_TEMPLATE = """
+WITH{bm25_ctes},
+vec AS (
+    SELECT id, vector_score, row_number() OVER (ORDER BY vector_score DESC, id) AS rank
+    FROM (
+        SELECT id, 1.0 - (embedding <=> $1::vector) AS vector_score
+        FROM current_documents
+        WHERE namespace = $4
+        ORDER BY embedding <=> $1::vector
+        LIMIT $5
+    ) top_vec
+    WHERE vector_score > $8
+),
+fused AS (
+    SELECT coalesce(b.id, v.id) AS id, b.bm25_score, v.vector_score,
+           b.rank AS bm25_rank, v.rank AS vector_rank,
+           coalesce(1.0::float8 / ($6 + b.rank), 0) + coalesce(1.0::float8 / ($6 + v.rank), 0) AS rrf_score
+    FROM bm25 b FULL OUTER JOIN vec v ON v.id = b.id
+    ORDER BY rrf_score DESC, b.rank IS NULL, coalesce(b.rank, v.rank)
+    LIMIT $7
+)
+SELECT f.id, d.document_id, d.content, d.metadata,
+       f.bm25_score, f.vector_score, f.vector_rank, f.rrf_score
+FROM fused f JOIN documents d ON d.id = f.id AND d.namespace = $4
+ORDER BY f.rrf_score DESC, f.bm25_rank IS NULL, coalesce(f.bm25_rank, f.vector_rank)
+"""
+
+_TS_RANK_CTES = """
+q AS (
+    SELECT CASE WHEN $3
+                THEN replace(plainto_tsquery('english', $2)::text, '&', '|')::tsquery
+                ELSE plainto_tsquery('english', $2)
+           END AS tsq
+),
+bm25 AS (
+    SELECT id, bm25_score, row_number() OVER (ORDER BY bm25_score DESC, id) AS rank
+    FROM (
+        SELECT d.id, ts_rank(d.fts_vector, q.tsq) AS bm25_score
+        FROM current_documents d, q
+        WHERE d.namespace = $4 AND d.fts_vector @@ q.tsq
+        ORDER BY bm25_score DESC, d.id
+        LIMIT $5
+    ) top_bm25
+)"""
+
+HYBRID_SQL = _HYBRID_SQL_TEMPLATE.format(bm25_ctes=_TS_RANK_CTES)
+HYBRID_BM25_SQL = _HYBRID_SQL_TEMPLATE.format(bm25_ctes=_OKAPI_BM25_CTES.format(
+    query="$2", or_mode="$3", namespace="$4", limit="$5", k1="$9", b="$10", budget="$11",
+))
+
+
+async def retrieve_hybrid_sql(
+    pool: Pool,
+    query: str,
+    query_embedding: list[float],
+    namespace: str,
+    limit: int,
+    top_k: int,
+    rrf_k: int = 60,
+    min_score: float = config.MIN_VECTOR_SCORE,
+    ef_search: int | None = None,
+    iterative_scan: str | None = None,
+    scoring: str = "ts_rank",
+) -> list[dict]:
+    """
+    Hybrid retrieval as one statement on one connection (HYBRID_SQL).
+
+    The "hybrid" path costs three round trips on two connections: the
+    tsquery, the BM25 search and, concurrently, the vector search, with the
+    fusion in Python afterwards. Here Postgres does all of it and returns
+    only the top_k fused rows, shaped like rrf_merge's output: the
+    vector_score of chunks the vector search found, else the bm25_score,
+    plus rrf_score. limit is each list's depth (retrieve's over_fetch).
+    ef_search / iterative_scan as for retrieve_vector; scoring as for
+    retrieve_bm25 ("bm25" runs HYBRID_BM25_SQL and raises ValueError while
+    the statistics are not maintained).
+    """
+    if scoring not in BM25_SCORINGS:
+        raise ValueError(f"scoring must be one of {BM25_SCORINGS}, got {scoring!r}")
+    use_or_mode = len(query.split()) >= BM25_OR_THRESHOLD
+    args = [query_embedding, query, use_or_mode, namespace, limit, rrf_k, top_k, min_score]
+    if scoring == "bm25":
+        _require_bm25_stats()
+        args.extend(_okapi_params())
+    async with _vector_search_conn(pool, ef_search, iterative_scan) as conn:
+        rows = await conn.fetch(HYBRID_BM25_SQL if scoring == "bm25" else HYBRID_SQL, *args)
+
+    results = []
+    for r in rows:
+        meta = _parse_metadata(r["metadata"])
+        entry = {
+            "id": r["id"],
+            "document_id": r["document_id"],
+            "content": r["content"],
+            "metadata": meta,
+        }
+        if r["vector_rank"] is not None:
+            entry["vector_score"] = r["vector_score"]
+        else:
+            entry["bm25_score"] = r["bm25_score"]
+        entry["source_filename"] = meta.get("source_filename")
+        entry["rrf_score"] = r["rrf_score"]
+        results.append(entry)
+    return results
+
+
 _cross_encoder: CrossEncoder | None = None
 
 def get_cross_encoder() -> CrossEncoder:
@@ -206,17 +507,23 @@ async def retrieve(
     if cfg is None:
         cfg = RetrieverConfig()
 
+    hnsw = {"ef_search": cfg.ef_search, "iterative_scan": cfg.iterative_scan}
+
     if cfg.mode == "vector_only":
-        candidates = await retrieve_vector(pool, query_embedding, namespace, cfg.top_k)
+        candidates = await retrieve_vector(
+            pool, query_embedding, namespace, cfg.top_k, backend=cfg.vector_backend, **hnsw,
+        )
 
     elif cfg.mode == "bm25_only":
-        candidates = await retrieve_bm25(pool, query, namespace, cfg.top_k)
+        candidates = await retrieve_bm25(
+            pool, query, namespace, cfg.top_k, scoring=cfg.bm25_scoring, backend=cfg.bm25_backend,
+        )
 
     elif cfg.mode == "hybrid":
         over_fetch = cfg.rerank_candidates if cfg.rerank else cfg.top_k * 2
         bm25_results, vector_results = await asyncio.gather(
-            retrieve_bm25(pool, query, namespace, over_fetch),
-            retrieve_vector(pool, query_embedding, namespace, over_fetch),
+            retrieve_bm25(pool, query, namespace, over_fetch, scoring=cfg.bm25_scoring, backend=cfg.bm25_backend),
+            retrieve_vector(pool, query_embedding, namespace, over_fetch, backend=cfg.vector_backend, **hnsw),
         )
         candidates = rrf_merge(
             bm25_results, vector_results,
@@ -224,6 +531,16 @@ async def retrieve(
             top_k=cfg.rerank_candidates if cfg.rerank else cfg.top_k,
         )
 
+    elif cfg.mode == "hybrid_sql":
+        candidates = await retrieve_hybrid_sql(
+            pool, query, query_embedding, namespace,
+            limit=cfg.rerank_candidates if cfg.rerank else cfg.top_k * 2,
+            top_k=cfg.rerank_candidates if cfg.rerank else cfg.top_k,
+            rrf_k=cfg.rrf_k,
+            scoring=cfg.bm25_scoring,
+            **hnsw,
+        )
+
     else:
         raise ValueError(f"Unknown retrieval mode: {cfg.mode}")
 
@@ -0,0 +1,123 @@
+"""
+api/services/uploads.py
+
+Constant-memory intake of /ingest uploads.
+
+The route used to do `content = await file.read()` then hash it: the whole
+upload in RAM (plus a decoded str copy later) and SHA-256 over all of it on
+the event loop. spool_upload() instead reads the upload UPLOAD_READ_SIZE at a
+time and, per piece:
+  - updates one hashlib.sha256 — the digest is ready when the read finishes,
+    so the lifecycle check needs no second pass over the data
+  - feeds an incremental UTF-8 decoder, so a file that cannot be chunked is
+    rejected (415) before any chunk reaches the database
+  - appends it to the spool: memory up to SPOOL_MAX_MEMORY, then a temp file
+
+Small uploads (the common case) stay in memory and go through the in-memory
+chunking path. Once an upload spills to disk, every further piece is hashed,
+validated and written in a worker thread (hashlib releases the GIL), and the
+file is chunked by streaming it from disk — peak memory is one read plus one
+embedding batch, whatever the upload size.
+"""
+import asyncio
+import codecs
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import UploadFile
+
+# Bytes pulled from the upload per read
+UPLOAD_READ_SIZE = 1024 * 1024
+
+# Uploads up to this size stay in memory; larger ones spill to a temp file
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+@dataclass
+class SpooledUpload:
+    """A fully received upload: its digest plus either the bytes or a spool file."""
+    filename: str
+    sha256:   str
+    size:     int
+    content:  bytes | None = field(default=None, repr=False)   # set when kept in memory
+    path:     str | None = None                                # set when spilled to disk
+
+    def cleanup(self) -> None:
+        """Delete the spool file, if any. Safe to call more than once."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+class _Spool:
+    """Hash, validate and store upload pieces; the blocking half of spool_upload."""
+
+    def __init__(self, suffix: str, max_memory: int):
+        self.hasher = hashlib.sha256()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.suffix = suffix
+        self.max_memory = max_memory
+        self.buffer = bytearray()
+        self.file = None
+        self.size = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self.file is not None
+
+    def write(self, piece: bytes) -> None:
+        self.hasher.update(piece)
+        self.decoder.decode(piece)          # raises UnicodeDecodeError (a ValueError) on bad bytes
+        self.size += len(piece)
+        if self.file is None and self.size <= self.max_memory:
+            self.buffer += piece
+            return
+        if self.file is None:
+            self.file = tempfile.NamedTemporaryFile(prefix="ingest_", suffix=self.suffix, delete=False)
+            self.file.write(self.buffer)
+            self.buffer = bytearray()
+        self.file.write(piece)
+
+    def finish(self, filename: str) -> SpooledUpload:
+        self.decoder.decode(b"", final=True)    # a truncated multi-byte sequence at EOF
+        upload = SpooledUpload(filename=filename, sha256=self.hasher.hexdigest(), size=self.size)
+        if self.file is None:
+            upload.content = bytes(self.buffer)
+        else:
+            self.file.close()
+            upload.path = self.file.name
+        return upload
+
+    def discard(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            os.remove(self.file.name)
+
+
+async def spool_upload(
+    file: UploadFile,
+    read_size: int = UPLOAD_READ_SIZE,
+    max_memory: int = SPOOL_MAX_MEMORY,
+) -> SpooledUpload:
+    """
+    Receive an upload in read_size pieces with an incremental SHA-256.
+
+    Raises ValueError if the upload is not valid UTF-8; nothing is left on
+    disk in that case. The caller owns the result and must call cleanup().
+    """
+    filename = file.filename or ""
+    spool = _Spool(Path(filename).suffix or ".txt", max_memory)
+    try:
+        while piece := await file.read(read_size):
+            if spool.spilled or spool.size + len(piece) > max_memory:
+                # Large upload — hash/validate/write off the event loop
+                await asyncio.to_thread(spool.write, piece)
+            else:
+                spool.write(piece)
+        return await asyncio.to_thread(spool.finish, filename) if spool.spilled else spool.finish(filename)
+    except BaseException:
+        spool.discard()
+        raise
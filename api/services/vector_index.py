@@ -0,0 +1,346 @@
+"""
+api/services/vector_index.py
+
+In-process exact vector search, per namespace — retrieve_vector's "memory"
+backend (RetrieverConfig.vector_backend, config.VECTOR_INDEX_CONFIG).
+
+Search is a float32 matrix-vector product over the whole namespace: exact
+where HNSW is approximate, and no round trip, but it grows with the rows —
+~1.4 ms at 5k x 768, ~5.6 ms at 20k, ~38 ms at max_rows' default of 100k.
+Namespaces of offload_rows or more are therefore searched in a worker
+thread (asyncio.to_thread; NumPy releases the GIL for the product) so they
+do not stall the event loop; smaller ones are searched inline.
+
+Snapshots: a namespace's visible chunks (current_documents) are written once
+to .npy files under snapshot_dir/<namespace key>/<build>/ — unit-normalised
+embeddings, chunk ids, document codes, and content + metadata as one JSON
+blob with offsets — and opened with mmap_mode="r". Every uvicorn worker on
+the host maps the same files, so the page cache holds one copy. A .lock
+file (flock) lets one worker build while the others wait and then reuse it;
+CURRENT names the live build.
+
+Freshness (api.services.memory_indexes): each worker LISTENs for
+lifecycle's document change events and patches its own view in memory:
+rows of a changed document are masked out of the snapshot and its current
+rows, fetched from Postgres, kept in a small in-memory delta matrix searched
+alongside. A worker opening an existing snapshot first catches up on the
+documents the registry shows changed since it was built. Once the changes
+exceed rebuild_fraction of the snapshot, the namespace is re-snapshotted.
+Rows written without the registry (scripts that bypass lifecycle) publish
+no event and are only picked up by the next snapshot.
+
+Fallback: search() returns None whenever it cannot answer — the namespace
+is not loaded yet (loading starts in the background), is larger than
+max_rows, or failed to load — and retrieve_vector then asks pgvector.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from asyncpg import Pool
+
+from api.services.memory_indexes import MemoryIndexes
+from config import EMBEDDING_DIM, VECTOR_INDEX_CONFIG
+
+logger = logging.getLogger("api.vector_index")
+
+# Registry timestamps are transaction start times: a change can commit a
+# little after a snapshot that does not contain it yet carries a later
+# timestamp. Catching up re-syncs documents changed shortly before the
+# snapshot too, which is harmless (a re-sync is idempotent).
+CATCH_UP_SLACK_SECONDS = 60
+
+ROWS_SQL = """
+SELECT d.id, d.document_id, d.content, d.metadata, d.embedding
+FROM current_documents d
+WHERE d.namespace = $1 AND d.embedding IS NOT NULL
+"""
+
+
+def _namespace_key(namespace: str) -> str:
+    """Directory name: readable, plus a hash so "kyc-aml" and "kyc_aml" never collide."""
+    readable = re.sub(r"[^a-z0-9]+", "_", namespace.lower())[:40]
+    return f"{readable}_{hashlib.md5(namespace.encode()).hexdigest()[:6]}"
+
+
+def _metadata(raw) -> dict:
+    if isinstance(raw, str):
+        return json.loads(raw)
+    return raw or {}
+
+
+def _normalised(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def write_snapshot(path: Path, rows: list) -> int:
+    """Write rows (id, document_id, content, metadata, embedding) as a snapshot directory; returns the row count."""
+    path.mkdir(parents=True)
+    n = len(rows)
+    embeddings = np.zeros((n, EMBEDDING_DIM), dtype=np.float32)
+    ids = np.empty(n, dtype=np.int64)
+    doc_codes = np.empty(n, dtype=np.int32)
+    documents: dict[str, int] = {}
+    blobs = []
+    for i, r in enumerate(rows):
+        embeddings[i] = np.asarray(r["embedding"], dtype=np.float32)
+        ids[i] = r["id"]
+        doc_codes[i] = documents.setdefault(r["document_id"], len(documents))
+        blobs.append(json.dumps({"content": r["content"], "metadata": _metadata(r["metadata"])}).encode())
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs], dtype=np.int64)
+
+    np.save(path / "embeddings.npy", _normalised(embeddings))
+    np.save(path / "ids.npy", ids)
+    np.save(path / "doc_codes.npy", doc_codes)
+    np.save(path / "offsets.npy", offsets)
+    np.save(path / "payload.npy", np.frombuffer(b"".join(blobs), dtype=np.uint8))
+    (path / "documents.json").write_text(json.dumps(list(documents)), encoding="utf-8")
+    return n
+
+
+class Snapshot:
+    """A snapshot directory, memory-mapped read-only."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.ids = np.load(path / "ids.npy")
+        mmap = "r" if len(self.ids) else None       # an empty array cannot be mapped
+        self.embeddings = np.load(path / "embeddings.npy", mmap_mode=mmap)
+        self.doc_codes = np.load(path / "doc_codes.npy", mmap_mode=mmap)
+        self.offsets = np.load(path / "offsets.npy")
+        self.payload = np.load(path / "payload.npy", mmap_mode="r" if self.offsets[-1] else None)
+        self.documents: list[str] = json.loads((path / "documents.json").read_text(encoding="utf-8"))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, i: int) -> dict:
+        stored = json.loads(self.payload[self.offsets[i]:self.offsets[i + 1]].tobytes())
+        return {"id": int(self.ids[i]), "document_id": self.documents[self.doc_codes[i]], **stored}
+
+
+class NamespaceIndex:
+    """
+    One worker's view of a namespace: the shared snapshot, a private mask of
+    its rows that are no longer visible, and a private delta of newer rows.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self._codes = {document_id: code for code, document_id in enumerate(snapshot.documents)}
+        # (alive mask, delta rows, delta matrix, delta ids): replaced as a whole,
+        # never modified, so a search running in a worker thread reads one state
+        self._view = (np.ones(len(snapshot), dtype=bool), [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32),
+                      np.zeros(0, dtype=np.int64))
+        self.changed_rows = 0
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self._view[0]
+
+    @property
+    def size(self) -> int:
+        alive, delta_rows, _, _ = self._view
+        return int(alive.sum()) + len(delta_rows)
+
+    @property
+    def base_size(self) -> int:
+        return len(self.snapshot)
+
+    def replace_documents(self, document_ids: Iterable[str], rows: list) -> None:
+        """The documents' visible rows are now exactly rows (none for a deleted document)."""
+        document_ids = set(document_ids)
+        alive, delta_rows, delta, _ = self._view
+        codes = [self._codes[d] for d in document_ids if d in self._codes]
+        if codes:
+            dropped = alive & np.isin(self.snapshot.doc_codes, codes)
+            self.changed_rows += int(dropped.sum())
+            alive = alive & ~dropped
+        kept = [i for i, r in enumerate(delta_rows) if r["document_id"] not in document_ids]
+        new = [r for r in rows if r["embedding"] is not None]
+        delta_rows = [delta_rows[i] for i in kept] + [
+            {"id": r["id"], "document_id": r["document_id"], "content": r["content"],
+             "metadata": _metadata(r["metadata"])}
+            for r in new
+        ]
+        added = np.array([r["embedding"] for r in new], dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        self._view = (alive, delta_rows, np.vstack([delta[kept], _normalised(added)]),
+                      np.array([r["id"] for r in delta_rows], dtype=np.int64))
+        self.changed_rows += len(new)
+
+    def search(self, query_embedding, limit: int, min_score: float) -> list[dict]:
+        """Exact cosine top-limit with score > min_score, best first, shaped like retrieve_vector's rows."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or limit <= 0:
+            return []
+        query = query / norm
+        alive, delta_rows, delta, delta_ids = self._view
+        scores = np.concatenate([
+            np.where(alive, self.snapshot.embeddings @ query, -np.inf),
+            delta @ query,
+        ])
+        k = min(limit, len(scores))
+        if k == 0:
+            return []
+        # Every row tied with the k-th score is a candidate, and ties go to
+        # the lower id: the same rows, in the same order, as VECTOR_SQL
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero((scores >= kth) & (scores > -np.inf))
+        n_snapshot = len(self.snapshot)
+        in_delta = candidates >= n_snapshot
+        ids = np.empty(len(candidates), dtype=np.int64)
+        ids[~in_delta] = self.snapshot.ids[candidates[~in_delta]]
+        ids[in_delta] = delta_ids[candidates[in_delta] - n_snapshot]
+        top = candidates[np.lexsort((ids, -scores[candidates]))[:k]]
+
+        results = []
+        for i in top:
+            score = float(scores[i])
+            if not score > min_score:
+                break
+            row = self.snapshot.row(i) if i < n_snapshot else delta_rows[i - n_snapshot]
+            results.append({
+                "id": row["id"],
+                "document_id": row["document_id"],
+                "content": row["content"],
+                "metadata": row["metadata"],
+                "vector_score": score,
+                "source_filename": row["metadata"].get("source_filename"),
+            })
+        return results
+
+
+class VectorIndex(MemoryIndexes):
+    """
+    Per-worker set of NamespaceIndex, loaded on demand and kept fresh by a
+    single background task (api.services.memory_indexes).
+
+    Usage (FastAPI lifespan):
+        app.state.vector_index = VectorIndex(db_pool)
+        app.state.document_changes.subscribe(app.state.vector_index.on_change)
+        app.state.vector_index.start(NAMESPACE_REGISTRY)   # preload
+        ...
+        await app.state.vector_index.stop()
+    """
+
+    name = "vector_index"
+    ROWS_SQL = ROWS_SQL
+
+    def __init__(
+        self,
+        pool: Pool,
+        snapshot_dir: str | Path = VECTOR_INDEX_CONFIG["snapshot_dir"],
+        max_rows: int = VECTOR_INDEX_CONFIG["max_rows"],
+        offload_rows: int = VECTOR_INDEX_CONFIG["offload_rows"],
+        max_snapshot_age: float = VECTOR_INDEX_CONFIG["max_snapshot_age"],
+        rebuild_fraction: float = VECTOR_INDEX_CONFIG["rebuild_fraction"],
+    ):
+        super().__init__(pool, max_rows, rebuild_fraction)
+        self.snapshot_dir = Path(snapshot_dir)
+        self.offload_rows = offload_rows
+        self.max_snapshot_age = max_snapshot_age
+
+    def start(self, namespaces: Iterable[str] = ()) -> None:
+        super().start(namespaces)
+        _set_active(self)
+
+    async def stop(self) -> None:
+        _set_active(None)
+        await super().stop()
+
+    async def search(self, namespace: str, query_embedding, limit: int, min_score: float) -> list[dict] | None:
+        """Top-limit rows from memory, or None when Postgres has to answer this one."""
+        index = self._lookup(namespace)
+        if index is None:
+            return None
+        if index.base_size >= self.offload_rows:
+            return await asyncio.to_thread(index.search, query_embedding, limit, min_score)
+        return index.search(query_embedding, limit, min_score)
+
+    async def _open(self, namespace: str, force: bool) -> NamespaceIndex:
+        requested_at = time.time()
+        directory = self.snapshot_dir / _namespace_key(namespace)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / ".lock", "a+") as lock:
+            await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+            try:
+                manifest = _read_manifest(directory)
+                # Another worker may have just built one for the same reason
+                fresh_after = requested_at if force else requested_at - self.max_snapshot_age
+                if manifest is not None and manifest["built_at"] >= fresh_after:
+                    snapshot = Snapshot(directory / manifest["build"])
+                    catch_up_since = manifest["watermark"]
+                else:
+                    snapshot, manifest = await self._build(namespace, directory)
+                    catch_up_since = None
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        index = NamespaceIndex(snapshot)
+        if catch_up_since is not None:
+            async with self.pool.acquire() as conn:
+                changed = await conn.fetch(
+                    """
+                    SELECT document_id FROM document_registry
+                    WHERE namespace = $1
+                      AND greatest(last_ingested_at, deleted_at) > $2::timestamptz - make_interval(secs => $3)
+                    """,
+                    namespace, catch_up_since, CATCH_UP_SLACK_SECONDS,
+                )
+                documents = [r["document_id"] for r in changed]
+                rows = await self._fetch_documents(conn, namespace, documents)
+            index.replace_documents(documents, rows)
+        logger.info(f"[vector_index] {namespace}: {index.size} rows in memory ({manifest['build']})")
+        return index
+
+    async def _build(self, namespace: str, directory: Path) -> tuple[Snapshot, dict]:
+        async with self.pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                watermark = await conn.fetchval("SELECT now()::text")
+                rows = await conn.fetch(ROWS_SQL, namespace)
+        build = f"b-{uuid.uuid4().hex[:12]}"
+        await asyncio.to_thread(write_snapshot, directory / build, rows)
+        manifest = {"build": build, "rows": len(rows), "built_at": time.time(), "watermark": watermark}
+        tmp = directory / f"CURRENT.{build}"
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp, directory / "CURRENT")
+        # Workers still mapping an older build keep it: unlinked files stay mapped
+        for old in directory.glob("b-*"):
+            if old.name != build:
+                shutil.rmtree(old, ignore_errors=True)
+        return Snapshot(directory / build), manifest
+
+
+def _read_manifest(directory: Path) -> dict | None:
+    try:
+        manifest = json.loads((directory / "CURRENT").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    build = manifest.get("build")
+    return manifest if build and (directory / build).is_dir() else None
+
+
+_active: VectorIndex | None = None
+
+
+def _set_active(index: VectorIndex | None) -> None:
+    global _active
+    _active = index
+
+
+def get_vector_index() -> VectorIndex | None:
+    """The running index of this worker, or None (retrieve_vector then uses Postgres)."""
+    return _active
@@ -31,6 +31,50 @@ EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 768))
 # is a one line change, not a SQL edit + redeploy.
 MIN_VECTOR_SCORE = 0.0
 
+# pgvector HNSW search settings: the session defaults of every pooled
+# connection (create_pool server_settings). RetrieverConfig can override
+# them per request; only then does the retriever run a transaction-local
+# set_config.
+# ef_search: candidate list size per HNSW search — higher means better recall
+#   and slower queries. pgvector's default is 40; it also caps how many rows
+#   one index scan can return.
+# iterative_scan: "relaxed_order" / "strict_order" keep scanning the index
+#   when the namespace filter throws candidates away, instead of returning
+#   fewer than LIMIT rows (pgvector >= 0.8). "off" is pgvector's default.
+# An empty env value leaves that setting to the server.
+HNSW_SEARCH_CONFIG = {
+    "ef_search":      int(os.getenv("HNSW_EF_SEARCH", 100) or 0) or None,
+    "iterative_scan": os.getenv("HNSW_ITERATIVE_SCAN", "relaxed_order") or None,
+}
+
+# Keyword (BM25 leg) scoring, RetrieverConfig.bm25_scoring:
+# "ts_rank": Postgres ts_rank over every matching chunk (the original).
+# "bm25": Okapi BM25 from the corpus statistics tables in schema.sql.
+# k1 / b: the usual BM25 term-frequency saturation and length normalisation.
+# candidate_budget: the rarest query terms are taken until their chunks add
+#   up to this many; only chunks holding one of them are scored. Queries
+#   whose terms all fit in the budget are scored exactly.
+# maintain_stats: keep those statistics tables current (triggers on
+#   documents, switched at API startup). They cost every write to documents
+#   an upsert of its namespace's corpus row, which serializes concurrent
+#   writers of a namespace, so by default they are only on when "bm25" is
+#   the scoring. BM25_MAINTAIN_STATS=1 keeps them on for per-request
+#   bm25_scoring="bm25" under a ts_rank default; without it such a request
+#   raises ValueError (the tables are empty), and BM25_SCORING=bm25 with
+#   BM25_MAINTAIN_STATS=0 is refused here. Turning them back on rebuilds the
+#   tables from documents.
+BM25_CONFIG = {
+    "scoring":          os.getenv("BM25_SCORING", "ts_rank"),
+    "k1":               float(os.getenv("BM25_K1", 1.2)),
+    "b":                float(os.getenv("BM25_B", 0.75)),
+    "candidate_budget": int(os.getenv("BM25_CANDIDATE_BUDGET", 2000)),
+}
+BM25_CONFIG["maintain_stats"] = os.getenv(
+    "BM25_MAINTAIN_STATS", "1" if BM25_CONFIG["scoring"] == "bm25" else "0"
+).lower() in ("1", "true", "yes")
+if BM25_CONFIG["scoring"] == "bm25" and not BM25_CONFIG["maintain_stats"]:
+    raise ValueError("BM25_SCORING=bm25 scores from the statistics tables; it cannot run with BM25_MAINTAIN_STATS off")
+
 # ==========================================
 # AGENT AND SYSTEM REGISTRIES
 # ==========================================
@@ -113,6 +157,111 @@ FEATURES = {
     "verifier_enabled": True,  # Enables the synthesis verifier loop in the agent
 }
 
+# Chunking.
+# tokenizer_path: a HuggingFace tokenizer.json used when chunkers run in token
+#   mode (core.ingestion.tokenizer). Unset → the bundled WordPiece vocabulary;
+#   set it to the embedding model's own tokenizer.json for exact counts.
+# offload_threshold_chars: documents at or above this size are chunked in the
+#   process pool (core.processing.pipeline.chunk_document), smaller ones inline.
+#   Lab 4.2: at 100KB pickling still costs more than it saves (sequential
+#   1.22x faster); at 10MB the pool is 2.4x faster. Interpolating linearly
+#   between the two (pool ~13ms fixed + 0.057ms/KB, inline 0.14-0.15ms/KB)
+#   puts break-even near 150KB; 256KB keeps the default clear of it.
+# offload_transfer: "pickle" (default) or "shared" — shared memory in, chunk
+#   offsets out. Lab 4.6: 3-7x fewer bytes back from the pool, same latency.
+CHUNKING_CONFIG = {
+    "tokenizer_path": os.getenv("TOKENIZER_PATH", None),
+    "offload_threshold_chars": int(os.getenv("CHUNK_OFFLOAD_THRESHOLD_CHARS", 256 * 1024)),
+    "offload_transfer": os.getenv("CHUNK_OFFLOAD_TRANSFER", "pickle"),
+}
+
+# Background ingestion (POST /ingest?background=true, api.services.ingest_jobs).
+# workers: jobs processed at once per API process. max_queued: jobs waiting
+# beyond that before POST answers 429. Job state lives in Redis for
+# job_ttl_seconds so any API replica can answer GET /ingest/jobs/{id}.
+INGEST_JOB_CONFIG = {
+    "workers":         int(os.getenv("INGEST_JOB_WORKERS", 2)),
+    "max_queued":      int(os.getenv("INGEST_JOB_MAX_QUEUED", 16)),
+    "job_ttl_seconds": 24 * 3600,
+}
+
+# Staged bulk load (core.database.StagedLoad, bulk_ingest --staged).
+# Chunks are COPYed into an UNLOGGED staging table and merged into documents in
+# one transaction, fts_vector computed set-based with the FTS trigger disabled.
+# hnsw_rebuild_threshold: loads of at least this many rows drop the HNSW index
+#   before the merge and rebuild it once afterwards instead of inserting into
+#   it row by row. maintenance_work_mem is raised for that build only.
+BULK_LOAD_CONFIG = {
+    "hnsw_rebuild_threshold": int(os.getenv("BULK_LOAD_HNSW_REBUILD_THRESHOLD", 100_000)),
+    "maintenance_work_mem":   os.getenv("BULK_LOAD_MAINTENANCE_WORK_MEM", "1GB"),
+}
+
+# Reclaiming superseded chunk sets (core.ingestion.lifecycle.reclaim_stale_versions,
+# run in the background by api.services.reclaimer). Rows are deleted
+# batch_size per transaction with pause_seconds in between, so a replaced
+# document's old version never becomes one long-running DELETE.
+RECLAIM_CONFIG = {
+    "batch_size":    int(os.getenv("RECLAIM_BATCH_SIZE", 500)),
+    "pause_seconds": float(os.getenv("RECLAIM_PAUSE_SECONDS", 0.05)),
+}
+
+# In-process vector search (api.services.vector_index), used when
+# RetrieverConfig.vector_backend is "memory". Each namespace's normalised
+# embeddings are snapshotted into memory-mapped files under snapshot_dir,
+# shared by every uvicorn worker on the host, and searched exactly in NumPy.
+# max_rows: namespaces larger than this stay on pgvector (automatic fallback).
+# offload_rows: namespaces of at least this many rows are searched in a
+#   worker thread (asyncio.to_thread) instead of on the event loop. The
+#   matrix-vector product grows with the rows: ~5.6 ms at 20k x 768, ~38 ms
+#   at 100k, ~1.4 ms at this default. Below it a search blocks the loop for
+#   about as long as an asyncpg round trip and is not worth a thread hop.
+# max_snapshot_age: seconds a worker may start from an existing snapshot and
+#   catch up from the registry instead of rebuilding it.
+# rebuild_fraction: once rows changed since the snapshot exceed this share of
+#   it, the namespace is re-snapshotted instead of patched in memory.
+VECTOR_INDEX_CONFIG = {
+    "backend":          os.getenv("VECTOR_BACKEND", "postgres"),
+    "max_rows":         int(os.getenv("VECTOR_INDEX_MAX_ROWS", 100_000)),
+    "offload_rows":     int(os.getenv("VECTOR_INDEX_OFFLOAD_ROWS", 5_000)),
+    "snapshot_dir":     os.getenv("VECTOR_INDEX_SNAPSHOT_DIR", "/dev/shm/rag-vector-index"
+                                  if os.path.isdir("/dev/shm") else "/tmp/rag-vector-index"),
+    "max_snapshot_age": int(os.getenv("VECTOR_INDEX_MAX_SNAPSHOT_AGE", 3600)),
+    "rebuild_fraction": float(os.getenv("VECTOR_INDEX_REBUILD_FRACTION", 0.2)),
+}
+
+# In-process Okapi BM25 (api.services.bm25_index), used when
+# RetrieverConfig.bm25_backend is "memory". Each worker holds per-namespace
+# postings built from the documents' own fts_vector, so matching is the
+# same as Postgres FTS; k1 and b come from BM25_CONFIG.
+# max_rows / rebuild_fraction: as for VECTOR_INDEX_CONFIG.
+# query_cache_size: analysed queries (to_tsvector lexemes) kept per worker;
+#   a repeated query is answered without touching Postgres at all.
+BM25_INDEX_CONFIG = {
+    "backend":          os.getenv("BM25_BACKEND", "postgres"),
+    "max_rows":         int(os.getenv("BM25_INDEX_MAX_ROWS", 100_000)),
+    "rebuild_fraction": float(os.getenv("BM25_INDEX_REBUILD_FRACTION", 0.2)),
+    "query_cache_size": int(os.getenv("BM25_INDEX_QUERY_CACHE_SIZE", 10_000)),
+}
+
+# Embedding request scheduler (core.ingestion.embedders.EmbeddingScheduler).
+# Batch size and concurrency start at the initial values and adapt (AIMD):
+# additive increase while calls come back under target latency, halved on
+# slow calls or 429s. max_batch_chars caps one request's payload regardless.
+# Local/demo share a single Ollama instance, so they start and stay smaller.
+EMBEDDING_BATCH_CONFIG = {
+    "max_batch_chars":        int(os.getenv("EMBED_MAX_BATCH_CHARS", 60_000)),
+    "initial_batch_size":     int(os.getenv("EMBED_BATCH_SIZE", 16 if MODE != "prod" else 64)),
+    "min_batch_size":         1,
+    "max_batch_size":         256 if MODE != "prod" else 1024,
+    "batch_size_step":        8,
+    "initial_concurrency":    2,
+    "max_concurrency":        int(os.getenv("EMBED_MAX_CONCURRENCY", 4 if MODE != "prod" else 16)),
+    "target_latency_seconds": float(os.getenv("EMBED_TARGET_LATENCY", 2.0)),
+    "max_retries":            5,
+    "backoff_base_seconds":   0.5,
+    "backoff_max_seconds":    30.0,
+}
+
 # Input and Output Guardrails configuration
 GUARDRAIL_CONFIG = {
     # Maximum query character length (Default: 1000 characters)
@@ -1,7 +1,13 @@
+from .bm25_stats import set_bm25_stats_maintenance
 from .bulk_ops import bulk_insert
+from .partitions import ensure_namespace_partitions
 from .pool import create_pool
+from .staged_load import StagedLoad
 
 __all__ = [
     "create_pool",
-    "bulk_insert"
+    "bulk_insert",
+    "ensure_namespace_partitions",
+    "set_bm25_stats_maintenance",
+    "StagedLoad"
 ]
@@ -0,0 +1,26 @@
+import logging
+
+from asyncpg import Pool
+
+logger = logging.getLogger("core.bm25_stats")
+
+
+async def set_bm25_stats_maintenance(pool: Pool, enabled: bool) -> bool:
+    '''
+    Turn the bm25_* statistics triggers on documents on or off.
+
+    Runs schema.sql's bm25_stats_maintenance: a catalog lookup when the
+    triggers are already in that state, otherwise they are enabled and the
+    tables rebuilt from documents, or disabled and the tables emptied.
+    Returns whether anything changed.
+
+    Only bm25_scoring = "bm25" reads the tables, but while the triggers are
+    on every write to documents upserts its namespace's corpus row, so
+    concurrent writers of one namespace (parallel COPY included) wait on one
+    another. Leave them off unless Okapi scoring is in use.
+    '''
+    async with pool.acquire() as conn:
+        changed = await conn.fetchval("SELECT bm25_stats_maintenance($1)", enabled)
+    if changed:
+        logger.info(f"[bm25_stats] statistics maintenance {'enabled, tables rebuilt' if enabled else 'disabled'}")
+    return changed
@@ -1,31 +1,124 @@
-
-
 import json
+import struct
+from collections import ChainMap
+from collections.abc import AsyncIterator, Iterable, Iterator
 
+import numpy as np
 from asyncpg import Connection
 
 from core.ingestion.chunkers import ChunkRecord
+from core.ingestion.lifecycle import compute_chunk_hash
+
+try:
+    import orjson
+except ImportError:        # optional — bulk_insert falls back to the stdlib encoder
+    orjson = None
+
+COPY_COLUMNS = ['document_id', 'namespace', 'content', 'embedding', 'metadata', 'chunk_hash', 'version']
+# COPY data is sent in pieces of about this size — one CopyData message each
+COPY_BUFFER_SIZE = 256 * 1024
+
+# PostgreSQL binary COPY framing: signature, flags, header extension length …
+_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+# … a field count before every tuple, and -1 as the end-of-data marker
+_FIELD_COUNT = struct.pack('!h', len(COPY_COLUMNS))
+_COPY_TRAILER = struct.pack('!h', -1)
+_NULL = struct.pack('!i', -1)
+_JSONB_VERSION = b'\x01'
+# pgvector's binary vector: uint16 dim, uint16 unused, then big-endian float32s
+_VECTOR_DTYPE = np.dtype('>f4')
+
+
+def _dumps(metadata: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(metadata, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(metadata).encode('utf-8')
+
+
+def _metadata(chunk: ChunkRecord) -> dict:
+    metadata = chunk.metadata
+    if isinstance(metadata, ChainMap):
+        # the chunk's own keys over the shared per-document dict — same result
+        # as dict(metadata), without ChainMap's per-key lookups
+        return {**metadata.maps[1], **metadata.maps[0]}
+    return metadata
+
+
+def _field(value: bytes) -> bytes:
+    return struct.pack('!i', len(value)) + value
+
+
+def _vector_field(embedding) -> bytes:
+    if embedding is None:
+        return _NULL
+    values = np.asarray(embedding, dtype=_VECTOR_DTYPE)
+    return struct.pack('!iHH', 4 + values.nbytes, values.size, 0) + values.tobytes()
+
+
+def encode_copy_rows(
+    batch: Iterable[ChunkRecord],
+    document_id: str,
+    namespace: str = "default",
+    version: int = 1,
+    buffer_size: int = COPY_BUFFER_SIZE,
+) -> Iterator[bytes]:
+    '''
+    Encode ChunkRecords as PostgreSQL binary COPY data for COPY_COLUMNS.
+
+    Lazy: rows are encoded as the batch is iterated and yielded in pieces of
+    about buffer_size bytes, the first carrying the COPY header and the last
+    the trailer. The embedding goes straight from its float32 buffer to
+    pgvector's wire format, and metadata is written as jsonb (version byte +
+    JSON text, orjson when installed).
+    '''
+    document_field = _field(document_id.encode('utf-8'))
+    namespace_field = _field(namespace.encode('utf-8'))
+    version_field = struct.pack('!iq', 8, version)
+    buffer = bytearray(_COPY_HEADER)
+    for chunk in batch:
+        buffer += _FIELD_COUNT
+        buffer += document_field
+        buffer += namespace_field
+        buffer += _field(chunk.content.encode('utf-8'))
+        buffer += _vector_field(chunk.embedding)
+        buffer += _field(_JSONB_VERSION + _dumps(_metadata(chunk)))
+        buffer += _field(compute_chunk_hash(chunk.content).encode('ascii'))
+        buffer += version_field
+        if len(buffer) >= buffer_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += _COPY_TRAILER
+    yield bytes(buffer)
+
+
+async def _as_async(pieces: Iterator[bytes]) -> AsyncIterator[bytes]:
+    for piece in pieces:
+        yield piece
 
 
-async def bulk_insert(conn: Connection, batch: list[ChunkRecord], document_id: str, namespace: str = "default") -> None:
+async def bulk_insert(
+    conn: Connection,
+    batch: list[ChunkRecord],
+    document_id: str,
+    namespace: str = "default",
+    table: str = "documents",
+    version: int = 1,
+) -> None:
     '''
-    COPY a batch of ChunkRecords into the documents table.
+    COPY a batch of ChunkRecords into the documents table (or a table with
+    the same COPY_COLUMNS — StagedLoad passes its staging table).
 
-    metadata dict is manually serialized to JSON string via json.dumps before COPY.
+    Binary COPY from encode_copy_rows: no per-row record tuples and no
+    per-value codec calls — the pgvector codec registered on the pool is not
+    used here. Rows are encoded as asyncpg sends them, so only one
+    COPY_BUFFER_SIZE piece of wire data exists at a time.
+    chunk_hash is written alongside so a later re-ingest can skip unchanged chunks.
+    version is the chunk set the rows belong to (see lifecycle.allocate_version);
+    they stay hidden from retrieval until the registry points at it.
     '''
-    records = [
-        (
-            document_id,
-            namespace,
-            chunk.content,
-            chunk.embedding,
-            json.dumps(chunk.metadata),
-        )
-        for chunk in batch
-    ]
-
-    await conn.copy_records_to_table(
-        'documents',
-        records=records,
-        columns=['document_id', 'namespace', 'content', 'embedding', 'metadata']
+    await conn.copy_to_table(
+        table,
+        source=_as_async(encode_copy_rows(batch, document_id, namespace, version)),
+        columns=COPY_COLUMNS,
+        format='binary',
     )
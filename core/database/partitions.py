@@ -0,0 +1,27 @@
+import logging
+from typing import Iterable
+
+from asyncpg import Pool
+
+logger = logging.getLogger("core.partitions")
+
+
+async def ensure_namespace_partitions(pool: Pool, namespaces: Iterable[str]) -> dict[str, str | None]:
+    '''
+    Make sure every namespace has its own documents partition.
+
+    Runs schema.sql's ensure_namespace_partition per namespace: a catalog
+    lookup when the partition exists, otherwise it is created and attached
+    (moving the namespace's rows out of documents_default). Returns
+    {namespace: partition name}; the names are None while documents is still
+    an unpartitioned table (see scripts/labs/lab_7.7_partition_documents.py).
+    '''
+    partitions = {}
+    async with pool.acquire() as conn:
+        for namespace in dict.fromkeys(namespaces):
+            partitions[namespace] = await conn.fetchval("SELECT ensure_namespace_partition($1)", namespace)
+    if any(name is None for name in partitions.values()):
+        logger.warning("[partitions] documents is not partitioned; run scripts/labs/lab_7.7_partition_documents.py")
+    else:
+        logger.info(f"[partitions] {len(partitions)} namespace partitions ready")
+    return partitions
@@ -5,7 +5,7 @@ import asyncpg
 from asyncpg import Pool
 from pgvector.asyncpg import register_vector
 
-from config import DATABASE_CONFIG
+from config import DATABASE_CONFIG, HNSW_SEARCH_CONFIG
 
 
 async def init_connection(conn):
@@ -23,14 +23,25 @@ async def create_pool() -> Pool:
 
     init=register_vector ensures every connection the pool creates understands
     pgvector custom types and can serialize Python lists into PostgreSQL vector columns.
+
+    HNSW_SEARCH_CONFIG is sent as server_settings, i.e. in the startup packet,
+    so the defaults are the session defaults of every pooled connection:
+    vector searches run with them without a SET of their own, and the
+    RESET ALL asyncpg issues on release returns to them. Only a request that
+    asks for different values pays for a transaction-local override
+    (api.services.retriever._vector_search_conn).
     '''
     pool_size = DATABASE_CONFIG.get("pool_size", 20)
+    server_settings = {
+        f"hnsw.{name}": str(value) for name, value in HNSW_SEARCH_CONFIG.items() if value is not None
+    }
 
     pool = await asyncpg.create_pool(
         dsn = DATABASE_CONFIG["url"],
         min_size = max(1, pool_size // 4),   # keep 25% of max alive when idle
         max_size = pool_size,                # ceiling on simultaneous connections
-        init = init_connection               # called on every new connection the pool creates
+        init = init_connection,              # called on every new connection the pool creates
+        server_settings = server_settings,   # hnsw.* search defaults, see above
     )
 
     # Log total connection budget so multi-worker deployments are visible.
@@ -1,14 +1,89 @@
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- documents is list-partitioned by namespace: one heap, one HNSW graph and
+-- one GIN index per namespace (the indexes below are declared once on the
+-- parent and created on every partition). A search filtered on namespace
+-- touches one partition; a bulk load into one namespace leaves the other
+-- namespaces' indexes alone. The primary key has to include the partition
+-- key; id alone still comes from one sequence and stays unique.
+-- Namespaces without their own partition land in documents_default until
+-- ensure_namespace_partition (below) gives them one. Databases created
+-- before partitioning keep a plain table until
+-- scripts/labs/lab_7.7_partition_documents.py migrates them.
 CREATE TABLE IF NOT EXISTS documents (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     document_id VARCHAR(255) NOT NULL,
     namespace VARCHAR(255) NOT NULL DEFAULT 'default',
     content TEXT,
     embedding VECTOR(768),
     metadata JSONB,
-    fts_vector tsvector
-);
+    fts_vector tsvector,
+    chunk_hash VARCHAR(64),
+    version BIGINT NOT NULL DEFAULT 1,
+    PRIMARY KEY (id, namespace)
+) PARTITION BY LIST (namespace);
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('documents')) = 'p' THEN
+        CREATE TABLE IF NOT EXISTS documents_default PARTITION OF documents DEFAULT;
+    END IF;
+END $$;
+
+-- Give a namespace its own partition; returns the partition's name, or NULL
+-- while documents is not partitioned yet. Idempotent and cheap once the
+-- partition exists. Rows of the namespace already in documents_default move
+-- into the new partition in the same transaction, with documents_default
+-- locked against writes until ATTACH has re-checked it (quick while the
+-- default stays small).
+-- Called for every NAMESPACE_REGISTRY entry at API startup and for the
+-- namespaces of a bulk load (core.database.partitions).
+-- Partition names: readable, plus a hash suffix so "kyc-aml" and "kyc_aml"
+-- never collide.
+CREATE OR REPLACE FUNCTION namespace_partition_name(ns TEXT)
+RETURNS TEXT AS $$
+    SELECT format('documents_%s_%s',
+                  left(regexp_replace(lower(ns), '[^a-z0-9]+', '_', 'g'), 40),
+                  left(md5(ns), 6));
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION ensure_namespace_partition(ns TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    parent_schema TEXT;
+    part TEXT := namespace_partition_name(ns);
+BEGIN
+    SELECT n.nspname INTO parent_schema
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = to_regclass('documents') AND c.relkind = 'p';
+    IF parent_schema IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF to_regclass(format('%I.%I', parent_schema, part)) IS NOT NULL THEN
+        RETURN part;
+    END IF;
+
+    -- One creator at a time; re-check once the lock is ours
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_namespace_partition'));
+    IF to_regclass(format('%I.%I', parent_schema, part)) IS NOT NULL THEN
+        RETURN part;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I.%I (LIKE %I.documents INCLUDING DEFAULTS)', parent_schema, part, parent_schema);
+    -- Hold off writers to the default partition until ATTACH: a row of ns
+    -- inserted after the move would make ATTACH's re-check of
+    -- documents_default fail. EXCLUSIVE still lets readers through.
+    EXECUTE format('LOCK TABLE %I.documents_default IN EXCLUSIVE MODE', parent_schema);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I.documents_default WHERE namespace = %L RETURNING *) '
+        'INSERT INTO %I.%I SELECT * FROM moved',
+        parent_schema, ns, parent_schema, part
+    );
+    EXECUTE format('ALTER TABLE %I.documents ATTACH PARTITION %I.%I FOR VALUES IN (%L)',
+                   parent_schema, parent_schema, part, ns);
+    RETURN part;
+END;
+$$ LANGUAGE plpgsql;
 
 CREATE INDEX IF NOT EXISTS idx_documents_namespace 
     ON documents(namespace);
@@ -35,19 +110,38 @@ CREATE INDEX IF NOT EXISTS idx_documents_embedding_hnsw
 CREATE INDEX IF NOT EXISTS idx_documents_fts 
     ON documents USING GIN (fts_vector);
 
+-- An INSERT that supplies fts_vector keeps it: carry_over_chunks copies a
+-- kept chunk's stored vector along with its content, so an unchanged body
+-- is never re-run through to_tsvector. A changed content always is.
 CREATE OR REPLACE FUNCTION update_fts_vector()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.fts_vector := to_tsvector('english', coalesce(NEW.content, ''));
+    IF TG_OP = 'UPDATE' OR NEW.fts_vector IS NULL THEN
+        NEW.fts_vector := to_tsvector('english', coalesce(NEW.content, ''));
+    END IF;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
+-- UPDATE OF content: metadata-only updates must not re-run to_tsvector on
+-- an unchanged body.
 DROP TRIGGER IF EXISTS trig_update_fts ON documents;
 CREATE TRIGGER trig_update_fts
-    BEFORE INSERT OR UPDATE ON documents
+    BEFORE INSERT OR UPDATE OF content ON documents
     FOR EACH ROW EXECUTE FUNCTION update_fts_vector();
 
+-- Per-chunk content hash for incremental re-ingestion.
+-- SHA-256 hex of the chunk text (UTF-8), written by bulk_insert. On an
+-- "updated" document only chunks whose hash is not already stored get
+-- embedded; the rest are copied into the new version with their stored
+-- embedding and fts_vector (carry_over_chunks), vanished ones are not.
+-- The ALTER + backfill bring existing installs up to date (idempotent).
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunk_hash VARCHAR(64);
+
+UPDATE documents
+    SET chunk_hash = encode(sha256(convert_to(coalesce(content, ''), 'UTF8')), 'hex')
+    WHERE chunk_hash IS NULL;
+
 -- Document lifecycle tracking 
 -- Records the content hash of each ingested document so we can detect
 -- re-ingestion of unchanged files (skip) and updated files (delete + re-ingest).
@@ -61,6 +155,248 @@ CREATE TABLE IF NOT EXISTS document_registry (
     PRIMARY KEY (document_id, namespace)
 );
 
+-- Versioned chunk sets — zero-downtime replacement of updated documents.
+-- Every ingest writes its chunks under a fresh version (document_version_seq,
+-- monotonic). register_document then flips document_registry.current_version
+-- to it in one statement, so a search sees the old chunk set or the new one,
+-- never neither or both. Older versions are deleted afterwards in small
+-- batches (lifecycle.reclaim_stale_versions). Rows of a version still being
+-- written are newer than the pointer and stay hidden until the flip.
+-- Existing rows and registry entries are version 1; the sequence starts at 2.
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE document_registry ADD COLUMN IF NOT EXISTS current_version BIGINT NOT NULL DEFAULT 1;
+CREATE SEQUENCE IF NOT EXISTS document_version_seq START 2;
+
+-- Tombstones — deleting a document is one registry UPDATE
+-- (lifecycle.delete_document_chunks sets deleted_at). current_documents hides
+-- the document at once; its rows are deleted later in small batches, with
+-- the superseded versions, by lifecycle.reclaim_stale_versions. Ingesting the
+-- same document_id again clears the tombstone.
+ALTER TABLE document_registry ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+
+-- Covering index for the visibility probe below: one index-only lookup per
+-- candidate row, so filtering on the current version costs an index probe.
+-- (Replaces idx_document_registry_current, which predates deleted_at.)
+DROP INDEX IF EXISTS idx_document_registry_current;
+CREATE INDEX IF NOT EXISTS idx_document_registry_visibility
+    ON document_registry (namespace, document_id) INCLUDE (current_version, deleted_at);
+
+-- What retrieval reads. A chunk is visible unless its document is registered
+-- under a different version or tombstoned. Unregistered documents (loaded by
+-- scripts that skip the registry) stay visible, as before versioning. The
+-- view is inlined by the planner, so the HNSW / GIN indexes on documents
+-- still apply.
+CREATE OR REPLACE VIEW current_documents AS
+    SELECT d.*
+    FROM documents d
+    WHERE NOT EXISTS (
+        SELECT 1 FROM document_registry r
+        WHERE r.namespace = d.namespace
+          AND r.document_id = d.document_id
+          AND (r.current_version <> d.version OR r.deleted_at IS NOT NULL)
+    );
+
+-- Okapi BM25 corpus statistics, per namespace (retriever BM25_SQL,
+-- RetrieverConfig.bm25_scoring = "bm25"):
+--   bm25_term_stats    chunks containing each lexeme (document frequency)
+--   bm25_chunk_stats   each chunk's length in lexeme occurrences
+--   bm25_corpus_stats  chunk count and total length, for N and avgdl
+-- Kept current by statement-level triggers on documents, so COPY, the
+-- staged merge, carry-over and reclaim all maintain them with no code of
+-- their own: one aggregate upsert per statement, not one per row. The
+-- namespace's corpus row is upserted first, which orders concurrent writers
+-- of one namespace and keeps their term upserts from deadlocking. Counted
+-- over every stored row, superseded versions included until reclaimed.
+-- That ordering is also the cost: every write to documents pays the
+-- aggregate upserts, and writers of one namespace (the parallel COPY
+-- writers of one ingest included) queue on its corpus row until the
+-- holder commits. Only bm25_scoring = "bm25" reads the tables, so
+-- maintenance is switchable: bm25_stats_maintenance(false) disables the
+-- triggers and empties the tables, (true) enables them and rebuilds the
+-- tables from documents (core.database.set_bm25_stats_maintenance,
+-- BM25_CONFIG["maintain_stats"]).
+CREATE TABLE IF NOT EXISTS bm25_term_stats (
+    namespace VARCHAR(255) NOT NULL,
+    term      TEXT         NOT NULL,
+    doc_freq  INTEGER      NOT NULL,
+    PRIMARY KEY (namespace, term)
+);
+
+CREATE TABLE IF NOT EXISTS bm25_chunk_stats (
+    namespace VARCHAR(255) NOT NULL,
+    chunk_id  INTEGER      NOT NULL,
+    length    INTEGER      NOT NULL,
+    PRIMARY KEY (namespace, chunk_id)
+);
+
+CREATE TABLE IF NOT EXISTS bm25_corpus_stats (
+    namespace    VARCHAR(255) PRIMARY KEY,
+    chunk_count  BIGINT       NOT NULL,
+    total_length BIGINT       NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION bm25_length(v tsvector)
+RETURNS INTEGER AS $$
+    SELECT coalesce(sum(coalesce(array_length(positions, 1), 1)), 0)::int FROM unnest(v);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- One function for the three triggers; changes is the statement's rows as
+-- (namespace, id, fts_vector, length, sign), +1 added and -1 removed. An
+-- UPDATE only counts rows whose fts_vector changed.
+CREATE OR REPLACE FUNCTION bm25_stats_maintain()
+RETURNS TRIGGER AS $$
+DECLARE
+    changes TEXT;
+BEGIN
+    changes := CASE TG_OP
+        WHEN 'INSERT' THEN
+            'SELECT namespace, id, fts_vector, bm25_length(fts_vector) AS length, 1 AS sign FROM new_rows'
+        WHEN 'DELETE' THEN
+            'SELECT namespace, id, fts_vector, bm25_length(fts_vector) AS length, -1 AS sign FROM old_rows'
+        ELSE
+            'SELECT x.* FROM old_rows o JOIN new_rows n ON n.id = o.id
+             CROSS JOIN LATERAL (VALUES
+                 (o.namespace, o.id, o.fts_vector, bm25_length(o.fts_vector), -1),
+                 (n.namespace, n.id, n.fts_vector, bm25_length(n.fts_vector), 1)
+             ) AS x(namespace, id, fts_vector, length, sign)
+             WHERE n.fts_vector IS DISTINCT FROM o.fts_vector OR n.namespace <> o.namespace'
+    END;
+
+    EXECUTE format(
+        'INSERT INTO bm25_corpus_stats AS s (namespace, chunk_count, total_length)
+         SELECT namespace, sum(sign), sum(sign * length) FROM (%s) c
+         GROUP BY namespace ORDER BY namespace
+         ON CONFLICT (namespace) DO UPDATE
+             SET chunk_count = s.chunk_count + EXCLUDED.chunk_count,
+                 total_length = s.total_length + EXCLUDED.total_length',
+        changes);
+    EXECUTE format(
+        'INSERT INTO bm25_term_stats AS s (namespace, term, doc_freq)
+         SELECT c.namespace, t.term, sum(c.sign) FROM (%s) c, unnest(tsvector_to_array(c.fts_vector)) AS t(term)
+         GROUP BY 1, 2 HAVING sum(c.sign) <> 0 ORDER BY 1, 2
+         ON CONFLICT (namespace, term) DO UPDATE SET doc_freq = s.doc_freq + EXCLUDED.doc_freq',
+        changes);
+    EXECUTE format(
+        'DELETE FROM bm25_chunk_stats s USING (%s) c
+         WHERE c.sign = -1 AND s.namespace = c.namespace AND s.chunk_id = c.id',
+        changes);
+    EXECUTE format(
+        'INSERT INTO bm25_chunk_stats (namespace, chunk_id, length)
+         SELECT namespace, id, length FROM (%s) c WHERE sign = 1
+         ON CONFLICT (namespace, chunk_id) DO UPDATE SET length = EXCLUDED.length',
+        changes);
+    IF TG_OP <> 'INSERT' THEN
+        -- Lexemes no chunk uses any more
+        EXECUTE format(
+            'DELETE FROM bm25_term_stats s
+             USING (SELECT DISTINCT c.namespace, t.term
+                    FROM (%s) c, unnest(tsvector_to_array(c.fts_vector)) AS t(term) WHERE c.sign = -1) g
+             WHERE s.namespace = g.namespace AND s.term = g.term AND s.doc_freq <= 0',
+            changes);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bm25_stats_reset()
+RETURNS TRIGGER AS $$
+BEGIN
+    TRUNCATE bm25_term_stats, bm25_chunk_stats, bm25_corpus_stats;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trig_bm25_stats_insert ON documents;
+CREATE TRIGGER trig_bm25_stats_insert
+    AFTER INSERT ON documents REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bm25_stats_maintain();
+
+DROP TRIGGER IF EXISTS trig_bm25_stats_update ON documents;
+CREATE TRIGGER trig_bm25_stats_update
+    AFTER UPDATE ON documents REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bm25_stats_maintain();
+
+DROP TRIGGER IF EXISTS trig_bm25_stats_delete ON documents;
+CREATE TRIGGER trig_bm25_stats_delete
+    AFTER DELETE ON documents REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bm25_stats_maintain();
+
+DROP TRIGGER IF EXISTS trig_bm25_stats_truncate ON documents;
+CREATE TRIGGER trig_bm25_stats_truncate
+    AFTER TRUNCATE ON documents
+    FOR EACH STATEMENT EXECUTE FUNCTION bm25_stats_reset();
+
+-- Recount every statistic from documents
+CREATE OR REPLACE FUNCTION bm25_stats_rebuild()
+RETURNS VOID AS $$
+BEGIN
+    TRUNCATE bm25_term_stats, bm25_chunk_stats, bm25_corpus_stats;
+    INSERT INTO bm25_corpus_stats (namespace, chunk_count, total_length)
+        SELECT namespace, count(*), sum(bm25_length(fts_vector)) FROM documents GROUP BY namespace;
+    INSERT INTO bm25_term_stats (namespace, term, doc_freq)
+        SELECT d.namespace, t.term, count(*)
+        FROM documents d, unnest(tsvector_to_array(d.fts_vector)) AS t(term)
+        GROUP BY 1, 2;
+    INSERT INTO bm25_chunk_stats (namespace, chunk_id, length)
+        SELECT namespace, id, bm25_length(fts_vector) FROM documents
+        ON CONFLICT (namespace, chunk_id) DO NOTHING;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Turn statistics maintenance on or off; returns whether it changed
+-- anything. A no-op when already in that state, so every API worker can
+-- call it at startup. ALTER TABLE ... TRIGGER blocks writers to documents
+-- until commit, so a rebuild sees no concurrent change it could miss.
+CREATE OR REPLACE FUNCTION bm25_stats_maintenance(enabled BOOLEAN)
+RETURNS BOOLEAN AS $$
+DECLARE
+    is_enabled BOOLEAN;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('bm25_stats_maintenance'));
+    SELECT bool_and(tgenabled <> 'D') INTO is_enabled
+    FROM pg_trigger
+    WHERE tgrelid = 'documents'::regclass AND tgname LIKE 'trig\_bm25\_stats\_%';
+    IF is_enabled = enabled THEN
+        RETURN false;
+    END IF;
+    IF enabled THEN
+        ALTER TABLE documents
+            ENABLE TRIGGER trig_bm25_stats_insert, ENABLE TRIGGER trig_bm25_stats_update,
+            ENABLE TRIGGER trig_bm25_stats_delete, ENABLE TRIGGER trig_bm25_stats_truncate;
+        PERFORM bm25_stats_rebuild();
+    ELSE
+        ALTER TABLE documents
+            DISABLE TRIGGER trig_bm25_stats_insert, DISABLE TRIGGER trig_bm25_stats_update,
+            DISABLE TRIGGER trig_bm25_stats_delete, DISABLE TRIGGER trig_bm25_stats_truncate;
+        TRUNCATE bm25_term_stats, bm25_chunk_stats, bm25_corpus_stats;
+    END IF;
+    RETURN true;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill once, for rows stored before the triggers existed. Re-applying
+-- this file re-creates the triggers enabled; if maintenance was off the
+-- tables are empty, so they are rebuilt here too.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM bm25_corpus_stats) THEN
+        PERFORM bm25_stats_rebuild();
+    END IF;
+END $$;
+
+-- Content-addressed embedding cache.
+-- content_hash is SHA-256 of the chunk text (same digest as documents.chunk_hash).
+-- model is part of the key: switching the embedding model never serves stale
+-- vectors. Read and written by core.ingestion.embedders.EmbeddingCache.
+-- created_at allows pruning, e.g. DELETE ... WHERE model <> '<current model>'.
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model        VARCHAR(200) NOT NULL,
+    content_hash VARCHAR(64)  NOT NULL,
+    embedding    VECTOR(768)  NOT NULL,
+    created_at   TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (model, content_hash)
+);
+
 -- Per-request LLM usage log for cost tracking and monthly aggregation.
 -- One row per API request that consumed LLM tokens.
 -- FinOps middleware writes here after every /search and /agent/query response.
@@ -0,0 +1,160 @@
+import logging
+import time
+import uuid
+
+from asyncpg import Connection, Pool
+
+from config import BULK_LOAD_CONFIG
+from core.database.bulk_ops import COPY_COLUMNS, bulk_insert
+from core.ingestion.chunkers import ChunkRecord
+
+logger = logging.getLogger("core.staged_load")
+
+HNSW_INDEX = "idx_documents_embedding_hnsw"
+FTS_TRIGGER = "trig_update_fts"
+
+
+class StagedLoad:
+    '''
+    Bulk-load mode for corpus loads: COPY into an UNLOGGED staging table,
+    then merge into documents once.
+
+    A plain COPY into documents fires trig_update_fts per row and inserts
+    every row into the GIN and HNSW indexes one at a time — the dominant
+    cost of a full-corpus load. Here:
+      - insert() has bulk_insert's signature (pass it as ingest_chunks'
+        insert=) and COPYs into documents_staging_<id>: no WAL, no trigger,
+        no indexes
+      - merge() moves everything into documents in one transaction, with
+        fts_vector computed by the INSERT ... SELECT itself and the trigger
+        disabled for it. Documents already stored under a staged
+        (namespace, document_id) are deleted and its registry row pointed at
+        the staged version in the same transaction, so an updated document
+        is replaced atomically.
+      - at hnsw_rebuild_threshold rows or more, the HNSW index is dropped
+        before the INSERT and rebuilt once from its own definition before
+        the commit — one build instead of N incremental inserts. With
+        documents partitioned that is every namespace's HNSW index, so keep
+        the threshold at loads that dwarf the existing corpus.
+
+    merge() holds locks that block other writers to documents until it
+    commits (DISABLE TRIGGER takes SHARE ROW EXCLUSIVE; a rebuild's DROP
+    INDEX takes ACCESS EXCLUSIVE, which blocks readers too), so this is for
+    offline / maintenance-window loads, not the /ingest path. The role needs
+    to own documents.
+
+    Usage:
+        async with StagedLoad(pool) as load:
+            await ingest_chunks(chunks, pool, document_id, insert=load.insert)
+            stats = await load.merge()
+    The staging table is dropped on exit, merged or not.
+    '''
+
+    def __init__(
+        self,
+        pool: Pool,
+        hnsw_rebuild_threshold: int | None = None,
+        maintenance_work_mem: str | None = None,
+    ):
+        self.pool = pool
+        self.table = f"documents_staging_{uuid.uuid4().hex[:12]}"
+        self.hnsw_rebuild_threshold = (
+            BULK_LOAD_CONFIG["hnsw_rebuild_threshold"] if hnsw_rebuild_threshold is None else hnsw_rebuild_threshold
+        )
+        self.maintenance_work_mem = maintenance_work_mem or BULK_LOAD_CONFIG["maintenance_work_mem"]
+
+    async def __aenter__(self) -> "StagedLoad":
+        columns = ", ".join(COPY_COLUMNS)
+        async with self.pool.acquire() as conn:
+            # Same column types as documents; no constraints, indexes or triggers
+            await conn.execute(
+                f"CREATE UNLOGGED TABLE {self.table} AS SELECT {columns} FROM documents WITH NO DATA"
+            )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    async def insert(
+        self,
+        conn: Connection,
+        batch: list[ChunkRecord],
+        document_id: str,
+        namespace: str = "default",
+        version: int = 1,
+    ) -> None:
+        await bulk_insert(conn, batch, document_id, namespace, table=self.table, version=version)
+
+    async def discard(self, document_id: str, namespace: str = "default") -> None:
+        """Drop one document's staged rows, e.g. after it failed part-way through."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"DELETE FROM {self.table} WHERE namespace = $1 AND document_id = $2", namespace, document_id
+            )
+
+    async def merge(self) -> dict:
+        '''
+        Move the staged rows into documents in one transaction.
+
+        Returns rows_inserted, rows_replaced (old rows of re-loaded
+        documents), hnsw_rebuilt and merge_seconds.
+        '''
+        t0 = time.perf_counter()
+        columns = ", ".join(COPY_COLUMNS)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                staged = await conn.fetchval(f"SELECT count(*) FROM {self.table}")
+                index_def = None
+                if staged >= self.hnsw_rebuild_threshold:
+                    index_def = await conn.fetchval(
+                        "SELECT pg_get_indexdef(to_regclass($1))", HNSW_INDEX
+                    )
+                    if index_def is not None:
+                        await conn.execute(f"DROP INDEX {HNSW_INDEX}")
+                        # On partitioned documents the definition reads
+                        # "ON ONLY", which would recreate the parent index
+                        # alone, without the per-partition indexes
+                        index_def = index_def.replace(" ON ONLY ", " ON ", 1)
+
+                await conn.execute(f"ALTER TABLE documents DISABLE TRIGGER {FTS_TRIGGER}")
+                replaced = await conn.execute(
+                    f"""
+                    DELETE FROM documents AS d
+                    USING (SELECT namespace, document_id, max(version) AS version
+                           FROM {self.table} GROUP BY namespace, document_id) AS s
+                    WHERE d.namespace = s.namespace AND d.document_id = s.document_id
+                      AND d.version < s.version
+                    """
+                )
+                inserted = await conn.execute(
+                    f"""
+                    INSERT INTO documents ({columns}, fts_vector)
+                    SELECT {columns}, to_tsvector('english', coalesce(content, '')) FROM {self.table}
+                    """
+                )
+                await conn.execute(f"ALTER TABLE documents ENABLE TRIGGER {FTS_TRIGGER}")
+                # Registered documents are only visible at their registry
+                # version; point it at the staged rows in this same commit.
+                # Only forward, as in register_document.
+                await conn.execute(
+                    f"""
+                    UPDATE document_registry AS r SET current_version = s.version
+                    FROM (SELECT DISTINCT namespace, document_id, version FROM {self.table}) AS s
+                    WHERE r.namespace = s.namespace AND r.document_id = s.document_id
+                      AND s.version > r.current_version
+                    """
+                )
+
+                if index_def is not None:
+                    await conn.execute("SELECT set_config('maintenance_work_mem', $1, true)", self.maintenance_work_mem)
+                    await conn.execute(index_def)
+
+        stats = {
+            "rows_inserted": int(inserted.split()[-1]),
+            "rows_replaced": int(replaced.split()[-1]),
+            "hnsw_rebuilt": index_def is not None,
+            "merge_seconds": round(time.perf_counter() - t0, 3),
+        }
+        logger.info(f"[staged_load] merged {self.table}: {stats}")
+        return stats
@@ -1,14 +1,27 @@
-from core.ingestion.chunkers import CHUNKER_REGISTRY, ChunkRecord, get_chunker
-from core.ingestion.embedders import embed_chunks
+from core.ingestion.chunkers import (
+    CHUNKER_REGISTRY,
+    STREAMING_CHUNKER_REGISTRY,
+    ChunkRecord,
+    get_chunker,
+    get_streaming_chunker,
+)
+from core.ingestion.embedders import EmbeddingCache, EmbeddingScheduler, embed_chunks
 from core.ingestion.processors import clean_chunks
 from core.ingestion.readers import FileChunkIterator, read_chunks
+from core.ingestion.tokenizer import TokenCounter, get_token_counter
 
 __all__ = [
     'FileChunkIterator',
     'read_chunks',
     'clean_chunks',
     'embed_chunks',
+    'EmbeddingCache',
+    'EmbeddingScheduler',
     'ChunkRecord',
     'CHUNKER_REGISTRY',
-    'get_chunker'
+    'get_chunker',
+    'STREAMING_CHUNKER_REGISTRY',
+    'get_streaming_chunker',
+    'TokenCounter',
+    'get_token_counter',
 ]
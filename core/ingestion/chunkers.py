@@ -11,26 +11,41 @@ Strategies:
   - recursive_split()     .txt, prose, general docs       ← implemented
   - header_aware_split()  .md files                       ← implemented
   - chunk_openapi_spec()  .json OpenAPI specs             ← implemented
-  - semantic_split()      long docs with topic shifts     ← STUB, needs embedder
+  - semantic_split()      long docs with topic shifts     ← implemented, needs embed_fn
+
+Streaming variants (constant memory, consume read_chunks() output):
+  - iter_recursive_split()     same chunks as recursive_split
+  - iter_header_aware_split()  same sections as header_aware_split
 
 NOTE on chunk_size units:
-  Using characters, not tokens. Token counting requires a tokenizer (tiktoken
-  or model-specific). At 4 chars ≈ 1 token for English prose, chunk_size=1200
-  chars ≈ 300 tokens — a reasonable working size for most embedding models.
-  TODO: replace with tiktoken when tokenizer is wired into the pipeline.
+  Characters by default. At 4 chars ≈ 1 token for English prose,
+  chunk_size=1200 chars ≈ 300 tokens — a reasonable working size for most
+  embedding models, but only an estimate: legal citations and tables run far
+  denser than 4 chars/token.
+
+  Pass token_counter=get_token_counter() (core/ingestion/tokenizer.py) to
+  recursive_split, header_aware_split or chunk_openapi_spec and chunk_size /
+  overlap are tokens instead, counted with a local WordPiece vocabulary.
+  Chunks then carry token_count and size_unit="tokens" in metadata. The
+  streaming iter_* variants stay character-based.
 """
 
 import json as _json
 import re
-from dataclasses import dataclass, field
+from collections import ChainMap
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, MutableMapping
 from typing import Callable as _Callable
 
+import numpy as np
+
+if TYPE_CHECKING:
+    from core.ingestion.tokenizer import TokenCounter
+
 # ---------------------------------------------------------------------------
 # ChunkRecord — maps directly to the documents table schema
 # ---------------------------------------------------------------------------
 
-@dataclass
 class ChunkRecord:
     """
     One row ready for insertion into the documents table.
@@ -40,25 +55,69 @@ class ChunkRecord:
       embedding → VECTOR(768) None here; embedders.py fills this
       metadata  → JSONB      everything needed for citation + filtering
 
-    Why a dataclass and not a dict:
-      Autocomplete works. Typos in field names are caught at definition time,
-      not silently at insert time. Adding a field here shows up everywhere.
+    Why slots and shared metadata:
+      A large ingest holds tens of thousands of these. __slots__ drops the
+      per-instance __dict__. Chunkers pass the per-document (or per-section)
+      fields — source, filename, strategy, chunk_size, overlap, header_path —
+      once as shared_metadata; each record stores only its own fields
+      (chunk_index, char_start, ...). metadata then reads as a ChainMap over
+      both: lookups fall through to the shared map, writes go to the record's
+      own dict, so the shared map is never modified through a record.
+      Constructed with metadata only, metadata is that plain dict.
+
+    embedding is a row of the float32 matrix embed_chunks() builds per batch
+    (pgvector stores float32 anyway) — 3KB per 768-d chunk instead of ~25KB
+    as a list of boxed floats. A list[float] is still accepted.
     """
-    content:   str
-    metadata:  dict         = field(default_factory=dict)
-    embedding: list[float] | None = field(default=None, repr=False)
-
-    def __post_init__(self):
-        self.content = self.content.strip()
+    __slots__ = ("content", "embedding", "_own", "_shared")
+
+    def __init__(
+        self,
+        content:   str,
+        metadata:  dict | None = None,
+        embedding: "np.ndarray | list[float] | None" = None,
+        shared_metadata: dict | None = None,
+    ):
+        self.content = content.strip()
+        self.embedding = embedding
+        self._own = {} if metadata is None else metadata
+        self._shared = shared_metadata
+
+    @property
+    def metadata(self) -> MutableMapping:
+        if self._shared is None:
+            return self._own
+        return ChainMap(self._own, self._shared)
+
+    @metadata.setter
+    def metadata(self, value: dict) -> None:
+        self._own, self._shared = value, None
+
+    def share_metadata(self, shared: dict) -> None:
+        """Re-base this record on shared; its own fields that shared also has are dropped."""
+        self._own = {k: v for k, v in self.metadata.items() if k not in shared}
+        self._shared = shared
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ChunkRecord):
+            return NotImplemented
+        if self.content != other.content or dict(self.metadata) != dict(other.metadata):
+            return False
+        if self.embedding is None or other.embedding is None:
+            return self.embedding is other.embedding
+        return bool(np.array_equal(self.embedding, other.embedding))
+
+    __hash__ = None
 
     def __repr__(self) -> str:
+        metadata = self.metadata
         preview = self.content[:60].replace("\n", " ")
         return (
             f"ChunkRecord("
             f"chars={len(self.content)}, "
-            f"index={self.metadata.get('chunk_index', '?')}/"
-            f"{self.metadata.get('chunk_total', '?')}, "
-            f"source='{self.metadata.get('source', 'unknown')}', "
+            f"index={metadata.get('chunk_index', '?')}/"
+            f"{metadata.get('chunk_total', '?')}, "
+            f"source='{metadata.get('source', 'unknown')}', "
             f"preview='{preview}...')"
         )
 
@@ -68,11 +127,189 @@ class ChunkRecord:
 # For: .txt, prose, general documentation
 # ---------------------------------------------------------------------------
 
+# Paragraph → sentence → word. The character split is the implicit last resort.
+_RECURSIVE_SEPARATORS = ["\n\n", ". ", "! ", "? ", " "]
+
+
+# A segment of the recursive split, as positions into the source text:
+# (separator, [(start, end), ...]). Each span is a run of parts that sit back
+# to back in the source, exactly one separator apart, so it is one slice.
+# Almost every segment is a single run. It has more than one only when the
+# source had extra whitespace or empty parts between two of its parts
+# ("a\n\n\n\nb") — the text is then the runs joined by the separator.
+_Segment = tuple[str, list[tuple[int, int]]]
+
+
+def _strip_span(text: str, start: int, end: int) -> tuple[int, int]:
+    """Span equivalent of text[start:end].strip()."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _iter_parts(text: str, start: int, end: int, sep: str) -> Iterator[tuple[int, int]]:
+    """Stripped, non-empty (start, end) spans of text[start:end].split(sep)."""
+    sep_len = len(sep)
+    # str.split runs in C; positions are recovered from the piece lengths
+    piece_start = start
+    for piece in text[start:end].split(sep):
+        piece_len = len(piece)
+        part_start, piece_start = piece_start, piece_start + piece_len + sep_len
+        part = piece.strip()
+        part_len = len(part)
+        if not part_len:
+            continue
+        if part_len != piece_len:
+            part_start += piece_len - len(piece.lstrip())
+        yield part_start, part_start + part_len
+
+
+def _token_window_spans(
+    text:          str,
+    start:         int,
+    end:           int,
+    chunk_size:    int,
+    overlap:       int,
+    token_counter: "TokenCounter",
+) -> list[_Segment]:
+    """Token-mode base case: windows of chunk_size tokens, overlap tokens apart, cut at token boundaries."""
+    offsets = token_counter.offsets(text[start:end])
+    if not offsets:
+        return [("", [(start, end)])]
+    segments, i = [], 0
+    while i < len(offsets):
+        last = min(i + chunk_size, len(offsets)) - 1
+        segments.append(("", [(start + offsets[i][0], start + offsets[last][1])]))
+        i += chunk_size - overlap
+    return segments
+
+
+def _split_spans(
+    text:          str,
+    start:         int,
+    end:           int,
+    separators:    list[str],
+    chunk_size:    int,
+    overlap:       int,
+    token_counter: "TokenCounter | None" = None,
+) -> list[_Segment]:
+    """
+    Recursively split text[start:end] using the first separator that produces
+    chunks within chunk_size. Falls back to next separator if needed.
+
+    Works on positions: the open chunk is its runs plus its length, so the
+    chunk text is never rebuilt while parts are added — the caller slices
+    once at the end. Splitting a long
+    paragraph word by word is linear in its length instead of re-copying the
+    open chunk for every word.
+
+    With a token_counter, sizes are tokens: every part at this level is
+    counted in one batch call, and a candidate's size is the sum of its
+    parts plus the separators' tokens (the pre-tokenizer splits on whitespace
+    and punctuation, so counts add up across separator boundaries).
+    """
+    if not separators:
+        if token_counter is not None:
+            return _token_window_spans(text, start, end, chunk_size, overlap, token_counter)
+        # Base case: character split with overlap
+        segments, pos = [], start
+        while pos < end:
+            segments.append(("", [(pos, min(pos + chunk_size, end))]))
+            pos += chunk_size - overlap
+        return segments
+
+    sep, sep_len = separators[0], len(separators[0])
+    if token_counter is None:
+        sized = ((s, e, e - s) for s, e in _iter_parts(text, start, end, sep))
+        sep_size = sep_len
+    else:
+        parts = list(_iter_parts(text, start, end, sep))
+        counts = token_counter.count([text[s:e] for s, e in parts] + [sep])
+        sep_size = counts.pop()
+        sized = ((s, e, n) for (s, e), n in zip(parts, counts))
+
+    segments: list[_Segment] = []
+    runs: list[tuple[int, int]] = []    # closed runs of the open chunk
+    run_start, run_end = -1, 0          # open run; run_start < 0 means no open chunk
+    current_len = 0
+
+    for part_start, part_end, part_len in sized:
+        candidate_len = current_len + sep_size + part_len if run_start >= 0 else part_len
+        if candidate_len <= chunk_size:
+            # Still fits — keep accumulating
+            if run_start < 0:
+                run_start = part_start
+            elif part_start != run_end + sep_len:
+                runs.append((run_start, run_end))
+                run_start = part_start
+            run_end = part_end
+            current_len = candidate_len
+        else:
+            if run_start >= 0:
+                runs.append((run_start, run_end))
+                segments.append((sep, runs))
+                runs = []
+            # This part alone is too big — recurse with next separator
+            if part_len > chunk_size:
+                segments.extend(_split_spans(
+                    text, part_start, part_end, separators[1:], chunk_size, overlap, token_counter
+                ))
+                run_start, current_len = -1, 0
+            else:
+                run_start, run_end, current_len = part_start, part_end, part_len
+
+    if run_start >= 0:
+        runs.append((run_start, run_end))
+        segments.append((sep, runs))
+
+    return segments
+
+
+def _segment_text(text: str, segment: _Segment) -> str:
+    sep, runs = segment
+    if len(runs) == 1:
+        return text[runs[0][0]:runs[0][1]]
+    return sep.join(text[s:e] for s, e in runs)
+
+
+def _split_recursive(
+    text:       str,
+    separators: list[str],
+    chunk_size: int,
+    overlap:    int,
+) -> list[str]:
+    """
+    Recursively split text using the first separator that produces
+    chunks within chunk_size. Falls back to next separator if needed.
+    String form of _split_spans.
+    """
+    return [
+        _segment_text(text, segment)
+        for segment in _split_spans(text, 0, len(text), separators, chunk_size, overlap)
+    ]
+
+
+def _recursive_metadata(source: str | Path, chunk_size: int, overlap: int) -> dict:
+    """Per-document metadata shared by every recursive chunk."""
+    return {
+        # Citation fields — shown to the user in retrieval results
+        "source":        str(source),
+        "filename":      Path(source).name if source != "unknown" else "unknown",
+        # Chunker config — debug retrieval issues, reproduce chunking
+        "strategy":      "recursive",
+        "chunk_size":    chunk_size,
+        "overlap":       overlap,
+    }
+
+
 def recursive_split(
     text:       str,
     source:     str | Path = "unknown",
     chunk_size: int = 1200,     # characters (~300 tokens for English prose)
     overlap:    int = 100,      # characters carried over to next chunk
+    token_counter: "TokenCounter | None" = None,
 ) -> list[ChunkRecord]:
     """
     Split text by trying paragraph boundaries first, then sentences, then
@@ -85,6 +322,8 @@ def recursive_split(
         chunk_size: max characters per chunk (~300 tokens at 4 chars/token)
         overlap:    characters of context carried into the next chunk.
                     Prevents a sentence split from losing context at boundaries.
+        token_counter: size in tokens instead — chunk_size and overlap are
+                    then token counts (see core/ingestion/tokenizer.py)
 
     Returns:
         list[ChunkRecord] with content + metadata, embedding=None
@@ -94,89 +333,221 @@ def recursive_split(
         fits, keep it whole. If not, fall back to sentence boundaries. Only
         split mid-sentence as a last resort for very long sentences.
     """
-
-    def _split_recursive(text: str, separators: list[str]) -> list[str]:
-        """
-        Recursively split text using the first separator that produces
-        chunks within chunk_size. Falls back to next separator if needed.
-        """
-        if not separators:
-            # Base case: character split with overlap
-            segments, start = [], 0
-            while start < len(text):
-                segments.append(text[start:start + chunk_size])
-                start += chunk_size - overlap
-            return segments
-
-        sep = separators[0]
-        parts = [p.strip() for p in text.split(sep) if p.strip()]
-        segments, current = [], ""
-
-        for part in parts:
-            candidate = (current + sep + part).strip() if current else part
-
-            if len(candidate) <= chunk_size:
-                # Still fits — keep accumulating
-                current = candidate
-            else:
-                if current:
-                    segments.append(current)
-                # This part alone is too big — recurse with next separator
-                if len(part) > chunk_size:
-                    segments.extend(_split_recursive(part, separators[1:]))
-                    current = ""
-                else:
-                    current = part
-
-        if current:
-            segments.append(current)
-
-        return segments
-
-    raw_segments = _split_recursive(
-        text,
-        separators=["\n\n", ". ", "! ", "? ", " "]
-    )
-
-    # Filter empty — track precise char positions during iteration (not text.find
-    # which breaks on repeated content)
+    # char_start = first occurrence of the segment at or after the cursor (end
+    # of the previous chunk), searched only up to the segment's own end. That
+    # bound keeps each lookup to the gap since the previous chunk plus the
+    # chunk itself — linear overall. An unbounded text.find() scans to the end
+    # of the document whenever the chunk is not a verbatim slice (whitespace
+    # between parts normalised, overlapping character pieces), which made
+    # those documents quadratic — and a hit there was a later, unrelated
+    # repeat of the text, not this chunk.
     valid, char_positions = [], []
     cursor = 0
-    for seg in raw_segments:
-        seg = seg.strip()
+    for segment in _split_spans(text, 0, len(text), _RECURSIVE_SEPARATORS, chunk_size, overlap, token_counter):
+        runs = segment[1]
+        if len(runs) == 1:
+            seg_start, seg_end = _strip_span(text, *runs[0])
+            seg = text[seg_start:seg_end]
+        else:
+            seg, seg_end = _segment_text(text, segment), runs[-1][1]
         if not seg:
             continue
-        # Advance cursor to where this segment actually starts in original text
-        pos = text.find(seg, cursor)
+        pos = text.find(seg, cursor, max(seg_end, cursor + len(seg)))
         if pos == -1:
-            pos = cursor   # fallback — shouldn't happen
+            pos = cursor
         valid.append(seg)
         char_positions.append(pos)
         cursor = pos + len(seg)
 
     total = len(valid)
+    base_metadata = _recursive_metadata(source, chunk_size, overlap)
 
-    return [
+    chunks = [
         ChunkRecord(
             content=segment,
             metadata={
-                # Citation fields — shown to the user in retrieval results
-                "source":        str(source),
-                "filename":      Path(source).name if source != "unknown" else "unknown",
                 # Position fields — reconstruct document order from DB
                 "chunk_index":   i,
                 "chunk_total":   total,
                 "char_start":    char_positions[i],
                 "char_end":      char_positions[i] + len(segment),
-                # Chunker config — debug retrieval issues, reproduce chunking
-                "strategy":      "recursive",
-                "chunk_size":    chunk_size,
-                "overlap":       overlap,
                 "word_count":    len(segment.split()),
-            }
+            },
+            shared_metadata=base_metadata,
         )
         for i, segment in enumerate(valid)
     ]
+    if token_counter is not None:
+        _set_token_counts(chunks, token_counter)
+    return chunks
+
+
+def _set_token_counts(chunks: list[ChunkRecord], token_counter: "TokenCounter") -> None:
+    """Record each chunk's exact token count — one batch call for the whole list."""
+    for chunk, count in zip(chunks, token_counter.count([c.content for c in chunks])):
+        chunk.metadata["token_count"] = count
+        chunk.metadata["size_unit"]   = "tokens"
+
+
+class _StreamingRecursiveSplitter:
+    """
+    Push-based form of recursive_split for text that arrives in pieces.
+
+    The top level of recursive_split is a left fold over paragraphs: each
+    paragraph either joins the chunk being built or closes it. That fold only
+    needs the paragraph in hand and the open chunk, so it can run as text
+    arrives. Everything below paragraph level (sentences, words, characters)
+    is delegated to _split_recursive on one paragraph at a time — the output
+    is the same as running recursive_split on the whole text.
+
+    Memory held at any moment: the open chunk, the current incomplete
+    paragraph, and the text between them — not the document. A paragraph
+    longer than max_pending is force-cut at its last space so a file with no
+    blank lines at all still streams in bounded memory.
+
+    chunk_total is not known until the stream ends, so it is omitted from the
+    metadata; document_registry.chunk_count records the final count.
+    """
+
+    def __init__(
+        self,
+        source:      str | Path,
+        chunk_size:  int,
+        overlap:     int,
+        max_pending: int,
+        extra_metadata: dict | None = None,
+    ):
+        self.chunk_size  = chunk_size
+        self.overlap     = overlap
+        self.max_pending = max_pending
+        self.base_metadata = {**_recursive_metadata(source, chunk_size, overlap), **(extra_metadata or {})}
+
+        self._buffer    = ""    # unconsumed text, starting at absolute offset _offset
+        self._offset    = 0
+        self._scan_from = 0     # index in _buffer where unprocessed paragraph text starts
+        self._cursor    = 0     # absolute position just after the last emitted segment
+        self._current   = ""    # open chunk being accumulated
+        self._current_end = 0   # absolute end of the open chunk's last part
+        self._index     = 0
+
+    def push(self, piece: str) -> list[ChunkRecord]:
+        """Add the next piece of the stream; return every chunk it completed."""
+        self._buffer += piece
+        sep = _RECURSIVE_SEPARATORS[0]
+        segments: list[tuple[str, int]] = []
+
+        cut = self._buffer.rfind(sep, self._scan_from)
+        if cut != -1:
+            for part_start, part_end in _iter_parts(self._buffer, self._scan_from, cut, sep):
+                segments.extend(self._fold(part_start, part_end))
+            self._scan_from = cut + len(sep)
+        elif len(self._buffer) - self._scan_from > self.max_pending:
+            # Pathological paragraph: cut at the last space so memory stays bounded
+            cut = self._buffer.rfind(" ", self._scan_from)
+            if cut <= self._scan_from:
+                cut = len(self._buffer)
+            segments.extend(self._fold(*_strip_span(self._buffer, self._scan_from, cut)))
+            self._scan_from = cut
+
+        return self._emit(segments)
+
+    def finish(self) -> list[ChunkRecord]:
+        """Flush the trailing paragraph and the open chunk at end of stream."""
+        segments = self._fold(*_strip_span(self._buffer, self._scan_from, len(self._buffer)))
+        self._scan_from = len(self._buffer)
+        if self._current:
+            segments.append((self._current, self._current_end))
+            self._current = ""
+        return self._emit(segments)
+
+    def _fold(self, part_start: int, part_end: int) -> list[tuple[str, int]]:
+        # Same accumulation rule as the top level of _split_spans. Takes the
+        # stripped part as a span of the buffer and returns (segment, absolute
+        # end of the source text it came from) pairs for _emit.
+        if part_start >= part_end:
+            return []
+        part = self._buffer[part_start:part_end]
+
+        sep, closed = _RECURSIVE_SEPARATORS[0], []
+        candidate = (self._current + sep + part).strip() if self._current else part
+
+        if len(candidate) <= self.chunk_size:
+            self._current = candidate
+            self._current_end = self._offset + part_end
+        else:
+            if self._current:
+                closed.append((self._current, self._current_end))
+            if len(part) > self.chunk_size:
+                closed.extend(
+                    (_segment_text(self._buffer, segment), self._offset + segment[1][-1][1])
+                    for segment in _split_spans(
+                        self._buffer, part_start, part_end, _RECURSIVE_SEPARATORS[1:], self.chunk_size, self.overlap
+                    )
+                )
+                self._current = ""
+            else:
+                self._current = part
+                self._current_end = self._offset + part_end
+        return closed
+
+    def _emit(self, segments: list[tuple[str, int]]) -> list[ChunkRecord]:
+        records = []
+        for seg, seg_end in segments:
+            seg = seg.strip()
+            if not seg:
+                continue
+            # Same bounded position recovery as recursive_split: only up to the
+            # segment's own end, so a later repeat is never taken for it
+            start = self._cursor - self._offset
+            rel = self._buffer.find(seg, start, max(seg_end - self._offset, start + len(seg)))
+            pos = self._offset + rel if rel != -1 else self._cursor
+            self._cursor = pos + len(seg)
+
+            records.append(ChunkRecord(
+                content=seg,
+                metadata={
+                    "chunk_index": self._index,
+                    "char_start":  pos,
+                    "char_end":    pos + len(seg),
+                    "word_count":  len(seg.split()),
+                },
+                shared_metadata=self.base_metadata,
+            ))
+            self._index += 1
+
+        # Drop text that can no longer be the start of a future segment
+        consumed = min(self._cursor - self._offset, self._scan_from)
+        if consumed > 0:
+            self._buffer     = self._buffer[consumed:]
+            self._offset    += consumed
+            self._scan_from -= consumed
+        return records
+
+
+def iter_recursive_split(
+    stream:      Iterable[str],
+    source:      str | Path = "unknown",
+    chunk_size:  int = 1200,
+    overlap:     int = 100,
+    max_pending: int = 1 << 20,   # chars of one unbroken paragraph before a forced cut
+) -> Iterator[ChunkRecord]:
+    """
+    Streaming recursive_split: consume text pieces (e.g. from read_chunks())
+    and yield ChunkRecords as soon as they are complete.
+
+    Produces the same chunks and char_start/char_end offsets as
+    recursive_split on the concatenated text, except that chunk_total is
+    absent (unknown until the stream ends). Paragraphs split across read
+    boundaries are stitched back together before splitting.
+
+    Example:
+        for chunk in iter_recursive_split(read_chunks(path, 64 * 1024), source=path):
+            ...
+    """
+    splitter = _StreamingRecursiveSplitter(source, chunk_size, overlap, max_pending)
+    for piece in stream:
+        yield from splitter.push(piece)
+    yield from splitter.finish()
 
 
 # ---------------------------------------------------------------------------
@@ -184,11 +555,106 @@ def recursive_split(
 # For: .md files — markdown documentation, READMEs, wikis
 # ---------------------------------------------------------------------------
 
+_HEADER_PATTERN = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
+# A run of #'s followed only by whitespace up to the end of the text read so
+# far — could still turn into a header once the title arrives
+_OPEN_HEADER_TAIL = re.compile(r'^#{1,6}\s*\Z', re.MULTILINE)
+
+
+def _advance_header_path(current_headers: dict[int, str], level: int, title: str) -> str:
+    """
+    Record title at level, forget any deeper headings, and return the full
+    hierarchy e.g. "Overview > Architecture > Database".
+    """
+    current_headers[level] = title
+    # Clear any deeper levels (we've moved to a new section at this level)
+    for deeper in list(current_headers.keys()):
+        if deeper > level:
+            del current_headers[deeper]
+    path_parts = [current_headers[lvl] for lvl in sorted(current_headers)]
+    return " > ".join(path_parts)
+
+
+def _section_content(sec: dict) -> str:
+    return f"{'#' * sec['level']} {sec['title']}\n\n{sec['body']}".strip()
+
+
+def _section_chunks(
+    sec:           dict,
+    header_path:   str,
+    section_index: int,
+    source:        str | Path,
+    chunk_size:    int,
+    overlap:       int,
+    token_counter: "TokenCounter | None" = None,
+    section_size:  int | None = None,
+) -> list[ChunkRecord]:
+    """
+    Chunk one parsed markdown section (level, title, body, char_start).
+
+    section_size is the full section's size in chunk_size units; callers in
+    token mode pass it from one batch count over all sections.
+    """
+    full_content = _section_content(sec)
+    if section_size is None:
+        section_size = (
+            token_counter.count([full_content])[0] if token_counter is not None else len(full_content)
+        )
+
+    base_metadata = {
+        # Citation fields
+        "source":         str(source),
+        "filename":       Path(source).name if source != "unknown" else "unknown",
+        # Header hierarchy — the key metadata this strategy adds
+        "header":         sec["title"],
+        "header_level":   sec["level"],
+        "header_path":    header_path,
+        # Position
+        "section_index":  section_index,
+        "char_start":     sec["char_start"],
+        # Chunker config
+        "strategy":       "header_aware",
+        "chunk_size":     chunk_size,
+        "overlap":        overlap,
+    }
+
+    if section_size <= chunk_size:
+        # Section fits — one clean chunk
+        chunk = ChunkRecord(
+            content=full_content,
+            metadata={
+                "chunk_index":    0,
+                "chunk_total":    1,
+                "char_end":       sec["char_start"] + len(full_content),
+                "word_count":     len(full_content.split()),
+                "is_subsection":  False,
+            },
+            shared_metadata=base_metadata,
+        )
+        if token_counter is not None:
+            chunk.metadata.update(token_count=section_size, size_unit="tokens")
+        return [chunk]
+
+    # Section too large — recursive fallback on body only
+    # Header line goes into every sub-chunk's metadata, not its content
+    sub_chunks = recursive_split(
+        sec["body"], source=source,
+        chunk_size=chunk_size, overlap=overlap, token_counter=token_counter
+    )
+    for sub in sub_chunks:
+        # Section-level fields (char_start, strategy, ...) override the
+        # recursive ones; chunk_index/chunk_total/char_end/word_count stay
+        sub.share_metadata(base_metadata)
+        sub.metadata["is_subsection"] = True
+    return sub_chunks
+
+
 def header_aware_split(
     text:       str,
     source:     str | Path = "unknown",
     chunk_size: int = 1200,
     overlap:    int = 100,
+    token_counter: "TokenCounter | None" = None,
 ) -> list[ChunkRecord]:
     """
     Split markdown using header boundaries (# ## ###) as the primary split point.
@@ -203,6 +669,8 @@ def header_aware_split(
         source:     filename or path — stored in metadata for citation
         chunk_size: max characters per chunk before fallback split kicks in
         overlap:    passed to recursive_split when fallback is needed
+        token_counter: size in tokens instead; every section is counted in
+                    one batch call before deciding which ones need the fallback
 
     Metadata per chunk (strategy-specific fields):
         header          — the immediate header title above this chunk
@@ -220,10 +688,8 @@ def header_aware_split(
 
     # --- Parse markdown into sections ---
     # Each section is (level, title, body_text, char_start)
-    header_pattern = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
-
     sections = []
-    matches  = list(header_pattern.finditer(text))
+    matches  = list(_HEADER_PATTERN.finditer(text))
 
     for idx, match in enumerate(matches):
         level = len(match.group(1))     # number of # chars
@@ -243,10 +709,16 @@ def header_aware_split(
 
     # Handle documents with no headers — fall back to recursive
     if not sections:
-        chunks = recursive_split(text, source=source, chunk_size=chunk_size, overlap=overlap)
+        chunks = recursive_split(
+            text, source=source, chunk_size=chunk_size, overlap=overlap, token_counter=token_counter
+        )
+        fallback_metadata = {
+            **_recursive_metadata(source, chunk_size, overlap),
+            "strategy":        "header_aware_fallback",
+            "fallback_reason": "no headers found in document",
+        }
         for c in chunks:
-            c.metadata["strategy"]       = "header_aware_fallback"
-            c.metadata["fallback_reason"] = "no headers found in document"
+            c.share_metadata(fallback_metadata)
         return chunks
 
     # --- Build header hierarchy (header_path) ---
@@ -255,72 +727,18 @@ def header_aware_split(
     # header_path = "Overview > Architecture > Database"
     current_headers: dict[int, str] = {}
 
-    def build_header_path(level: int, title: str) -> str:
-        current_headers[level] = title
-        # Clear any deeper levels (we've moved to a new section at this level)
-        for deeper in list(current_headers.keys()):
-            if deeper > level:
-                del current_headers[deeper]
-        path_parts = [current_headers[lvl] for lvl in sorted(current_headers)]
-        return " > ".join(path_parts)
-
     # --- Build chunks ---
     chunks: list[ChunkRecord] = []
-    section_index = 0
-
-    for sec in sections:
-        header_path = build_header_path(sec["level"], sec["title"])
-        full_content = f"{'#' * sec['level']} {sec['title']}\n\n{sec['body']}".strip()
-
-        base_metadata = {
-            # Citation fields
-            "source":         str(source),
-            "filename":       Path(source).name if source != "unknown" else "unknown",
-            # Header hierarchy — the key metadata this strategy adds
-            "header":         sec["title"],
-            "header_level":   sec["level"],
-            "header_path":    header_path,
-            # Position
-            "section_index":  section_index,
-            "char_start":     sec["char_start"],
-            # Chunker config
-            "strategy":       "header_aware",
-            "chunk_size":     chunk_size,
-            "overlap":        overlap,
-        }
-
-        if len(full_content) <= chunk_size:
-            # Section fits — one clean chunk
-            chunks.append(ChunkRecord(
-                content=full_content,
-                metadata={
-                    **base_metadata,
-                    "chunk_index":    0,
-                    "chunk_total":    1,
-                    "char_end":       sec["char_start"] + len(full_content),
-                    "word_count":     len(full_content.split()),
-                    "is_subsection":  False,
-                }
-            ))
-        else:
-            # Section too large — recursive fallback on body only
-            # Header line goes into every sub-chunk's metadata, not its content
-            sub_chunks = recursive_split(
-                sec["body"], source=source,
-                chunk_size=chunk_size, overlap=overlap
-            )
-            for sub in sub_chunks:
-                sub.metadata.update({
-                    **base_metadata,
-                    # Override position fields from recursive with section-level ones
-                    "chunk_index":   sub.metadata["chunk_index"],
-                    "chunk_total":   sub.metadata["chunk_total"],
-                    "is_subsection": True,
-                    "word_count":    len(sub.content.split()),
-                })
-            chunks.extend(sub_chunks)
+    sizes = (
+        token_counter.count([_section_content(sec) for sec in sections])
+        if token_counter is not None else [None] * len(sections)
+    )
 
-        section_index += 1
+    for section_index, (sec, size) in enumerate(zip(sections, sizes)):
+        header_path = _advance_header_path(current_headers, sec["level"], sec["title"])
+        chunks.extend(_section_chunks(
+            sec, header_path, section_index, source, chunk_size, overlap, token_counter, size
+        ))
 
     # Final pass — set chunk_total across the whole document
     total = len(chunks)
@@ -331,6 +749,121 @@ def header_aware_split(
     return chunks
 
 
+def iter_header_aware_split(
+    stream:     Iterable[str],
+    source:     str | Path = "unknown",
+    chunk_size: int = 1200,
+    overlap:    int = 100,
+) -> Iterator[ChunkRecord]:
+    """
+    Streaming header_aware_split: consume text pieces (e.g. from read_chunks())
+    and yield each section's chunks as soon as the next header closes it.
+
+    Header path state carries across read boundaries, and a header line cut
+    in half by a read is only parsed once its line is complete. Sections are
+    chunked exactly as header_aware_split does, with absolute char_start /
+    char_end. Memory held is the largest single section, not the document.
+
+    Differences from header_aware_split, both forced by not seeing the end:
+      - doc_chunk_total is absent (doc_chunk_index is still set).
+      - Text before the first header is streamed through recursive splitting
+        as "header_aware_fallback" chunks instead of being discarded, since a
+        header may never arrive. A file with no headers at all therefore
+        produces the same chunks as the batch fallback.
+    """
+    current_headers: dict[int, str] = {}
+    preamble = _StreamingRecursiveSplitter(
+        source, chunk_size, overlap, max_pending=1 << 20,
+        extra_metadata={
+            "strategy":        "header_aware_fallback",
+            "fallback_reason": "text outside any header section",
+        },
+    )
+    # Before the first header, buffer holds preamble text not yet handed to the
+    # splitter. After it, buffer starts at the open header line.
+    buffer, offset = "", 0
+    open_header    = None       # (level, title, header_end) relative to buffer
+    section_index  = 0
+    doc_index      = 0
+
+    def number(records: list[ChunkRecord]) -> list[ChunkRecord]:
+        nonlocal doc_index
+        for r in records:
+            r.metadata["doc_chunk_index"] = doc_index
+            doc_index += 1
+        return records
+
+    def close_section(body_end: int) -> list[ChunkRecord]:
+        nonlocal section_index
+        level, title, header_end = open_header
+        header_path = _advance_header_path(current_headers, level, title)
+        sec = {
+            "level":      level,
+            "title":      title,
+            "body":       buffer[header_end:body_end].strip(),
+            "char_start": offset,
+        }
+        records = _section_chunks(sec, header_path, section_index, source, chunk_size, overlap)
+        section_index += 1
+        return records
+
+    def drain(at_eof: bool) -> list[ChunkRecord]:
+        nonlocal buffer, offset, open_header
+        out: list[ChunkRecord] = []
+        search_from = open_header[2] if open_header else 0
+        growing_at  = None
+
+        while True:
+            match = _HEADER_PATTERN.search(buffer, search_from)
+            if match is None:
+                break
+            # A header touching the end of the buffer may still be growing
+            if match.end() >= len(buffer) and not at_eof:
+                growing_at = match.start()
+                break
+            if open_header is None:
+                out.extend(preamble.push(buffer[:match.start()]))
+                out.extend(preamble.finish())
+            else:
+                out.extend(close_section(match.start()))
+
+            # Re-anchor the buffer at the new header
+            buffer = buffer[match.start():]
+            offset += match.start()
+            open_header = (len(match.group(1)), match.group(2).strip(), match.end() - match.start())
+            search_from = open_header[2]
+
+        if open_header is None:
+            # Still in the preamble: hand over complete lines that cannot
+            # become part of a header once more text arrives
+            if at_eof:
+                safe = len(buffer)
+            else:
+                safe = buffer.rfind("\n") + 1
+                tail = _OPEN_HEADER_TAIL.search(buffer)
+                if tail is not None:
+                    safe = min(safe, tail.start())
+                if growing_at is not None:
+                    safe = min(safe, growing_at)
+            if safe > 0:
+                out.extend(preamble.push(buffer[:safe]))
+                buffer = buffer[safe:]
+                offset += safe
+        return out
+
+    for piece in stream:
+        buffer += piece
+        yield from number(drain(at_eof=False))
+
+    records = drain(at_eof=True)
+    if open_header is not None:
+        records.extend(close_section(len(buffer)))
+    else:
+        records.extend(preamble.finish())
+    yield from number(records)
+
+
+
 # ---------------------------------------------------------------------------
 # Strategy 3: OpenAPI-aware split
 # For: .json OpenAPI / Swagger specs
@@ -340,6 +873,7 @@ def chunk_openapi_spec(
     text:       str,
     source:     str | Path = "unknown",
     chunk_size: int = 1200,
+    token_counter: "TokenCounter | None" = None,
 ) -> list[ChunkRecord]:
     """
     One ChunkRecord per API operation (path + HTTP method).
@@ -364,7 +898,9 @@ def chunk_openapi_spec(
                               PostgreSQL ?| operator:
                                 metadata->'response_codes' ?| array['404','500']
         oversize        bool  True when len(content) > chunk_size
-                              chunk is NOT truncated — just flagged
+                              chunk is NOT truncated — just flagged.
+                              With token_counter: token count > chunk_size,
+                              all operations counted in one batch call.
     """
     # --- Parse ---
     try:
@@ -397,6 +933,15 @@ def chunk_openapi_spec(
         for method in methods
         if method.lower() in HTTP_METHODS
     )
+    base_metadata = {
+        # Citation
+        "source":           str(source),
+        "filename":         Path(source).name if source != "unknown" else "unknown",
+        "chunk_total":      total_ops,
+        # Chunker
+        "strategy":         "openapi_operation",
+        "chunk_size":       chunk_size,
+    }
 
     for path, path_item in paths.items():
         if not isinstance(path_item, dict):
@@ -488,9 +1033,6 @@ def chunk_openapi_spec(
             chunks.append(ChunkRecord(
                 content=chunk_text,
                 metadata={
-                    # Citation
-                    "source":           str(source),
-                    "filename":         Path(source).name if source != "unknown" else "unknown",
                     # Operation identity
                     "method":           method.lower(),
                     "path":             path,
@@ -501,56 +1043,174 @@ def chunk_openapi_spec(
                     "response_codes":   response_codes,        # list[str] — ?| filterable
                     # Position
                     "chunk_index":      op_index,
-                    "chunk_total":      total_ops,
-                    # Chunker
-                    "strategy":         "openapi_operation",
-                    "chunk_size":       chunk_size,
                     "oversize":         oversize,
                     "word_count":       len(chunk_text.split()),
-                }
+                },
+                shared_metadata=base_metadata,
             ))
 
             op_index += 1
 
+    if token_counter is not None:
+        _set_token_counts(chunks, token_counter)
+        for c in chunks:
+            c.metadata["oversize"] = c.metadata["token_count"] > chunk_size
+
     return chunks
 
 
 # ---------------------------------------------------------------------------
-# Strategy 4: Semantic split  (STUB — requires embedder)
+# Strategy 4: Semantic split
 # For: long documents with topic shifts
 # ---------------------------------------------------------------------------
 
+# Sentence boundary: whitespace after . ! ? or a blank line
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+# Takes a list of texts, returns one vector per text (list of lists or an
+# (n, dim) array). Synchronous — chunkers run in the process pool.
+_EmbedFn = _Callable[[list[str]], "list[list[float]] | np.ndarray"]
+
+
+def _sentence_spans(text: str) -> list[tuple[int, int]]:
+    spans, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        span = _strip_span(text, start, match.start())
+        if span[0] < span[1]:
+            spans.append(span)
+        start = match.end()
+    span = _strip_span(text, start, len(text))
+    if span[0] < span[1]:
+        spans.append(span)
+    return spans
+
+
+def _embed_windows(windows: list[str], embed_fn: _EmbedFn, batch_size: int) -> np.ndarray:
+    """Embed every window in batch_size calls; return the row-normalised (n, dim) matrix."""
+    matrix = np.vstack([
+        np.asarray(embed_fn(windows[i:i + batch_size]), dtype=np.float32)
+        for i in range(0, len(windows), batch_size)
+    ])
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
 def semantic_split(
     text:       str,
     source:     str | Path = "unknown",
     chunk_size: int = 1200,
+    embed_fn:   _EmbedFn | None = None,
+    threshold:  float = 0.5,
+    window:     int = 3,
+    min_chunk_size: int = 200,
+    batch_size: int = 256,
 ) -> list[ChunkRecord]:
     """
     Split by embedding-similarity between adjacent sentence windows.
     A drop in cosine similarity signals a topic boundary — split there.
 
-    STUB — implement after embedders.py is wired into the pipeline.
+    Algorithm:
+      1. Split text into sentences (_SENTENCE_END).
+      2. Embed a window of `window` sentences centred on each sentence —
+         all windows in len/batch_size embed_fn calls, not one per window.
+      3. Cosine similarity between each window and the next: one NumPy
+         row-wise dot product over the normalised window matrix.
+      4. One pass over the sentences: a similarity < threshold closes the
+         chunk (once it holds min_chunk_size characters — smaller pieces merge
+         into the next), and so does reaching chunk_size.
 
-    Algorithm when ready:
-      1. Split text into sentences (use the SENTENCE_END pattern from above)
-      2. Embed each sentence (or a sliding window of 3 sentences)
-      3. Compute cosine similarity between adjacent windows
-      4. Where similarity < threshold (default ~0.5), start new chunk
-      5. Merge small adjacent chunks up to chunk_size
-
-    Why this is deferred:
-      Calling an embedding model here creates a circular dependency —
-      the chunker runs before the embedder in the pipeline. The simplest
-      resolution: expose a chunker factory that accepts an embed_fn callable,
-      injected when the embedder is available.
+    Args:
+        text:       full document text
+        source:     filename or path — stored in metadata for citation
+        chunk_size: max characters per chunk; a single longer sentence is
+                    cut at word boundaries like recursive_split does
+        embed_fn:   list[str] → one vector per text. Required — the chunker
+                    runs before the embedder, so the caller injects one
+                    (bind it with functools.partial to use the registry entry).
+        threshold:  similarity below which adjacent windows are different topics
+        window:     sentences per window; smooths one-off short sentences
+        min_chunk_size: characters a chunk needs before a topic boundary may close it
+        batch_size: windows per embed_fn call
 
-    Planned signature when implemented:
-      semantic_split(text, source, chunk_size, embed_fn, threshold=0.5)
+    Metadata per chunk (strategy-specific fields):
+        sentence_count  — sentences in the chunk
+        boundary        — what closed it: "topic", "size" or "end"
+        boundary_similarity — window similarity at a "topic" boundary, else None
     """
-    raise NotImplementedError(
-        "semantic_split requires an embedding function. "
-        "Implement after embedders.py is wired — see docstring for algorithm."
-    )
+    if embed_fn is None:
+        raise ValueError(
+            "semantic_split requires embed_fn: a callable mapping list[str] to one vector per text"
+        )
+
+    sentences = _sentence_spans(text)
+    half = window // 2
+    windows = [
+        text[sentences[max(0, i - half)][0]:sentences[min(len(sentences) - 1, i + half)][1]]
+        for i in range(len(sentences))
+    ]
+
+    if len(sentences) > 1:
+        matrix = _embed_windows(windows, embed_fn, batch_size)
+        # similarities[i]: sentence i's window vs sentence i + 1's
+        similarities = np.einsum("ij,ij->i", matrix[:-1], matrix[1:]).tolist()
+    else:
+        similarities = []
+
+    # (start, end, content, sentence_count, boundary, similarity)
+    pieces: list[tuple[int, int, str, int, str, float | None]] = []
+    chunk_start, chunk_end, count = -1, 0, 0
+
+    for i, (s_start, s_end) in enumerate(sentences):
+        if chunk_start >= 0 and s_end - chunk_start > chunk_size:
+            pieces.append((chunk_start, chunk_end, text[chunk_start:chunk_end], count, "size", None))
+            chunk_start = -1
+
+        if s_end - s_start > chunk_size:
+            # One sentence over budget — word-level split, as recursive_split would
+            for segment in _split_spans(text, s_start, s_end, _RECURSIVE_SEPARATORS[4:], chunk_size, 0):
+                runs = segment[1]
+                pieces.append((runs[0][0], runs[-1][1], _segment_text(text, segment), 1, "size", None))
+            continue
+
+        if chunk_start < 0:
+            chunk_start, count = s_start, 0
+        chunk_end = s_end
+        count += 1
+
+        if i < len(similarities) and similarities[i] < threshold and chunk_end - chunk_start >= min_chunk_size:
+            pieces.append((
+                chunk_start, chunk_end, text[chunk_start:chunk_end], count, "topic", round(similarities[i], 4)
+            ))
+            chunk_start = -1
+
+    if chunk_start >= 0:
+        pieces.append((chunk_start, chunk_end, text[chunk_start:chunk_end], count, "end", None))
+
+    base_metadata = {
+        "source":     str(source),
+        "filename":   Path(source).name if source != "unknown" else "unknown",
+        "strategy":   "semantic",
+        "chunk_size": chunk_size,
+        "threshold":  threshold,
+        "window":     window,
+    }
+    return [
+        ChunkRecord(
+            content=content,
+            metadata={
+                "chunk_index":         i,
+                "chunk_total":         len(pieces),
+                "char_start":          start,
+                "char_end":            end,
+                "word_count":          len(content.split()),
+                "sentence_count":      count,
+                "boundary":            boundary,
+                "boundary_similarity": similarity,
+            },
+            shared_metadata=base_metadata,
+        )
+        for i, (start, end, content, count, boundary, similarity) in enumerate(pieces)
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -565,11 +1225,43 @@ CHUNKER_REGISTRY: dict[str, _ChunkerFn | None] = {
     "md":   header_aware_split,    # markdown — headers are the structure
     "json": chunk_openapi_spec,    # OpenAPI / Swagger specs
     "pdf":  None,                  # Week 13 — Docling multimodal parser
+    # Opt-in (_NOT_AN_EXTENSION): no file extension maps here. Needs an embedder,
+    # so callers ask for it by key and bind one: partial(CHUNKER_REGISTRY["semantic"], embed_fn=...)
+    "semantic": semantic_split,    # long documents with topic shifts
     # Add as needed:
     # "yaml": chunk_openapi_spec,  # OpenAPI also ships as YAML — wire if needed
     # "rst":  recursive_split,     # reStructuredText — no header parser yet
 }
 
+# Registry keys that name a strategy rather than a file type: an upload
+# called x.semantic is plain text to get_chunker / get_streaming_chunker.
+_NOT_AN_EXTENSION = frozenset({"semantic"})
+
+
+# Strategies that can consume a text stream. Types missing here (json, pdf)
+# need the whole document in hand and go through CHUNKER_REGISTRY instead.
+_StreamingChunkerFn = _Callable[..., Iterator[ChunkRecord]]
+
+STREAMING_CHUNKER_REGISTRY: dict[str, _StreamingChunkerFn] = {
+    "txt":  iter_recursive_split,
+    "md":   iter_header_aware_split,
+}
+
+
+def get_streaming_chunker(extension: str) -> _StreamingChunkerFn | None:
+    """
+    Return the streaming chunker for a file extension, or None when the type
+    must be chunked from the full text (e.g. .json, whose parse needs the
+    whole document). Unknown extensions stream as plain text, matching the
+    get_chunker() fallback.
+    """
+    ext = extension.lower().lstrip(".")
+    if ext in STREAMING_CHUNKER_REGISTRY:
+        return STREAMING_CHUNKER_REGISTRY[ext]
+    if ext in CHUNKER_REGISTRY and ext not in _NOT_AN_EXTENSION:
+        return None
+    return STREAMING_CHUNKER_REGISTRY["txt"]
+
 
 def get_chunker(extension: str, text: str = "") -> _ChunkerFn:
     """
@@ -592,7 +1284,7 @@ def get_chunker(extension: str, text: str = "") -> _ChunkerFn:
                 pass
 
     # 2. Match exactly on extension
-    if ext in CHUNKER_REGISTRY:
+    if ext in CHUNKER_REGISTRY and ext not in _NOT_AN_EXTENSION:
         chunker = CHUNKER_REGISTRY[ext]
         if chunker is None:
             raise NotImplementedError(
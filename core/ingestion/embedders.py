@@ -1,19 +1,92 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+import asyncpg
 import litellm
+import numpy as np
+from asyncpg import Pool
 
-from config import LLM_CONFIG
+from config import EMBEDDING_BATCH_CONFIG, LLM_CONFIG
 from core.ingestion.chunkers import ChunkRecord
+from core.ingestion.lifecycle import compute_chunk_hash
+
+logger = logging.getLogger("core.embedders")
 
 
-async def embed_chunks(chunks: list[ChunkRecord]) -> list[ChunkRecord]:
+class EmbeddingCache:
     '''
-    Send a batch of chunks to the AI via LiteLLM and fill their embedding fields.
-    Uses the embedding model defined in config.py based on the deployment MODE.
+    Content-addressed embedding cache in Postgres: (model, SHA-256 of text) → vector.
+
+    Boilerplate paragraphs repeat across documents, and the same file is often
+    ingested into more than one namespace. Every one of those used to be a
+    provider call; with the cache only the first occurrence is.
+
+    The model is part of the key, so switching EMBED_MODEL never serves vectors
+    from the old model — the new model simply starts with an empty cache.
+    Hashes are compute_chunk_hash(), the same digest as documents.chunk_hash.
+
+    hits / misses accumulate over the instance's lifetime — create one per
+    ingestion run to get per-run numbers.
+
+    Fails open: if the table is missing or the DB errors, lookups return nothing
+    and writes are dropped. Ingestion never fails because of the cache.
     '''
-    if not chunks:
-        return []
 
-    texts = [chunk.content for chunk in chunks]
+    def __init__(self, pool: Pool, model: str | None = None):
+        self.pool = pool
+        self.model = model or LLM_CONFIG["embedding_model"]
+        self.hits = 0
+        self.misses = 0
+
+    async def get_many(self, hashes: list[str]) -> dict[str, np.ndarray]:
+        '''One round trip for the whole batch. Returns only the hashes found, as pgvector's float32 arrays.'''
+        if not hashes:
+            return {}
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT content_hash, embedding FROM embedding_cache
+                    WHERE model = $1 AND content_hash = ANY($2::varchar[])
+                    """,
+                    self.model, hashes,
+                )
+        except (asyncpg.PostgresError, OSError) as e:
+            logger.warning(f"[embed_cache] Lookup failed: {e}. Embedding every text.")
+            return {}
+        return {r["content_hash"]: r["embedding"] for r in rows}
+
+    async def put_many(self, entries: dict[str, list[float]]) -> None:
+        '''Store freshly computed vectors. ON CONFLICT DO NOTHING — a concurrent run may have won.'''
+        if not entries:
+            return
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.executemany(
+                    """
+                    INSERT INTO embedding_cache (model, content_hash, embedding)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (model, content_hash) DO NOTHING
+                    """,
+                    [(self.model, h, emb) for h, emb in entries.items()],
+                )
+        except (asyncpg.PostgresError, OSError) as e:
+            logger.warning(f"[embed_cache] Write failed: {e}. Vectors not cached.")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "embedding_cache_hits": self.hits,
+            "embedding_cache_misses": self.misses,
+            "embedding_cache_hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
 
+
+async def _provider_embed(texts: list[str]) -> list[list[float]]:
     # Dynamically grab the model (e.g., ollama/nomic-embed-text or azure/...)
     target_model = LLM_CONFIG["embedding_model"]
 
@@ -22,8 +95,227 @@ async def embed_chunks(chunks: list[ChunkRecord]) -> list[ChunkRecord]:
         model=target_model,
         input=texts
     )
+    return [data["embedding"] for data in response.data]
+
+
+# Worth another attempt: the provider is overloaded or the network blipped.
+# Everything else (auth, bad model name) fails immediately.
+_RETRYABLE_ERRORS = (
+    litellm.RateLimitError,
+    litellm.Timeout,
+    litellm.APIConnectionError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+)
+
+
+def _retry_after_seconds(error: Exception) -> float | None:
+    """
+    Retry-After from a provider error, in seconds, or None if absent.
+
+    LiteLLM keeps vendor headers on error.response.headers (proxy-supplied ones
+    on error.headers). The value is either delta-seconds or an HTTP date.
+    """
+    for headers in (getattr(getattr(error, "response", None), "headers", None), getattr(error, "headers", None)):
+        if not headers:
+            continue
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+class EmbeddingScheduler:
+    """
+    Splits embedding work into provider-sized requests and adapts to the provider.
+
+      - Splitting: each request carries at most batch_size texts and
+        max_batch_chars characters, so one oversize batch can't fail outright.
+      - Concurrency: at most `concurrency` requests in flight, across every
+        caller sharing this scheduler — it is per process, like the rate limit.
+      - Retries: jittered exponential backoff; a Retry-After header wins.
+      - AIMD: a call under target latency adds batch_size_step to batch_size and,
+        once per `concurrency` such calls, one concurrency slot. A slow call
+        halves batch_size; a 429 halves concurrency and batch_size.
+
+    A 400 on a multi-text request (e.g. context window exceeded) is split in
+    half and retried rather than failed.
+    """
+
+    def __init__(self, config: dict | None = None):
+        self.config = {**EMBEDDING_BATCH_CONFIG, **(config or {})}
+        self.batch_size = self.config["initial_batch_size"]
+        self.concurrency = self.config["initial_concurrency"]
+        self.retries = 0
+        self.rate_limited = 0
+        self._fast_calls = 0
+        self._in_flight = 0
+        self._slots: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _condition(self) -> asyncio.Condition:
+        # asyncio primitives bind to the loop they're first used on; a
+        # module-level scheduler outlives loops in scripts and tests.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots, self._loop, self._in_flight = asyncio.Condition(), loop, 0
+        return self._slots
+
+    def split(self, texts: list[str]) -> list[list[str]]:
+        """Cut texts into requests bounded by the current batch_size and the char budget."""
+        max_chars = self.config["max_batch_chars"]
+        batches, current, chars = [], [], 0
+        for text in texts:
+            if current and (len(current) >= self.batch_size or chars + len(text) > max_chars):
+                batches.append(current)
+                current, chars = [], 0
+            current.append(text)        # a single text over budget still goes alone
+            chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts, in order. Sub-batches run concurrently within the current limit."""
+        results = await asyncio.gather(*(self._embed_batch(batch) for batch in self.split(texts)))
+        return [vector for batch in results for vector in batch]
+
+    @asynccontextmanager
+    async def _slot(self):
+        slots = self._condition()
+        async with slots:
+            await slots.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            async with slots:
+                self._in_flight -= 1
+                slots.notify_all()
+
+    async def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        cfg = self.config
+        for attempt in range(cfg["max_retries"] + 1):
+            try:
+                async with self._slot():
+                    t0 = time.perf_counter()
+                    vectors = await _provider_embed(texts)
+                self._on_success(time.perf_counter() - t0)
+                return vectors
+            except litellm.BadRequestError:
+                if len(texts) == 1:
+                    raise
+                half = len(texts) // 2
+                self._shrink_batch(half)
+                left, right = await asyncio.gather(self._embed_batch(texts[:half]), self._embed_batch(texts[half:]))
+                return left + right
+            except _RETRYABLE_ERRORS as e:
+                if attempt == cfg["max_retries"]:
+                    raise
+                delay = self._on_failure(e, attempt)
+                self.retries += 1
+                logger.warning(
+                    f"[embed] {type(e).__name__} on {len(texts)} texts, retry {attempt + 1} in {delay:.1f}s "
+                    f"(batch_size={self.batch_size}, concurrency={self.concurrency})"
+                )
+                await asyncio.sleep(delay)
+
+    def _on_success(self, latency: float) -> None:
+        cfg = self.config
+        if latency > cfg["target_latency_seconds"]:
+            self._shrink_batch(self.batch_size // 2)
+            return
+        self.batch_size = min(cfg["max_batch_size"], self.batch_size + cfg["batch_size_step"])
+        self._fast_calls += 1
+        if self._fast_calls >= self.concurrency:
+            self._fast_calls = 0
+            self.concurrency = min(cfg["max_concurrency"], self.concurrency + 1)
+
+    def _on_failure(self, error: Exception, attempt: int) -> float:
+        """Multiplicative decrease; returns how long to wait before retrying."""
+        cfg = self.config
+        self._fast_calls = 0
+        if isinstance(error, litellm.RateLimitError):
+            self.rate_limited += 1
+            self.concurrency = max(1, self.concurrency // 2)
+        self._shrink_batch(self.batch_size // 2)
+
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, cfg["backoff_max_seconds"]) + random.uniform(0, cfg["backoff_base_seconds"])
+        backoff = min(cfg["backoff_max_seconds"], cfg["backoff_base_seconds"] * 2 ** attempt)
+        return backoff * random.uniform(0.5, 1.5)
+
+    def _shrink_batch(self, size: int) -> None:
+        self.batch_size = max(self.config["min_batch_size"], size)
+
+    def stats(self) -> dict:
+        return {
+            "embed_batch_size": self.batch_size,
+            "embed_concurrency": self.concurrency,
+            "embed_retries": self.retries,
+            "embed_rate_limited": self.rate_limited,
+        }
+
+
+_scheduler: EmbeddingScheduler | None = None
+
+
+def get_embedding_scheduler() -> EmbeddingScheduler:
+    """Process-wide scheduler — every ingestion shares the provider's limits."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = EmbeddingScheduler()
+    return _scheduler
+
+
+async def embed_chunks(chunks: list[ChunkRecord], cache: EmbeddingCache | None = None) -> list[ChunkRecord]:
+    '''
+    Send a batch of chunks to the AI via LiteLLM and fill their embedding fields.
+    Uses the embedding model defined in config.py based on the deployment MODE.
+
+    Identical texts within the batch are sent once. With a cache, the batch is
+    looked up in one query and only the misses go to the provider; the new
+    vectors are written back. Provider calls go through the shared
+    EmbeddingScheduler (size/char-bounded requests, retries, adaptive limits).
+
+    The batch's vectors are stored as one (unique texts × dim) float32 matrix;
+    each chunk.embedding is a row view into it (duplicates share a row). That
+    is 3KB per 768-d chunk instead of ~25KB as a list of boxed Python floats,
+    and pgvector's codec takes the rows as is for COPY.
+    '''
+    if not chunks:
+        return []
+
+    # Deduplicate by content hash — order of first appearance is kept
+    by_hash: dict[str, list[ChunkRecord]] = {}
+    for chunk in chunks:
+        by_hash.setdefault(compute_chunk_hash(chunk.content), []).append(chunk)
+
+    vectors = await cache.get_many(list(by_hash)) if cache else {}
+    missing = [h for h in by_hash if h not in vectors]
+
+    if missing:
+        embedded = await get_embedding_scheduler().embed([by_hash[h][0].content for h in missing])
+        fresh = dict(zip(missing, embedded))
+        vectors.update(fresh)
+        if cache:
+            await cache.put_many(fresh)
+
+    if cache:
+        cache.hits += len(by_hash) - len(missing)
+        cache.misses += len(missing)
 
-    for i, data in enumerate(response.data):
-        chunks[i].embedding = data["embedding"]
+    matrix = np.asarray([vectors[h] for h in by_hash], dtype=np.float32)
+    for row, same_text in zip(matrix, by_hash.values()):
+        for chunk in same_text:
+            chunk.embedding = row
 
     return chunks
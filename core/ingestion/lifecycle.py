@@ -3,21 +3,53 @@ core/ingestion/lifecycle.py
 
 Document lifecycle management for the RAG platform.
 
-Provides three operations:
+Provides these operations:
   1. compute_content_hash(content_bytes) → SHA-256 hex string
+     compute_file_hash(path) → same digest, streamed from disk
+     compute_chunk_hash(text) → SHA-256 hex of one chunk's text (documents.chunk_hash)
   2. check_document_status(pool, document_id, namespace, new_hash) → "new" | "unchanged" | "updated"
-  3. delete_document_chunks(pool, document_id, namespace) → count of deleted rows
-  4. register_document(pool, document_id, namespace, content_hash, chunk_count, source_filename) → None
+     check_documents_status(pool, namespace, hashes) → the same, for many documents in one query
+  3. delete_document_chunks(pool, document_id, namespace) → tombstones the document;
+     count of chunks hidden, or None if there was nothing to delete
+  4. allocate_version(pool) → a fresh chunk-set version to write a document under
+     register_document(pool, document_id, namespace, content_hash, chunk_count, source_filename, version)
+       → None; flips current_version, which is what makes the new chunks visible
+  5. fetch_chunk_hashes / carry_over_chunks → chunk-level diff for incremental re-ingest
+     (driven by core.pipeline.db_ingest.ingest_changed_chunks)
+  6. reclaim_stale_versions(pool, document_id, namespace) → batched delete of
+     chunk sets the registry no longer points at, and of tombstoned documents
+     dead_documents(pool) → [(document_id, namespace)] that still have such rows
+     count_dead_chunks(pool) → {namespace: rows still waiting to be reclaimed}
+  7. DOCUMENT_CHANGES_CHANNEL: register_document and delete_document_chunks
+     NOTIFY it with {"namespace", "document_id"} whenever the document's
+     visible chunks change (in-process search indexes listen, api.services.vector_index)
 
-These are called by the /ingest route handler before and after the chunking pipeline.
+These are called by the /ingest route handler before and after the chunking pipeline,
+and by core.pipeline.bulk_ingest for corpus loads.
 """
+import asyncio
 import hashlib
+import json
 import logging
+from pathlib import Path
+from typing import Callable
 
 from asyncpg import Pool
 
+from config import RECLAIM_CONFIG
+
 logger = logging.getLogger("core.lifecycle")
 
+DOCUMENT_CHANGES_CHANNEL = "document_changes"
+# Appended to the statement that changes the registry, so the notification
+# is part of its transaction: delivered on commit, never for a rollback.
+# $3 is the payload.
+_NOTIFY_CALL = f"pg_notify('{DOCUMENT_CHANGES_CHANNEL}', $3)"
+
+
+def _change_payload(document_id: str, namespace: str) -> str:
+    return json.dumps({"namespace": namespace, "document_id": document_id})
+
 
 def compute_content_hash(content: bytes) -> str:
     """
@@ -35,6 +67,30 @@ def compute_content_hash(content: bytes) -> str:
     return hashlib.sha256(content).hexdigest()
 
 
+def compute_file_hash(path: str | Path, block_size: int = 1024 * 1024) -> str:
+    """
+    SHA-256 of a file, read in block_size pieces.
+
+    Same digest as compute_content_hash(path.read_bytes()) without holding
+    the file in memory. Blocking — call via asyncio.to_thread from async code.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def compute_chunk_hash(text: str) -> str:
+    """
+    SHA-256 of one chunk's text, UTF-8 encoded. Stored in documents.chunk_hash.
+
+    Must stay byte-for-byte equal to the SQL backfill in schema.sql
+    (sha256(convert_to(content, 'UTF8'))) or pre-existing rows never match.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 async def check_document_status(
     pool: Pool,
     document_id: str,
@@ -45,7 +101,8 @@ async def check_document_status(
     Compare the new content hash against the stored one.
 
     Returns:
-      "new"       — document has never been ingested in this namespace
+      "new"       — document has never been ingested in this namespace,
+                    or was deleted (tombstoned) since
       "unchanged" — content hash matches, no re-ingestion needed
       "updated"   — content hash differs, old chunks should be deleted
 
@@ -56,13 +113,13 @@ async def check_document_status(
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             """
-            SELECT content_hash FROM document_registry
+            SELECT content_hash, deleted_at FROM document_registry
             WHERE document_id = $1 AND namespace = $2
             """,
             document_id, namespace,
         )
 
-    if row is None:
+    if row is None or row["deleted_at"] is not None:
         return "new"
     elif row["content_hash"] == new_hash:
         return "unchanged"
@@ -70,30 +127,92 @@ async def check_document_status(
         return "updated"
 
 
+async def check_documents_status(
+    pool: Pool,
+    namespace: str,
+    hashes: dict[str, str],
+) -> dict[str, str]:
+    """
+    Batched check_document_status: {document_id: new_hash} → {document_id: status}.
+
+    One round trip for the whole batch (document_id = ANY($2)) instead of one
+    query per file — a corpus load of a few thousand documents otherwise
+    spends more time on registry lookups than on the lookups' actual work.
+    """
+    if not hashes:
+        return {}
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT document_id, content_hash FROM document_registry
+            WHERE namespace = $1 AND document_id = ANY($2::varchar[])
+              AND deleted_at IS NULL
+            """,
+            namespace, list(hashes),
+        )
+
+    stored = {r["document_id"]: r["content_hash"] for r in rows}
+    statuses = {}
+    for document_id, new_hash in hashes.items():
+        if document_id not in stored:
+            statuses[document_id] = "new"
+        elif stored[document_id] == new_hash:
+            statuses[document_id] = "unchanged"
+        else:
+            statuses[document_id] = "updated"
+    return statuses
+
+
 async def delete_document_chunks(
     pool: Pool,
     document_id: str,
     namespace: str,
-) -> int:
+) -> int | None:
     """
-    Delete all chunks for a document_id + namespace from the documents table.
+    Delete a document: tombstone it in the registry (deleted_at) and leave
+    its rows to reclaim_stale_versions.
 
-    Returns the count of deleted rows so the API can report it.
+    current_documents hides the document as soon as this returns, and the
+    cost is one registry row whatever the document's size — a single DELETE
+    of a 10k-chunk document would hold its row locks and churn the HNSW
+    index for as long as it runs. Documents loaded without the registry get
+    a tombstone entry pinned at their newest stored version.
 
-    This uses DELETE with RETURNING to get the count in a single query
-    instead of a separate COUNT query followed by a DELETE.
+    Returns the count of chunks hidden, or None if the document is not
+    stored (or already deleted).
     """
+    payload = _change_payload(document_id, namespace)
     async with pool.acquire() as conn:
-        result = await conn.execute(
-            """
-            DELETE FROM documents
-            WHERE document_id = $1 AND namespace = $2
+        count = await conn.fetchval(
+            f"""
+            WITH tombstoned AS (
+                UPDATE document_registry SET deleted_at = NOW()
+                WHERE document_id = $1 AND namespace = $2 AND deleted_at IS NULL
+                RETURNING chunk_count
+            )
+            SELECT chunk_count, {_NOTIFY_CALL} FROM tombstoned
             """,
-            document_id, namespace,
+            document_id, namespace, payload,
         )
-    # asyncpg returns "DELETE N" where N is the row count
-    count = int(result.split()[-1])
-    logger.info(f"[lifecycle] Deleted {count} chunks for {document_id} in {namespace}")
+        if count is None:
+            count = await conn.fetchval(
+                f"""
+                WITH tombstoned AS (
+                    INSERT INTO document_registry
+                        (document_id, namespace, content_hash, chunk_count, current_version, deleted_at)
+                    SELECT $1, $2, '', count(*), max(version), NOW()
+                    FROM documents WHERE document_id = $1 AND namespace = $2
+                    HAVING count(*) > 0
+                    ON CONFLICT (document_id, namespace) DO NOTHING
+                    RETURNING chunk_count
+                )
+                SELECT chunk_count, {_NOTIFY_CALL} FROM tombstoned
+                """,
+                document_id, namespace, payload,
+            )
+    if count is not None:
+        logger.info(f"[lifecycle] Tombstoned {document_id} in {namespace} ({count} chunks)")
     return count
 
 
@@ -104,31 +223,255 @@ async def register_document(
     content_hash: str,
     chunk_count: int,
     source_filename: str,
+    version: int | None = None,
 ) -> None:
     """
     Insert or update the document registry entry.
 
+    version: the chunk set just written (allocate_version). Setting
+    current_version to it is the atomic switch from the old chunks to the new
+    ones in current_documents; call this only after every chunk is written.
+    None leaves the pointer where it is (1 for a new entry). Re-registering a
+    deleted document clears its tombstone.
+
+    The pointer only moves forward. Two ingests of one document can overlap
+    (job workers plus the sync route); if the older version registers last,
+    nothing is updated or published. Its rows are then below the pointer and
+    reclaim_stale_versions removes them, and the newer version's rows stay
+    visible.
+
     Uses INSERT ... ON CONFLICT DO UPDATE (upsert pattern).
     On first ingest: creates the row.
     On re-ingest with changed content: updates hash, chunk_count, timestamp.
     On re-ingest with same content: this function is never called (the route
     short-circuits on "unchanged" status).
 
+    Publishes the change on DOCUMENT_CHANGES_CHANNEL in the same statement,
+    so listeners hear of it when the new chunks become visible.
+
     ON CONFLICT DO UPDATE is PostgreSQL's built-in upsert. It is a single
     atomic operation, not a SELECT-then-INSERT/UPDATE sequence. No race
     condition between two concurrent ingests of the same document.
     """
     async with pool.acquire() as conn:
         await conn.execute(
+            f"""
+            WITH registered AS (
+                INSERT INTO document_registry
+                    (document_id, namespace, content_hash, chunk_count, source_filename,
+                     current_version, last_ingested_at)
+                VALUES ($1, $2, $4, $5, $6, COALESCE($7, 1), NOW())
+                ON CONFLICT (document_id, namespace) DO UPDATE SET
+                    content_hash = EXCLUDED.content_hash,
+                    chunk_count = EXCLUDED.chunk_count,
+                    source_filename = EXCLUDED.source_filename,
+                    current_version = COALESCE($7, document_registry.current_version),
+                    deleted_at = NULL,
+                    last_ingested_at = NOW()
+                WHERE $7::bigint IS NULL OR $7::bigint >= document_registry.current_version
+                RETURNING 1
+            )
+            SELECT {_NOTIFY_CALL} FROM registered
+            """,
+            document_id, namespace, _change_payload(document_id, namespace),
+            content_hash, chunk_count, source_filename, version,
+        )
+
+
+async def allocate_version(pool: Pool) -> int:
+    """
+    A fresh chunk-set version for one ingest of one document.
+
+    From a sequence, so versions only grow: rows of a version still being
+    written are always newer than the registry pointer — invisible to
+    current_documents and never touched by reclaim_stale_versions.
+    """
+    async with pool.acquire() as conn:
+        return await conn.fetchval("SELECT nextval('document_version_seq')")
+
+
+async def fetch_chunk_hashes(
+    pool: Pool,
+    document_id: str,
+    namespace: str,
+) -> dict[str, list[tuple[int, dict]]]:
+    """
+    Stored chunks of a document's current version keyed by chunk_hash:
+    {hash: [(row id, metadata), ...]}.
+
+    A list per hash because the same paragraph can legitimately appear twice
+    in one document (boilerplate clauses). Rows are in document order
+    (chunk_index); ids are not, since parallel COPY writers land batches out
+    of order.
+    Rows ingested before chunk_hash existed (NULL) are keyed under "" and so
+    never match a new chunk — they are replaced on the first incremental run.
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
             """
-            INSERT INTO document_registry
-                (document_id, namespace, content_hash, chunk_count, source_filename, last_ingested_at)
-            VALUES ($1, $2, $3, $4, $5, NOW())
-            ON CONFLICT (document_id, namespace) DO UPDATE SET
-                content_hash = EXCLUDED.content_hash,
-                chunk_count = EXCLUDED.chunk_count,
-                source_filename = EXCLUDED.source_filename,
-                last_ingested_at = NOW()
+            SELECT id, chunk_hash, metadata FROM current_documents
+            WHERE namespace = $1 AND document_id = $2
+            ORDER BY (metadata->>'chunk_index')::int, id
             """,
-            document_id, namespace, content_hash, chunk_count, source_filename,
+            namespace, document_id,
+        )
+
+    stored: dict[str, list[tuple[int, dict]]] = {}
+    for r in rows:
+        metadata = r["metadata"]
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        stored.setdefault(r["chunk_hash"] or "", []).append((r["id"], metadata or {}))
+    return stored
+
+
+async def carry_over_chunks(
+    pool: Pool,
+    namespace: str,
+    version: int,
+    kept: list[tuple[int, str]],
+) -> int:
+    """
+    Copy kept chunks of the current version into the new one, server-side:
+    kept is [(row id, metadata JSON)] — the metadata as the new version has
+    it (chunk_index, offsets and header path can move). Content, embedding,
+    chunk_hash and fts_vector come from the stored row, so nothing is
+    re-embedded, re-run through to_tsvector or sent back over the wire.
+
+    Each kept chunk is still a new row: it gets its own HNSW and GIN
+    entries, and the old row's are removed when reclaim_stale_versions
+    deletes it. That index churn is the price of versioned chunk sets (the
+    old version keeps serving, untouched, until the registry flips); what
+    carrying over saves is the embedding calls and the text analysis.
+
+    Returns the count of rows written. The old rows stay until the registry
+    flips and reclaim_stale_versions runs.
+    """
+    if not kept:
+        return 0
+    ids, metadatas = zip(*kept)
+    async with pool.acquire() as conn:
+        result = await conn.execute(
+            """
+            INSERT INTO documents (document_id, namespace, content, embedding, metadata, chunk_hash, fts_vector, version)
+            SELECT d.document_id, d.namespace, d.content, d.embedding, k.metadata, d.chunk_hash, d.fts_vector, $3
+            FROM unnest($1::int[], $2::jsonb[]) WITH ORDINALITY AS k(id, metadata, position)
+            JOIN documents d ON d.id = k.id AND d.namespace = $4
+            ORDER BY k.position
+            """,
+            list(ids), list(metadatas), version, namespace,
+        )
+    return int(result.split()[-1])
+
+
+# A row of documents d that reclaim_stale_versions deletes, given its
+# registry row r: below the pointer, or at it once the document is tombstoned.
+_DEAD_ROW = "d.version <= r.current_version AND (d.version < r.current_version OR r.deleted_at IS NOT NULL)"
+
+
+async def reclaim_stale_versions(
+    pool: Pool,
+    document_id: str | None = None,
+    namespace: str | None = None,
+    batch_size: int | None = None,
+    pause_seconds: float | None = None,
+    on_batch: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Delete chunks of versions older than their document's current_version,
+    and every chunk of a tombstoned document, batch_size rows per
+    transaction with a pause in between.
+
+    One big DELETE of a superseded 10k-chunk document would hold its row
+    locks and dirty the HNSW index in one go right after the flip, while
+    traffic moves to the new version; small batches spread that out. Scoped
+    to one document when document_id and namespace are given. Otherwise a
+    sweep over every document (startup): the documents with dead rows are
+    selected once (dead_documents) and reclaimed one by one, so each batch
+    is an idx_documents_ns_docid lookup rather than a join of all of
+    documents against the registry. Nothing above the pointer is touched — a
+    newer version still being written (a tombstoned document re-ingested,
+    say) is left alone. on_batch is called with each batch's row count.
+
+    Returns the count of deleted rows.
+    """
+    batch_size = batch_size or RECLAIM_CONFIG["batch_size"]
+    pause_seconds = RECLAIM_CONFIG["pause_seconds"] if pause_seconds is None else pause_seconds
+    if document_id is None or namespace is None:
+        total = 0
+        for dead_id, dead_namespace in await dead_documents(pool):
+            total += await reclaim_stale_versions(
+                pool, dead_id, dead_namespace, batch_size, pause_seconds, on_batch,
+            )
+        return total
+
+    total = 0
+    while True:
+        async with pool.acquire() as conn:
+            result = await conn.execute(
+                f"""
+                DELETE FROM documents WHERE (id, namespace) IN (
+                    SELECT d.id, d.namespace FROM documents d
+                    JOIN document_registry r
+                      ON r.namespace = d.namespace AND r.document_id = d.document_id
+                    WHERE d.namespace = $2 AND d.document_id = $3 AND {_DEAD_ROW}
+                    LIMIT $1
+                )
+                """,
+                batch_size, namespace, document_id,
+            )
+        deleted = int(result.split()[-1])
+        total += deleted
+        if on_batch is not None:
+            on_batch(deleted)
+        if deleted < batch_size:
+            break
+        await asyncio.sleep(pause_seconds)
+    if total:
+        logger.info(f"[lifecycle] Reclaimed {total} superseded chunks ({namespace}/{document_id})")
+    return total
+
+
+async def dead_documents(pool: Pool) -> list[tuple[str, str]]:
+    """
+    (document_id, namespace) of every registered document with rows left
+    for reclaim_stale_versions: one idx_documents_ns_docid probe per
+    registry row, stopping at the first dead row.
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT r.document_id, r.namespace FROM document_registry r
+            WHERE EXISTS (
+                SELECT 1 FROM documents d
+                WHERE d.namespace = r.namespace AND d.document_id = r.document_id AND {_DEAD_ROW}
+            )
+            ORDER BY r.namespace, r.document_id
+            """
+        )
+    return [(r["document_id"], r["namespace"]) for r in rows]
+
+
+async def count_dead_chunks(pool: Pool) -> dict[str, int]:
+    """
+    {namespace: rows reclaim_stale_versions would still delete} — chunks
+    hidden from current_documents but not yet gone from documents.
+    Namespaces with nothing left are omitted. Driven from the registry, one
+    idx_documents_ns_docid lookup per document, instead of a join over all
+    of documents.
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT r.namespace, sum(c.dead)::bigint AS dead
+            FROM document_registry r
+            CROSS JOIN LATERAL (
+                SELECT count(*) AS dead FROM documents d
+                WHERE d.namespace = r.namespace AND d.document_id = r.document_id AND {_DEAD_ROW}
+            ) c
+            WHERE c.dead > 0
+            GROUP BY r.namespace
+            ORDER BY r.namespace
+            """
         )
+    return {r["namespace"]: r["dead"] for r in rows}
@@ -45,8 +45,8 @@ class FileChunkIterator:
 
 # simpler generator function
 
-def read_chunks(file_path, chunk_size):
-  with open(file_path, 'r') as f:
+def read_chunks(file_path, chunk_size, encoding=None):
+  with open(file_path, 'r', encoding=encoding) as f:
     while True:
       chunk = f.read(chunk_size)
       if not chunk:
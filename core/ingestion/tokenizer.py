@@ -0,0 +1,80 @@
+"""
+core/ingestion/tokenizer.py
+
+Offline token counting for token-accurate chunk sizing.
+
+The chunkers size by characters unless given a TokenCounter; with one,
+chunk_size is a token budget. The counter wraps a HuggingFace `tokenizers`
+tokenizer.json loaded from disk — no network, no model download.
+
+Vocabulary:
+  vocab/wordpiece_compliance.json ships with the repo: a BERT-style WordPiece
+  vocabulary (lowercased, whitespace + punctuation pre-tokenization — the same
+  scheme as nomic-embed-text's bert-base-uncased tokenizer) trained on the
+  compliance corpus by scripts/corpus/build_tokenizer_vocab.py. Its counts
+  approximate the model's, with no guaranteed direction: the smaller
+  vocabulary splits some words into more pieces, but any word longer than
+  max_input_chars_per_word (100) becomes a single [UNK] however long it is.
+  Leave headroom under the model's limit when sizing chunks with it; for
+  exact counts, point TOKENIZER_PATH at the embedding model's own
+  tokenizer.json.
+
+One load per process:
+  get_token_counter(path) is cached per process, and a TokenCounter pickles
+  as just its path. Passing one to run_cpu_bound therefore ships a short
+  string; the core.processing.cpu_offload worker loads the vocabulary on first
+  use and reuses it for every later task.
+
+Batch counting:
+  count(texts) encodes a whole list in one encode_batch call (Rust, parallel)
+  instead of one call per string. The recursive splitter counts every part at
+  a split level in one call, then sums: with whitespace/punctuation
+  pre-tokenization, count(a + " " + b) == count(a) + count(b), so a
+  candidate's size is a sum, not a re-encode.
+"""
+from functools import lru_cache
+from pathlib import Path
+
+from tokenizers import Tokenizer
+
+from config import CHUNKING_CONFIG
+
+BUNDLED_TOKENIZER_PATH = Path(__file__).parent / "vocab" / "wordpiece_compliance.json"
+
+
+class TokenCounter:
+    """Counts tokens with a tokenizer.json; construct via get_token_counter()."""
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._tokenizer = Tokenizer.from_file(self.path)
+        self._tokenizer.no_truncation()
+        self._tokenizer.no_padding()
+
+    def __reduce__(self):
+        # Cross the process boundary as a path; the receiving process resolves
+        # it through its own get_token_counter() cache — loaded once per worker.
+        return (get_token_counter, (self.path,))
+
+    def count(self, texts: list[str]) -> list[int]:
+        """Token count of each text, in one batched encode. No special tokens."""
+        if not texts:
+            return []
+        return [len(e.ids) for e in self._tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+    def offsets(self, text: str) -> list[tuple[int, int]]:
+        """(start, end) character span of every token in text."""
+        return self._tokenizer.encode(text, add_special_tokens=False).offsets
+
+
+def get_token_counter(path: str | Path | None = None) -> TokenCounter:
+    """
+    Process-wide TokenCounter for path (default: TOKENIZER_PATH, else the
+    bundled vocabulary). Loaded once per process.
+    """
+    return _load_token_counter(str(path or CHUNKING_CONFIG["tokenizer_path"] or BUNDLED_TOKENIZER_PATH))
+
+
+@lru_cache(maxsize=4)
+def _load_token_counter(path: str) -> TokenCounter:
+    return TokenCounter(path)
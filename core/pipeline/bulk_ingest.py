@@ -0,0 +1,389 @@
+"""
+core/pipeline/bulk_ingest.py
+==============================
+Corpus-scale ingestion: many documents, one pool, N at a time, resumable.
+
+WHY THIS EXISTS:
+  The corpus scripts called db_ingest.ingestion_pipeline() once per file
+  without a pool, so every file paid for creating and closing its own asyncpg
+  pool, files ran strictly one after another, and document_registry was never
+  written — a re-run re-embedded everything.
+
+  bulk_ingest() is the corpus-level loop done properly:
+    1. One shared pool for the whole run.
+    2. Files hashed off the event loop, then ONE registry query per namespace
+       (check_documents_status) decides new / updated / unchanged.
+    3. Up to `concurrency` documents in the pipeline at once.
+    4. Every finished document is appended to a checkpoint file, so a crashed
+       run restarted with the same checkpoint skips what already landed.
+    5. An aggregate throughput report at the end.
+
+  staged=True (--staged) is the full-corpus mode: every document is COPYed
+  into one UNLOGGED staging table and merged into documents in a single
+  transaction at the end (core.database.StagedLoad) — no per-row FTS trigger,
+  and above a size threshold one HNSW rebuild instead of row-by-row index
+  inserts. Documents are registered and checkpointed only after the merge.
+  Updated documents are replaced whole in the merge, not diffed (the
+  embedding cache still saves re-embedding their unchanged chunks). The merge
+  blocks writers to documents, so use it for offline loads.
+
+USAGE:
+  # Every .md directly inside a directory, document_id = file stem
+  python -m core.pipeline.bulk_ingest --dir data/compliance/real/legal --namespace legal
+
+  # Explicit manifest — JSON Lines: {"path": ..., "document_id": ..., "namespace": ...}
+  python -m core.pipeline.bulk_ingest --manifest corpus.jsonl --concurrency 8
+
+  # Resume after a crash: pass the same checkpoint file again
+  python -m core.pipeline.bulk_ingest --dir ... --namespace legal --checkpoint .ingest_checkpoint.json
+
+  # Initial load of a large corpus: stage everything, merge once
+  python -m core.pipeline.bulk_ingest --manifest corpus.jsonl --staged
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from asyncpg import Pool
+
+from core.database import StagedLoad, create_pool, ensure_namespace_partitions
+from core.ingestion.lifecycle import (
+    allocate_version,
+    check_documents_status,
+    compute_file_hash,
+    reclaim_stale_versions,
+    register_document,
+)
+from core.pipeline.db_ingest import ingestion_pipeline
+
+logger = logging.getLogger("core.bulk_ingest")
+
+DEFAULT_CONCURRENCY = 4
+
+
+@dataclass
+class BulkIngestItem:
+    """One document to load: where it lives and where it goes."""
+    path:        Path
+    document_id: str
+    namespace:   str = "default"
+
+
+def collect_directory(directory: str | Path, namespace: str, pattern: str = "*.md") -> list[BulkIngestItem]:
+    """
+    Every file matching pattern directly inside directory (subdirectories are
+    not descended into, so nested namespaces don't bleed). document_id is the
+    file stem, e.g. gdpr_art_4.md → "gdpr_art_4".
+    """
+    base_dir = Path(directory)
+    if not base_dir.exists():
+        return []
+    return [
+        BulkIngestItem(path=path, document_id=path.stem, namespace=namespace)
+        for path in sorted(base_dir.glob(pattern))
+        if path.is_file()
+    ]
+
+
+def load_manifest(manifest_path: str | Path, default_namespace: str = "default") -> list[BulkIngestItem]:
+    """
+    Read a JSON Lines manifest. Each line: {"path": ..., "document_id": ..., "namespace": ...}.
+    document_id defaults to the file stem, namespace to default_namespace.
+    Relative paths resolve against the manifest's directory.
+    """
+    manifest_path = Path(manifest_path)
+    items = []
+    for line_no, line in enumerate(manifest_path.read_text(encoding="utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            path = Path(entry["path"])
+        except (json.JSONDecodeError, KeyError, TypeError) as exc:
+            raise ValueError(f"{manifest_path}:{line_no}: expected an object with a 'path' key") from exc
+        if not path.is_absolute():
+            path = manifest_path.parent / path
+        items.append(BulkIngestItem(
+            path=path,
+            document_id=entry.get("document_id") or path.stem,
+            namespace=entry.get("namespace") or default_namespace,
+        ))
+    return items
+
+
+class IngestCheckpoint:
+    """
+    Progress file for resumable runs: {"namespace/document_id": content_hash}.
+
+    A document counts as done only if its hash still matches, so a file edited
+    between the crash and the restart is ingested again rather than skipped.
+    Written with write-to-temp + os.replace so a crash mid-write never leaves a
+    truncated checkpoint behind.
+    """
+
+    def __init__(self, path: str | Path | None):
+        self.path = Path(path) if path else None
+        self._done: dict[str, str] = {}
+        if self.path and self.path.exists():
+            self._done = json.loads(self.path.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def _key(item: BulkIngestItem) -> str:
+        return f"{item.namespace}/{item.document_id}"
+
+    def is_done(self, item: BulkIngestItem, content_hash: str) -> bool:
+        return self._done.get(self._key(item)) == content_hash
+
+    def mark_done(self, item: BulkIngestItem, content_hash: str) -> None:
+        self._done[self._key(item)] = content_hash
+        if self.path is None:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._done, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+async def _ingest_one(
+    pool: Pool,
+    item: BulkIngestItem,
+    status: str,
+    content_hash: str,
+    batch_size: int,
+) -> int:
+    """
+    Lifecycle-aware ingest of a single document. Returns its chunk count.
+
+    Written under a new version and registered at it. An updated document's
+    old version is left for bulk_ingest to reclaim once every document is in.
+    """
+    version = await allocate_version(pool)
+    metrics = await ingestion_pipeline(
+        input_file_path=str(item.path),
+        document_id=item.document_id,
+        namespace=item.namespace,
+        batch_size=batch_size,
+        pool=pool,
+        incremental=(status == "updated"),
+        version=version,
+    )
+    await register_document(
+        pool=pool,
+        document_id=item.document_id,
+        namespace=item.namespace,
+        content_hash=content_hash,
+        chunk_count=metrics["total_chunks"],
+        source_filename=item.path.name,
+        version=version,
+    )
+    return metrics["total_chunks"]
+
+
+async def _stage_one(load: StagedLoad, pool: Pool, item: BulkIngestItem, batch_size: int) -> tuple[int, int]:
+    """Staged-mode ingest of a single document: COPY into the staging table only. Returns (chunks, version)."""
+    version = await allocate_version(pool)
+    try:
+        metrics = await ingestion_pipeline(
+            input_file_path=str(item.path),
+            document_id=item.document_id,
+            namespace=item.namespace,
+            batch_size=batch_size,
+            pool=pool,
+            insert=load.insert,
+            version=version,
+        )
+    except Exception:
+        await load.discard(item.document_id, item.namespace)
+        raise
+    return metrics["total_chunks"], version
+
+
+async def bulk_ingest(
+    items: list[BulkIngestItem],
+    pool: Pool | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint_path: str | Path | None = None,
+    batch_size: int = 50,
+    staged: bool = False,
+) -> dict:
+    """
+    Ingest many documents through one pool with bounded concurrency.
+
+    Args:
+        items:           documents to load (collect_directory / load_manifest)
+        pool:            shared pool; created and closed here if not passed
+        concurrency:     documents in the embed → COPY pipeline at once
+        checkpoint_path: progress file — pass the same path to resume a run
+        batch_size:      chunks per embedding call / COPY
+        staged:          load through a StagedLoad merged once at the end
+
+    Returns an aggregate report. One failing document never aborts the run;
+    it is listed under "failed" and left out of the checkpoint so the next
+    run retries it. A failed merge does abort a staged run — nothing from it
+    reached documents, the registry or the checkpoint. Staged runs report the
+    merge's stats under "staged_merge". Old versions of updated documents
+    are reclaimed after the load ("chunks_reclaimed"); a staged merge
+    replaces them itself.
+    """
+    start_time = time.perf_counter()
+    checkpoint = IngestCheckpoint(checkpoint_path)
+    report = {
+        "documents_total":    len(items),
+        "ingested":           0,
+        "unchanged":          0,
+        "resumed_skipped":    0,
+        "failed":             [],
+        "total_chunks":       0,
+        "chunks_reclaimed":   0,
+    }
+
+    owns_pool = pool is None
+    if owns_pool:
+        pool = await create_pool()
+
+    try:
+        # Hash off the event loop — SHA-256 of a large file is CPU + disk work
+        hashes = await asyncio.gather(*(asyncio.to_thread(compute_file_hash, item.path) for item in items))
+
+        pending = []
+        for item, content_hash in zip(items, hashes):
+            if checkpoint.is_done(item, content_hash):
+                report["resumed_skipped"] += 1
+            else:
+                pending.append((item, content_hash))
+
+        # One registry round trip per namespace instead of one per document
+        statuses: dict[tuple[str, str], str] = {}
+        by_namespace: dict[str, dict[str, str]] = {}
+        for item, content_hash in pending:
+            by_namespace.setdefault(item.namespace, {})[item.document_id] = content_hash
+        for namespace, ns_hashes in by_namespace.items():
+            for document_id, status in (await check_documents_status(pool, namespace, ns_hashes)).items():
+                statuses[(namespace, document_id)] = status
+
+        # A new namespace gets its own partition before its first row lands,
+        # not moved out of documents_default afterwards
+        if by_namespace:
+            await ensure_namespace_partitions(pool, by_namespace)
+
+        slots = asyncio.Semaphore(concurrency)
+        updated: list[BulkIngestItem] = []
+        staged_done: list[tuple[BulkIngestItem, str, int, int]] = []
+
+        async def run(item: BulkIngestItem, content_hash: str, load: StagedLoad | None) -> None:
+            status = statuses[(item.namespace, item.document_id)]
+            if status == "unchanged":
+                report["unchanged"] += 1
+                checkpoint.mark_done(item, content_hash)
+                return
+            async with slots:
+                try:
+                    if load is not None:
+                        chunks, version = await _stage_one(load, pool, item, batch_size)
+                    else:
+                        chunks = await _ingest_one(pool, item, status, content_hash, batch_size)
+                except Exception as e:
+                    logger.warning(f"[bulk_ingest] {item.namespace}/{item.document_id} failed: {e}")
+                    report["failed"].append({"document_id": item.document_id, "namespace": item.namespace, "error": str(e)})
+                    return
+            if load is not None:
+                staged_done.append((item, content_hash, chunks, version))
+                return
+            report["ingested"] += 1
+            report["total_chunks"] += chunks
+            checkpoint.mark_done(item, content_hash)
+            if status == "updated":
+                updated.append(item)
+            logger.info(f"[bulk_ingest] {item.namespace}/{item.document_id} ({status}): {chunks} chunks")
+
+        if not staged:
+            await asyncio.gather(*(run(item, content_hash, None) for item, content_hash in pending))
+            # Old versions go after the load, so a large superseded document
+            # never holds up the ones behind it
+            for item in updated:
+                report["chunks_reclaimed"] += await reclaim_stale_versions(pool, item.document_id, item.namespace)
+        else:
+            async with StagedLoad(pool) as load:
+                await asyncio.gather(*(run(item, content_hash, load) for item, content_hash in pending))
+                report["staged_merge"] = await load.merge()
+            for item, content_hash, chunks, version in staged_done:
+                await register_document(
+                    pool=pool,
+                    document_id=item.document_id,
+                    namespace=item.namespace,
+                    content_hash=content_hash,
+                    chunk_count=chunks,
+                    source_filename=item.path.name,
+                    version=version,
+                )
+                report["ingested"] += 1
+                report["total_chunks"] += chunks
+                checkpoint.mark_done(item, content_hash)
+
+    finally:
+        if owns_pool:
+            await pool.close()
+
+    elapsed = time.perf_counter() - start_time
+    report["total_time_seconds"] = round(elapsed, 3)
+    report["documents_per_second"] = round(report["ingested"] / elapsed, 2) if elapsed > 0 else 0
+    report["throughput_chunks_per_second"] = round(report["total_chunks"] / elapsed, 2) if elapsed > 0 else 0
+    return report
+
+
+def _print_report(report: dict) -> None:
+    print(f"\n{'=' * 60}")
+    print(f"Documents: {report['documents_total']} total | {report['ingested']} ingested | "
+          f"{report['unchanged']} unchanged | {report['resumed_skipped']} resumed-skipped | "
+          f"{len(report['failed'])} failed")
+    print(f"Chunks:    {report['total_chunks']} in {report['total_time_seconds']}s "
+          f"({report['throughput_chunks_per_second']} chunks/s, {report['documents_per_second']} docs/s)")
+    if "staged_merge" in report:
+        merge = report["staged_merge"]
+        print(f"Merge:     {merge['rows_inserted']} rows in {merge['merge_seconds']}s "
+              f"({merge['rows_replaced']} replaced, HNSW rebuilt: {merge['hnsw_rebuilt']})")
+    if report["chunks_reclaimed"]:
+        print(f"Reclaimed: {report['chunks_reclaimed']} chunks of superseded versions")
+    for failure in report["failed"]:
+        print(f"  [FAILED] {failure['namespace']}/{failure['document_id']}: {failure['error']}")
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.manifest:
+        items = load_manifest(args.manifest, default_namespace=args.namespace)
+    else:
+        items = collect_directory(args.dir, args.namespace, pattern=args.pattern)
+
+    if not items:
+        print("Nothing to ingest.")
+        return
+
+    report = await bulk_ingest(
+        items,
+        concurrency=args.concurrency,
+        checkpoint_path=args.checkpoint,
+        batch_size=args.batch_size,
+        staged=args.staged,
+    )
+    _print_report(report)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or manifest into the documents table")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory of documents (not recursive)")
+    source.add_argument("--manifest", help="JSON Lines manifest of {path, document_id, namespace}")
+    parser.add_argument("--namespace", default="default", help="Namespace for --dir, default for --manifest")
+    parser.add_argument("--pattern", default="*.md", help="Glob for --dir (default: *.md)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Documents in flight at once")
+    parser.add_argument("--batch-size", type=int, default=50, help="Chunks per embed call / COPY")
+    parser.add_argument("--checkpoint", help="Progress file; reuse it to resume an interrupted run")
+    parser.add_argument("--staged", action="store_true",
+                        help="COPY into an UNLOGGED staging table and merge once at the end (offline loads)")
+    asyncio.run(_main(parser.parse_args()))
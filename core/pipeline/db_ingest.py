@@ -1,13 +1,56 @@
+import asyncio
+import json
 import time
-from itertools import islice
+import weakref
+from itertools import chain, islice
 from pathlib import Path
-from typing import Generator, Iterator
+from typing import Awaitable, Callable, Generator, Iterable, Iterator
 
-from asyncpg import Pool
+from asyncpg import Connection, Pool
 
 from core.database import bulk_insert, create_pool
-from core.ingestion.chunkers import ChunkRecord, get_chunker
-from core.ingestion.embedders import embed_chunks
+from core.ingestion.chunkers import ChunkRecord, get_chunker, get_streaming_chunker
+from core.ingestion.embedders import EmbeddingCache, embed_chunks, get_embedding_scheduler
+from core.ingestion.lifecycle import carry_over_chunks, compute_chunk_hash, fetch_chunk_hashes
+from core.ingestion.readers import read_chunks
+from core.processing.pipeline import chunk_document
+
+# Characters pulled from the file per read. Big enough that paragraph
+# stitching across reads is rare, small enough to be noise next to a batch.
+STREAM_READ_SIZE = 64 * 1024
+
+# Overlap defaults for the embed → COPY stages.
+# EMBED_CONCURRENCY: embedding requests in flight at once.
+# MAX_QUEUED_BATCHES: embedded batches allowed to wait for the writer. Together
+# they bound memory: at most EMBED_CONCURRENCY + MAX_QUEUED_BATCHES batches live,
+# plus one per COPY writer (COPY_CONCURRENCY below).
+EMBED_CONCURRENCY = 2
+MAX_QUEUED_BATCHES = 4
+
+# COPY_CONCURRENCY: embedded batches COPYed at once, each on its own pool
+# connection. COPY_POOL_SHARE caps that across every ingest running on the
+# pool: together they never hold more than this share of its connections
+# (20 → 10, demo's 5 → 2), the rest stay free for /search and the agent
+# (less one held by the document change listener when an in-process index
+# is configured, see api.main).
+# With BM25 statistics maintenance on (BM25_CONFIG["maintain_stats"]) each
+# COPY ends in a trigger that upserts the namespace's bm25_corpus_stats row
+# and holds it until commit, so the writers' trigger-and-commit tails run one
+# at a time; lab 3.7 (--bm25-stats) measures both settings.
+COPY_CONCURRENCY = 4
+COPY_POOL_SHARE = 0.5
+
+# Progress hooks for callers that report on a running ingest (background jobs).
+# BatchWrittenFn(chunks_done) fires after every COPY.
+# ProgressFn(stage, chunks_done, chunks_total) fires on stage changes and after
+# every COPY; chunks_total is None until chunking has finished.
+BatchWrittenFn = Callable[[int], Awaitable[None]]
+ProgressFn = Callable[[str, int, int | None], Awaitable[None]]
+
+# Writes one embedded batch: bulk_insert's signature (plus version= when the
+# ingest is versioned). StagedLoad.insert is the other implementation (COPY
+# into a staging table instead of documents).
+InsertFn = Callable[[Connection, list[ChunkRecord], str, str], Awaitable[None]]
 
 
 def batch_generator(iterable: Iterator, batch_size: int = 50) -> Generator[list, None, None]:
@@ -28,49 +71,412 @@ def batch_generator(iterable: Iterator, batch_size: int = 50) -> Generator[list,
 
 
 
+def iter_document_chunks(
+    input_file_path: str,
+    read_size: int = STREAM_READ_SIZE,
+    source: str | None = None,
+) -> Iterator[ChunkRecord]:
+    '''
+    Lazily chunk a file from disk.
+
+    .txt / .md (and unknown extensions) stream through the iter_* chunkers, so
+    only one read plus the open section is in memory. Types that need the whole
+    document (OpenAPI .json) — or text that sniffs as JSON — are read in full and
+    go through the regular CHUNKER_REGISTRY path.
+
+    source (default: the path) picks the chunker by extension and is cited in
+    chunk metadata — pass the original filename when reading a spool file.
+    '''
+    source = source or input_file_path
+    ext = Path(source).suffix.lstrip(".")
+    stream = read_chunks(input_file_path, read_size, encoding="utf-8")
+    first = next(stream, "")
+
+    streamer = get_streaming_chunker(ext)
+    if streamer is not None and not first.lstrip().startswith(("{", "[")):
+        yield from streamer(chain([first], stream), source=source)
+        return
+
+    # Whole-document path — also runs the JSON content sniffing in get_chunker
+    text = first + "".join(stream)
+    chunker = get_chunker(ext, text=text)
+    yield from chunker(text, source=source)
+
+
+# event loop → {id(pool): semaphore}. asyncpg pools can't be weak-referenced;
+# keying by loop drops the semaphores along with the loop that owns them.
+_copy_slots: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def copy_connection_cap(pool: Pool, share: float = COPY_POOL_SHARE) -> int:
+    """Connections of pool that ingest COPYs may hold at once, all ingests together."""
+    return max(1, int(pool.get_max_size() * share))
+
+
+def _copy_slots_for(pool: Pool) -> asyncio.Semaphore:
+    per_pool = _copy_slots.setdefault(asyncio.get_running_loop(), {})
+    if id(pool) not in per_pool:
+        per_pool[id(pool)] = asyncio.Semaphore(copy_connection_cap(pool))
+    return per_pool[id(pool)]
+
+
+def _first_error(error: BaseException) -> BaseException:
+    """Unwrap TaskGroup's ExceptionGroup so callers see the real failure (ValueError → 415 etc.)."""
+    while isinstance(error, BaseExceptionGroup):
+        error = error.exceptions[0]
+    return error
+
+
+async def ingest_chunks(
+    chunks: Iterable[ChunkRecord],
+    pool: Pool,
+    document_id: str,
+    namespace: str = "default",
+    batch_size: int = 50,
+    embed_concurrency: int = EMBED_CONCURRENCY,
+    max_queued_batches: int = MAX_QUEUED_BATCHES,
+    embedding_cache: EmbeddingCache | None = None,
+    on_batch_written: BatchWrittenFn | None = None,
+    insert: InsertFn | None = None,
+    copy_concurrency: int = COPY_CONCURRENCY,
+    version: int | None = None,
+) -> dict:
+    '''
+    Embed and COPY a chunk stream with the two stages overlapped.
+
+    Producer/consumer over a bounded asyncio.Queue:
+      - producer: pulls batch_size chunks at a time, runs up to embed_concurrency
+        embed_chunks() calls concurrently, puts each embedded batch on the queue
+      - writers: copy_concurrency tasks take embedded batches off the queue and
+        bulk_insert them, each on its own pool connection
+
+    So batch N+1 embeds while batch N is being COPYed. The queue's maxsize is
+    the backpressure: if the DB falls behind, embedders block on put() instead of
+    piling embedded batches up in memory.
+
+    Writers hold a slot of the pool-wide COPY cap (copy_connection_cap) for
+    each COPY, so concurrent ingests share COPY_POOL_SHARE of the pool between
+    them. Batches can land in any order; chunk order is what the chunker wrote
+    into metadata (chunk_index), not the row id.
+
+    Returned stage timings (seconds):
+      embed_time_seconds        sum of embed_chunks() call durations (can exceed
+                                wall time when embed_concurrency > 1)
+      insert_time_seconds       sum of bulk_insert() durations (can exceed
+                                wall time when copy_concurrency > 1)
+      writer_queue_wait_seconds writers idle, waiting on embeddings → embed-bound
+      embed_queue_wait_seconds  embedded batches waiting for queue room → DB-bound
+      copy_connections          writers used (copy_concurrency after the cap)
+
+    With an embedding_cache, the cache's hit/miss counts and hit ratio are
+    added to the returned stats. on_batch_written(total so far) is awaited
+    after every COPY. insert replaces bulk_insert as the writer (e.g.
+    StagedLoad.insert). version: the chunk set to write under
+    (lifecycle.allocate_version); None keeps the column default.
+
+    Each batch's embeddings are dropped once COPYed (chunk.embedding = None):
+    a caller holding the whole chunk list (ingest_document) would otherwise
+    keep every batch's float32 matrix alive until the document is done.
+    '''
+    insert = insert or bulk_insert
+    versioned = {} if version is None else {"version": version}
+    queue: asyncio.Queue[list[ChunkRecord] | None] = asyncio.Queue(maxsize=max_queued_batches)
+    embed_slots = asyncio.Semaphore(embed_concurrency)
+    copy_slots = _copy_slots_for(pool)
+    writers = max(1, min(copy_concurrency, copy_connection_cap(pool)))
+    stats = {
+        "total_chunks": 0,
+        "embed_time_seconds": 0.0,
+        "insert_time_seconds": 0.0,
+        "writer_queue_wait_seconds": 0.0,
+        "embed_queue_wait_seconds": 0.0,
+        "copy_connections": writers,
+    }
+
+    async def embed_batch(batch: list[ChunkRecord]) -> None:
+        try:
+            t0 = time.perf_counter()
+            embedded = await embed_chunks(batch, cache=embedding_cache)
+            t1 = time.perf_counter()
+            await queue.put(embedded)
+            stats["embed_time_seconds"] += t1 - t0
+            stats["embed_queue_wait_seconds"] += time.perf_counter() - t1
+        finally:
+            embed_slots.release()
+
+    async def write_batches() -> None:
+        while True:
+            t0 = time.perf_counter()
+            batch = await queue.get()
+            stats["writer_queue_wait_seconds"] += time.perf_counter() - t0
+            if batch is None:      # sentinel — every embedder has finished
+                return
+            t0 = time.perf_counter()
+            async with copy_slots, pool.acquire() as conn:
+                await insert(conn, batch, document_id=document_id, namespace=namespace, **versioned)
+            for chunk in batch:
+                chunk.embedding = None
+            stats["insert_time_seconds"] += time.perf_counter() - t0
+            stats["total_chunks"] += len(batch)
+            if on_batch_written is not None:
+                await on_batch_written(stats["total_chunks"])
+
+    batches = batch_generator(chunks, batch_size)
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(writers):
+                tg.create_task(write_batches())
+            embedding: set[asyncio.Task] = set()
+            # chunks may be a streaming chunker reading and splitting a file —
+            # pull each batch in a thread so that work stays off the event loop
+            while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                await embed_slots.acquire()
+                task = tg.create_task(embed_batch(batch))
+                embedding.add(task)
+                task.add_done_callback(embedding.discard)
+            await asyncio.gather(*embedding)
+            for _ in range(writers):
+                await queue.put(None)
+    except BaseExceptionGroup as group:
+        raise _first_error(group)
+
+    if embedding_cache is not None:
+        stats.update(embedding_cache.stats())
+
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()}
+
+
+async def ingest_changed_chunks(
+    chunks: Iterable[ChunkRecord],
+    pool: Pool,
+    document_id: str,
+    namespace: str = "default",
+    batch_size: int = 50,
+    embed_concurrency: int = EMBED_CONCURRENCY,
+    max_queued_batches: int = MAX_QUEUED_BATCHES,
+    embedding_cache: EmbeddingCache | None = None,
+    on_batch_written: BatchWrittenFn | None = None,
+    copy_concurrency: int = COPY_CONCURRENCY,
+    version: int | None = None,
+) -> dict:
+    '''
+    Incremental re-ingest of an "updated" document: embed only what changed.
+
+    The new chunk set is written whole under version (a new
+    lifecycle.allocate_version) next to the current one, which keeps serving
+    searches until the caller flips the registry (register_document). Each
+    new chunk's hash is looked up in the current version's chunk hashes:
+      - match    → the stored row is copied into the new version server-side
+                   with the new metadata (carry_over_chunks): no embedding
+                   call, no vector over the wire
+      - no match → streamed through ingest_chunks() (embed + COPY)
+      - stored rows nothing matched → not carried over; they go when the old
+                   version is reclaimed (lifecycle.reclaim_stale_versions)
+
+    A quarterly amendment to one article of a long regulation re-embeds a few
+    chunks instead of all of them.
+
+    Returns ingest_chunks' stage metrics with total_chunks counting the whole
+    new version, plus chunks_embedded / chunks_reused / chunks_deleted
+    (old chunks not carried over). on_batch_written counts kept chunks as
+    done too.
+    '''
+    if version is None:
+        raise ValueError("incremental re-ingest writes a new chunk set; pass version=")
+    stored = await fetch_chunk_hashes(pool, document_id, namespace)
+    kept: list[tuple[int, str]] = []
+
+    def changed_only() -> Iterator[ChunkRecord]:
+        for chunk in chunks:
+            matches = stored.get(compute_chunk_hash(chunk.content))
+            if not matches:
+                yield chunk
+                continue
+            row_id, _ = matches.pop(0)
+            kept.append((row_id, json.dumps(dict(chunk.metadata))))
+
+    async def written(inserted: int) -> None:
+        await on_batch_written(inserted + len(kept))
+
+    stage_metrics = await ingest_chunks(
+        changed_only(), pool, document_id, namespace,
+        batch_size=batch_size,
+        embed_concurrency=embed_concurrency,
+        max_queued_batches=max_queued_batches,
+        embedding_cache=embedding_cache,
+        on_batch_written=written if on_batch_written is not None else None,
+        copy_concurrency=copy_concurrency,
+        version=version,
+    )
+    reused = await carry_over_chunks(pool, namespace, version, kept)
+
+    return {
+        **stage_metrics,
+        "total_chunks": stage_metrics["total_chunks"] + reused,
+        "chunks_embedded": stage_metrics["total_chunks"],
+        "chunks_reused": reused,
+        "chunks_deleted": sum(len(rows) for rows in stored.values()),
+    }
+
+
 async def ingestion_pipeline(
     input_file_path: str,
     document_id: str,
     namespace: str = "default",
     batch_size: int = 50,
     pool: Pool = None,       # API passes its shared pool; standalone runs create one
+    embed_concurrency: int = EMBED_CONCURRENCY,
+    max_queued_batches: int = MAX_QUEUED_BATCHES,
+    incremental: bool = False,
+    use_embedding_cache: bool = True,
+    source: str | None = None,
+    copy_concurrency: int = COPY_CONCURRENCY,
+    on_progress: ProgressFn | None = None,
+    insert: InsertFn | None = None,
+    version: int | None = None,
 ) -> dict:
     '''
-    Chunk → embed → bulk insert into PostgreSQL.
+    Chunk → embed → bulk insert into PostgreSQL, with embedding and COPY
+    overlapped (see ingest_chunks).
+
+    incremental=True is the update path for a document that is already stored:
+    only new/changed chunks are embedded, unchanged rows are carried over
+    server-side (see ingest_changed_chunks). The caller must NOT delete the
+    old chunks first — they keep serving searches until the flip.
+
+    version: the chunk set to write under (lifecycle.allocate_version). The
+    chunks stay invisible to retrieval until register_document(version=)
+    points the registry at it. Required with incremental.
+
+    use_embedding_cache: look vectors up in embedding_cache before calling the
+    provider (see EmbeddingCache); hit ratio is reported in the metrics.
 
     Accepts an external pool so the API's shared pool is reused across requests.
     If no pool is passed, creates one locally — preserves standalone script usage.
+
+    Chunks are produced lazily (iter_document_chunks) and pulled batch_size at a
+    time, in a worker thread, so peak memory tracks one batch, not the file,
+    and the chunking does not run on the event loop.
+
+    source: original filename when input_file_path is a spool file (see
+    iter_document_chunks). on_progress is awaited with ("embedding",
+    chunks_done, None) after every COPY — the total is unknown while streaming.
+
+    copy_concurrency: COPY writers on their own connections, under the
+    pool-wide cap (see ingest_chunks).
+
+    insert: writer for each embedded batch instead of bulk_insert —
+    bulk_ingest's staged mode passes StagedLoad.insert. Not combinable with
+    incremental, which diffs against and edits rows already in documents.
     '''
     start_time = time.perf_counter()
 
-    # Read full file text first so we can use it for content sniffing if the extension is missing/wrong
-    text = Path(input_file_path).read_text(encoding="utf-8")
+    on_batch_written = None
+    if on_progress is not None:
+        async def on_batch_written(chunks_done: int) -> None:
+            await on_progress("embedding", chunks_done, None)
+
+    return await _run_ingest(
+        iter_document_chunks(input_file_path, source=source), start_time, document_id, namespace,
+        batch_size, pool, embed_concurrency, max_queued_batches, copy_concurrency, incremental,
+        use_embedding_cache, on_batch_written, insert, version,
+    )
 
-    # Resolve chunker from file extension (with text fallback) — dispatch table in chunkers.py
-    ext = Path(input_file_path).suffix.lstrip(".")
-    chunker = get_chunker(ext, text=text)
 
-    chunks: list[ChunkRecord] = chunker(text, source=input_file_path)
+async def ingest_document(
+    text: str,
+    source: str,
+    document_id: str,
+    namespace: str = "default",
+    batch_size: int = 50,
+    pool: Pool = None,
+    embed_concurrency: int = EMBED_CONCURRENCY,
+    max_queued_batches: int = MAX_QUEUED_BATCHES,
+    incremental: bool = False,
+    use_embedding_cache: bool = True,
+    on_progress: ProgressFn | None = None,
+    copy_concurrency: int = COPY_CONCURRENCY,
+    version: int | None = None,
+) -> dict:
+    '''
+    ingestion_pipeline for a document already in memory (an upload): no temp
+    file, no re-read. Chunking goes through chunk_document — inline below the
+    Lab 4.2 break-even, in the process pool above it — so the event loop stays
+    free for other requests while a large upload is chunked. source is the
+    original filename: it picks the chunker and is cited in chunk metadata.
 
-    total_chunks = 0
+    Same embed → COPY stages, arguments and metrics as ingestion_pipeline.
+    on_progress is awaited with ("chunking", 0, None), then ("embedding",
+    chunks_done, chunks_total) once chunking is done and after every COPY.
+    '''
+    start_time = time.perf_counter()
+    if on_progress is not None:
+        await on_progress("chunking", 0, None)
+    chunks = await chunk_document(text, source)
+
+    on_batch_written = None
+    if on_progress is not None:
+        await on_progress("embedding", 0, len(chunks))
+
+        async def on_batch_written(chunks_done: int) -> None:
+            await on_progress("embedding", chunks_done, len(chunks))
+
+    return await _run_ingest(
+        chunks, start_time, document_id, namespace, batch_size, pool,
+        embed_concurrency, max_queued_batches, copy_concurrency, incremental, use_embedding_cache,
+        on_batch_written, version=version,
+    )
+
+
+async def _run_ingest(
+    chunks: Iterable[ChunkRecord],
+    start_time: float,
+    document_id: str,
+    namespace: str,
+    batch_size: int,
+    pool: Pool | None,
+    embed_concurrency: int,
+    max_queued_batches: int,
+    copy_concurrency: int,
+    incremental: bool,
+    use_embedding_cache: bool,
+    on_batch_written: BatchWrittenFn | None,
+    insert: InsertFn | None = None,
+    version: int | None = None,
+) -> dict:
+    if incremental and insert is not None:
+        raise ValueError("incremental re-ingest writes to documents directly; it takes no insert=")
     owns_pool = pool is None
 
     if owns_pool:
         pool = await create_pool()
 
-    for batch in batch_generator(chunks, batch_size):
-        embedded_batch = await embed_chunks(batch)
-        async with pool.acquire() as conn:
-            await bulk_insert(conn, embedded_batch, document_id=document_id, namespace=namespace)
-        total_chunks += len(embedded_batch)
+    embedding_cache = EmbeddingCache(pool) if use_embedding_cache else None
+    options = dict(
+        batch_size=batch_size,
+        embed_concurrency=embed_concurrency,
+        max_queued_batches=max_queued_batches,
+        embedding_cache=embedding_cache,
+        on_batch_written=on_batch_written,
+        copy_concurrency=copy_concurrency,
+        version=version,
+    )
 
-    if owns_pool:
-        await pool.close()
+    try:
+        if incremental:
+            stage_metrics = await ingest_changed_chunks(chunks, pool, document_id, namespace, **options)
+        else:
+            stage_metrics = await ingest_chunks(chunks, pool, document_id, namespace, insert=insert, **options)
+    finally:
+        if owns_pool:
+            await pool.close()
 
     elapsed_time = time.perf_counter() - start_time
+    total_chunks = stage_metrics["total_chunks"]
 
     return {
-        'total_chunks': total_chunks,
+        **stage_metrics,
+        **get_embedding_scheduler().stats(),    # adaptive batch size / concurrency where the run ended
         'total_time_seconds': round(elapsed_time, 3),
         'throughput_chunks_per_second': round(total_chunks / elapsed_time, 2) if elapsed_time > 0 else 0,
     }
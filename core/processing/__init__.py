@@ -1,8 +1,9 @@
-from core.processing.cpu_offload import get_pool, run_cpu_bound, shutdown_pool
+from core.processing.cpu_offload import get_pool, run_cpu_bound, run_cpu_bound_shared, shutdown_pool
 from core.processing.pipeline import chunk_document
 
 __all__ = [
     "run_cpu_bound",
+    "run_cpu_bound_shared",
     "get_pool",
     "shutdown_pool",
     "chunk_document",
@@ -25,13 +25,26 @@ RULES FOR CALLABLES PASSED TO run_cpu_bound:
      that captures unpicklable state. Process pool workers communicate via
      pickle; only picklable objects cross the boundary.
   2. Arguments must also be picklable (str, bytes, list, dict — all fine).
-  3. Return value must be picklable (list[ChunkRecord] is fine — dataclass).
+  3. Return value must be picklable (list[ChunkRecord] is fine — slotted class).
   4. Keep the payload small. Sending 100MB across processes costs more than
      the CPU work saves. Lab 4.2 found break-even at ~100KB for this workload.
+
+SHARED-MEMORY MODE (run_cpu_bound_shared):
+  For one large text argument, pickling copies it into the pipe, the worker
+  copies it out and unpickles it. run_cpu_bound_shared() instead writes the
+  UTF-8 bytes once into a multiprocessing.shared_memory block and sends only
+  (block name, byte length). The worker decodes straight from the mapped
+  block — one copy, no pipe traffic proportional to the document. The block
+  is unlinked by the caller when the call returns or fails.
+
+  The result still comes back by pickle, so callers should return something
+  compact — core.processing.pipeline returns chunk offsets, not ChunkRecords.
 """
 
 import asyncio
 from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
 from typing import Any, Callable
 
 # One pool, shared for the entire process lifetime.
@@ -54,6 +67,11 @@ def get_pool(max_workers: int = 4) -> ProcessPoolExecutor:
     """
     global _pool
     if _pool is None:
+        # Start the resource tracker before any worker exists so the workers
+        # inherit it. Otherwise each worker starts its own on first
+        # SharedMemory attach, and that tracker tries to unlink every block
+        # the worker touched when it exits (run_cpu_bound_shared).
+        resource_tracker.ensure_running()
         _pool = ProcessPoolExecutor(max_workers=max_workers)
     return _pool
 
@@ -99,3 +117,37 @@ async def run_cpu_bound(fn: Callable, *args: Any) -> Any:
     """
     loop = asyncio.get_running_loop()
     return await loop.run_in_executor(get_pool(), fn, *args)
+
+
+def _call_with_shared_text(fn: Callable, shm_name: str, size: int, *args: Any) -> Any:
+    """Worker side of run_cpu_bound_shared: fn(text, *args), text read from the block."""
+    shm = SharedMemory(name=shm_name)
+    try:
+        text = str(shm.buf[:size], "utf-8")
+    finally:
+        shm.close()
+    return fn(text, *args)
+
+
+async def run_cpu_bound_shared(fn: Callable, text: str, *args: Any) -> Any:
+    """
+    run_cpu_bound(fn, text, *args), with text passed through shared memory
+    instead of being pickled.
+
+    Same rules as run_cpu_bound for fn, args and the return value. Pool
+    workers share the parent's resource tracker (see get_pool), so the block
+    is tracked once and removed exactly once, here.
+
+    Example:
+        offsets = await run_cpu_bound_shared(pack_fn, document_text, "big.md")
+    """
+    data = text.encode("utf-8")
+    size = len(data)
+    shm = SharedMemory(create=True, size=max(size, 1))      # size 0 is rejected
+    try:
+        shm.buf[:size] = data
+        del data                                            # the block holds it now
+        return await run_cpu_bound(_call_with_shared_text, fn, shm.name, size, *args)
+    finally:
+        shm.close()
+        shm.unlink()
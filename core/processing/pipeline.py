@@ -23,28 +23,176 @@ WHY THE SPLIT BETWEEN pipeline.py AND db_ingest.py:
     over the network, not read from disk.
 
   They coexist. Week 5 builds on this file; Week 3 script stays as a benchmark
-  reference.
+  reference. The /ingest route now chunks uploads here (via
+  db_ingest.ingest_document) instead of writing them to a temp file.
+
+INLINE VS PROCESS POOL:
+  Offloading is not free — the text is pickled to the worker and every
+  ChunkRecord pickled back. Lab 4.2 measured that round trip still losing at
+  100KB and winning 2.4x at 10MB. Documents under
+  CHUNKING_CONFIG["offload_threshold_chars"] are chunked inline (a few ms on
+  the loop); larger ones go to the pool so a big upload never stalls /search
+  for everyone else.
+
+TRANSFER MODES (CHUNKING_CONFIG["offload_transfer"]):
+  "pickle"  text pickled in, list[ChunkRecord] pickled out — every record
+            carrying its own copy of the per-document metadata.
+  "shared"  text in through shared memory (run_cpu_bound_shared); out comes a
+            PackedChunks — (start, end) per chunk in one int64 array, the
+            metadata common to every chunk once, only the varying fields per
+            chunk. The parent rebuilds the records by slicing its own copy of
+            the text (unpack_chunks). Chunks that are not verbatim slices
+            (OpenAPI operations, header-aware sections re-joined with their
+            heading) travel as text.
+
+  Lab 4.6 (scripts/labs/lab_4.6_shared_memory_offload.py): "shared" cuts the
+  bytes sent back 3-7x at 1-10MB (25x+ below 300KB), but not the time —
+  pickling a str is already one encode + copy, and rebuilding records in
+  Python costs about what unpickling them does. Round-trip overhead is 5-10% of
+  the chunking time in both modes, so "pickle" stays the default; "shared"
+  is for memory-tight deployments with large uploads.
 """
 
+from array import array
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
 
+from config import CHUNKING_CONFIG
 from core.ingestion.chunkers import ChunkRecord, get_chunker
-from core.processing.cpu_offload import run_cpu_bound
+from core.ingestion.tokenizer import TokenCounter
+from core.processing.cpu_offload import run_cpu_bound, run_cpu_bound_shared
+
+# How far past the previous chunk pack_chunks looks for a chunk that is not
+# where its metadata says. Keeps the search linear; anything not found inside
+# the window is shipped as text instead.
+_LOCATE_SLACK = 1024
+
+
+@dataclass
+class PackedChunks:
+    """
+    Compact, picklable form of a list[ChunkRecord] chunked from one text.
+
+    offsets: int64 (start, end) pairs, one per chunk. start >= 0 → content is
+             text[start:end]; start == -1 → content is texts[end].
+    header:  metadata identical in every chunk, sent once.
+    columns: metadata keys every chunk has, with differing values — one list each.
+    extras:  chunk index → keys only some chunks have.
+    """
+    offsets: bytes
+    texts:   list[str]             = field(default_factory=list)
+    header:  dict                  = field(default_factory=dict)
+    columns: dict[str, list]       = field(default_factory=dict)
+    extras:  dict[int, dict]       = field(default_factory=dict)
+
+
+def pack_chunks(text: str, chunks: list[ChunkRecord]) -> PackedChunks:
+    """Encode chunks produced from text as offsets into it plus factored metadata."""
+    spans = array("q")
+    texts: list[str] = []
+    start = end = 0
+    for chunk in chunks:
+        content = chunk.content
+        hint = chunk.metadata.get("char_start", -1)
+        if isinstance(hint, int) and hint >= 0 and text.startswith(content, hint):
+            pos = hint
+        else:
+            # Bounded search from the previous chunk — chunks arrive in
+            # document order, possibly overlapping their predecessor
+            pos = text.find(content, start, max(end, start) + len(content) + _LOCATE_SLACK)
+        if pos == -1:
+            spans.extend((-1, len(texts)))
+            texts.append(content)
+        else:
+            start, end = pos, pos + len(content)
+            spans.extend((start, end))
+
+    packed = PackedChunks(offsets=spans.tobytes(), texts=texts)
+    if not chunks:
+        return packed
+
+    metadatas = [c.metadata for c in chunks]
+    missing = object()
+    for key, value in metadatas[0].items():
+        column = [m.get(key, missing) for m in metadatas]
+        if missing in column:
+            continue                        # not in every chunk → extras
+        if column.count(value) == len(column):
+            packed.header[key] = value
+        else:
+            packed.columns[key] = column
+
+    shared = packed.header.keys() | packed.columns.keys()
+    for i, metadata in enumerate(metadatas):
+        if metadata.keys() != shared:
+            packed.extras[i] = {k: v for k, v in metadata.items() if k not in shared}
+    return packed
+
+
+def unpack_chunks(text: str, packed: PackedChunks) -> list[ChunkRecord]:
+    """Rebuild the ChunkRecords pack_chunks encoded, slicing contents out of text."""
+    spans = array("q")
+    spans.frombytes(packed.offsets)
+    records = []
+    for i in range(len(spans) // 2):
+        start, end = spans[2 * i], spans[2 * i + 1]
+        own = {key: column[i] for key, column in packed.columns.items()}
+        if i in packed.extras:
+            own.update(packed.extras[i])
+        records.append(ChunkRecord(
+            content=text[start:end] if start >= 0 else packed.texts[end],
+            metadata=own,
+            shared_metadata=packed.header,   # one dict for every record, as in the worker
+        ))
+    return records
+
+
+def _chunk_text(
+    extension: str,
+    text:      str,
+    source:    str,
+    token_counter: TokenCounter | None = None,
+) -> list[ChunkRecord]:
+    """
+    Pick the chunker (including JSON content sniffing, which parses the
+    whole text) and run it. Module-level so the pool can pickle it — the
+    sniffing runs in the worker too.
+    """
+    chunker = get_chunker(extension, text=text)
+    if token_counter is not None:
+        return chunker(text, source, token_counter=token_counter)
+    return chunker(text, source)
+
+
+def _chunk_text_packed(
+    text:      str,
+    extension: str,
+    source:    str,
+    token_counter: TokenCounter | None = None,
+) -> PackedChunks:
+    """Pool-side chunking: text arrives via shared memory, offsets go back."""
+    return pack_chunks(text, _chunk_text(extension, text, source, token_counter))
 
 
 async def chunk_document(
     text:   str,
     source: str | Path,
+    token_counter: TokenCounter | None = None,
+    offload_threshold: int | None = None,
+    offload_transfer: str | None = None,
 ) -> list[ChunkRecord]:
     """
-    Select the correct chunker for source's file extension and run it in
-    the process pool so the event loop is not blocked.
+    Select the correct chunker for source's file extension and run it —
+    inline for small documents, in the process pool for large ones so the
+    event loop is not blocked.
 
     Extension dispatch (via CHUNKER_REGISTRY in core/ingestion/chunkers.py):
         .txt  → recursive_split        (paragraph → sentence → character)
         .md   → header_aware_split     (# / ## / ### boundaries)
         .json → chunk_openapi_spec     (one HTTP operation = one chunk)
         .pdf  → NotImplementedError    (Week 13 — Docling multimodal)
+    Text that parses as JSON goes to chunk_openapi_spec whatever the extension.
 
     Args:
         text:   Full document text, already decoded to str.
@@ -52,6 +200,15 @@ async def chunk_document(
                   1. Extension detection (which chunker to use)
                   2. Stored in every ChunkRecord's metadata.source field
                      so retrieval results can cite the origin document.
+        token_counter: size chunks in tokens (core/ingestion/tokenizer.py).
+                It pickles as its vocabulary path, so the worker process
+                loads the vocabulary once and reuses it for later calls.
+        offload_threshold: chunk in the process pool when len(text) reaches
+                this many characters. Default: CHUNKING_CONFIG
+                ["offload_threshold_chars"] (the Lab 4.2 break-even).
+        offload_transfer: "pickle" or "shared" — how text and chunks cross
+                to the pool (see TRANSFER MODES above). Default:
+                CHUNKING_CONFIG["offload_transfer"].
 
     Returns:
         list[ChunkRecord] — each record has:
@@ -68,8 +225,23 @@ async def chunk_document(
         chunks = await chunk_document(readme_text, source="README.md")
         chunks = await chunk_document(spec_json,   source="openapi.json")
     """
-    ext     = Path(source).suffix          # e.g. ".md", ".json", ".txt"
-    chunker = get_chunker(ext)             # raises ValueError / NotImplementedError early
+    ext = Path(source).suffix              # e.g. ".md", ".json", ".txt"
+    get_chunker(ext)                       # raises ValueError / NotImplementedError early
+
+    if offload_threshold is None:
+        offload_threshold = CHUNKING_CONFIG["offload_threshold_chars"]
+    if offload_transfer is None:
+        offload_transfer = CHUNKING_CONFIG["offload_transfer"]
+
+    if len(text) < offload_threshold:
+        # Below break-even — pickling to a worker would cost more than the work
+        return _chunk_text(ext, text, str(source), token_counter)
 
-    # Offload to process pool — chunking is CPU work, never call inline in async
-    return await run_cpu_bound(chunker, text, str(source))
+    # run_cpu_bound takes positional args only; partial of a module-level
+    # function still pickles (a TokenCounter pickles as its path)
+    if offload_transfer == "shared":
+        packed = await run_cpu_bound_shared(
+            partial(_chunk_text_packed, token_counter=token_counter), text, ext, str(source)
+        )
+        return unpack_chunks(text, packed)
+    return await run_cpu_bound(partial(_chunk_text, token_counter=token_counter), ext, text, str(source))
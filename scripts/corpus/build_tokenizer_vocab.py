@@ -0,0 +1,55 @@
+"""
+scripts/corpus/build_tokenizer_vocab.py
+=========================================
+Builds the bundled WordPiece vocabulary used for token-accurate chunk sizing
+(core/ingestion/vocab/wordpiece_compliance.json, see core.ingestion.tokenizer).
+
+The embedding model's own tokenizer is not downloadable at ingest time (air-
+gapped deployments, no HF hub access), so the repo ships a vocabulary trained
+on its own corpus with the same scheme as bert-base-uncased: BERT normalizer
+(lowercase), BERT pre-tokenizer (whitespace + punctuation), WordPiece with
+"##" continuations. Re-run after the corpus under data/ changes materially.
+
+Usage:
+  python scripts/corpus/build_tokenizer_vocab.py
+  python scripts/corpus/build_tokenizer_vocab.py --vocab-size 8000 --out /tmp/tokenizer.json
+"""
+
+import argparse
+from pathlib import Path
+
+from tokenizers import Tokenizer, decoders, models, normalizers, pre_tokenizers, trainers
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_OUT = ROOT / "core" / "ingestion" / "vocab" / "wordpiece_compliance.json"
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def build(vocab_size: int, out: Path) -> int:
+    files = sorted(str(p) for pattern in ("*.md", "*.txt") for p in (ROOT / "data").rglob(pattern))
+    if not files:
+        raise SystemExit(f"No .md/.txt files under {ROOT / 'data'}")
+
+    tokenizer = Tokenizer(models.WordPiece(unk_token="[UNK]", max_input_chars_per_word=100))
+    tokenizer.normalizer = normalizers.BertNormalizer(
+        clean_text=True, handle_chinese_chars=True, strip_accents=None, lowercase=True
+    )
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.decoder = decoders.WordPiece()
+    trainer = trainers.WordPieceTrainer(
+        vocab_size=vocab_size, min_frequency=2, special_tokens=SPECIAL_TOKENS, show_progress=False
+    )
+    tokenizer.train(files, trainer)
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tokenizer.save(str(out))
+    print(f"{len(files)} files → {tokenizer.get_vocab_size()} tokens → {out.relative_to(ROOT) if out.is_relative_to(ROOT) else out}")
+    return tokenizer.get_vocab_size()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the bundled WordPiece vocabulary on data/")
+    parser.add_argument("--vocab-size", type=int, default=8000)
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    args = parser.parse_args()
+    build(args.vocab_size, args.out)
@@ -11,6 +11,11 @@ The original script has a hardcoded list of three synthetic files.
 This one scans a directory for every .md file and ingests them all,
 using the filename (without extension) as the document_id.
 
+Loading goes through core.pipeline.bulk_ingest: one shared pool for the
+whole run, several documents in flight at once, document_registry kept up to
+date (unchanged files are skipped on re-runs), and an optional checkpoint
+file so an interrupted run resumes where it stopped.
+
 Two namespaces are handled:
   - legal   → data/compliance/real/*.md         (GDPR/CCPA/HIPAA)
   - kyc_aml → data/compliance/real/kyc_aml/*.md (KYC/AML/CFR)
@@ -30,6 +35,9 @@ USAGE
     python scripts/ingest_real_corpus.py --namespace legal
     python scripts/ingest_real_corpus.py --namespace kyc_aml
 
+    # More documents in flight, resumable:
+    python scripts/ingest_real_corpus.py --concurrency 8 --checkpoint .real_corpus_checkpoint.json
+
 IMPORTANT: Run the fetch scripts first.
     python scripts/fetch_real_compliance_corpus.py
     python scripts/fetch_real_kyc_aml_corpus.py
@@ -44,11 +52,12 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-from core.pipeline.db_ingest import ingestion_pipeline
+from core.database import create_pool
+from core.pipeline.bulk_ingest import DEFAULT_CONCURRENCY, BulkIngestItem, bulk_ingest
 
 # ── Namespace → directory mapping ─────────────────────────────────────────────
 NAMESPACES = {
-    "legal":   Path("data/compliance/real"),
+    "legal":   Path("data/compliance/real/legal"),
     "kyc_aml": Path("data/compliance/real/kyc_aml"),
 }
 
@@ -74,35 +83,40 @@ def collect_files(namespace: str) -> list[tuple[Path, str]]:
     return files
 
 
-async def ingest_namespace(namespace: str, files: list[tuple[Path, str]], dry_run: bool) -> int:
-    """Ingest all files for one namespace. Returns total chunk count."""
-    total_chunks = 0
-    for path, doc_id in files:
-        if dry_run:
+async def ingest_namespace(pool, namespace: str, files: list[tuple[Path, str]], dry_run: bool,
+                           concurrency: int, checkpoint: str | None) -> int:
+    """Ingest all files for one namespace through the shared pool. Returns total chunk count."""
+    if dry_run:
+        for path, doc_id in files:
             print(f"  [DRY RUN] would ingest {path.name} → namespace={namespace} document_id={doc_id}")
-            continue
+        return 0
+
+    items = [BulkIngestItem(path=path, document_id=doc_id, namespace=namespace) for path, doc_id in files]
+    report = await bulk_ingest(items, pool=pool, concurrency=concurrency, checkpoint_path=checkpoint)
 
-        print(f"  [ingesting] {path.name} (document_id={doc_id}, namespace={namespace})")
-        try:
-            metrics = await ingestion_pipeline(
-                input_file_path=str(path),
-                document_id=doc_id,
-                namespace=namespace,
-            )
-            print(f"    chunks={metrics['total_chunks']} "
-                  f"time={metrics['total_time_seconds']}s "
-                  f"throughput={metrics['throughput_chunks_per_second']} chunks/s")
-            total_chunks += metrics["total_chunks"]
-        except Exception as e:
-            print(f"    [ERROR] {path.name}: {e}")
-            # Don't abort — log the failure and continue with remaining files.
-
-    return total_chunks
-
-
-async def main(target_namespace: str | None, dry_run: bool):
+    print(f"    ingested={report['ingested']} unchanged={report['unchanged']} "
+          f"resumed_skipped={report['resumed_skipped']} failed={len(report['failed'])}")
+    print(f"    chunks={report['total_chunks']} time={report['total_time_seconds']}s "
+          f"throughput={report['throughput_chunks_per_second']} chunks/s")
+    for failure in report["failed"]:
+        # Don't abort — failures are reported and retried on the next run.
+        print(f"    [ERROR] {failure['document_id']}: {failure['error']}")
+
+    return report["total_chunks"]
+
+
+async def main(target_namespace: str | None, dry_run: bool, concurrency: int, checkpoint: str | None):
     namespaces_to_run = [target_namespace] if target_namespace else list(NAMESPACES)
 
+    pool = None if dry_run else await create_pool()
+    try:
+        await _run_namespaces(pool, namespaces_to_run, dry_run, concurrency, checkpoint)
+    finally:
+        if pool is not None:
+            await pool.close()
+
+
+async def _run_namespaces(pool, namespaces_to_run, dry_run, concurrency, checkpoint):
     grand_total = 0
     for namespace in namespaces_to_run:
         base_dir = NAMESPACES[namespace]
@@ -125,7 +139,7 @@ async def main(target_namespace: str | None, dry_run: bool):
             print(f"  {path.name:<40} ({size_kb:.1f} KB) → document_id={doc_id}")
 
         print()
-        chunks = await ingest_namespace(namespace, files, dry_run)
+        chunks = await ingest_namespace(pool, namespace, files, dry_run, concurrency, checkpoint)
         grand_total += chunks
 
         if not dry_run:
@@ -141,6 +155,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingest real statutory corpus into RAG platform")
     parser.add_argument("--namespace", choices=list(NAMESPACES), help="Ingest one namespace only")
     parser.add_argument("--dry-run", action="store_true", help="List files without touching the DB")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Documents in flight at once")
+    parser.add_argument("--checkpoint", help="Progress file; reuse it to resume an interrupted run")
     args = parser.parse_args()
 
-    asyncio.run(main(args.namespace, args.dry_run))
+    asyncio.run(main(args.namespace, args.dry_run, args.concurrency, args.checkpoint))
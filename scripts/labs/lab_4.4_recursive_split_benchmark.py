@@ -0,0 +1,158 @@
+"""
+lab_4.4_recursive_split_benchmark.py
+====================================
+Lab 4.4c — span-based recursive_split vs the string-building original.
+
+The original (kept below as baseline_recursive_split, verbatim from before the
+change) rebuilt `current + sep + part` for every part and recovered
+char_start with an unbounded text.find(). The find is what hurt: whenever a
+chunk is not a verbatim slice of the source (extra blank lines or spaces
+between parts are normalised to one separator), it fails after scanning to
+the end of the document — once per chunk, so quadratic in document size.
+
+core.ingestion.chunkers.recursive_split now splits on (start, end) spans and
+bounds every lookup by the chunk's own position. Chunks and offsets are
+identical — the benchmark asserts that on every input before reporting. (They
+can only differ where the original's unbounded find matched a later,
+unrelated repeat of a chunk's text, i.e. where its char_start was wrong.)
+
+Inputs (built by repeating the real corpus under data/ to the target size):
+  corpus           the .md corpus as is
+  one_paragraph    same words, single spaces, no blank lines (word-level path)
+  blank_lines      every paragraph break widened to three newlines
+
+Usage:
+  PYTHONPATH=. python scripts/labs/lab_4.4_recursive_split_benchmark.py
+  PYTHONPATH=. python scripts/labs/lab_4.4_recursive_split_benchmark.py --sizes-mb 1 10 100 --baseline-max-mb 10
+
+The baseline is skipped above --baseline-max-mb: at 100 MB its blank_lines run
+takes tens of minutes.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.ingestion.chunkers import ChunkRecord, recursive_split  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[2]
+RESULTS_PATH = ROOT / "benchmarks" / "lab_4.4_recursive_split_benchmarks.json"
+SEPARATORS = ["\n\n", ". ", "! ", "? ", " "]
+
+
+def baseline_recursive_split(text: str, chunk_size: int = 1200, overlap: int = 100) -> list[ChunkRecord]:
+    """The pre-change algorithm, building the same ChunkRecords so timings compare like for like."""
+
+    def _split_recursive(text: str, separators: list[str]) -> list[str]:
+        if not separators:
+            segments, start = [], 0
+            while start < len(text):
+                segments.append(text[start:start + chunk_size])
+                start += chunk_size - overlap
+            return segments
+
+        sep = separators[0]
+        parts = [p.strip() for p in text.split(sep) if p.strip()]
+        segments, current = [], ""
+        for part in parts:
+            candidate = (current + sep + part).strip() if current else part
+            if len(candidate) <= chunk_size:
+                current = candidate
+            else:
+                if current:
+                    segments.append(current)
+                if len(part) > chunk_size:
+                    segments.extend(_split_recursive(part, separators[1:]))
+                    current = ""
+                else:
+                    current = part
+        if current:
+            segments.append(current)
+        return segments
+
+    valid, char_positions, cursor = [], [], 0
+    for seg in _split_recursive(text, SEPARATORS):
+        seg = seg.strip()
+        if not seg:
+            continue
+        pos = text.find(seg, cursor)
+        if pos == -1:
+            pos = cursor
+        valid.append(seg)
+        char_positions.append(pos)
+        cursor = pos + len(seg)
+
+    base_metadata = {"source": "unknown", "filename": "unknown", "strategy": "recursive",
+                     "chunk_size": chunk_size, "overlap": overlap}
+    return [
+        ChunkRecord(content=segment, metadata={
+            **base_metadata,
+            "chunk_index": i,
+            "chunk_total": len(valid),
+            "char_start":  char_positions[i],
+            "char_end":    char_positions[i] + len(segment),
+            "word_count":  len(segment.split()),
+        })
+        for i, segment in enumerate(valid)
+    ]
+
+
+def build_inputs(size: int) -> dict[str, str]:
+    corpus = "\n\n".join(
+        p.read_text(encoding="utf-8") for p in sorted((ROOT / "data").rglob("*.md"))
+    )
+    shapes = {
+        "corpus":        corpus,
+        "one_paragraph": " ".join(corpus.split()),
+        "blank_lines":   corpus.replace("\n\n", "\n\n\n"),
+    }
+    return {name: (base * (size // len(base) + 1))[:size] for name, base in shapes.items()}
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round(time.perf_counter() - t0, 3)
+
+
+def run(sizes_mb: list[int], baseline_max_mb: int, chunk_size: int, overlap: int) -> list[dict]:
+    results = []
+    for mb in sizes_mb:
+        for shape, text in build_inputs(mb * 1_000_000).items():
+            chunks, new_s = timed(recursive_split, text, chunk_size=chunk_size, overlap=overlap)
+            row = {"size_mb": mb, "input": shape, "chunks": len(chunks), "span_based_s": new_s}
+
+            if mb <= baseline_max_mb:
+                expected, old_s = timed(baseline_recursive_split, text, chunk_size, overlap)
+                assert [(c.content, c.metadata) for c in chunks] == [(c.content, c.metadata) for c in expected], \
+                    f"{shape}: output differs"
+                row.update(original_s=old_s, speedup=round(old_s / new_s, 1) if new_s else None)
+
+            results.append(row)
+            print(
+                f"{mb:>4} MB  {shape:<14} {row['chunks']:>7} chunks  "
+                f"span-based {new_s:>7.3f}s  "
+                + (f"original {row['original_s']:>8.3f}s  ({row['speedup']}x)" if "original_s" in row else "original skipped")
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark span-based recursive_split against the original")
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--baseline-max-mb", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=1200)
+    parser.add_argument("--overlap", type=int, default=100)
+    args = parser.parse_args()
+
+    results = run(args.sizes_mb, args.baseline_max_mb, args.chunk_size, args.overlap)
+    RESULTS_PATH.write_text(json.dumps({
+        "chunk_size": args.chunk_size,
+        "overlap": args.overlap,
+        "results": results,
+    }, indent=2))
+    print(f"\nResults written to {RESULTS_PATH.relative_to(ROOT)}")
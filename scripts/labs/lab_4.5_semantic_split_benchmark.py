@@ -0,0 +1,152 @@
+"""
+lab_4.5_semantic_split_benchmark.py
+===================================
+Lab 4.5 — cost per MB of semantic_split against recursive_split.
+
+semantic_split embeds one window of sentences per sentence, so its cost has
+two parts the recursive strategy does not pay at all:
+  embed   — embed_fn calls. Reported as calls/MB and embedded chars/MB: with
+            window=3 every sentence is sent three times, so a provider bills
+            roughly window x the document for chunking alone, before the
+            chunks themselves are embedded.
+  split   — sentence spans, window matrix normalisation, the similarity
+            vector and the merge pass (total time minus embed time).
+
+Embedders:
+  hashed    (default) local feature-hashing bag of words, 768 dims — no
+            network, so the numbers isolate the chunker's own overhead
+  provider  litellm.embedding with LLM_CONFIG["embedding_model"] (needs the
+            provider up; use small --sizes-mb)
+
+Usage:
+  PYTHONPATH=. python scripts/labs/lab_4.5_semantic_split_benchmark.py
+  PYTHONPATH=. python scripts/labs/lab_4.5_semantic_split_benchmark.py --sizes-mb 0.1 --embedder provider
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.ingestion.chunkers import recursive_split, semantic_split  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[2]
+RESULTS_PATH = ROOT / "benchmarks" / "lab_4.5_semantic_split_benchmarks.json"
+DIM = 768
+_WORD = re.compile(r"\w+")
+
+
+class HashedEmbedder:
+    """Bag-of-words vectors via feature hashing. Deterministic across runs (crc32)."""
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+        self.buckets: dict[str, int] = {}
+        self.calls = 0
+        self.chars = 0
+        self.seconds = 0.0
+
+    def _bucket(self, word: str) -> int:
+        bucket = self.buckets.get(word)
+        if bucket is None:
+            bucket = self.buckets[word] = zlib.crc32(word.encode()) % self.dim
+        return bucket
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        t0 = time.perf_counter()
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = [self._bucket(w) for w in _WORD.findall(text.lower())]
+            if ids:
+                matrix[row] = np.bincount(ids, minlength=self.dim)
+        self._record(texts, t0)
+        return matrix
+
+    def _record(self, texts: list[str], t0: float) -> None:
+        self.calls += 1
+        self.chars += sum(map(len, texts))
+        self.seconds += time.perf_counter() - t0
+
+
+class ProviderEmbedder(HashedEmbedder):
+    """The configured embedding model, called synchronously like a process-pool chunker would."""
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        import litellm
+
+        from config import LLM_CONFIG
+
+        t0 = time.perf_counter()
+        response = litellm.embedding(model=LLM_CONFIG["embedding_model"], input=texts)
+        self._record(texts, t0)
+        return [item["embedding"] for item in response.data]
+
+
+def build_input(size: int) -> str:
+    corpus = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted((ROOT / "data").rglob("*.md")))
+    return (corpus * (size // len(corpus) + 1))[:size]
+
+
+def run(sizes_mb: list[float], embedder_name: str, chunk_size: int, threshold: float, batch_size: int) -> list[dict]:
+    results = []
+    for mb in sizes_mb:
+        text = build_input(int(mb * 1_000_000))
+
+        t0 = time.perf_counter()
+        recursive = recursive_split(text, chunk_size=chunk_size)
+        recursive_s = time.perf_counter() - t0
+
+        embedder = (ProviderEmbedder if embedder_name == "provider" else HashedEmbedder)()
+        t0 = time.perf_counter()
+        semantic = semantic_split(
+            text, chunk_size=chunk_size, embed_fn=embedder.embed, threshold=threshold, batch_size=batch_size
+        )
+        semantic_s = time.perf_counter() - t0
+
+        row = {
+            "size_mb":                    mb,
+            "recursive_chunks":           len(recursive),
+            "recursive_s_per_mb":         round(recursive_s / mb, 3),
+            "semantic_chunks":            len(semantic),
+            "semantic_topic_boundaries":  sum(c.metadata["boundary"] == "topic" for c in semantic),
+            "semantic_s_per_mb":          round(semantic_s / mb, 3),
+            "semantic_embed_s_per_mb":    round(embedder.seconds / mb, 3),
+            "semantic_split_s_per_mb":    round((semantic_s - embedder.seconds) / mb, 3),
+            "embed_calls_per_mb":         round(embedder.calls / mb, 1),
+            "embedded_chars_per_mb":      round(embedder.chars / mb),
+        }
+        results.append(row)
+        print(
+            f"{mb:>5} MB  recursive {row['recursive_s_per_mb']:>6.3f} s/MB ({len(recursive)} chunks)  |  "
+            f"semantic {row['semantic_s_per_mb']:>6.3f} s/MB = embed {row['semantic_embed_s_per_mb']:.3f} "
+            f"+ split {row['semantic_split_s_per_mb']:.3f} ({len(semantic)} chunks, "
+            f"{row['embed_calls_per_mb']} calls/MB, {row['embedded_chars_per_mb']:,} chars embedded/MB)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost per MB: semantic_split vs recursive_split")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--embedder", choices=["hashed", "provider"], default="hashed")
+    parser.add_argument("--chunk-size", type=int, default=1200)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    results = run(args.sizes_mb, args.embedder, args.chunk_size, args.threshold, args.batch_size)
+    RESULTS_PATH.write_text(json.dumps({
+        "embedder": args.embedder,
+        "chunk_size": args.chunk_size,
+        "threshold": args.threshold,
+        "batch_size": args.batch_size,
+        "results": results,
+    }, indent=2))
+    print(f"\nResults written to {RESULTS_PATH.relative_to(ROOT)}")
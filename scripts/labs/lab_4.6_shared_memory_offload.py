@@ -0,0 +1,224 @@
+"""
+lab_4.6_shared_memory_offload.py
+================================
+Lab 4.6 — where does offloading chunking to the process pool pay off, with
+and without the shared-memory transfer?
+
+Lab 4.2 found the break-even for pickled payloads between 100KB and 10MB.
+core.processing.pipeline.chunk_document now sends the text through shared
+memory and gets back PackedChunks (offsets + factored metadata) instead of
+pickled ChunkRecords. This lab chunks N_DOCS documents of each size three ways:
+
+  inline    one after another on the calling thread (what the loop would do)
+  pickled   concurrently in the pool — text pickled in, list[ChunkRecord] out
+  shared    concurrently in the pool — run_cpu_bound_shared + unpack_chunks
+
+and reports, per size:
+  - wall time for the N_DOCS batch in each mode, and the speedup over inline
+  - overhead_ms: what one document's round trip costs on top of the
+    chunking itself, through the real pool and pipe:
+      pickled  ship the text to a worker + ship the records (both by pickle)
+      shared   ship the text via shared memory + ship the PackedChunks,
+               plus pack_chunks (worker) and unpack_chunks (parent)
+    Each ship is timed as a worker call that returns id() of its argument,
+    so no chunking is included; the second call's dispatch is subtracted.
+    This does not depend on the core count, so it is measurable on a small
+    machine where the batch timings cannot show any parallel gain.
+  - the bytes pickled per document each way
+Both pool modes are checked to return exactly the inline chunks before any
+timing is reported.
+
+Break-even. Measured: the smallest size from which a pool mode beats inline
+for the batch — only meaningful with at least N_DOCS cores. Estimated: with
+W workers the pool wins once the per-document chunking time exceeds
+overhead / (W - 1), so it is derived from overhead_ms for the configured
+--workers even on a smaller machine.
+
+Inputs are built by repeating the real corpus under data/ to the target size:
+  md    the .md corpus (header_aware_split)
+  txt   same text as .txt (recursive_split)
+
+Usage:
+  PYTHONPATH=. python scripts/labs/lab_4.6_shared_memory_offload.py
+  PYTHONPATH=. python scripts/labs/lab_4.6_shared_memory_offload.py --sizes-kb 10 100 1000 --repeats 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.processing.cpu_offload import get_pool, run_cpu_bound, run_cpu_bound_shared, shutdown_pool  # noqa: E402
+from core.processing.pipeline import _chunk_text, _chunk_text_packed, pack_chunks, unpack_chunks  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[2]
+RESULTS_PATH = ROOT / "benchmarks" / "lab_4.6_shared_memory_offload.json"
+N_DOCS = 4
+
+
+def build_inputs(size: int) -> dict[str, str]:
+    corpus = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted((ROOT / "data").rglob("*.md")))
+    return {ext: (corpus * (size // len(corpus) + 1))[:size] for ext in (".md", ".txt")}
+
+
+async def inline(docs: list[tuple[str, str, str]]):
+    return [_chunk_text(ext, text, source) for ext, text, source in docs]
+
+
+async def pickled(docs: list[tuple[str, str, str]]):
+    return await asyncio.gather(*(run_cpu_bound(_chunk_text, ext, text, source) for ext, text, source in docs))
+
+
+async def shared(docs: list[tuple[str, str, str]]):
+    packed = await asyncio.gather(
+        *(run_cpu_bound_shared(_chunk_text_packed, text, ext, source) for ext, text, source in docs)
+    )
+    return [unpack_chunks(text, p) for (_, text, _), p in zip(docs, packed)]
+
+
+async def best_of(mode, docs, repeats: int) -> tuple[list, float]:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = await mode(docs)
+        times.append(time.perf_counter() - t0)
+    return result, min(times)
+
+
+def best_time(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+async def best_async_time(make_call, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        await make_call()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+async def run(sizes_kb: list[int], repeats: int, workers: int) -> list[dict]:
+    # Warm the pool (spawn + imports) so no mode pays the cold start
+    await asyncio.gather(*(run_cpu_bound(_chunk_text, ".txt", "warm up", "w.txt") for _ in range(N_DOCS)))
+
+    # Pool dispatch latency: an empty task's round trip
+    dispatch = []
+    for _ in range(20):
+        t0 = time.perf_counter()
+        await run_cpu_bound(id, "")
+        dispatch.append(time.perf_counter() - t0)
+    dispatch_s = min(dispatch)
+
+    results = []
+    for kb in sizes_kb:
+        for ext, text in build_inputs(kb * 1024).items():
+            docs = [(ext, text, f"doc{i}{ext}") for i in range(N_DOCS)]
+            expected, inline_s = await best_of(inline, docs, repeats)
+            as_records, pickled_s = await best_of(pickled, docs, repeats)
+            as_offsets, shared_s = await best_of(shared, docs, repeats)
+            for got in (as_records, as_offsets):
+                assert [[(c.content, c.metadata) for c in doc] for doc in got] == \
+                       [[(c.content, c.metadata) for c in doc] for doc in expected], f"{kb}KB {ext}: output differs"
+
+            _, one_inline_s = await best_of(inline, docs[:1], repeats)
+            chunks = expected[0]
+            packed = pack_chunks(text, chunks)
+            pickled_overhead_s = (
+                await best_async_time(lambda: run_cpu_bound(id, text), repeats)
+                + await best_async_time(lambda: run_cpu_bound(id, chunks), repeats)
+                - dispatch_s
+            )
+            shared_overhead_s = (
+                await best_async_time(lambda: run_cpu_bound_shared(id, text), repeats)
+                + await best_async_time(lambda: run_cpu_bound(id, packed), repeats)
+                - dispatch_s
+                + best_time(lambda: pack_chunks(text, chunks), repeats)
+                + best_time(lambda: unpack_chunks(text, packed), repeats)
+            )
+            row = {
+                "size_kb": kb,
+                "input": ext,
+                "chunks_per_doc": len(chunks),
+                "inline_ms": round(inline_s * 1000, 2),
+                "pickled_ms": round(pickled_s * 1000, 2),
+                "shared_ms": round(shared_s * 1000, 2),
+                "pickled_speedup": round(inline_s / pickled_s, 2),
+                "shared_speedup": round(inline_s / shared_s, 2),
+                "chunk_ms_per_doc": round(one_inline_s * 1000, 2),
+                "pickled_overhead_ms": round(pickled_overhead_s * 1000, 2),
+                "shared_overhead_ms": round(shared_overhead_s * 1000, 2),
+                # Bytes crossing the pipe per document, each direction
+                "pickled_bytes_in": len(pickle.dumps(text)),
+                "pickled_bytes_out": len(pickle.dumps(chunks)),
+                "shared_bytes_out": len(pickle.dumps(packed)),
+            }
+            for mode in ("pickled", "shared"):
+                row[f"{mode}_wins_on_{workers}_workers"] = (
+                    row["chunk_ms_per_doc"] > row[f"{mode}_overhead_ms"] / max(workers - 1, 1)
+                )
+            results.append(row)
+            print(
+                f"{kb:>6} KB {ext:<5} {row['chunks_per_doc']:>6} chunks  inline {row['inline_ms']:>9.2f}ms  "
+                f"pickled {row['pickled_ms']:>9.2f}ms ({row['pickled_speedup']}x)  "
+                f"shared {row['shared_ms']:>9.2f}ms ({row['shared_speedup']}x)  "
+                f"overhead {row['pickled_overhead_ms']:>8.2f} → {row['shared_overhead_ms']:>8.2f}ms  "
+                f"out {row['pickled_bytes_out'] // 1024}KB → {row['shared_bytes_out'] // 1024}KB"
+            )
+    return results
+
+
+def break_even(results: list[dict], wins) -> dict[str, int | None]:
+    """Per input, the smallest size (KB) from which wins(row) holds for every larger size."""
+    out = {}
+    for ext in sorted({r["input"] for r in results}):
+        rows = sorted((r for r in results if r["input"] == ext), key=lambda r: r["size_kb"])
+        out[ext] = next((r["size_kb"] for i, r in enumerate(rows) if all(wins(later) for later in rows[i:])), None)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pickled vs shared-memory chunking offload")
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[10, 30, 100, 300, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=N_DOCS)
+    args = parser.parse_args()
+
+    get_pool(max_workers=args.workers)
+    try:
+        results = asyncio.run(run(args.sizes_kb, args.repeats, args.workers))
+    finally:
+        shutdown_pool()
+
+    summary = {
+        "measured": {
+            mode: break_even(results, lambda r, m=mode: r[f"{m}_speedup"] > 1) for mode in ("pickled", "shared")
+        },
+        f"estimated_{args.workers}_workers": {
+            mode: break_even(results, lambda r, m=mode: r[f"{m}_wins_on_{args.workers}_workers"])
+            for mode in ("pickled", "shared")
+        },
+    }
+    print(f"\nBreak-even (KB, smallest size from which the pool wins): {json.dumps(summary)}")
+    RESULTS_PATH.write_text(json.dumps({
+        "lab": "4.6 — shared-memory offload",
+        "n_docs": N_DOCS,
+        "workers": args.workers,
+        "cpu_count": os.cpu_count(),
+        "repeats": args.repeats,
+        "speedup_explanation": "inline_ms / pool_ms for N_DOCS documents. >1.0 means the pool wins.",
+        "break_even_kb": summary,
+        "results": results,
+    }, indent=2))
+    print(f"Results written to {RESULTS_PATH.relative_to(ROOT)}")
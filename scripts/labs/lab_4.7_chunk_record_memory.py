@@ -0,0 +1,168 @@
+"""
+lab_4.7_chunk_record_memory.py
+==============================
+Lab 4.7 — memory held by a 50k-chunk ingest, before and after the compact
+ChunkRecord.
+
+Before (kept below as LegacyChunkRecord, the pre-change dataclass):
+  - a __dict__ per record
+  - a full metadata dict per record, repeating source / filename / strategy /
+    chunk_size / overlap
+  - embedding as list[float]: 768 boxed Python floats, ~25KB per chunk
+
+After (core.ingestion.chunkers.ChunkRecord + embed_chunks):
+  - __slots__, no __dict__
+  - per-chunk metadata deltas over one shared per-document dict (ChainMap)
+  - embedding as a row view of one float32 matrix per embed batch, ~3KB
+
+Modes, each run in a fresh subprocess so one cannot reuse the other's freed
+memory:
+  legacy    LegacyChunkRecord, full dicts, list[float] embeddings
+  compact   ChunkRecord, shared metadata, float32 matrix rows
+  released  compact, plus what ingest_chunks now does after every COPY:
+            chunk.embedding = None, so only batches in flight hold vectors
+
+The same text is chunked by recursive_split in every mode; the legacy records
+are converted from its output. Embeddings are random — the provider is not
+part of what is measured. Memory is resident set size (Linux /proc), read
+after chunking (text + chunker output baseline), after building the records,
+and after embedding every batch. Content strings are the same objects in
+every mode and are not counted.
+
+Usage:
+  PYTHONPATH=. python scripts/labs/lab_4.7_chunk_record_memory.py
+  PYTHONPATH=. python scripts/labs/lab_4.7_chunk_record_memory.py --chunks 10000
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np  # noqa: E402
+
+from core.ingestion.chunkers import ChunkRecord, recursive_split  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[2]
+RESULTS_PATH = ROOT / "benchmarks" / "lab_4.7_chunk_record_memory.json"
+EMBEDDING_DIM = 768
+BATCH_SIZE = 50
+MODES = ("legacy", "compact", "released")
+
+
+@dataclass
+class LegacyChunkRecord:
+    """The pre-change ChunkRecord, verbatim apart from __repr__."""
+    content:   str
+    metadata:  dict         = field(default_factory=dict)
+    embedding: list[float] | None = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.content = self.content.strip()
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def build_text(n_chunks: int, chunk_size: int) -> str:
+    corpus = "\n\n".join(p.read_text(encoding="utf-8") for p in sorted((ROOT / "data").rglob("*.md")))
+    size = n_chunks * chunk_size      # chunks come out under chunk_size, so this yields more than n_chunks
+    return (corpus * (size // len(corpus) + 1))[:size]
+
+
+def measure(mode: str, n_chunks: int, chunk_size: int) -> dict:
+    text = build_text(n_chunks, chunk_size)
+    chunks = recursive_split(text, source="data/regulations/large.md", chunk_size=chunk_size, overlap=0)
+    chunks = chunks[:n_chunks]
+    n = len(chunks)
+
+    rng = np.random.default_rng(0)
+    gc.collect()
+    before_records = rss_mb()
+    # Rebuild the records after the baseline so the delta is what they cost.
+    # Content strings are shared with the chunker output, so they are not
+    # counted — they are the same in every mode.
+    if mode == "legacy":
+        records = [LegacyChunkRecord(content=c.content, metadata=dict(c.metadata)) for c in chunks]
+    else:
+        records = [
+            ChunkRecord(content=c.content, metadata=dict(c.metadata.maps[0]), shared_metadata=c.metadata.maps[1])
+            for c in chunks
+        ]
+    del chunks
+    gc.collect()
+    after_records = rss_mb()
+
+    for i in range(0, n, BATCH_SIZE):
+        batch = records[i:i + BATCH_SIZE]
+        vectors = rng.random((len(batch), EMBEDDING_DIM), dtype=np.float32)
+        if mode == "legacy":
+            for chunk, vector in zip(batch, vectors):
+                chunk.embedding = vector.tolist()
+        else:
+            matrix = np.ascontiguousarray(vectors)
+            for chunk, row in zip(batch, matrix):
+                chunk.embedding = row
+            if mode == "released":
+                for chunk in batch:
+                    chunk.embedding = None
+    gc.collect()
+    after_embeddings = rss_mb()
+
+    return {
+        "mode": mode,
+        "chunks": n,
+        "records_mb": round(after_records - before_records, 1),
+        "embeddings_mb": round(after_embeddings - after_records, 1),
+        "total_mb": round(after_embeddings - before_records, 1),
+        "bytes_per_chunk": round((after_embeddings - before_records) * 2**20 / n),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory held by ChunkRecords for a large ingest")
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--chunk-size", type=int, default=1200)
+    parser.add_argument("--mode", choices=MODES, help="internal: measure one mode in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.chunks, args.chunk_size)))
+        sys.exit(0)
+
+    results = []
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--chunks", str(args.chunks), "--chunk-size", str(args.chunk_size)],
+            check=True, capture_output=True, text=True,
+        )
+        row = json.loads(out.stdout.strip().splitlines()[-1])
+        results.append(row)
+        print(
+            f"{mode:<9} {row['chunks']:>7} chunks  records {row['records_mb']:>8.1f} MB  "
+            f"embeddings {row['embeddings_mb']:>8.1f} MB  total {row['total_mb']:>8.1f} MB  "
+            f"({row['bytes_per_chunk']} B/chunk)"
+        )
+
+    legacy = results[0]["total_mb"]
+    reduction = {r["mode"]: round(legacy / r["total_mb"], 1) if r["total_mb"] > 0 else None for r in results[1:]}
+    print(f"\nReduction vs legacy: {reduction}")
+    RESULTS_PATH.write_text(json.dumps({
+        "lab": "4.7 — ChunkRecord memory",
+        "embedding_dim": EMBEDDING_DIM,
+        "batch_size": BATCH_SIZE,
+        "chunk_size": args.chunk_size,
+        "memory_unit": "MB of resident set growth",
+        "reduction_vs_legacy": reduction,
+        "results": results,
+    }, indent=2))
+    print(f"Results written to {RESULTS_PATH.relative_to(ROOT)}")
@@ -0,0 +1,233 @@
+"""
+scripts/lab_7.7_partition_documents.py
+
+Migrates an existing, unpartitioned documents table to the list-partitioned
+layout in core/database/schema.sql (one partition per namespace, local HNSW
+and GIN indexes), online: searches and ingests keep running throughout and
+only the final swap takes a lock, for a few catalog updates.
+
+  1. Apply schema.sql (adds the partition functions; the plain documents
+     table is left as it is)
+  2. Prepare, in one transaction: documents_partitioned with one partition
+     per namespace (NAMESPACE_REGISTRY + every namespace already stored) and
+     documents_default; the old table's indexes renamed *_unpartitioned and
+     recreated under their own names on the new table (empty, so instant);
+     an AFTER trigger on documents mirroring every insert / update / delete
+     into documents_partitioned from here on
+  3. Backfill existing rows in id batches (INSERT ... SELECT ... FOR SHARE,
+     ON CONFLICT DO NOTHING): FOR SHARE makes a concurrent delete or update
+     of a row wait for its batch, so the mirror trigger always has the last
+     word. Rows are copied with their fts_vector; the FTS trigger is only
+     created on the new table at the swap.
+  4. Verify: per-namespace row counts of both tables, in one REPEATABLE
+     READ snapshot — the mirror runs in the writer's transaction, so any
+     difference is a real one and aborts the migration
+  5. Swap, in one transaction under ACCESS EXCLUSIVE on documents: drop the
+     mirror, rename documents → documents_unpartitioned and
+     documents_partitioned → documents, hand over the id sequence and the
+     primary key name, recreate documents' triggers (FTS, BM25 statistics),
+     repoint current_documents
+  6. Drop documents_unpartitioned (--drop-old), or leave it for rollback
+
+Interrupted runs resume: step 2 is skipped once documents_partitioned
+exists and the backfill's ON CONFLICT DO NOTHING makes re-copying harmless.
+Re-running after a completed migration only reports that documents is
+already partitioned.
+
+Usage:
+  PYTHONPATH=. python scripts/labs/lab_7.7_partition_documents.py
+  PYTHONPATH=. python scripts/labs/lab_7.7_partition_documents.py --batch-size 2000 --drop-old
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from config import NAMESPACE_REGISTRY
+from core.database import ensure_namespace_partitions
+from core.database.pool import create_pool
+
+SCHEMA_SQL = Path(__file__).resolve().parents[2] / "core" / "database" / "schema.sql"
+NEW_TABLE = "documents_partitioned"
+OLD_TABLE = "documents_unpartitioned"
+MIRROR_TRIGGER = "trig_documents_partition_mirror"
+
+
+async def is_partitioned(conn) -> bool:
+    return await conn.fetchval("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('documents')")
+
+
+async def prepare(conn) -> None:
+    namespaces = set(NAMESPACE_REGISTRY) | {
+        r["namespace"] for r in await conn.fetch("SELECT DISTINCT namespace FROM documents")
+    }
+    indexes = await conn.fetch(
+        """
+        SELECT i.relname AS name, pg_get_indexdef(i.oid) AS definition
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = 'documents'::regclass AND NOT x.indisprimary
+        """
+    )
+    async with conn.transaction():
+        await conn.execute(
+            f"""
+            CREATE TABLE {NEW_TABLE} (LIKE documents INCLUDING DEFAULTS, PRIMARY KEY (id, namespace))
+                PARTITION BY LIST (namespace)
+            """
+        )
+        await conn.execute(f"CREATE TABLE documents_default PARTITION OF {NEW_TABLE} DEFAULT")
+        for namespace in sorted(namespaces):
+            await conn.execute(
+                f"""
+                DO $$ BEGIN
+                    EXECUTE format('CREATE TABLE %I PARTITION OF {NEW_TABLE} FOR VALUES IN (%L)',
+                                   namespace_partition_name({_literal(namespace)}), {_literal(namespace)});
+                END $$
+                """
+            )
+        for index in indexes:
+            await conn.execute(f'ALTER INDEX "{index["name"]}" RENAME TO "{index["name"]}_unpartitioned"')
+            await conn.execute(index["definition"].replace(" ON public.documents ", f" ON public.{NEW_TABLE} ", 1))
+
+        # The table's column order is documents' (LIKE), so whole rows copy as-is
+        await conn.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION documents_partition_mirror() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {NEW_TABLE} WHERE id = OLD.id AND namespace = OLD.namespace;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {NEW_TABLE} SELECT (NEW).* ON CONFLICT (id, namespace) DO NOTHING;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        await conn.execute(
+            f"""
+            CREATE TRIGGER {MIRROR_TRIGGER}
+                AFTER INSERT OR UPDATE OR DELETE ON documents
+                FOR EACH ROW EXECUTE FUNCTION documents_partition_mirror()
+            """
+        )
+    print(f"      {len(namespaces)} namespace partitions + documents_default, {len(indexes)} indexes, mirror trigger")
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+async def backfill(pool, batch_size: int, pause_seconds: float) -> int:
+    async with pool.acquire() as conn:
+        max_id = await conn.fetchval("SELECT coalesce(max(id), 0) FROM documents")
+    copied, last_id, start = 0, 0, time.perf_counter()
+    while last_id < max_id:
+        async with pool.acquire() as conn:
+            result = await conn.execute(
+                f"""
+                INSERT INTO {NEW_TABLE}
+                SELECT * FROM documents WHERE id > $1 AND id <= $2 ORDER BY id FOR SHARE
+                ON CONFLICT (id, namespace) DO NOTHING
+                """,
+                last_id, last_id + batch_size,
+            )
+        copied += int(result.split()[-1])
+        last_id += batch_size
+        print(f"\r      id {min(last_id, max_id)}/{max_id}, {copied} rows copied "
+              f"({time.perf_counter() - start:.1f}s)", end="", flush=True)
+        await asyncio.sleep(pause_seconds)
+    print()
+    return copied
+
+
+async def verify(conn) -> bool:
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        old = dict(await conn.fetch("SELECT namespace, count(*) FROM documents GROUP BY namespace"))
+        new = dict(await conn.fetch(f"SELECT namespace, count(*) FROM {NEW_TABLE} GROUP BY namespace"))
+    for namespace in sorted(old.keys() | new.keys()):
+        marker = "" if old.get(namespace) == new.get(namespace) else "   <-- MISMATCH"
+        print(f"      {namespace:<20} {old.get(namespace, 0):>10} → {new.get(namespace, 0):>10}{marker}")
+    return old == new
+
+
+async def swap(conn) -> None:
+    triggers = await conn.fetch(
+        """
+        SELECT pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = 'documents'::regclass AND NOT tgisinternal AND tgname <> $1
+        """,
+        MIRROR_TRIGGER,
+    )
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE documents IN ACCESS EXCLUSIVE MODE")
+        await conn.execute(f"DROP TRIGGER {MIRROR_TRIGGER} ON documents")
+        await conn.execute(f"ALTER TABLE documents RENAME TO {OLD_TABLE}")
+        await conn.execute(f"ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT documents_pkey TO {OLD_TABLE}_pkey")
+        await conn.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO documents")
+        await conn.execute(f"ALTER TABLE documents RENAME CONSTRAINT {NEW_TABLE}_pkey TO documents_pkey")
+        await conn.execute("ALTER SEQUENCE documents_id_seq OWNED BY documents.id")
+        # Read before the renames, so they already name documents — now the partitioned table.
+        # The BM25 statistics carry over as they are: the rows did not change.
+        for trigger in triggers:
+            await conn.execute(trigger[0])
+        # The view followed the old table through its rename; point it back
+        view = await conn.fetchval("SELECT pg_get_viewdef('current_documents'::regclass)")
+        await conn.execute(
+            "CREATE OR REPLACE VIEW current_documents AS " + view.replace(f" {OLD_TABLE} ", " documents ")
+        )
+        await conn.execute("DROP FUNCTION documents_partition_mirror()")
+
+
+async def migrate(pool, batch_size: int, pause_seconds: float, drop_old: bool) -> None:
+    async with pool.acquire() as conn:
+        await conn.execute(SCHEMA_SQL.read_text(encoding="utf-8"))
+        print("[1/6] Applied schema.sql")
+
+        if await is_partitioned(conn):
+            partitions = await ensure_namespace_partitions(pool, NAMESPACE_REGISTRY)
+            print(f"      documents is already partitioned ({len(partitions)} registry namespaces ensured). Nothing to do.")
+            return
+
+        if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", NEW_TABLE):
+            print(f"[2/6] {NEW_TABLE} exists — resuming an interrupted migration")
+        else:
+            print(f"[2/6] Preparing {NEW_TABLE}...")
+            await prepare(conn)
+
+    print(f"[3/6] Backfilling in batches of {batch_size} ids...")
+    await backfill(pool, batch_size, pause_seconds)
+
+    async with pool.acquire() as conn:
+        print("[4/6] Verifying per-namespace row counts (old → new):")
+        if not await verify(conn):
+            print("      Counts differ — not swapping. Investigate, then re-run to resume.")
+            return
+
+        start = time.perf_counter()
+        await swap(conn)
+        print(f"[5/6] Swapped tables in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        if drop_old:
+            await conn.execute(f"DROP TABLE {OLD_TABLE}")
+            print(f"[6/6] Dropped {OLD_TABLE}")
+        else:
+            print(f"[6/6] Kept {OLD_TABLE} for rollback — DROP TABLE {OLD_TABLE} once satisfied")
+
+
+async def main(batch_size: int, pause_seconds: float, drop_old: bool):
+    pool = await create_pool()
+    try:
+        await migrate(pool, batch_size, pause_seconds, drop_old)
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online migration of documents to namespace partitions")
+    parser.add_argument("--batch-size", type=int, default=5000, help="ids per backfill transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds between backfill batches")
+    parser.add_argument("--drop-old", action="store_true", help="drop the unpartitioned table after the swap")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.pause, args.drop_old))
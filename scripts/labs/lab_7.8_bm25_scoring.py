@@ -0,0 +1,156 @@
+"""
+scripts/lab_7.8_bm25_scoring.py
+
+Lab 7.8 — ts_rank vs Okapi BM25 for the keyword leg, on the Lab 7.3 query
+set against the live "legal" namespace.
+
+  ts_rank  retrieve_bm25 as before: tsquery round trip, then ts_rank over
+           every chunk matching it (in OR mode — 5+ words — that is most of
+           the namespace for common words, each fts_vector detoasted)
+  bm25     BM25_SQL: one statement; document frequencies, chunk lengths and
+           corpus size come from the bm25_* statistics tables, candidates
+           are bounded by the rarest query terms, content is read for the
+           top rows only
+
+Latency: client-side p50 / p95 / mean over --repeats rounds of every query,
+reported for the AND-mode (short) and OR-mode (5+ words) queries apart.
+Precision@5: as in Lab 7.3, the top 5 of both scorings are printed for
+manual labeling; fill in LABELS (1 = relevant, same order as printed) and
+re-run to get the comparison. Results go to
+benchmarks/lab_7.8_bm25_scoring.json.
+
+The statistics tables are only kept current while BM25 statistics
+maintenance is on (BM25_CONFIG["maintain_stats"]); the lab turns it on
+first, which rebuilds them if it was off. What keeping them current costs
+ingest is measured by Lab 3.7 --bm25-stats.
+
+Needs the corpus loaded and schema.sql applied:
+  PYTHONPATH=. python scripts/labs/lab_7.8_bm25_scoring.py --repeats 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+import config
+from api.services.retriever import BM25_OR_THRESHOLD, retrieve_bm25
+from core.database import set_bm25_stats_maintenance
+from core.database.pool import create_pool
+
+NAMESPACE = "legal"
+TOP_K = 5
+SCORINGS = ("ts_rank", "bm25")
+OUTPUT_JSON = Path("benchmarks/lab_7.8_bm25_scoring.json")
+
+# The Lab 7.3 query set
+QUERIES = [
+    "what does the data minimization principle say about extraneous fields",
+    "attorney general fines for unintentional CCPA violations",
+    "are life insurers and employers subject to HIPAA regulations",
+    "is preventing fraud considered a legitimate interest for data processing",
+    "timeline for reporting a data breach to the supervisory authority",
+    "what is our policy on retaining data for former workers",
+    "how long do we keep security logs vs application logs",
+    "are pre-ticked boxes acceptable for obtaining user consent",
+    "which API endpoint do I use to check the status of a pending data subject request",
+    "WPA3 network encryption requirement for remote work",
+    "do we need parental consent for users under 16",
+    "how quickly must an employee report a suspected data breach internally",
+    "timeframe to respond to a data subject access request",
+    "right to be forgotten timeline for erasure",
+    "what agreement is needed before using a third-party data processor",
+    "approved mechanisms for transferring data outside the EEA",
+    "is it allowed to store confidential competitor information on company laptops",
+    "how frequently must employee passwords be changed",
+    "what to do with your device during an active ransomware attack",
+    "what are the four levels of data classification used by the company",
+]
+
+# {query: {"ts_rank": [1, 0, 0, 0, 0], "bm25": [...]}} — manual judgments of the printed top 5
+LABELS: dict[str, dict[str, list[int]]] = {}
+
+
+def summarize(latencies_ms: list[float]) -> dict:
+    ordered = sorted(latencies_ms)
+    return {
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 2),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+    }
+
+
+async def timed_search(pool, query: str, scoring: str) -> float:
+    t0 = time.perf_counter()
+    await retrieve_bm25(pool, query, NAMESPACE, TOP_K, scoring=scoring)
+    return (time.perf_counter() - t0) * 1000
+
+
+def print_for_labeling(idx: int, query: str, results: dict[str, list[dict]]):
+    print(f"\n{'=' * 80}\nQUERY {idx}: {query}\n{'=' * 80}")
+    for scoring, rows in results.items():
+        print(f"\n--- {scoring} ---")
+        for i, r in enumerate(rows, 1):
+            snippet = r["content"][:150].replace("\n", " ")
+            print(f"  [{i}] ({r['bm25_score']:.3f}) {snippet}")
+
+
+def precision_at_5(labels: dict) -> dict:
+    return {
+        scoring: round(statistics.fmean(sum(modes[scoring]) / TOP_K for modes in labels.values()), 3)
+        for scoring in SCORINGS
+    }
+
+
+async def main(repeats: int):
+    pool = await create_pool()
+    try:
+        if await set_bm25_stats_maintenance(pool, True):
+            print("BM25 statistics maintenance was off: enabled and tables rebuilt")
+        config.BM25_CONFIG["maintain_stats"] = True      # retrieve_bm25 refuses "bm25" otherwise
+        for idx, query in enumerate(QUERIES):
+            results = {s: await retrieve_bm25(pool, query, NAMESPACE, TOP_K, scoring=s) for s in SCORINGS}
+            print_for_labeling(idx, query, results)
+
+        groups = {
+            "and_mode": [q for q in QUERIES if len(q.split()) < BM25_OR_THRESHOLD],
+            "or_mode": [q for q in QUERIES if len(q.split()) >= BM25_OR_THRESHOLD],
+        }
+        latency = {}
+        for scoring in SCORINGS:
+            for query in QUERIES:                                   # warm-up
+                await timed_search(pool, query, scoring)
+            latency[scoring] = {
+                group: summarize([await timed_search(pool, q, scoring) for _ in range(repeats) for q in queries])
+                for group, queries in groups.items() if queries
+            }
+            for group, numbers in latency[scoring].items():
+                print(f"{scoring:<8} {group:<9} p50 {numbers['p50_ms']:>7} ms  p95 {numbers['p95_ms']:>7} ms")
+    finally:
+        await pool.close()
+
+    output = {
+        "lab": "7.8 — ts_rank vs Okapi BM25 (keyword leg)",
+        "queries_tested": len(QUERIES),
+        "repeats": repeats,
+        "bm25_config": {k: v for k, v in config.BM25_CONFIG.items() if k != "scoring"},
+        "latency": latency,
+    }
+    if LABELS:
+        output["precision_at_5"] = precision_at_5(LABELS)
+        print(f"\nPrecision@5: {output['precision_at_5']}")
+    else:
+        print("\n[!] No labels entered yet. Fill in LABELS from the output above, then re-run "
+              "for the Precision@5 comparison.")
+
+    OUTPUT_JSON.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_JSON.write_text(json.dumps(output, indent=2))
+    print(f"Results saved to {OUTPUT_JSON}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ts_rank vs Okapi BM25 on the Lab 7.3 queries")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeats))
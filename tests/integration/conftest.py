@@ -5,5 +5,49 @@ Fixtures for integration tests: exercise real components
 (Postgres, Redis, pgvector) against test instances, but never call
 out to a live LLM or the public internet.
 
-Not implemented until Week 9.
+Postgres tests need TEST_DATABASE_URL (a database with the pgvector
+extension available) and are skipped without it. Each test gets a scratch
+schema built from core/database/schema.sql, dropped afterwards.
 """
+import os
+import uuid
+from pathlib import Path
+
+import asyncpg
+import pytest
+from pgvector.asyncpg import register_vector
+
+SCHEMA_SQL = Path(__file__).resolve().parents[2] / "core" / "database" / "schema.sql"
+
+
+@pytest.fixture
+async def pg_pool():
+    """
+    An asyncpg pool whose search_path is a fresh scratch schema.
+
+    Usage:
+        async def test_something(pg_pool):
+            async with pg_pool.acquire() as conn:
+                ...
+    """
+    dsn = os.getenv("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL not set")
+
+    schema = f"it_{uuid.uuid4().hex[:12]}"
+    admin = await asyncpg.connect(dsn)
+    await admin.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    await admin.execute(f"SET search_path = {schema}, public")
+    await admin.execute(SCHEMA_SQL.read_text(encoding="utf-8"))
+
+    pool = await asyncpg.create_pool(
+        dsn, min_size=1, max_size=4, init=register_vector,
+        server_settings={"search_path": f"{schema}, public"},
+    )
+    try:
+        yield pool
+    finally:
+        await pool.close()
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
@@ -0,0 +1,151 @@
+"""
+tests/integration/test_bm25_stats.py
+
+The BM25 corpus statistics must follow every write to documents through
+the schema.sql triggers, and BM25_SQL must score from them. Runs against a
+real Postgres (see conftest.pg_pool).
+"""
+import math
+
+import numpy as np
+import pytest
+
+import config
+from api.services.bm25_index import BM25Index
+from api.services.retriever import retrieve_bm25
+from core.database import bulk_insert, set_bm25_stats_maintenance
+from core.ingestion.chunkers import ChunkRecord
+
+RECOMPUTED = """
+SELECT
+    (SELECT coalesce(jsonb_object_agg(namespace, jsonb_build_array(n, len)), '{}')
+     FROM (SELECT namespace, count(*) AS n, sum(bm25_length(fts_vector)) AS len
+           FROM documents GROUP BY namespace) c) AS corpus,
+    (SELECT count(*) FROM documents d, unnest(tsvector_to_array(d.fts_vector))) AS postings,
+    (SELECT count(*) FROM (SELECT DISTINCT d.namespace, t
+                           FROM documents d, unnest(tsvector_to_array(d.fts_vector)) t) x) AS terms
+"""
+
+MAINTAINED = """
+SELECT
+    (SELECT coalesce(jsonb_object_agg(namespace, jsonb_build_array(chunk_count, total_length)), '{}')
+     FROM bm25_corpus_stats WHERE chunk_count > 0) AS corpus,
+    (SELECT coalesce(sum(doc_freq), 0) FROM bm25_term_stats) AS postings,
+    (SELECT count(*) FROM bm25_term_stats) AS terms
+"""
+
+
+@pytest.fixture(autouse=True)
+def _stats_maintained(monkeypatch):
+    """schema.sql creates the triggers enabled; scoring="bm25" checks the config flag."""
+    monkeypatch.setitem(config.BM25_CONFIG, "maintain_stats", True)
+
+
+def _chunks(texts: list[str]) -> list[ChunkRecord]:
+    rng = np.random.default_rng(0)
+    return [
+        ChunkRecord(content=text, metadata={"chunk_index": i}, embedding=rng.standard_normal(768, dtype=np.float32))
+        for i, text in enumerate(texts)
+    ]
+
+
+async def _assert_in_sync(conn):
+    assert dict(await conn.fetchrow(MAINTAINED)) == dict(await conn.fetchrow(RECOMPUTED))
+    assert await conn.fetchval(
+        "SELECT count(*) FROM documents d LEFT JOIN bm25_chunk_stats l ON l.chunk_id = d.id "
+        "WHERE l.length IS DISTINCT FROM bm25_length(d.fts_vector)"
+    ) == 0
+
+
+async def test_statistics_follow_inserts_updates_and_deletes(pg_pool):
+    async with pg_pool.acquire() as conn:
+        await bulk_insert(conn, _chunks(["Personal data shall be processed lawfully and fairly",
+                                         "Data breach notification within 72 hours"]), "gdpr", "legal")
+        await bulk_insert(conn, _chunks(["Consumers may request deletion of personal information"]), "ccpa", "legal")
+        await bulk_insert(conn, _chunks(["Customer due diligence for new accounts"]), "kyc", "kyc_aml")
+        await _assert_in_sync(conn)
+
+        await conn.execute("UPDATE documents SET content = 'Breach of contract' WHERE document_id = 'ccpa'")
+        await conn.execute("UPDATE documents SET metadata = '{}' WHERE document_id = 'gdpr'")
+        await _assert_in_sync(conn)
+
+        await conn.execute("DELETE FROM documents WHERE document_id = 'gdpr'")
+        await _assert_in_sync(conn)
+        assert await conn.fetchval(
+            "SELECT doc_freq FROM bm25_term_stats WHERE namespace = 'legal' AND term = 'breach'"
+        ) == 1
+
+        await conn.execute("TRUNCATE documents")
+        assert await conn.fetchval("SELECT count(*) FROM bm25_term_stats") == 0
+
+
+async def test_maintenance_off_skips_the_triggers_and_on_rebuilds(pg_pool):
+    async with pg_pool.acquire() as conn:
+        await bulk_insert(conn, _chunks(["Personal data shall be processed lawfully"]), "gdpr", "legal")
+
+    assert await set_bm25_stats_maintenance(pg_pool, False) is True
+    assert await set_bm25_stats_maintenance(pg_pool, False) is False
+    async with pg_pool.acquire() as conn:
+        assert await conn.fetchval("SELECT count(*) FROM bm25_corpus_stats") == 0
+        await bulk_insert(conn, _chunks(["Consumers may request deletion"]), "ccpa", "legal")
+        assert await conn.fetchval("SELECT count(*) FROM bm25_term_stats") == 0
+
+    assert await set_bm25_stats_maintenance(pg_pool, True) is True
+    async with pg_pool.acquire() as conn:
+        await _assert_in_sync(conn)
+        await conn.execute("DELETE FROM documents WHERE document_id = 'gdpr'")
+        await _assert_in_sync(conn)
+
+
+async def test_bm25_scores_match_okapi_formula(pg_pool):
+    texts = ["erasure erasure of personal data", "erasure request", "personal data retention schedule",
+             "retention of logs", "personal data transfer"]
+    async with pg_pool.acquire() as conn:
+        await bulk_insert(conn, _chunks(texts), "policy", "legal")
+
+    results = await retrieve_bm25(pg_pool, "erasure", "legal", 5, scoring="bm25")
+
+    k1, b = config.BM25_CONFIG["k1"], config.BM25_CONFIG["b"]
+    lengths = [4, 2, 4, 2, 3]          # lexeme occurrences per chunk; "of" is a stop word
+    avg = sum(lengths) / len(lengths)
+    idf = math.log(1 + (5 - 2 + 0.5) / (2 + 0.5))
+
+    def okapi(tf, length):
+        return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg))
+
+    assert [r["content"] for r in results] == texts[:2]
+    assert [r["bm25_score"] for r in results] == pytest.approx([okapi(2, lengths[0]), okapi(1, lengths[1])])
+
+
+async def test_candidates_are_bounded_by_the_rarest_terms(pg_pool, monkeypatch):
+    """OR query: with a budget of one chunk only the rarest term's chunks are scored."""
+    texts = ["personal data", "personal data", "personal data", "personal data pseudonymisation"]
+    async with pg_pool.acquire() as conn:
+        await bulk_insert(conn, _chunks(texts), "policy", "legal")
+    query = "personal data and pseudonymisation in our policy"
+
+    monkeypatch.setitem(config.BM25_CONFIG, "candidate_budget", 1)
+    bounded = await retrieve_bm25(pg_pool, query, "legal", 10, scoring="bm25")
+    monkeypatch.setitem(config.BM25_CONFIG, "candidate_budget", 1000)
+    exhaustive = await retrieve_bm25(pg_pool, query, "legal", 10, scoring="bm25")
+
+    assert [r["content"] for r in bounded] == ["personal data pseudonymisation"]
+    assert len(exhaustive) == 4 and exhaustive[0]["content"] == "personal data pseudonymisation"
+
+
+
+async def test_memory_engine_scores_like_bm25_sql(pg_pool):
+    """Postings built from fts_vector: same matches and scores as BM25_SQL when the budget does not bind."""
+    texts = ["erasure erasure of personal data", "erasure request", "personal data retention schedule",
+             "retention of logs", "personal data transfer"]
+    async with pg_pool.acquire() as conn:
+        await bulk_insert(conn, _chunks(texts), "policy", "legal")
+    index = BM25Index(pg_pool)
+    await index._load("legal", force=False)
+    k1, b = config.BM25_CONFIG["k1"], config.BM25_CONFIG["b"]
+
+    for query, or_mode in (("personal data", False), ("erasure of personal data retention logs", True)):
+        in_db = await retrieve_bm25(pg_pool, query, "legal", 5, scoring="bm25")
+        in_memory = await index.search("legal", query, 5, or_mode, k1, b)
+        assert [r["id"] for r in in_memory] == [r["id"] for r in in_db]
+        assert [r["bm25_score"] for r in in_memory] == pytest.approx([r["bm25_score"] for r in in_db])
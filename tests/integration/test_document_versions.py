@@ -0,0 +1,57 @@
+"""
+tests/integration/test_document_versions.py
+
+The registry's current_version only moves forward: an ingest that finishes
+after a newer one of the same document must not point the document back at
+its own, older chunk set (which reclaim may already have deleted). Runs
+against a real Postgres (see conftest.pg_pool).
+"""
+import numpy as np
+
+from core.database import bulk_insert
+from core.database.staged_load import StagedLoad
+from core.ingestion.chunkers import ChunkRecord
+from core.ingestion.lifecycle import allocate_version, reclaim_stale_versions, register_document
+
+
+def _chunks(text: str) -> list[ChunkRecord]:
+    embedding = np.random.default_rng(0).standard_normal(768, dtype=np.float32)
+    return [ChunkRecord(content=text, metadata={"chunk_index": 0}, embedding=embedding)]
+
+
+async def _visible(pool) -> list[str]:
+    async with pool.acquire() as conn:
+        rows = await conn.fetch("SELECT content FROM current_documents WHERE document_id = 'gdpr'")
+    return [r["content"] for r in rows]
+
+
+async def test_older_version_registering_last_does_not_move_the_pointer_back(pg_pool):
+    older, newer = await allocate_version(pg_pool), await allocate_version(pg_pool)
+    async with pg_pool.acquire() as conn:
+        await bulk_insert(conn, _chunks("old text"), "gdpr", "legal", version=older)
+        await bulk_insert(conn, _chunks("new text"), "gdpr", "legal", version=newer)
+
+    await register_document(pg_pool, "gdpr", "legal", "hash-new", 1, "gdpr.md", version=newer)
+    await reclaim_stale_versions(pg_pool, "gdpr", "legal")
+    await register_document(pg_pool, "gdpr", "legal", "hash-old", 1, "gdpr.md", version=older)
+
+    async with pg_pool.acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT current_version, content_hash FROM document_registry WHERE document_id = 'gdpr'"
+        )
+    assert (row["current_version"], row["content_hash"]) == (newer, "hash-new")
+    assert await _visible(pg_pool) == ["new text"]
+
+
+async def test_staged_merge_of_an_older_version_keeps_the_newer_one(pg_pool):
+    older, newer = await allocate_version(pg_pool), await allocate_version(pg_pool)
+    async with pg_pool.acquire() as conn:
+        await bulk_insert(conn, _chunks("new text"), "gdpr", "legal", version=newer)
+    await register_document(pg_pool, "gdpr", "legal", "hash-new", 1, "gdpr.md", version=newer)
+
+    async with StagedLoad(pg_pool) as load:
+        async with pg_pool.acquire() as conn:
+            await load.insert(conn, _chunks("old text"), "gdpr", "legal", version=older)
+        await load.merge()
+
+    assert await _visible(pg_pool) == ["new text"]
@@ -1,12 +0,0 @@
-"""
-Keeps the integration tier collectible before Week 9 fixtures exist.
-Delete this file once real integration tests land - e.g.
-test_retriever_integration.py exercising rrf_merge against a real
-pgvector + BM25 index.
-"""
-import pytest
-
-
-@pytest.mark.skip(reason="No test database wired up yet - see Week 9")
-def test_integration_placeholder():
-    pass
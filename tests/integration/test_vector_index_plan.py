@@ -0,0 +1,136 @@
+"""
+tests/integration/test_vector_index_plan.py
+
+The vector queries must be served by idx_documents_embedding_hnsw (on a
+partitioned documents table: by one partition's copy of it), a search must
+prune to its namespace's partition, and the HNSW settings must keep a
+filtered search from coming back short. Plans are read with
+EXPLAIN (FORMAT JSON) against a real pgvector instance.
+"""
+import json
+
+import numpy as np
+
+from api.services.retriever import HYBRID_SQL, VECTOR_SQL, RetrieverConfig, retrieve, retrieve_vector
+from core.database import bulk_insert, ensure_namespace_partitions
+from core.ingestion.chunkers import ChunkRecord
+
+HNSW_INDEX = "idx_documents_embedding_hnsw"
+ROWS = 3000
+SMALL_NAMESPACE_ROWS = 50
+
+# retrieve_vector's shape before it was made index-eligible
+SCORED_THEN_FILTERED_SQL = """
+SELECT * FROM (
+    SELECT id, document_id, content, metadata,
+           1.0 - (embedding <=> $1::vector) AS vector_score
+    FROM current_documents
+    WHERE namespace = $2
+) scored
+WHERE vector_score > $4
+ORDER BY vector_score DESC
+LIMIT $3
+"""
+
+
+async def _load(pool) -> np.ndarray:
+    """
+    ROWS chunks: the first SMALL_NAMESPACE_ROWS in "small", the rest in "legal". Returns the embeddings.
+    No namespace partitions are created, so both share documents_default and one HNSW graph.
+    """
+    matrix = np.random.default_rng(0).standard_normal((ROWS, 768), dtype=np.float32)
+    words = ["retention", "erasure", "consent", "breach", "processor", "transfer"]
+    chunks = [
+        ChunkRecord(content=f"Clause {i} on {words[i % len(words)]} obligations", metadata={"chunk_index": i},
+                    embedding=row)
+        for i, row in enumerate(matrix)
+    ]
+    async with pool.acquire() as conn:
+        await bulk_insert(conn, chunks[:SMALL_NAMESPACE_ROWS], "small_doc", "small")
+        for start in range(SMALL_NAMESPACE_ROWS, ROWS, 500):
+            await bulk_insert(conn, chunks[start:start + 500], f"doc_{start}", "legal")
+        await conn.execute("ANALYZE documents")
+    return matrix
+
+
+async def _plan(pool, sql: str, *args) -> str:
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            # Take the sequential scan off the table: a shape the index can
+            # serve then plans with it; one it cannot still plans without it
+            await conn.execute("SET LOCAL enable_seqscan = off")
+            plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *args)
+    return json.dumps(json.loads(plan) if isinstance(plan, str) else plan)
+
+
+async def _hnsw_indexes(pool) -> set[str]:
+    """HNSW_INDEX plus the per-partition indexes attached to it (their names are generated)."""
+    async with pool.acquire() as conn:
+        children = await conn.fetch(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass($1)", HNSW_INDEX
+        )
+    return {HNSW_INDEX} | {r[0] for r in children}
+
+
+def _uses_any(plan: str, names: set[str]) -> bool:
+    return any(f'"{name}"' in plan for name in names)
+
+
+async def test_vector_sql_is_served_by_hnsw(pg_pool):
+    matrix = await _load(pg_pool)
+    query = matrix[1000].tolist()
+    indexes = await _hnsw_indexes(pg_pool)
+
+    assert _uses_any(await _plan(pg_pool, VECTOR_SQL, query, "legal", 20, 0.0), indexes)
+    assert not _uses_any(await _plan(pg_pool, SCORED_THEN_FILTERED_SQL, query, "legal", 20, 0.0), indexes)
+
+
+async def test_hybrid_sql_vector_list_is_served_by_hnsw(pg_pool):
+    matrix = await _load(pg_pool)
+    args = (matrix[1000].tolist(), "erasure obligations", False, "legal", 20, 60, 5, 0.0)
+
+    assert _uses_any(await _plan(pg_pool, HYBRID_SQL, *args), await _hnsw_indexes(pg_pool))
+
+
+async def test_namespace_search_prunes_to_its_partition(pg_pool):
+    matrix = await _load(pg_pool)
+    partitions = await ensure_namespace_partitions(pg_pool, ["legal", "small"])
+    async with pg_pool.acquire() as conn:
+        await conn.execute("ANALYZE documents")
+    args = (matrix[1000].tolist(), "erasure obligations", False, "legal", 20, 60, 5, 0.0)
+
+    for plan in (await _plan(pg_pool, VECTOR_SQL, *args[:1], "legal", 20, 0.0),
+                 await _plan(pg_pool, HYBRID_SQL, *args)):
+        assert f'"{partitions["legal"]}"' in plan
+        assert f'"{partitions["small"]}"' not in plan
+        assert '"documents_default"' not in plan
+
+    # The moved rows are still found, from the partition
+    results = await retrieve_vector(pg_pool, matrix[1000].tolist(), "legal", 5, min_score=-1.0)
+    assert results[0]["content"].startswith("Clause 1000 ")
+
+
+async def test_iterative_scan_fills_a_filtered_search(pg_pool):
+    """A namespace holding ~2% of the rows: without iterative scan the HNSW candidates run out."""
+    matrix = await _load(pg_pool)
+    query = matrix[10].tolist()
+
+    short = await retrieve_vector(pg_pool, query, "small", 20, min_score=-1.0, ef_search=40, iterative_scan="off")
+    full = await retrieve_vector(pg_pool, query, "small", 20, min_score=-1.0, ef_search=40,
+                                 iterative_scan="relaxed_order")
+
+    assert len(short) < 20
+    assert len(full) == 20
+    assert full[0]["content"].startswith("Clause 10 ")
+    assert [r["vector_score"] for r in full] == sorted((r["vector_score"] for r in full), reverse=True)
+
+
+async def test_hybrid_sql_matches_python_fusion(pg_pool):
+    matrix = await _load(pg_pool)
+    query, embedding = "consent and erasure obligations for the processor", matrix[2000].tolist()
+
+    python = await retrieve(pg_pool, query, embedding, "legal", RetrieverConfig(mode="hybrid"))
+    sql = await retrieve(pg_pool, query, embedding, "legal", RetrieverConfig(mode="hybrid_sql"))
+
+    assert [r["id"] for r in sql] == [r["id"] for r in python]
+    assert [r["rrf_score"] for r in sql] == [r["rrf_score"] for r in python]
@@ -0,0 +1,151 @@
+"""
+tests/unit/test_bm25_index.py
+
+Tests for the in-process BM25 engine in api/services/bm25_index.py. Rows
+carry their lexemes the way ROWS_SQL returns them; no DB needed.
+"""
+import math
+from collections import Counter
+
+import pytest
+
+import config
+from api.services.bm25_index import BM25Index, NamespaceBM25, Postings
+
+K1, B = 1.2, 0.75
+
+
+def _row(id: int, document_id: str, lexemes: str, source: str | None = None) -> dict:
+    counts = Counter(lexemes.split())
+    return {"id": id, "document_id": document_id, "content": lexemes,
+            "metadata": {"source_filename": source or f"{document_id}.md"},
+            "terms": sorted(counts), "tfs": [counts[t] for t in sorted(counts)]}
+
+
+CORPUS = [
+    _row(1, "gdpr", "gdpr articl 5 principl process person data"),
+    _row(2, "gdpr", "gdpr articl 17 right erasur erasur"),
+    _row(3, "ccpa", "consum right delet person inform"),
+    _row(4, "ccpa", "right know person inform collect"),
+    _row(5, "policy", "retent schedul log data"),
+]
+
+
+def _okapi(rows: list[dict], terms: list[str]) -> dict[int, float]:
+    """Reference BM25 over rows (OR matching)."""
+    n = len(rows)
+    avg = sum(sum(r["tfs"]) for r in rows) / n
+    scores = {}
+    for term in terms:
+        holders = [r for r in rows if term in r["terms"]]
+        if not holders:
+            continue
+        idf = math.log(1 + (n - len(holders) + 0.5) / (len(holders) + 0.5))
+        for r in holders:
+            tf = r["tfs"][r["terms"].index(term)]
+            length = sum(r["tfs"])
+            scores[r["id"]] = scores.get(r["id"], 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg))
+    return scores
+
+
+def test_postings_hold_each_terms_chunks_and_frequencies():
+    postings = Postings(CORPUS)
+
+    chunks, tfs = postings.postings("erasur")
+    assert chunks.tolist() == [1] and tfs.tolist() == [2.0]
+    chunks, _ = postings.postings("right")
+    assert chunks.tolist() == [1, 2, 3]
+    assert len(postings.postings("unknown")[0]) == 0
+    assert postings.lengths.tolist() == [7, 6, 5, 5, 4]
+
+
+def test_or_search_matches_reference_okapi_scores():
+    index = NamespaceBM25(CORPUS)
+    terms = ["right", "erasur", "person"]
+
+    results = index.search(terms, True, 10, K1, B)
+
+    expected = _okapi(CORPUS, terms)
+    assert [r["id"] for r in results] == sorted(expected, key=expected.get, reverse=True)
+    assert [r["bm25_score"] for r in results] == pytest.approx(sorted(expected.values(), reverse=True))
+    assert results[0] == {"id": 2, "document_id": "gdpr", "content": "gdpr articl 17 right erasur erasur",
+                          "metadata": {"source_filename": "gdpr.md"}, "bm25_score": results[0]["bm25_score"],
+                          "source_filename": "gdpr.md"}
+    assert len(index.search(terms, True, 2, K1, B)) == 2
+
+
+def test_and_search_requires_every_term():
+    index = NamespaceBM25(CORPUS)
+
+    assert [r["id"] for r in index.search(["gdpr", "articl", "5"], False, 10, K1, B)] == [1]
+    assert index.search(["gdpr", "unknown"], False, 10, K1, B) == []
+    assert {r["id"] for r in index.search(["gdpr", "unknown"], True, 10, K1, B)} == {1, 2}
+    assert index.search([], False, 10, K1, B) == []
+
+
+def test_score_ties_go_to_the_lower_id_like_bm25_sql():
+    boilerplate = "confidenti claus appli"
+    rows = [_row(9, "nda", boilerplate), _row(4, "msa", boilerplate), _row(6, "dpa", boilerplate)] + CORPUS
+    index = NamespaceBM25(rows)
+
+    assert [r["id"] for r in index.search(["confidenti"], False, 2, K1, B)] == [4, 6]
+
+    index.replace_documents(["new"], [_row(3, "new", boilerplate)])
+    assert [r["id"] for r in index.search(["confidenti"], False, 2, K1, B)] == [3, 4]
+
+
+def test_replace_documents_reindexes_changed_documents():
+    index = NamespaceBM25(CORPUS)
+    new_ccpa = [_row(10, "ccpa", "consum right opt out sale"), _row(11, "ccpa", "right correct inaccur inform")]
+
+    index.replace_documents(["ccpa"], new_ccpa)
+
+    current = [r for r in CORPUS if r["document_id"] != "ccpa"] + new_ccpa
+    assert index.size == 5 and index.changed_rows == 4
+    expected = _okapi(current, ["right", "inform"])
+    results = index.search(["right", "inform"], True, 10, K1, B)
+    assert {r["id"]: r["bm25_score"] for r in results} == pytest.approx(expected)
+
+    index.replace_documents(["gdpr"], [])                   # deleted
+    assert index.search(["gdpr"], True, 10, K1, B) == []
+    assert index.size == 3
+
+
+async def test_queries_are_analysed_once_and_unloaded_namespaces_fall_back(mock_db_pool):
+    pool, conn = mock_db_pool
+    conn.fetchval.return_value = ["gdpr", "articl", "5"]
+    index = BM25Index(pool, query_cache_size=1)
+    index._indexes["legal"] = NamespaceBM25(CORPUS)
+
+    first = await index.search("legal", "GDPR Article 5", 5, False, K1, B)
+    again = await index.search("legal", "GDPR Article 5", 5, False, K1, B)
+
+    assert [r["id"] for r in first] == [r["id"] for r in again] == [1]
+    assert conn.fetchval.await_count == 1
+    assert await index.search("hr", "GDPR Article 5", 5, False, K1, B) is None
+
+
+async def test_retrieve_bm25_falls_back_to_postgres_without_an_answer(mock_db_pool, monkeypatch):
+    from types import SimpleNamespace
+
+    from api.services import retriever
+
+    pool, conn = mock_db_pool
+    conn.fetch.return_value = []
+
+    async def search(namespace, query, limit, or_mode, k1, b):
+        return [{"id": 1, "bm25_score": 2.5}] if namespace == "legal" else None
+
+    monkeypatch.setattr(retriever, "get_bm25_index", lambda: SimpleNamespace(search=search))
+    monkeypatch.setitem(config.BM25_CONFIG, "maintain_stats", False)
+    # the memory engine keeps its own statistics, so "bm25" needs no tables when it answers
+    assert await retriever.retrieve_bm25(pool, "GDPR Article 5", "legal", 5, scoring="bm25", backend="memory") == [
+        {"id": 1, "bm25_score": 2.5}
+    ]
+    assert conn.fetch.await_count == 0
+    monkeypatch.setitem(config.BM25_CONFIG, "maintain_stats", True)
+    assert await retriever.retrieve_bm25(pool, "GDPR Article 5", "hr", 5, scoring="bm25", backend="memory") == []
+    assert conn.fetch.await_count == 1
+
+    with pytest.raises(ValueError):
+        await retriever.retrieve_bm25(pool, "GDPR Article 5", "legal", 5, backend="tantivy")
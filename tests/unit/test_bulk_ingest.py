@@ -0,0 +1,131 @@
+"""
+tests/unit/test_bulk_ingest.py
+
+Tests for the corpus bulk-ingest engine. The per-document pipeline and the
+registry lookup are patched; no DB or embedding provider needed.
+"""
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from core.pipeline.bulk_ingest import BulkIngestItem, bulk_ingest, collect_directory, load_manifest
+
+
+@pytest.fixture(autouse=True)
+def _no_partitions():
+    with patch("core.pipeline.bulk_ingest.ensure_namespace_partitions", AsyncMock()):
+        yield
+
+
+def _corpus(tmp_path, n: int) -> list[BulkIngestItem]:
+    for i in range(n):
+        (tmp_path / f"doc_{i}.md").write_text(f"# Doc {i}\n\nBody {i}", encoding="utf-8")
+    return collect_directory(tmp_path, "legal")
+
+
+def test_collect_directory_uses_stem_and_skips_subdirs(tmp_path):
+    (tmp_path / "gdpr_art_4.md").write_text("x")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "inner.md").write_text("x")
+    items = collect_directory(tmp_path, "legal")
+    assert [(i.document_id, i.namespace) for i in items] == [("gdpr_art_4", "legal")]
+
+
+def test_load_manifest_resolves_relative_paths(tmp_path):
+    manifest = tmp_path / "corpus.jsonl"
+    manifest.write_text(
+        json.dumps({"path": "a.md", "namespace": "kyc_aml"}) + "\n\n"
+        + json.dumps({"path": "/abs/b.md", "document_id": "bee"}) + "\n"
+    )
+    items = load_manifest(manifest, default_namespace="legal")
+    assert items[0].path == tmp_path / "a.md"
+    assert (items[0].document_id, items[0].namespace) == ("a", "kyc_aml")
+    assert (items[1].document_id, items[1].namespace) == ("bee", "legal")
+
+
+async def test_bulk_ingest_skips_unchanged_and_reports(tmp_path):
+    items = _corpus(tmp_path, 3)
+    statuses = {"doc_0": "new", "doc_1": "unchanged", "doc_2": "updated"}
+
+    with patch("core.pipeline.bulk_ingest.check_documents_status",
+               AsyncMock(side_effect=lambda pool, ns, hashes: {d: statuses[d] for d in hashes})) as check, \
+         patch("core.pipeline.bulk_ingest._ingest_one", AsyncMock(return_value=7)) as ingest_one, \
+         patch("core.pipeline.bulk_ingest.reclaim_stale_versions", AsyncMock(return_value=5)) as reclaim:
+        report = await bulk_ingest(items, pool=object(), concurrency=2)
+
+    assert check.await_count == 1                       # one registry query for the namespace
+    assert ingest_one.await_count == 2
+    assert report["ingested"] == 2
+    assert report["unchanged"] == 1
+    assert report["total_chunks"] == 14
+    # only the updated document has an old version, reclaimed after the load
+    assert [call.args[1:] for call in reclaim.await_args_list] == [("doc_2", "legal")]
+    assert report["chunks_reclaimed"] == 5
+
+
+async def test_bulk_ingest_resumes_from_checkpoint(tmp_path):
+    """Documents finished before a crash are not ingested again; failures are retried."""
+    items = _corpus(tmp_path, 4)
+    checkpoint = tmp_path / "progress.json"
+
+    async def flaky(pool, item, status, content_hash, batch_size):
+        if item.document_id == "doc_2":
+            raise RuntimeError("embedding provider timed out")
+        return 1
+
+    all_new = AsyncMock(side_effect=lambda pool, ns, hashes: dict.fromkeys(hashes, "new"))
+    with patch("core.pipeline.bulk_ingest.check_documents_status", all_new), \
+         patch("core.pipeline.bulk_ingest._ingest_one", AsyncMock(side_effect=flaky)):
+        first = await bulk_ingest(items, pool=object(), checkpoint_path=checkpoint)
+
+    assert first["ingested"] == 3
+    assert [f["document_id"] for f in first["failed"]] == ["doc_2"]
+
+    with patch("core.pipeline.bulk_ingest.check_documents_status", all_new), \
+         patch("core.pipeline.bulk_ingest._ingest_one", AsyncMock(return_value=1)) as ingest_one:
+        second = await bulk_ingest(items, pool=object(), checkpoint_path=checkpoint)
+
+    assert second["resumed_skipped"] == 3
+    assert [call.args[1].document_id for call in ingest_one.await_args_list] == ["doc_2"]
+
+
+async def test_bulk_ingest_staged_registers_only_after_merge(tmp_path):
+    items = _corpus(tmp_path, 3)
+    events = []
+
+    class FakeStagedLoad:
+        def __init__(self, pool):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            events.append("dropped")
+
+        async def merge(self):
+            events.append("merged")
+            return {"rows_inserted": 4, "rows_replaced": 0, "hnsw_rebuilt": False, "merge_seconds": 0.1}
+
+    async def stage(load, pool, item, batch_size):
+        if item.document_id == "doc_1":
+            raise RuntimeError("embedding provider timed out")
+        events.append(f"staged {item.document_id}")
+        return 2, 10 + int(item.document_id[-1])
+
+    async def register(**kwargs):
+        events.append(f"registered {kwargs['document_id']} at {kwargs['version']}")
+
+    all_new = AsyncMock(side_effect=lambda pool, ns, hashes: dict.fromkeys(hashes, "new"))
+    with patch("core.pipeline.bulk_ingest.check_documents_status", all_new), \
+         patch("core.pipeline.bulk_ingest.StagedLoad", FakeStagedLoad), \
+         patch("core.pipeline.bulk_ingest._stage_one", AsyncMock(side_effect=stage)), \
+         patch("core.pipeline.bulk_ingest.register_document", AsyncMock(side_effect=register)):
+        report = await bulk_ingest(items, pool=object(), staged=True)
+
+    assert events.index("merged") > max(events.index("staged doc_0"), events.index("staged doc_2"))
+    assert events[events.index("dropped") + 1:] == ["registered doc_0 at 10", "registered doc_2 at 12"]
+    assert report["ingested"] == 2 and report["total_chunks"] == 4
+    assert [f["document_id"] for f in report["failed"]] == ["doc_1"]
+    assert report["staged_merge"]["rows_inserted"] == 4
@@ -0,0 +1,93 @@
+"""
+tests/unit/test_bulk_ops.py
+
+Tests for the binary COPY encoding in core/database/bulk_ops.py. The wire
+data is decoded here by hand; no DB needed.
+"""
+import json
+import struct
+from unittest.mock import AsyncMock
+
+import numpy as np
+from pgvector import Vector
+
+from core.database.bulk_ops import COPY_COLUMNS, bulk_insert, encode_copy_rows
+from core.ingestion.chunkers import ChunkRecord
+from core.ingestion.lifecycle import compute_chunk_hash
+
+
+def _decode(data: bytes) -> list[list[bytes | None]]:
+    assert data[:11] == b'PGCOPY\n\xff\r\n\x00'
+    pos, rows = 19, []
+    while (count := struct.unpack_from('!h', data, pos)[0]) != -1:
+        pos += 2
+        row = []
+        for _ in range(count):
+            size = struct.unpack_from('!i', data, pos)[0]
+            pos += 4
+            row.append(None if size == -1 else data[pos:pos + size])
+            pos += max(size, 0)
+        rows.append(row)
+    assert pos + 2 == len(data)
+    return rows
+
+
+def _chunks(n: int) -> list[ChunkRecord]:
+    matrix = np.random.default_rng(0).random((n, 768), dtype=np.float32)
+    shared = {"source": "gdpr.md", "strategy": "recursive"}
+    return [
+        ChunkRecord(content=f"Artikel {i} — Löschung", metadata={"chunk_index": i}, embedding=row, shared_metadata=shared)
+        for i, row in enumerate(matrix)
+    ]
+
+
+def test_encode_copy_rows_matches_column_types():
+    chunks = _chunks(3)
+    chunks[2].embedding = None
+
+    rows = _decode(b"".join(encode_copy_rows(chunks, "gdpr", "eu", version=42)))
+
+    assert len(rows) == 3 and all(len(row) == len(COPY_COLUMNS) for row in rows)
+    document_id, namespace, content, embedding, metadata, chunk_hash, version = rows[0]
+    assert (document_id, namespace) == (b"gdpr", b"eu")
+    assert content.decode("utf-8") == "Artikel 0 — Löschung"
+    # pgvector's own binary decoder reads back the exact float32 values
+    assert np.array_equal(Vector.from_binary(embedding).to_numpy(), chunks[0].embedding)
+    assert metadata[:1] == b"\x01"
+    assert json.loads(metadata[1:]) == {"chunk_index": 0, "source": "gdpr.md", "strategy": "recursive"}
+    assert chunk_hash.decode() == compute_chunk_hash(chunks[0].content)
+    assert struct.unpack("!q", version) == (42,)
+    assert rows[2][3] is None
+
+
+def test_encode_copy_rows_is_lazy_and_split_into_pieces():
+    chunks = _chunks(10)
+    consumed = []
+
+    def tracked():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    pieces = encode_copy_rows(tracked(), "gdpr", buffer_size=4096)
+    first = next(pieces)
+
+    assert len(consumed) < len(chunks)
+    assert len(first) >= 4096
+    assert len(_decode(first + b"".join(pieces))) == 10
+
+
+async def test_bulk_insert_copies_binary_stream():
+    conn = AsyncMock()
+    sent = []
+
+    async def copy_to_table(table, source, columns, format):
+        sent.extend([piece async for piece in source])
+
+    conn.copy_to_table.side_effect = copy_to_table
+
+    await bulk_insert(conn, _chunks(2), document_id="gdpr", namespace="eu")
+
+    kwargs = conn.copy_to_table.call_args.kwargs
+    assert kwargs["format"] == "binary" and kwargs["columns"] == COPY_COLUMNS
+    assert [row[0] for row in _decode(b"".join(sent))] == [b"gdpr", b"gdpr"]
@@ -0,0 +1,295 @@
+"""
+tests/unit/test_chunkers.py
+
+Tests for the chunking strategies (pure functions, no I/O beyond tmp files).
+"""
+import json
+import pickle
+import random
+
+import pytest
+
+from core.ingestion.chunkers import (
+    CHUNKER_REGISTRY,
+    chunk_openapi_spec,
+    get_chunker,
+    get_streaming_chunker,
+    header_aware_split,
+    iter_header_aware_split,
+    iter_recursive_split,
+    recursive_split,
+    semantic_split,
+)
+from core.ingestion.tokenizer import get_token_counter
+from core.pipeline.db_ingest import iter_document_chunks
+
+PROSE = "\n\n".join(
+    f"Paragraph {p}. " + " ".join(f"Sentence {p}.{s} covers retention rule {s}." for s in range(p % 9 + 1))
+    for p in range(60)
+)
+
+MARKDOWN = "\n\n".join(
+    f"{'#' * (s % 3 + 1)} Section {s}\n\n" + "Body text for this section. " * (s * 7 % 90)
+    for s in range(25)
+)
+
+
+def _reference_recursive_split(text: str, chunk_size: int, overlap: int) -> list[tuple[str, int]]:
+    """The string-building recursive_split that the span-based one replaced, as (content, char_start)."""
+    def split(text, separators):
+        if not separators:
+            return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size - overlap)]
+        sep, segments, current = separators[0], [], ""
+        for part in [p.strip() for p in text.split(sep) if p.strip()]:
+            candidate = (current + sep + part).strip() if current else part
+            if len(candidate) <= chunk_size:
+                current = candidate
+                continue
+            if current:
+                segments.append(current)
+            if len(part) > chunk_size:
+                segments.extend(split(part, separators[1:]))
+                current = ""
+            else:
+                current = part
+        return segments + [current] if current else segments
+
+    out, cursor = [], 0
+    for seg in (s.strip() for s in split(text, ["\n\n", ". ", "! ", "? ", " "])):
+        if seg:
+            pos = text.find(seg, cursor)
+            pos = cursor if pos == -1 else pos
+            out.append((seg, pos))
+            cursor = pos + len(seg)
+    return out
+
+
+def _messy_prose(seed: int) -> str:
+    """Unique words joined by regular and irregular whitespace (extra blank lines, padded separators)."""
+    rng = random.Random(seed)
+    gaps = [" ", " ", " ", "  ", ". ", "! ", "? ", "\n\n", "\n\n\n", " \n\n ", ".\n\n", " . ", "  \n\n\n\n"]
+    return "".join(f"w{i}z{rng.choice(gaps)}" for i in range(rng.randint(0, 600)))
+
+
+def _pieces(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _positions(chunks):
+    return [(c.content, c.metadata["char_start"], c.metadata["char_end"]) for c in chunks]
+
+
+@pytest.mark.parametrize("read_size", [1, 13, 256, 100_000])
+def test_iter_recursive_split_matches_batch(read_size):
+    """Streaming must produce the same chunks and offsets however the reads are cut."""
+    batch = recursive_split(PROSE, chunk_size=300, overlap=20)
+    streamed = list(iter_recursive_split(_pieces(PROSE, read_size), chunk_size=300, overlap=20))
+    assert _positions(streamed) == _positions(batch)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_recursive_split_matches_reference(seed):
+    """Differential: span-based recursive_split == the string-building original, chunks and offsets."""
+    text = _messy_prose(seed)
+    chunk_size = random.Random(seed).choice([15, 40, 80, 200, 1200])
+    chunks = recursive_split(text, chunk_size=chunk_size, overlap=chunk_size // 5)
+    assert [(c.content, c.metadata["char_start"]) for c in chunks] == \
+        _reference_recursive_split(text, chunk_size, chunk_size // 5)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_recursive_split_repetitive_text_same_chunks(seed):
+    """
+    On highly repetitive text the original sometimes pinned a chunk to a later,
+    unrelated repeat of it; the bounded lookup doesn't. Contents must still match
+    and each chunk starts at or after the end of the previous one.
+    """
+    rng = random.Random(seed)
+    text = "".join(rng.choice(["ab", "a", ". ", " ", "\n\n", "\n\n\n", "\t", "x" * 30]) for _ in range(400))
+    chunks = recursive_split(text, chunk_size=20, overlap=4)
+    assert [c.content for c in chunks] == [seg for seg, _ in _reference_recursive_split(text, 20, 4)]
+    ends = [c.metadata["char_end"] for c in chunks]
+    starts = [c.metadata["char_start"] for c in chunks]
+    assert all(end <= nxt for end, nxt in zip(ends, starts[1:]))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_iter_recursive_split_repetitive_text_matches_batch(seed):
+    """Streaming uses the same bounded lookup, so offsets agree with batch on repetitive text too."""
+    rng = random.Random(seed)
+    text = "".join(rng.choice(["ab", "a", ". ", " ", "\n\n", "\n\n\n", "\t", "x" * 30]) for _ in range(400))
+    batch = recursive_split(text, chunk_size=20, overlap=4)
+    streamed = list(iter_recursive_split(_pieces(text, rng.choice([1, 13, 256])), chunk_size=20, overlap=4))
+    assert _positions(streamed) == _positions(batch)
+
+
+def test_iter_recursive_split_offsets_point_into_source():
+    """char_start/char_end must slice the original text back out."""
+    for chunk in iter_recursive_split(_pieces(PROSE, 97), chunk_size=200, overlap=10):
+        start, end = chunk.metadata["char_start"], chunk.metadata["char_end"]
+        assert PROSE[start:end] == chunk.content
+
+
+def test_iter_recursive_split_has_no_chunk_total():
+    """chunk_total is unknowable mid-stream, so it is left out rather than guessed."""
+    chunks = list(iter_recursive_split([PROSE], chunk_size=300))
+    assert all("chunk_total" not in c.metadata for c in chunks)
+    assert [c.metadata["chunk_index"] for c in chunks] == list(range(len(chunks)))
+
+
+def test_iter_recursive_split_bounds_unbroken_text():
+    """A file with no blank lines is force-cut instead of buffered whole."""
+    text = "word " * 50_000
+    chunks = list(iter_recursive_split(_pieces(text, 4096), chunk_size=500, max_pending=10_000))
+    assert chunks
+    assert all(len(c.content) <= 500 for c in chunks)
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 512, 100_000])
+def test_iter_header_aware_split_matches_batch(read_size):
+    """Header path state and section bodies must survive reads cut mid-header."""
+    batch = header_aware_split(MARKDOWN, chunk_size=400, overlap=20)
+    streamed = list(iter_header_aware_split(_pieces(MARKDOWN, read_size), chunk_size=400, overlap=20))
+
+    assert [c.content for c in streamed] == [c.content for c in batch]
+    for s, b in zip(streamed, batch):
+        expected = {k: v for k, v in b.metadata.items() if k != "doc_chunk_total"}
+        assert s.metadata == expected
+
+
+def test_iter_header_aware_split_keeps_preamble():
+    """Text before the first header is emitted as fallback chunks, not dropped."""
+    text = "Intro paragraph before any header.\n\n# Title\n\nBody."
+    chunks = list(iter_header_aware_split(_pieces(text, 5)))
+    assert chunks[0].content == "Intro paragraph before any header."
+    assert chunks[0].metadata["strategy"] == "header_aware_fallback"
+    assert chunks[1].metadata["header"] == "Title"
+
+
+def test_chunks_share_document_metadata_without_leaking_writes():
+    chunks = recursive_split(PROSE, source="docs/policy.txt", chunk_size=300)
+    shared = chunks[0].metadata.maps[1]
+
+    assert all(c.metadata.maps[1] is shared for c in chunks)
+    assert "chunk_index" not in shared and shared["source"] == "docs/policy.txt"
+
+    chunks[0].metadata["strategy"] = "relabelled"
+    assert chunks[1].metadata["strategy"] == "recursive"
+    assert json.loads(json.dumps(dict(chunks[0].metadata)))["strategy"] == "relabelled"
+
+    # One copy of the shared dict per pickle, not one per record
+    restored = pickle.loads(pickle.dumps(chunks))
+    assert restored[0].metadata.maps[1] is restored[-1].metadata.maps[1]
+    assert [dict(c.metadata) for c in restored] == [dict(c.metadata) for c in chunks]
+
+
+def test_get_streaming_chunker_dispatch():
+    assert get_streaming_chunker(".md") is iter_header_aware_split
+    assert get_streaming_chunker("txt") is iter_recursive_split
+    assert get_streaming_chunker(".log") is iter_recursive_split
+    assert get_streaming_chunker(".json") is None
+
+
+def test_iter_document_chunks_streams_from_disk(tmp_path):
+    path = tmp_path / "policy.md"
+    path.write_text(MARKDOWN, encoding="utf-8")
+    chunks = list(iter_document_chunks(str(path), read_size=64))
+    assert [c.content for c in chunks] == [c.content for c in header_aware_split(MARKDOWN, source=str(path))]
+
+
+def test_iter_document_chunks_sniffs_json(tmp_path):
+    """A .txt that is really an OpenAPI spec still goes to the JSON chunker."""
+    path = tmp_path / "spec.txt"
+    path.write_text('{"paths": {"/docs": {"get": {"summary": "List docs"}}}}', encoding="utf-8")
+    chunks = list(iter_document_chunks(str(path)))
+    assert len(chunks) == 1
+    assert chunks[0].metadata["strategy"] == "openapi_operation"
+
+
+@pytest.mark.parametrize("text", [PROSE, _messy_prose(7), "x" * 5000, "Art.5(1)(f) " * 400])
+def test_recursive_split_token_mode_respects_budget(text):
+    counter = get_token_counter()
+    chunks = recursive_split(text, chunk_size=64, overlap=8, token_counter=counter)
+
+    assert chunks
+    assert [c.metadata["token_count"] for c in chunks] == counter.count([c.content for c in chunks])
+    assert all(c.metadata["token_count"] <= 64 and c.metadata["size_unit"] == "tokens" for c in chunks)
+
+
+def test_header_aware_split_token_mode_respects_budget():
+    counter = get_token_counter()
+    chunks = header_aware_split(MARKDOWN, chunk_size=80, overlap=10, token_counter=counter)
+
+    assert any(c.metadata["is_subsection"] for c in chunks)
+    assert any(not c.metadata["is_subsection"] for c in chunks)
+    assert all(c.metadata["token_count"] <= 80 for c in chunks)
+    assert [c.metadata["token_count"] for c in chunks] == counter.count([c.content for c in chunks])
+
+
+def test_chunk_openapi_spec_token_mode_flags_oversize():
+    spec = json.dumps({"paths": {
+        "/short": {"get": {"summary": "Ping"}},
+        "/long": {"post": {"summary": "Create", "description": "retention schedule " * 100}},
+    }})
+    chunks = chunk_openapi_spec(spec, chunk_size=50, token_counter=get_token_counter())
+
+    assert [c.metadata["oversize"] for c in chunks] == [False, True]
+    assert chunks[1].metadata["token_count"] > 50
+
+
+def test_token_counter_pickles_to_the_process_cached_instance():
+    counter = get_token_counter()
+    assert len(pickle.dumps(counter)) < 500      # the path, not the vocabulary
+    assert pickle.loads(pickle.dumps(counter)) is counter
+
+
+TOPICS = (
+    " ".join(f"Privacy notice {i} explains data retention." for i in range(10)) + "\n\n"
+    + " ".join(f"Payment transfer {i} requires a wire record." for i in range(10))
+)
+
+
+def _topic_embed(calls: list[int]):
+    """Two-topic bag of words: [privacy-ish, payment-ish]."""
+    def embed_fn(texts):
+        calls.append(len(texts))
+        return [[t.count("Privacy") + t.count("retention"), t.count("Payment") + t.count("wire")] for t in texts]
+    return embed_fn
+
+
+def test_semantic_split_splits_at_topic_shift_in_batched_calls():
+    calls = []
+    chunks = semantic_split(TOPICS, embed_fn=_topic_embed(calls), window=1, min_chunk_size=0, batch_size=8)
+
+    assert calls == [8, 8, 4]
+    assert [c.metadata["boundary"] for c in chunks] == ["topic", "end"]
+    assert chunks[0].metadata["boundary_similarity"] == 0.0
+    assert "Payment" not in chunks[0].content and "Privacy" not in chunks[1].content
+    assert all(TOPICS[c.metadata["char_start"]:c.metadata["char_end"]] == c.content for c in chunks)
+
+
+def test_semantic_split_respects_chunk_size_and_min_chunk_size():
+    chunks = semantic_split(TOPICS, chunk_size=200, embed_fn=_topic_embed([]), window=1, min_chunk_size=0)
+    assert all(len(c.content) <= 200 for c in chunks)
+    assert any(c.metadata["boundary"] == "size" for c in chunks)
+
+    # Every sentence pair differs → without a minimum each sentence would be its own chunk
+    alternating = " ".join("Privacy rule applies." if i % 2 else "Payment rule applies." for i in range(40))
+    merged = semantic_split(alternating, chunk_size=1200, embed_fn=_topic_embed([]), window=1, min_chunk_size=100)
+    assert all(len(c.content) >= 100 for c in merged[:-1])
+
+
+def test_semantic_split_cuts_oversized_sentence_and_needs_embed_fn():
+    chunks = semantic_split("word " * 600, chunk_size=500, embed_fn=_topic_embed([]))
+    assert len(chunks) > 1 and all(len(c.content) <= 500 for c in chunks)
+
+    with pytest.raises(ValueError, match="embed_fn"):
+        semantic_split(TOPICS)
+
+
+def test_semantic_split_is_opt_in_registry_key():
+    assert CHUNKER_REGISTRY["semantic"] is semantic_split
+    assert get_chunker(".txt") is not semantic_split
+    # A .semantic upload is plain text, not a semantic_split call without an embedder
+    assert get_chunker(".semantic") is recursive_split
+    assert get_streaming_chunker(".semantic") is iter_recursive_split
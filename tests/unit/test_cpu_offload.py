@@ -0,0 +1,70 @@
+"""
+tests/unit/test_cpu_offload.py
+
+Tests for the shared-memory offload path: run_cpu_bound_shared in
+core/processing/cpu_offload.py and the PackedChunks encoding in
+core/processing/pipeline.py. Uses a real process pool; no services needed.
+"""
+import os
+
+import pytest
+
+from core.processing.cpu_offload import run_cpu_bound_shared, shutdown_pool
+from core.processing.pipeline import _chunk_text, chunk_document, pack_chunks, unpack_chunks
+
+MARKDOWN = (
+    "# Data Retention\nRecords are kept for five years.\n\n"
+    "## Erasure\n\n" + "Controllers erase personal data without undue delay. " * 60 + "\n\n"
+    "## Audit\n\nAudits run quarterly.\n"
+)
+
+
+@pytest.fixture
+def process_pool():
+    yield
+    shutdown_pool()
+
+
+def _as_tuples(chunks):
+    return [(c.content, c.metadata) for c in chunks]
+
+
+@pytest.mark.parametrize("extension, text", [
+    (".md", MARKDOWN),
+    (".md", "No headings here.\n\n" * 200),                     # fallback → per-chunk extras
+    (".txt", "Retention applies to every record. " * 400),
+])
+def test_pack_unpack_round_trips_chunks(extension, text):
+    chunks = _chunk_text(extension, text, "policy" + extension)
+
+    packed = pack_chunks(text, chunks)
+
+    assert _as_tuples(unpack_chunks(text, packed)) == _as_tuples(chunks)
+    assert packed.header["source"] == "policy" + extension
+    assert "source" not in packed.columns
+
+
+def test_pack_ships_only_non_verbatim_chunks_as_text():
+    chunks = _chunk_text(".md", MARKDOWN, "policy.md")
+
+    packed = pack_chunks(MARKDOWN, chunks)
+
+    # "# Data Retention\n\nRecords..." is rebuilt with a blank line the source lacks
+    assert packed.texts == [chunks[0].content]
+    assert len(packed.offsets) == 16 * len(chunks)
+
+
+async def test_run_cpu_bound_shared_passes_text_and_unlinks_block(process_pool):
+    before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+    assert await run_cpu_bound_shared(len, "Verordnung über Aufbewahrung — §147 AO") == 38
+
+    after = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+    assert after <= before
+
+
+async def test_chunk_document_shared_transfer_matches_inline(process_pool):
+    inline = await chunk_document(MARKDOWN, "policy.md", offload_threshold=len(MARKDOWN) + 1)
+    shared = await chunk_document(MARKDOWN, "policy.md", offload_threshold=1, offload_transfer="shared")
+
+    assert _as_tuples(shared) == _as_tuples(inline)
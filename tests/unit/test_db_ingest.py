@@ -0,0 +1,219 @@
+"""
+tests/unit/test_db_ingest.py
+
+Tests for the overlapped embed → COPY stages in core/pipeline/db_ingest.py.
+embed_chunks and bulk_insert are patched; no DB or embedding provider needed.
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from core.ingestion.chunkers import ChunkRecord
+from core.pipeline.db_ingest import ingest_chunks
+
+
+def _chunks(n: int) -> list[ChunkRecord]:
+    return [ChunkRecord(content=f"chunk {i}", metadata={"chunk_index": i}) for i in range(n)]
+
+
+async def test_ingest_chunks_inserts_every_chunk(mock_db_pool):
+    pool, _ = mock_db_pool
+    inserted = []
+
+    async def fake_embed(batch, cache=None):
+        for c in batch:
+            c.embedding = [0.0]
+        return batch
+
+    async def fake_insert(conn, batch, document_id, namespace):
+        inserted.extend(c.metadata["chunk_index"] for c in batch)
+
+    with patch("core.pipeline.db_ingest.embed_chunks", fake_embed), \
+         patch("core.pipeline.db_ingest.bulk_insert", fake_insert):
+        metrics = await ingest_chunks(_chunks(23), pool, "doc", batch_size=5)
+
+    assert metrics["total_chunks"] == 23
+    assert sorted(inserted) == list(range(23))
+    for key in ("embed_time_seconds", "insert_time_seconds",
+                "writer_queue_wait_seconds", "embed_queue_wait_seconds"):
+        assert key in metrics
+
+
+async def test_ingest_chunks_overlaps_embed_with_copy(mock_db_pool):
+    """The next batch must start embedding before the previous COPY finishes."""
+    pool, _ = mock_db_pool
+    events = []
+
+    async def fake_embed(batch, cache=None):
+        events.append(("embed_start", batch[0].metadata["chunk_index"]))
+        await asyncio.sleep(0.01)
+        return batch
+
+    async def fake_insert(conn, batch, document_id, namespace):
+        await asyncio.sleep(0.03)
+        events.append(("insert_end", batch[0].metadata["chunk_index"]))
+
+    with patch("core.pipeline.db_ingest.embed_chunks", fake_embed), \
+         patch("core.pipeline.db_ingest.bulk_insert", fake_insert):
+        await ingest_chunks(_chunks(20), pool, "doc", batch_size=5, embed_concurrency=1)
+
+    first_insert_end = events.index(("insert_end", 0))
+    assert ("embed_start", 5) in events[:first_insert_end]
+
+
+async def test_ingest_chunks_bounds_in_flight_batches(mock_db_pool):
+    """A stalled writer must stop the producer instead of buffering everything."""
+    pool, _ = mock_db_pool
+    embedded = []
+    release = asyncio.Event()
+
+    async def fake_embed(batch, cache=None):
+        embedded.append(batch[0].metadata["chunk_index"])
+        return batch
+
+    async def fake_insert(conn, batch, document_id, namespace):
+        await release.wait()
+
+    with patch("core.pipeline.db_ingest.embed_chunks", fake_embed), \
+         patch("core.pipeline.db_ingest.bulk_insert", fake_insert):
+        task = asyncio.create_task(
+            ingest_chunks(_chunks(100), pool, "doc", batch_size=1, embed_concurrency=2, max_queued_batches=3)
+        )
+        await asyncio.sleep(0.05)
+        # 1 batch held by the writer + 3 queued + 2 embedders blocked on put()
+        assert len(embedded) <= 6
+        release.set()
+        metrics = await task
+
+    assert metrics["total_chunks"] == 100
+
+
+async def test_ingest_chunks_copies_on_several_connections_under_pool_cap(mock_db_pool):
+    """Writers COPY concurrently, but never beyond COPY_POOL_SHARE of the pool — even across ingests."""
+    pool, _ = mock_db_pool
+    pool.get_max_size.return_value = 6          # cap: 3 connections
+    in_flight, peak, inserted = 0, 0, []
+
+    async def fake_embed(batch, cache=None):
+        return batch
+
+    async def fake_insert(conn, batch, document_id, namespace):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        inserted.extend((document_id, c.metadata["chunk_index"]) for c in batch)
+
+    with patch("core.pipeline.db_ingest.embed_chunks", fake_embed), \
+         patch("core.pipeline.db_ingest.bulk_insert", fake_insert):
+        metrics, _ = await asyncio.gather(
+            ingest_chunks(_chunks(40), pool, "a", batch_size=2, copy_concurrency=8, max_queued_batches=8),
+            ingest_chunks(_chunks(40), pool, "b", batch_size=2, copy_concurrency=8, max_queued_batches=8),
+        )
+
+    assert metrics["copy_connections"] == 3
+    assert peak == 3
+    assert sorted(i for d, i in inserted if d == "a") == list(range(40))
+
+
+async def test_ingest_chunks_surfaces_embed_error(mock_db_pool):
+    """Provider errors propagate as themselves, not wrapped in an ExceptionGroup."""
+    pool, _ = mock_db_pool
+
+    async def failing_embed(batch, cache=None):
+        raise RuntimeError("provider down")
+
+    with patch("core.pipeline.db_ingest.embed_chunks", failing_embed):
+        with pytest.raises(RuntimeError, match="provider down"):
+            await ingest_chunks(_chunks(10), pool, "doc", batch_size=5)
+
+
+async def test_ingest_changed_chunks_embeds_only_the_diff(mock_db_pool):
+    """Kept chunks skip embedding and are carried into the new version with their new metadata."""
+    from core.ingestion.lifecycle import compute_chunk_hash
+    from core.pipeline.db_ingest import ingest_changed_chunks
+
+    pool, _ = mock_db_pool
+    stored = {
+        compute_chunk_hash("Article 1 unchanged"): [(10, {"chunk_index": 0})],
+        compute_chunk_hash("Article 2 unchanged"): [(11, {"chunk_index": 1})],
+        compute_chunk_hash("Article 3 repealed"): [(12, {"chunk_index": 2})],
+    }
+    new_version = [
+        ChunkRecord(content="Article 1 unchanged", metadata={"chunk_index": 0}),
+        ChunkRecord(content="Article 1a inserted", metadata={"chunk_index": 1}),
+        ChunkRecord(content="Article 2 unchanged", metadata={"chunk_index": 2}),
+    ]
+    embedded, inserted, carried = [], [], []
+
+    async def fake_embed(batch, cache=None):
+        embedded.extend(c.content for c in batch)
+        return batch
+
+    async def fake_insert(conn, batch, document_id, namespace, version):
+        inserted.append(version)
+
+    async def fake_fetch(pool, document_id, namespace):
+        return stored
+
+    async def fake_carry_over(pool, namespace, version, kept):
+        carried.append((version, kept))
+        return len(kept)
+
+    with patch("core.pipeline.db_ingest.embed_chunks", fake_embed), \
+         patch("core.pipeline.db_ingest.bulk_insert", fake_insert), \
+         patch("core.pipeline.db_ingest.fetch_chunk_hashes", fake_fetch), \
+         patch("core.pipeline.db_ingest.carry_over_chunks", fake_carry_over):
+        metrics = await ingest_changed_chunks(new_version, pool, "gdpr", version=7)
+
+    assert embedded == ["Article 1a inserted"]
+    assert inserted == [7]
+    assert carried == [(7, [(10, '{"chunk_index": 0}'), (11, '{"chunk_index": 2}')])]
+    assert (metrics["total_chunks"], metrics["chunks_embedded"],
+            metrics["chunks_reused"], metrics["chunks_deleted"]) == (3, 1, 2, 1)
+
+
+async def test_chunk_document_offloads_only_above_threshold():
+    from core.processing.pipeline import chunk_document
+
+    offloaded = []
+
+    async def fake_run_cpu_bound(fn, *args):
+        offloaded.append(args[-1])
+        return fn(*args)
+
+    text = "Retention applies to every record.\n\n" * 50
+    with patch("core.processing.pipeline.run_cpu_bound", fake_run_cpu_bound):
+        inline = await chunk_document(text, "small.txt", offload_threshold=len(text) + 1)
+        pooled = await chunk_document(text, "large.txt", offload_threshold=len(text))
+
+    assert offloaded == ["large.txt"]
+    assert [c.content for c in inline] == [c.content for c in pooled]
+    assert inline[0].metadata["source"] == "small.txt"
+
+
+async def test_ingest_document_chunks_text_in_memory(mock_db_pool):
+    """Uploads are chunked from the text itself; the filename picks the chunker."""
+    from core.pipeline.db_ingest import ingest_document
+
+    pool, _ = mock_db_pool
+    inserted = []
+
+    async def fake_embed(batch, cache=None):
+        return batch
+
+    async def fake_insert(conn, batch, document_id, namespace):
+        inserted.extend(batch)
+
+    with patch("core.pipeline.db_ingest.embed_chunks", fake_embed), \
+         patch("core.pipeline.db_ingest.bulk_insert", fake_insert):
+        metrics = await ingest_document(
+            "# Scope\n\nApplies to processors.\n\n# Rights\n\nAccess and erasure.",
+            source="policy.md", document_id="policy", pool=pool, use_embedding_cache=False,
+        )
+
+    assert metrics["total_chunks"] == 2
+    assert [c.metadata["header"] for c in inserted] == ["Scope", "Rights"]
+    assert inserted[0].metadata["source"] == "policy.md"
@@ -0,0 +1,174 @@
+"""
+tests/unit/test_embedders.py
+
+Tests for embed_chunks deduplication, the (model, content hash) embedding cache
+and the adaptive EmbeddingScheduler.
+The provider call is patched; the cache runs against the mocked pool.
+The scheduler tests patch the single provider call and asyncio.sleep.
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import litellm
+import numpy as np
+
+from core.ingestion.chunkers import ChunkRecord
+from core.ingestion.embedders import EmbeddingCache, EmbeddingScheduler, embed_chunks
+from core.ingestion.lifecycle import compute_chunk_hash
+
+
+def _fake_provider(sent: list):
+    async def provider(texts):
+        sent.extend(texts)
+        return [[float(len(t))] for t in texts]
+    return provider
+
+
+async def test_embed_chunks_deduplicates_within_batch():
+    chunks = [ChunkRecord(content=t) for t in ("boilerplate", "article 1", "boilerplate")]
+    sent = []
+    with patch("core.ingestion.embedders._provider_embed", _fake_provider(sent)):
+        await embed_chunks(chunks)
+
+    assert sent == ["boilerplate", "article 1"]
+    assert chunks[0].embedding.tolist() == chunks[2].embedding.tolist() == [11.0]
+
+
+async def test_embed_chunks_stores_rows_of_one_float32_matrix():
+    chunks = [ChunkRecord(content=t) for t in ("article 1", "article 22", "article 1")]
+    with patch("core.ingestion.embedders._provider_embed", _fake_provider([])):
+        await embed_chunks(chunks)
+
+    matrix = chunks[0].embedding.base
+    assert matrix.dtype == np.float32 and matrix.shape == (2, 1)
+    assert all(c.embedding.base is matrix for c in chunks)
+    assert chunks[2].embedding is chunks[0].embedding                 # duplicates share a row
+
+
+async def test_embed_chunks_sends_only_cache_misses(mock_db_pool):
+    pool, conn = mock_db_pool
+    conn.fetch.return_value = [
+        {"content_hash": compute_chunk_hash("boilerplate"), "embedding": np.array([7.0], dtype=np.float32)},
+    ]
+    cache = EmbeddingCache(pool, model="ollama/nomic-embed-text")
+    chunks = [ChunkRecord(content=t) for t in ("boilerplate", "article 1", "article 1")]
+    sent = []
+
+    with patch("core.ingestion.embedders._provider_embed", _fake_provider(sent)):
+        await embed_chunks(chunks, cache=cache)
+
+    assert sent == ["article 1"]
+    assert chunks[0].embedding.tolist() == [7.0]               # served from cache
+    assert conn.fetch.await_args.args[1] == "ollama/nomic-embed-text"   # model is part of the key
+    written = conn.executemany.await_args.args[1]
+    assert written == [("ollama/nomic-embed-text", compute_chunk_hash("article 1"), [9.0])]
+    assert cache.stats() == {
+        "embedding_cache_hits": 1,
+        "embedding_cache_misses": 1,
+        "embedding_cache_hit_ratio": 0.5,
+    }
+
+
+async def test_embedding_cache_fails_open(mock_db_pool):
+    """A missing embedding_cache table must not stop ingestion."""
+    import asyncpg
+
+    pool, conn = mock_db_pool
+    conn.fetch = AsyncMock(side_effect=asyncpg.UndefinedTableError("relation does not exist"))
+    conn.executemany = AsyncMock(side_effect=asyncpg.UndefinedTableError("relation does not exist"))
+    chunks = [ChunkRecord(content="article 1")]
+
+    with patch("core.ingestion.embedders._provider_embed", _fake_provider([])):
+        await embed_chunks(chunks, cache=EmbeddingCache(pool, model="m"))
+
+    assert chunks[0].embedding.tolist() == [9.0]
+
+
+def _rate_limit(retry_after: str | None = None) -> litellm.RateLimitError:
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://ollama:11434/api/embed"))
+    return litellm.RateLimitError("slow down", llm_provider="ollama", model="nomic-embed-text", response=response)
+
+
+def test_scheduler_split_respects_count_and_char_budget():
+    scheduler = EmbeddingScheduler({"initial_batch_size": 3, "max_batch_chars": 10})
+    assert scheduler.split(["aaaa", "bbbb", "ccc", "d", "e"]) == [["aaaa", "bbbb"], ["ccc", "d", "e"]]
+    assert scheduler.split(["x" * 50, "y"]) == [["x" * 50], ["y"]]   # oversize text goes alone
+
+
+async def test_scheduler_honours_retry_after_and_backs_off():
+    scheduler = EmbeddingScheduler({"initial_batch_size": 32, "initial_concurrency": 4})
+    calls = []
+
+    async def provider(texts):
+        calls.append(len(texts))
+        if len(calls) == 1:
+            raise _rate_limit(retry_after="3")
+        return [[1.0]] * len(texts)
+
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    with patch("core.ingestion.embedders._provider_embed", provider), \
+         patch("core.ingestion.embedders.asyncio.sleep", fake_sleep):
+        vectors = await scheduler.embed(["t"] * 5)
+
+    assert len(vectors) == 5
+    assert calls == [5, 5]
+    assert 3.0 <= sleeps[0] <= 3.0 + scheduler.config["backoff_base_seconds"]
+    assert scheduler.concurrency == 2
+    assert scheduler.rate_limited == 1
+
+
+async def test_scheduler_grows_on_fast_calls():
+    scheduler = EmbeddingScheduler({"initial_batch_size": 4, "batch_size_step": 4,
+                                    "initial_concurrency": 1, "max_concurrency": 3})
+
+    async def provider(texts):
+        return [[1.0]] * len(texts)
+
+    with patch("core.ingestion.embedders._provider_embed", provider):
+        for _ in range(3):
+            await scheduler.embed(["t"] * 4)
+
+    # +1 slot per `concurrency` fast calls: 1 → 2 after one call, 2 → 3 after two more
+    assert scheduler.batch_size == 16
+    assert scheduler.concurrency == 3
+
+
+async def test_scheduler_caps_requests_in_flight():
+    scheduler = EmbeddingScheduler({"initial_batch_size": 1, "initial_concurrency": 2,
+                                    "max_concurrency": 2, "target_latency_seconds": 10})
+    in_flight, peak = 0, 0
+
+    async def provider(texts):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [[1.0]]
+
+    with patch("core.ingestion.embedders._provider_embed", provider):
+        await scheduler.embed(["t"] * 8)
+
+    assert peak == 2
+
+
+async def test_scheduler_splits_rejected_batch():
+    """A 400 on a multi-text request is retried as two halves instead of failing."""
+    scheduler = EmbeddingScheduler({"initial_batch_size": 4, "batch_size_step": 0})
+
+    async def provider(texts):
+        if len(texts) > 2:
+            raise litellm.BadRequestError("input too long", model="nomic-embed-text", llm_provider="ollama")
+        return [[float(len(t))] for t in texts]
+
+    with patch("core.ingestion.embedders._provider_embed", provider):
+        vectors = await scheduler.embed(["a", "bb", "ccc", "dddd"])
+
+    assert vectors == [[1.0], [2.0], [3.0], [4.0]]
+    assert scheduler.batch_size == 2
@@ -0,0 +1,127 @@
+"""
+tests/unit/test_ingest_jobs.py
+
+Tests for the background ingestion job queue in api/services/ingest_jobs.py.
+ingest_upload is patched and Redis is an in-memory stand-in; no services needed.
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from api.services.ingest_jobs import IngestJobQueue, IngestQueueFull, get_job
+from api.services.uploads import SpooledUpload
+
+
+class FakeRedis:
+    """The hash + MULTI subset of redis.asyncio the job store uses."""
+
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.ttls: dict[str, int] = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+class _FakePipeline:
+    def __init__(self, r):
+        self.r, self.ops = r, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def hset(self, key, mapping):
+        self.ops.append(lambda: self.r.hashes.setdefault(key, {}).update(mapping))
+
+    def expire(self, key, seconds):
+        self.ops.append(lambda: self.r.ttls.__setitem__(key, seconds))
+
+    async def execute(self):
+        for op in self.ops:
+            op()
+
+
+def _upload(content: bytes, filename: str) -> SpooledUpload:
+    return SpooledUpload(filename=filename, sha256="0" * 64, size=len(content), content=content)
+
+
+async def _wait_for(r, job_id, status):
+    for _ in range(200):
+        job = await get_job(r, job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"job never reached {status}: {job}")
+
+
+async def test_job_runs_in_background_and_reports_progress(mock_db_pool):
+    pool, _ = mock_db_pool
+    r = FakeRedis()
+    release = asyncio.Event()
+
+    async def fake_ingest_upload(pool, upload, document_id, namespace, on_progress=None, reclaimer=None):
+        await on_progress("embedding", 50, 120)
+        await release.wait()
+        return {"document_id": document_id, "namespace": namespace, "status": "new", "total_chunks": 120,
+                "total_time_seconds": 1.0, "throughput_chunks_per_second": 120.0}
+
+    jobs = IngestJobQueue(pool, r, workers=1, max_queued=4)
+    with patch("api.services.ingest_jobs.ingest_upload", fake_ingest_upload):
+        jobs.start()
+        job_id = await jobs.submit(_upload(b"text", "gdpr.md"), "gdpr", "legal")
+        assert r.ttls["ingest_job:" + job_id] > 0
+
+        running = await _wait_for(r, job_id, "running")
+        assert (running["stage"], running["chunks_done"], running["chunks_total"]) == ("embedding", 50, 120)
+
+        release.set()
+        done = await _wait_for(r, job_id, "done")
+        await jobs.stop()
+
+    assert (done["stage"], done["chunks_done"]) == ("done", 120)
+    assert done["result"]["total_chunks"] == 120
+    assert done["throughput_chunks_per_second"] > 0
+
+
+async def test_full_queue_raises_with_retry_after(mock_db_pool):
+    pool, _ = mock_db_pool
+    jobs = IngestJobQueue(pool, FakeRedis(), workers=2, max_queued=2)   # workers not started
+
+    await jobs.submit(_upload(b"a", "a.txt"), "a", "default")
+    await jobs.submit(_upload(b"b", "b.txt"), "b", "default")
+    with pytest.raises(IngestQueueFull) as exc:
+        await jobs.submit(_upload(b"c", "c.txt"), "c", "default")
+    assert exc.value.retry_after >= 1
+
+
+async def test_failed_and_unfinished_jobs_are_marked_failed(mock_db_pool):
+    pool, _ = mock_db_pool
+    r = FakeRedis()
+
+    async def failing_ingest_upload(*args, **kwargs):
+        raise ValueError("Chunker for .pdf is planned but not yet implemented.")
+
+    jobs = IngestJobQueue(pool, r, workers=1, max_queued=4)
+    with patch("api.services.ingest_jobs.ingest_upload", failing_ingest_upload):
+        jobs.start()
+        failed_id = await jobs.submit(_upload(b"%PDF", "scan.pdf"), "scan", "default")
+        failed = await _wait_for(r, failed_id, "failed")
+        await jobs.stop()
+
+    assert "not yet implemented" in failed["error"]
+
+    idle = IngestJobQueue(pool, r, workers=1, max_queued=4)
+    queued_id = await idle.submit(_upload(b"text", "a.txt"), "a", "default")
+    await idle.stop()
+    assert "resubmit" in (await get_job(r, queued_id))["error"]
+
+
+async def test_unknown_job_is_none():
+    assert await get_job(FakeRedis(), "missing") is None
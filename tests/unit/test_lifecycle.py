@@ -1,9 +1,20 @@
 """
 tests/unit/test_lifecycle.py
 
-Tests for the document lifecycle module (pure functions only).
+Tests for the document lifecycle module (pure functions and mocked-pool queries).
 """
-from core.ingestion.lifecycle import compute_content_hash
+import json
+
+from core.ingestion.lifecycle import (
+    carry_over_chunks,
+    check_documents_status,
+    compute_chunk_hash,
+    compute_content_hash,
+    compute_file_hash,
+    delete_document_chunks,
+    fetch_chunk_hashes,
+    reclaim_stale_versions,
+)
 
 
 def test_hash_deterministic():
@@ -45,3 +56,96 @@ def test_hash_large_content():
     content = b"x" * (5 * 1024 * 1024)  # 5 MB
     result = compute_content_hash(content)
     assert len(result) == 64
+
+
+def test_file_hash_matches_content_hash(tmp_path):
+    """Streaming the file must give the same digest as hashing its bytes at once."""
+    content = b"Article 5 - principles relating to processing of personal data\n" * 50_000
+    path = tmp_path / "gdpr.md"
+    path.write_bytes(content)
+    assert compute_file_hash(path, block_size=4096) == compute_content_hash(content)
+
+
+async def test_batched_status_lookup(mock_db_pool):
+    """One query classifies every document as new / unchanged / updated."""
+    pool, conn = mock_db_pool
+    conn.fetch.return_value = [
+        {"document_id": "gdpr", "content_hash": "aaa"},
+        {"document_id": "ccpa", "content_hash": "old"},
+    ]
+    statuses = await check_documents_status(pool, "legal", {"gdpr": "aaa", "ccpa": "new", "hipaa": "x"})
+    assert statuses == {"gdpr": "unchanged", "ccpa": "updated", "hipaa": "new"}
+    assert conn.fetch.await_count == 1
+
+
+async def test_fetch_chunk_hashes_groups_duplicates(mock_db_pool):
+    """Repeated paragraphs keep one entry each; pre-migration NULL hashes never match."""
+    pool, conn = mock_db_pool
+    h = compute_chunk_hash("Standard confidentiality clause.")
+    conn.fetch.return_value = [
+        {"id": 1, "chunk_hash": h, "metadata": '{"chunk_index": 0}'},
+        {"id": 2, "chunk_hash": h, "metadata": {"chunk_index": 5}},
+        {"id": 3, "chunk_hash": None, "metadata": None},
+    ]
+    stored = await fetch_chunk_hashes(pool, "nda", "legal")
+    # document order, not id order: parallel COPY writers land batches out of order
+    assert "ORDER BY (metadata->>'chunk_index')::int" in conn.fetch.await_args.args[0]
+    assert stored[h] == [(1, {"chunk_index": 0}), (2, {"chunk_index": 5})]
+    assert stored[""] == [(3, {})]
+
+
+async def test_carry_over_copies_embedding_and_fts_vector_server_side(mock_db_pool):
+    """Kept chunks are neither re-embedded nor re-analysed: both come from the stored row."""
+    pool, conn = mock_db_pool
+    conn.execute.return_value = "INSERT 0 2"
+
+    assert await carry_over_chunks(pool, "legal", 7, [(1, '{"chunk_index": 0}'), (2, '{"chunk_index": 1}')]) == 2
+    sql, ids, metadatas, version, namespace = conn.execute.await_args.args
+    assert "d.embedding" in sql and "d.fts_vector" in sql
+    assert (ids, version, namespace) == ([1, 2], 7, "legal")
+    assert await carry_over_chunks(pool, "legal", 7, []) == 0
+
+
+async def test_reclaim_stale_versions_deletes_in_batches(mock_db_pool):
+    """Full batches keep going; a short batch means the old version is gone."""
+    pool, conn = mock_db_pool
+    conn.execute.side_effect = ["DELETE 500", "DELETE 500", "DELETE 3"]
+    deleted = await reclaim_stale_versions(pool, "gdpr", "legal", batch_size=500, pause_seconds=0)
+    assert deleted == 1003
+    assert conn.execute.await_count == 3
+    sql, *args = conn.execute.await_args.args
+    assert "d.version < r.current_version" in sql
+    assert args == [500, "legal", "gdpr"]
+
+
+async def test_unscoped_reclaim_selects_dead_documents_then_deletes_per_document(mock_db_pool):
+    """The sweep finds the documents first; every DELETE is scoped to one (namespace, document_id)."""
+    pool, conn = mock_db_pool
+    conn.fetch.return_value = [{"document_id": "gdpr", "namespace": "legal"},
+                               {"document_id": "kyc", "namespace": "kyc_aml"}]
+    conn.execute.side_effect = ["DELETE 2", "DELETE 7"]
+    assert await reclaim_stale_versions(pool, batch_size=500, pause_seconds=0) == 9
+    assert "FROM document_registry r" in conn.fetch.await_args.args[0]
+    assert [call.args[1:] for call in conn.execute.await_args_list] == [
+        (500, "legal", "gdpr"), (500, "kyc_aml", "kyc"),
+    ]
+
+
+async def test_delete_document_chunks_tombstones_instead_of_deleting(mock_db_pool):
+    """A registered document is hidden by one registry UPDATE; unknown ones report None."""
+    pool, conn = mock_db_pool
+    conn.fetchval.return_value = 10_000
+    assert await delete_document_chunks(pool, "gdpr", "legal") == 10_000
+    assert conn.fetchval.await_count == 1
+    sql, *args = conn.fetchval.await_args.args
+    assert "UPDATE document_registry SET deleted_at" in sql
+    # listeners hear of it in the same statement
+    assert "pg_notify('document_changes', $3)" in sql
+    assert json.loads(args[2]) == {"namespace": "legal", "document_id": "gdpr"}
+    conn.execute.assert_not_awaited()
+
+    conn.fetchval.reset_mock()
+    conn.fetchval.return_value = None
+    assert await delete_document_chunks(pool, "missing", "legal") is None
+    # second statement: tombstone entry for rows loaded without the registry
+    assert "INSERT INTO document_registry" in conn.fetchval.await_args.args[0]
@@ -0,0 +1,82 @@
+"""
+tests/unit/test_reclaimer.py
+
+Tests for the background reclaimer in api/services/reclaimer.py. The lifecycle
+queries are patched; no DB needed.
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from api.services.reclaimer import VersionReclaimer
+
+
+async def test_reclaimer_sweeps_then_drains_queue_and_reports_progress(mock_db_pool):
+    pool, conn = mock_db_pool
+    conn.fetchval.return_value = True            # got the sweep lock
+    calls = []
+
+    async def fake_reclaim(pool, document_id, namespace, on_batch=None):
+        calls.append((document_id, namespace))
+        on_batch(500)
+        on_batch(3)
+        return 503
+
+    reclaimer = VersionReclaimer(pool)
+    reclaimer.schedule("gdpr", "legal")
+    reclaimer.schedule("gdpr", "legal")          # collapses into the queued entry
+    with patch("api.services.reclaimer.reclaim_stale_versions", fake_reclaim), \
+         patch("api.services.reclaimer.count_dead_chunks", AsyncMock(return_value={"legal": 42})):
+        reclaimer.start()
+        for _ in range(100):
+            if reclaimer.documents_done:
+                break
+            await asyncio.sleep(0.005)
+        status = await reclaimer.status()
+        await reclaimer.stop()
+
+    assert calls == [(None, None), ("gdpr", "legal")]
+    assert status["chunks_reclaimed"] == 1006 and status["documents_done"] == 1
+    assert status["queued"] == 0 and status["dead_chunks"] == {"legal": 42}
+    assert "pg_advisory_unlock" in conn.execute.await_args.args[0]
+
+
+async def test_only_the_worker_holding_the_sweep_lock_sweeps(mock_db_pool):
+    pool, conn = mock_db_pool
+    conn.fetchval.return_value = False           # another worker is sweeping
+    calls = []
+
+    async def fake_reclaim(pool, document_id, namespace, on_batch=None):
+        calls.append((document_id, namespace))
+        return 0
+
+    reclaimer = VersionReclaimer(pool)
+    reclaimer.schedule("gdpr", "legal")
+    with patch("api.services.reclaimer.reclaim_stale_versions", fake_reclaim):
+        reclaimer.start()
+        for _ in range(100):
+            if reclaimer.documents_done:
+                break
+            await asyncio.sleep(0.005)
+        await reclaimer.stop()
+
+    assert calls == [("gdpr", "legal")]
+    conn.execute.assert_not_awaited()
+
+
+async def test_reclaimer_survives_a_failed_reclaim():
+    async def failing(pool, document_id, namespace, on_batch=None):
+        raise RuntimeError("lock timeout")
+
+    reclaimer = VersionReclaimer(pool=object())
+    with patch("api.services.reclaimer.reclaim_stale_versions", failing):
+        reclaimer.start()
+        reclaimer.schedule("gdpr", "legal")
+        for _ in range(100):
+            if reclaimer.last_error and "gdpr" in reclaimer.last_error:
+                break
+            await asyncio.sleep(0.005)
+        running = not reclaimer._task.done()
+        await reclaimer.stop()
+
+    assert running
+    assert reclaimer.last_error == "legal/gdpr: lock timeout"
@@ -3,9 +3,22 @@ tests/unit/test_retriever.py
 
 Tests for the retriever's pure functions (no database needed).
 """
+from unittest.mock import AsyncMock, MagicMock
+
+import asyncpg
 import pytest
 
-from api.services.retriever import rrf_merge
+import config
+from api.services.retriever import retrieve_vector, rrf_merge
+from core.database import pool as pool_module
+
+
+class _Transaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
 
 
 def test_rrf_empty_inputs():
@@ -62,3 +75,134 @@ def test_rrf_top_k_limits_output(make_doc, top_k, expected_len):
     docs = [make_doc(i) for i in range(10)]
     result = rrf_merge(docs, [], k=60, top_k=top_k)
     assert len(result) == expected_len
+
+
+async def test_hybrid_sql_is_one_statement_shaped_like_rrf_merge(mock_db_pool):
+    """hybrid_sql: one fetch on one connection; the row's found-by-vector decides the score field."""
+    from api.services.retriever import RetrieverConfig, retrieve
+
+    pool, conn = mock_db_pool
+    conn.fetch.return_value = [
+        {"id": 7, "document_id": "gdpr", "content": "Art. 17", "metadata": '{"source_filename": "gdpr.md"}',
+         "bm25_score": 0.4, "vector_score": 0.8, "vector_rank": 1, "rrf_score": 2 / 61},
+        {"id": 9, "document_id": "ccpa", "content": "1798.105", "metadata": {},
+         "bm25_score": 0.2, "vector_score": None, "vector_rank": None, "rrf_score": 1 / 62},
+    ]
+    cfg = RetrieverConfig(top_k=2, mode="hybrid_sql", ef_search=None, iterative_scan=None)
+
+    results = await retrieve(pool, "right to erasure timeline for data deletion", [0.1] * 768, "legal", cfg)
+
+    assert conn.fetch.await_count == 1
+    args = conn.fetch.await_args.args
+    assert args[3:8] == (True, "legal", 4, 60, 2)      # OR mode (5+ words), over-fetch, rrf k, top_k
+    assert results[0] == {
+        "id": 7, "document_id": "gdpr", "content": "Art. 17", "metadata": {"source_filename": "gdpr.md"},
+        "vector_score": 0.8, "source_filename": "gdpr.md", "rrf_score": 2 / 61,
+    }
+    assert "vector_score" not in results[1] and results[1]["bm25_score"] == 0.2
+    # every ranked list breaks score ties by id, so both paths agree on tied rows
+    from api.services.retriever import HYBRID_BM25_SQL, HYBRID_SQL
+    for sql in (HYBRID_SQL, HYBRID_BM25_SQL):
+        assert sql.count("row_number() OVER (ORDER BY") == sql.count(", id) AS rank") == 2
+
+
+async def test_vector_search_applies_hnsw_settings_inside_a_transaction(mock_db_pool):
+    """Values other than the pool's defaults go through one transaction-local set_config before the query."""
+    from unittest.mock import MagicMock
+
+    from api.services.retriever import VECTOR_SQL, retrieve_vector
+
+    pool, conn = mock_db_pool
+    conn.transaction = MagicMock(return_value=_Transaction())
+    conn.fetch.return_value = []
+
+    await retrieve_vector(pool, [0.1] * 768, "legal", 20, ef_search=200, iterative_scan="strict_order")
+
+    conn.transaction.assert_called_once()
+    sql, *values = conn.execute.await_args.args
+    assert sql == "SELECT set_config('hnsw.ef_search', $1, true), set_config('hnsw.iterative_scan', $2, true)"
+    assert values == ["200", "strict_order"]
+    assert conn.fetch.await_args.args[0] == VECTOR_SQL
+    # distance-ordered LIMIT (index-eligible), floor applied outside it
+    assert "ORDER BY embedding <=> $1::vector\n    LIMIT $3" in VECTOR_SQL
+
+    with pytest.raises(ValueError):
+        await retrieve_vector(pool, [0.1] * 768, "legal", 20, iterative_scan="fast")
+
+
+async def test_vector_search_at_the_pool_defaults_is_one_round_trip(mock_db_pool, monkeypatch):
+    """The defaults are every pooled connection's session settings, so no transaction or set_config."""
+    create_pool = AsyncMock()
+    monkeypatch.setattr(asyncpg, "create_pool", create_pool)
+    monkeypatch.setitem(config.HNSW_SEARCH_CONFIG, "ef_search", 100)
+    monkeypatch.setitem(config.HNSW_SEARCH_CONFIG, "iterative_scan", "relaxed_order")
+    await pool_module.create_pool()
+    assert create_pool.await_args.kwargs["server_settings"] == {
+        "hnsw.ef_search": "100", "hnsw.iterative_scan": "relaxed_order",
+    }
+
+    pool, conn = mock_db_pool
+    conn.transaction = MagicMock(return_value=_Transaction())
+    conn.fetch.return_value = []
+
+    await retrieve_vector(pool, [0.1] * 768, "legal", 20, ef_search=100, iterative_scan="relaxed_order")
+    await retrieve_vector(pool, [0.1] * 768, "legal", 20, ef_search=None, iterative_scan=None)
+    await retrieve_vector(pool, [0.1] * 768, "legal", 20, ef_search=150, iterative_scan="relaxed_order")
+
+    assert conn.transaction.call_count == 1
+    assert conn.execute.await_args.args == ("SELECT set_config('hnsw.ef_search', $1, true)", "150")
+    assert conn.fetch.await_count == 3
+
+
+async def test_bm25_scoring_is_one_statement_over_corpus_statistics(mock_db_pool, monkeypatch):
+    """bm25_scoring="bm25": no separate tsquery round trip; k1 / b / candidate budget from config."""
+    from api.services.retriever import BM25_SQL, HYBRID_BM25_SQL, RetrieverConfig, retrieve
+
+    monkeypatch.setitem(config.BM25_CONFIG, "maintain_stats", True)
+    pool, conn = mock_db_pool
+    conn.fetch.return_value = [
+        {"id": 3, "document_id": "gdpr", "content": "Article 5", "metadata": '{"source_filename": "gdpr.md"}',
+         "bm25_score": 7.5, "vector_score": None, "vector_rank": None, "rrf_score": 1 / 61},
+    ]
+    okapi = (config.BM25_CONFIG["k1"], config.BM25_CONFIG["b"], config.BM25_CONFIG["candidate_budget"])
+
+    results = await retrieve(pool, "GDPR Article 5", [0.1] * 768, "legal",
+                             RetrieverConfig(top_k=3, mode="bm25_only", bm25_scoring="bm25"))
+
+    assert conn.fetchval.await_count == 0
+    assert conn.fetch.await_args.args == (BM25_SQL, "GDPR Article 5", False, "legal", 3, *okapi)
+    assert results[0]["bm25_score"] == 7.5 and results[0]["metadata"] == {"source_filename": "gdpr.md"}
+
+    await retrieve(pool, "GDPR Article 5", [0.1] * 768, "legal",
+                   RetrieverConfig(top_k=3, mode="hybrid_sql", bm25_scoring="bm25",
+                                   ef_search=None, iterative_scan=None))
+    sql, *args = conn.fetch.await_args.args
+    assert sql == HYBRID_BM25_SQL and args[-3:] == list(okapi)
+
+    with pytest.raises(ValueError):
+        await retrieve(pool, "GDPR", [0.1] * 768, "legal", RetrieverConfig(mode="bm25_only", bm25_scoring="tf"))
+
+
+async def test_bm25_scoring_is_refused_while_statistics_are_not_maintained(mock_db_pool, monkeypatch):
+    """Empty statistics tables would make BM25_SQL / HYBRID_BM25_SQL match nothing, silently."""
+    import os
+    import subprocess
+    import sys
+
+    from api.services.retriever import RetrieverConfig, retrieve, retrieve_bm25
+
+    monkeypatch.setitem(config.BM25_CONFIG, "maintain_stats", False)
+    pool, conn = mock_db_pool
+
+    with pytest.raises(ValueError, match="BM25_MAINTAIN_STATS"):
+        await retrieve_bm25(pool, "GDPR Article 5", "legal", 5, scoring="bm25")
+    with pytest.raises(ValueError, match="BM25_MAINTAIN_STATS"):
+        await retrieve(pool, "GDPR Article 5", [0.1] * 768, "legal",
+                       RetrieverConfig(mode="hybrid_sql", bm25_scoring="bm25"))
+    assert conn.fetch.await_count == 0
+    conn.fetchval.return_value = ""
+    assert await retrieve_bm25(pool, "GDPR Article 5", "legal", 5, scoring="ts_rank") == []
+
+    env = dict(os.environ, BM25_SCORING="bm25", BM25_MAINTAIN_STATS="0")
+    loaded = subprocess.run([sys.executable, "-c", "import config"], env=env, capture_output=True, text=True)
+    assert loaded.returncode != 0 and "BM25_MAINTAIN_STATS" in loaded.stderr
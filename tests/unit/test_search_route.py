@@ -34,6 +34,6 @@ def test_search_request_validates_retrieval_mode():
         SearchRequest(query="test", retrieval_mode="invalid")
 
     # Valid modes should work
-    for mode in ("vector_only", "bm25_only", "hybrid"):
+    for mode in ("vector_only", "bm25_only", "hybrid", "hybrid_sql"):
         req = SearchRequest(query="test", retrieval_mode=mode)
         assert req.retrieval_mode == mode
@@ -0,0 +1,84 @@
+"""
+tests/unit/test_staged_load.py
+
+Tests for the staged bulk-load mode in core/database/staged_load.py. The
+connection is mocked; assertions are on the SQL it is sent, in order.
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.database.staged_load import StagedLoad
+
+
+class _Transaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+@pytest.fixture
+def staged_pool(mock_db_pool):
+    pool, conn = mock_db_pool
+    conn.transaction = MagicMock(return_value=_Transaction())
+    conn.execute.side_effect = lambda sql, *args: {"DELETE": "DELETE 3", "INSERT": "INSERT 0 120"}.get(
+        sql.split()[0], "OK"
+    )
+    conn.fetchval.side_effect = lambda sql, *args: (
+        120 if "count(*)" in sql else "CREATE INDEX idx_documents_embedding_hnsw ON ONLY public.documents USING hnsw"
+    )
+    return pool, conn
+
+
+def _statements(conn) -> list[str]:
+    return [" ".join(call.args[0].split()) for call in conn.execute.await_args_list]
+
+
+async def test_merge_below_threshold_keeps_index_and_computes_fts_in_one_statement(staged_pool):
+    pool, conn = staged_pool
+
+    async with StagedLoad(pool, hnsw_rebuild_threshold=1000) as load:
+        stats = await load.merge()
+
+    sql = _statements(conn)
+    assert sql[0].startswith(f"CREATE UNLOGGED TABLE {load.table}")
+    assert not any("INDEX" in s for s in sql)
+    disable, enable = sql.index(
+        "ALTER TABLE documents DISABLE TRIGGER trig_update_fts"
+    ), sql.index("ALTER TABLE documents ENABLE TRIGGER trig_update_fts")
+    insert = next(i for i, s in enumerate(sql) if s.startswith("INSERT INTO documents"))
+    assert disable < insert < enable
+    assert "to_tsvector('english'" in sql[insert]
+    # neither the DELETE nor the pointer flip may go back past a newer registered version
+    assert any(s.startswith("DELETE FROM documents") and "d.version < s.version" in s for s in sql)
+    assert any(s.startswith("UPDATE document_registry") and "s.version > r.current_version" in s for s in sql)
+    assert sql[-1] == f"DROP TABLE IF EXISTS {load.table}"
+    assert stats["rows_inserted"] == 120 and stats["rows_replaced"] == 3
+    assert stats["hnsw_rebuilt"] is False
+
+
+async def test_merge_above_threshold_rebuilds_hnsw_once(staged_pool):
+    pool, conn = staged_pool
+
+    async with StagedLoad(pool, hnsw_rebuild_threshold=100, maintenance_work_mem="2GB") as load:
+        stats = await load.merge()
+
+    sql = _statements(conn)
+    drop = sql.index("DROP INDEX idx_documents_embedding_hnsw")
+    insert = next(i for i, s in enumerate(sql) if s.startswith("INSERT INTO documents"))
+    rebuild = sql.index("CREATE INDEX idx_documents_embedding_hnsw ON public.documents USING hnsw")
+    assert drop < insert < rebuild
+    assert conn.execute.await_args_list[rebuild - 1].args[1] == "2GB"
+    assert stats["hnsw_rebuilt"] is True
+
+
+async def test_staging_table_dropped_when_load_fails(staged_pool):
+    pool, conn = staged_pool
+
+    with pytest.raises(RuntimeError):
+        async with StagedLoad(pool) as load:
+            raise RuntimeError("embedding provider down")
+
+    assert _statements(conn)[-1] == f"DROP TABLE IF EXISTS {load.table}"
@@ -0,0 +1,51 @@
+"""
+tests/unit/test_uploads.py
+
+Tests for streaming upload intake in api/services/uploads.py.
+"""
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from api.services.uploads import spool_upload
+from core.ingestion.lifecycle import compute_content_hash
+
+
+def _file(content: bytes, filename: str = "policy.md") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+async def test_small_upload_stays_in_memory_with_digest():
+    content = "# GDPR\n\nArticle 17 — right to erasure.\n".encode("utf-8")
+
+    upload = await spool_upload(_file(content), read_size=8)
+
+    assert upload.content == content and upload.path is None
+    assert upload.size == len(content)
+    assert upload.sha256 == compute_content_hash(content)
+
+
+async def test_large_upload_spills_to_spool_file():
+    content = ("Controllers shall erase personal data without undue delay. " * 500).encode("utf-8")
+
+    upload = await spool_upload(_file(content), read_size=1024, max_memory=4096)
+    try:
+        assert upload.content is None and upload.path.endswith(".md")
+        with open(upload.path, "rb") as f:
+            assert f.read() == content
+        assert upload.sha256 == compute_content_hash(content)
+    finally:
+        upload.cleanup()
+    assert upload.path is None
+
+
+async def test_invalid_utf8_raises_and_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    # A multi-byte character split across reads is fine; a stray byte is not
+    content = "é".encode("utf-8") * 3000 + b"\xff"
+
+    with pytest.raises(ValueError):
+        await spool_upload(_file(content), read_size=1001, max_memory=2048)
+    assert os.listdir(tmp_path) == []
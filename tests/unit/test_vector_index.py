@@ -0,0 +1,183 @@
+"""
+tests/unit/test_vector_index.py
+
+Tests for the in-process vector index in api/services/vector_index.py and
+its change feed in api/services/document_changes.py. Snapshots go to
+tmp_path; no DB needed.
+"""
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from api.services.document_changes import DocumentChangeListener
+from api.services.vector_index import NamespaceIndex, Snapshot, VectorIndex, write_snapshot
+from config import EMBEDDING_DIM
+
+
+def _rows(n: int, seed: int = 0, document_id=lambda i: f"doc-{i % 3}") -> list[dict]:
+    rng = np.random.default_rng(seed)
+    return [
+        {"id": i, "document_id": document_id(i), "content": f"chunk {i}",
+         "metadata": json.dumps({"source_filename": f"{document_id(i)}.md", "chunk_index": i}),
+         "embedding": rng.standard_normal(EMBEDDING_DIM).astype(np.float32)}
+        for i in range(n)
+    ]
+
+
+def _brute_force(rows: list[dict], query, limit: int) -> list[int]:
+    query = np.asarray(query) / np.linalg.norm(query)
+    scored = [(float(np.dot(r["embedding"] / np.linalg.norm(r["embedding"]), query)), r["id"]) for r in rows]
+    return [i for _, i in sorted(scored, reverse=True)[:limit]]
+
+
+def test_snapshot_roundtrip(tmp_path):
+    rows = _rows(5)
+    assert write_snapshot(tmp_path / "b-1", rows) == 5
+
+    snapshot = Snapshot(tmp_path / "b-1")
+
+    assert len(snapshot) == 5
+    assert isinstance(snapshot.embeddings, np.memmap)
+    assert snapshot.row(4) == {"id": 4, "document_id": "doc-1", "content": "chunk 4",
+                               "metadata": {"source_filename": "doc-1.md", "chunk_index": 4}}
+    assert np.allclose(np.linalg.norm(snapshot.embeddings, axis=1), 1.0, atol=1e-5)
+
+
+def test_empty_snapshot_searches_to_nothing(tmp_path):
+    write_snapshot(tmp_path / "b-1", [])
+    assert NamespaceIndex(Snapshot(tmp_path / "b-1")).search(np.ones(EMBEDDING_DIM), 5, 0.0) == []
+
+
+def test_search_matches_brute_force_and_applies_the_floor(tmp_path):
+    rows = _rows(50)
+    write_snapshot(tmp_path / "b-1", rows)
+    index = NamespaceIndex(Snapshot(tmp_path / "b-1"))
+    query = rows[7]["embedding"] + 0.1
+
+    results = index.search(query, 10, -1.0)
+
+    assert [r["id"] for r in results] == _brute_force(rows, query, 10)
+    assert results[0]["source_filename"] == "doc-1.md" and results[0]["metadata"]["chunk_index"] == 7
+    assert all(a["vector_score"] >= b["vector_score"] for a, b in zip(results, results[1:]))
+    floor = results[1]["vector_score"]
+    assert [r["id"] for r in index.search(query, 10, floor)] == [results[0]["id"]]
+
+
+def test_score_ties_go_to_the_lower_id_like_vector_sql(tmp_path):
+    rows = _rows(12)
+    boilerplate = rows[0]["embedding"]
+    for row, id in zip(rows[:4], (5, 2, 9, 7)):          # duplicate chunks, ids out of snapshot order
+        row["id"], row["embedding"] = id, boilerplate
+    for i, row in enumerate(rows[4:]):
+        row["id"] = 100 + i
+    write_snapshot(tmp_path / "b-1", rows)
+    index = NamespaceIndex(Snapshot(tmp_path / "b-1"))
+
+    assert [r["id"] for r in index.search(boilerplate, 2, -1.0)] == [2, 5]
+
+    index.replace_documents(["new"], [dict(rows[0], id=1, document_id="new")])
+    assert [r["id"] for r in index.search(boilerplate, 3, -1.0)] == [1, 2, 5]
+
+
+def test_replace_documents_masks_old_rows_and_searches_the_delta(tmp_path):
+    rows = _rows(30)
+    write_snapshot(tmp_path / "b-1", rows)
+    index = NamespaceIndex(Snapshot(tmp_path / "b-1"))
+    replacement = _rows(4, seed=1, document_id=lambda i: "doc-0")
+    for r in replacement:
+        r["id"] += 100
+
+    index.replace_documents(["doc-0", "doc-new-but-empty"], replacement)
+
+    current = [r for r in rows if r["document_id"] != "doc-0"] + replacement
+    query = replacement[2]["embedding"]
+    assert index.size == len(current)
+    assert index.changed_rows == 10 + 4
+    assert [r["id"] for r in index.search(query, 8, -1.0)] == _brute_force(current, query, 8)
+
+    index.replace_documents(["doc-0"], [])                      # deleted
+    assert index.size == 20
+    assert all(r["document_id"] != "doc-0" for r in index.search(query, 30, -1.0))
+
+
+async def test_unloaded_namespace_is_left_to_postgres():
+    index = VectorIndex(pool=object(), snapshot_dir="/nonexistent")
+    assert await index.search("legal", np.ones(EMBEDDING_DIM), 5, 0.0) is None
+
+
+async def test_large_namespaces_are_searched_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+
+    rows = _rows(40)
+    write_snapshot(tmp_path / "b-1", rows)
+    index = VectorIndex(pool=object(), snapshot_dir=tmp_path, offload_rows=40)
+    index._indexes["legal"] = NamespaceIndex(Snapshot(tmp_path / "b-1"))
+    query = rows[3]["embedding"]
+    offloaded = []
+
+    async def to_thread(fn, *args):
+        offloaded.append(fn)
+        return fn(*args)
+
+    monkeypatch.setattr(asyncio, "to_thread", to_thread)
+    results = await index.search("legal", query, 5, -1.0)
+    assert len(offloaded) == 1
+    assert [r["id"] for r in results] == _brute_force(rows, query, 5)
+
+    index.offload_rows = 41
+    assert await index.search("legal", query, 5, -1.0) == results
+    assert len(offloaded) == 1
+
+
+async def test_retrieve_vector_falls_back_to_postgres_without_an_answer(mock_db_pool, monkeypatch):
+    from api.services import retriever
+
+    pool, conn = mock_db_pool
+    conn.fetch.return_value = []
+
+    async def search(namespace, query, limit, min_score):
+        return [{"id": 1, "vector_score": 0.9}] if namespace == "legal" else None
+
+    memory = SimpleNamespace(search=search)
+
+    monkeypatch.setattr(retriever, "get_vector_index", lambda: None)
+    assert await retriever.retrieve_vector(pool, [0.1] * 768, "legal", 5, backend="memory") == []
+    assert conn.fetch.await_count == 1
+
+    monkeypatch.setattr(retriever, "get_vector_index", lambda: memory)
+    assert await retriever.retrieve_vector(pool, [0.1] * 768, "legal", 5, backend="memory") == [
+        {"id": 1, "vector_score": 0.9}
+    ]
+    assert await retriever.retrieve_vector(pool, [0.1] * 768, "hr", 5, backend="memory") == []
+    assert conn.fetch.await_count == 2
+
+    with pytest.raises(ValueError):
+        await retriever.retrieve_vector(pool, [0.1] * 768, "legal", 5, backend="faiss")
+
+
+def test_memory_indexes_subclasses_must_provide_rows_sql_and_open():
+    from api.services.memory_indexes import MemoryIndexes
+
+    class NoOpen(MemoryIndexes):
+        ROWS_SQL = "SELECT 1"
+
+    with pytest.raises(TypeError):
+        MemoryIndexes(pool=object(), max_rows=10, rebuild_fraction=0.2)
+    with pytest.raises(TypeError):
+        NoOpen(pool=object(), max_rows=10, rebuild_fraction=0.2)
+    assert VectorIndex(pool=object()).ROWS_SQL.lstrip().startswith("SELECT")
+
+
+def test_change_listener_dispatches_payloads_and_skips_malformed_ones():
+    listener = DocumentChangeListener(pool=object())
+    seen = []
+    listener.subscribe(lambda namespace, document_id: seen.append((namespace, document_id)))
+    listener.subscribe(lambda namespace, document_id: 1 / 0)     # a failing subscriber is isolated
+
+    listener._on_notify(None, 1, "document_changes", json.dumps({"namespace": "legal", "document_id": "gdpr"}))
+    listener._on_notify(None, 1, "document_changes", "not json")
+    listener._on_notify(None, 1, "document_changes", json.dumps({"namespace": "legal"}))
+
+    assert seen == [("legal", "gdpr")]